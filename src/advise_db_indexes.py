@@ -0,0 +1,189 @@
+#! /usr/bin/env python3
+'''
+    Firmware Analysis and Comparison Tool (FACT)
+    Copyright (C) 2015-2023  Fraunhofer FKIE
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+import sys
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Iterator
+
+import config
+from storage.db_interface_base import ReadOnlyDbInterface
+from storage.db_setup import DbSetup
+from storage.query_conversion import Explain, build_generic_search_query
+from storage.schema import INDEXED_RESULT_PLUGINS, AnalysisEntry, FileObjectEntry, FirmwareEntry
+
+PROGRAM_DESCRIPTION = (
+    'Replay logged search queries with EXPLAIN and recommend indexes for the filters of queries that scan whole tables'
+)
+SEARCH_QUERY_LOG_PREFIX = 'Search query: '  # see `generic_search` in `storage.db_interface_frontend`
+INDEXED_COLUMNS = {'file_object': {'uid', 'sha256'}, 'firmware': {'uid'}}
+ARRAY_COLUMNS = {'firmware_tags'}
+MAX_NAME_LENGTH = 63
+
+
+def read_queries(paths: list[str]) -> Iterator[dict]:
+    '''
+    Read search queries from files with one query per line. The line may either be a JSON query (as used by the
+    advanced search or the REST API) or a log line with the search query (the frontend logs it at the debug level).
+    '''
+    for path in paths:
+        for line in Path(path).read_text().splitlines():
+            if SEARCH_QUERY_LOG_PREFIX in line:
+                line = line.split(SEARCH_QUERY_LOG_PREFIX, maxsplit=1)[1]
+            try:
+                query = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(query, dict):
+                yield query
+
+
+def get_index_recommendations(query: dict) -> dict[str, str]:
+    '''
+    Get the indexes that could be used by the filters of a search query. Filters that can already use an index of the
+    schema are skipped.
+
+    :param query: A search query (e.g. ``{"processed_analysis.file_type.full": {"$like": "ELF"}}``).
+    :return: The definitions of the recommended indexes (see ``storage.db_setup.TRIGRAM_INDEXES``) by index name.
+    '''
+    recommendations = {}
+    for key, value in _iterate_filters(query):
+        operator = next(iter(value)) if isinstance(value, dict) and value else '$eq'
+        if key.startswith('processed_analysis.'):
+            _, plugin, subkey = key.split('.', maxsplit=2)
+            index = _get_analysis_index(plugin, subkey, operator)
+        elif hasattr(FileObjectEntry, key):
+            index = _get_column_index('file_object', key, operator)
+        elif hasattr(FirmwareEntry, key):
+            index = _get_column_index('firmware', key, operator)
+        else:
+            index = None
+        if index is not None:
+            recommendations[_get_index_name(index[0])] = index[1]
+    return recommendations
+
+
+def _iterate_filters(query: dict) -> Iterator[tuple[str, Any]]:
+    for key, value in query.items():
+        if key == '$or':
+            yield from _iterate_filters(value)
+        else:
+            yield key, value
+
+
+def _get_analysis_index(plugin: str, subkey: str, operator: str) -> tuple[str, str] | None:
+    if hasattr(AnalysisEntry, subkey):  # e.g. the summary (indexed by the schema)
+        return None
+    path = subkey.split('.')
+    where = f'WHERE plugin = {_quote(plugin)}'
+    if operator == '$eq' and plugin not in INDEXED_RESULT_PLUGINS:
+        return f'analysis_{plugin}_result', f'analysis USING gin (result jsonb_path_ops) {where}'
+    if operator == '$in' and not (plugin == 'file_type' and path == ['mime']):
+        return f'analysis_{plugin}_{subkey}', f'analysis (({_get_json_expression(path, as_text=True)})) {where}'
+    if operator == '$like':
+        expression = _get_json_expression(path, as_text=True)
+        return f'analysis_{plugin}_{subkey}_trigram', f'analysis USING gin (({expression}) gin_trgm_ops) {where}'
+    if operator in ['$lt', '$gt']:
+        return f'analysis_{plugin}_{subkey}_json', f'analysis (({_get_json_expression(path, as_text=False)})) {where}'
+    return None
+
+
+def _get_json_expression(path: list[str], as_text: bool) -> str:
+    # this must be the same expression as in the query (see `_add_json_filter` in `storage.query_conversion`)
+    *parents, last = [_quote(key) for key in path]
+    return ' -> '.join(['result', *parents]) + (' ->> ' if as_text else ' -> ') + last
+
+
+def _get_column_index(table: str, column: str, operator: str) -> tuple[str, str] | None:
+    if column in INDEXED_COLUMNS.get(table, set()) or column == 'release_date':  # release date is converted to text
+        return None
+    if column in ARRAY_COLUMNS:
+        return f'{table}_{column}', f'{table} USING gin ({column})'
+    if operator in ['$like', '$regex']:
+        return f'{table}_{column}_trigram', f'{table} USING gin ({column} gin_trgm_ops)'
+    if operator in ['$eq', '$in', '$lt', '$gt']:
+        return f'{table}_{column}', f'{table} ({column})'
+    return None
+
+
+def _quote(string: str) -> str:
+    escaped = string.replace('\'', '\'\'')
+    return f'\'{escaped}\''
+
+
+def _get_index_name(label: str) -> str:
+    return re.sub(r'\W+', '_', label.lower())[: MAX_NAME_LENGTH - len('_index')] + '_index'
+
+
+def get_scanned_tables(db: ReadOnlyDbInterface, query: dict) -> set[str]:
+    '''
+    Get the tables that are scanned sequentially when the search query is executed by the frontend.
+    '''
+    with db.get_read_only_session() as session:
+        plan = session.execute(Explain(build_generic_search_query(deepcopy(query), False, False))).scalar()
+    return set(_iterate_sequential_scans(plan[0]['Plan']))
+
+
+def _iterate_sequential_scans(node: dict) -> Iterator[str]:
+    if node['Node Type'] == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from _iterate_sequential_scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=PROGRAM_DESCRIPTION)
+    parser.add_argument('files', nargs='+', help='files with search queries (JSON queries or FACT logs)')
+    parser.add_argument('--create', action='store_true', help='create the recommended indexes')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+    logging.basicConfig(level=logging.INFO)
+
+    db, db_setup = ReadOnlyDbInterface(), DbSetup()
+    recommendations = {}
+    for query in read_queries(args.files):
+        scanned_tables = get_scanned_tables(db, query)
+        for name, definition in get_index_recommendations(query).items():
+            if definition.split(' ', maxsplit=1)[0] in scanned_tables and not db_setup.index_exists(name):
+                recommendations.setdefault(name, (definition, []))[1].append(query)
+
+    if not recommendations:
+        print('No missing indexes found')
+    for name, (definition, queries) in recommendations.items():
+        print(f'CREATE INDEX {name} ON {definition};  -- used by {len(queries)} queries, e.g. {json.dumps(queries[0])}')
+
+    if args.create and recommendations:
+        trigram_indexes = {name for name, (definition, _) in recommendations.items() if 'gin_trgm_ops' in definition}
+        if trigram_indexes and not db_setup.create_trigram_extension():
+            logging.warning(f'Extension pg_trgm is not available: Skipping {", ".join(sorted(trigram_indexes))}')
+            recommendations = {name: item for name, item in recommendations.items() if name not in trigram_indexes}
+        for name, (definition, _) in recommendations.items():
+            logging.info(f'Creating index {name}')
+            db_setup.create_index(name, definition)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import ctypes
 import logging
-from multiprocessing import Array, Manager, Queue, Value
+from multiprocessing import Array, Queue, Value
 from queue import Empty
 from time import time
 
@@ -9,11 +9,11 @@ from packaging.version import parse as parse_version
 
 from config import cfg
 from helperFunctions.process import (
-    ExceptionSafeProcess,
+    PersistentTaskProcess,
+    TaskProcessError,
     check_worker_exceptions,
     start_single_worker,
     stop_processes,
-    terminate_process_and_children,
 )
 from helperFunctions.tag import TagColor
 from objects.file import FileObject
@@ -55,8 +55,8 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
         self.stop_condition = Value('i', 0)
         self.workers = []
         self.thread_count = 1 if no_multithread else self._get_thread_count()
+        self.max_tasks_per_worker = self._get_max_tasks_per_worker()
         self.active = [Value('i', 0) for _ in range(self.thread_count)]
-        self.manager = Manager()
         self.analysis_stats = Array(ctypes.c_float, self.ANALYSIS_STATS_LIMIT)
         self.analysis_stats_count = Value('i', 0)
         self.analysis_stats_index = Value('i', 0)
@@ -68,6 +68,12 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
         """
         return int(getattr(cfg, self.NAME, {}).get('threads', cfg.plugin_defaults.threads))
 
+    def _get_max_tasks_per_worker(self) -> int:
+        '''
+        Get the number of tasks after which an analysis process is recycled (``0`` means never) from the config.
+        '''
+        return int(getattr(cfg, self.NAME, {}).get('max_tasks_per_worker', cfg.plugin_defaults.max_tasks_per_worker))
+
     def additional_setup(self):
         '''
         This function can be implemented by the plugin to do initialization
@@ -155,32 +161,33 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
             self.workers.append(start_single_worker(process_index, 'Analysis', self.worker))
         logging.debug(f'{self.NAME}: {len(self.workers)} worker threads started')
 
-    def process_next_object(self, task, result):
+    def process_next_object(self, task: FileObject) -> FileObject:
+        # the scheduler does not send the binary through the queues if the file is in the file storage -> it is loaded
+        # from the file if the plugin accesses it (see `FileObject.binary`)
+        binary_is_lazy = not task.binary_is_loaded()
         task.processed_analysis.update({self.NAME: {}})
-        finished_task = self.analyze_file(task)
-        result.append(finished_task)
+        result = self.analyze_file(task)
+        if binary_is_lazy:
+            result.binary = None  # the binary is also not needed on the way back
+        return result
 
-    @staticmethod
-    def timeout_happened(process):
-        return process.is_alive()
-
-    def worker_processing_with_timeout(self, worker_id, next_task: FileObject):
-        result = self.manager.list()
-        process = ExceptionSafeProcess(target=self.process_next_object, args=(next_task, result))
+    def worker_processing_with_timeout(self, worker_id, next_task: FileObject, task_process: PersistentTaskProcess):
         start = time()
-        process.start()
-        process.join(timeout=self.TIMEOUT)
-        duration = time() - start
-        if duration > 120:
-            logging.info(f'Analysis {self.NAME} on {next_task.uid} is slow: took {duration:.1f} seconds')
-        self._update_duration_stats(duration)
-        if self.timeout_happened(process):
-            self._handle_failed_analysis(next_task, process, worker_id, 'Timeout')
-        elif process.exception:
-            self._handle_failed_analysis(next_task, process, worker_id, 'Exception')
+        try:
+            result = task_process.execute(next_task, timeout=self.TIMEOUT)
+        except TimeoutError:
+            self._handle_failed_analysis(next_task, worker_id, 'Timeout')
+        except TaskProcessError as error:
+            logging.warning(f'Worker {worker_id}: {self.NAME} analysis on {next_task.uid} failed:\n{error}')
+            self._handle_failed_analysis(next_task, worker_id, 'Exception')
         else:
-            self.out_queue.put(result.pop())
+            self.out_queue.put(result)
             logging.debug(f'Worker {worker_id}: Finished {self.NAME} analysis on {next_task.uid}')
+        finally:
+            duration = time() - start
+            if duration > 120:
+                logging.info(f'Analysis {self.NAME} on {next_task.uid} is slow: took {duration:.1f} seconds')
+            self._update_duration_stats(duration)
 
     def _update_duration_stats(self, duration):
         with self.analysis_stats.get_lock():
@@ -192,23 +199,31 @@ class AnalysisBasePlugin(BasePlugin):  # pylint: disable=too-many-instance-attri
         if self.analysis_stats_count.value < self.ANALYSIS_STATS_LIMIT:
             self.analysis_stats_count.value += 1
 
-    def _handle_failed_analysis(self, fw_object, process, worker_id, cause: str):
-        terminate_process_and_children(process)
+    def _handle_failed_analysis(self, fw_object, worker_id, cause: str):
         fw_object.analysis_exception = (self.NAME, f'{cause} occurred during analysis')
         logging.error(f'Worker {worker_id}: {cause} during analysis {self.NAME} on {fw_object.uid}')
         self.out_queue.put(fw_object)
 
     def worker(self, worker_id):
-        while self.stop_condition.value == 0:
-            try:
-                next_task = self.in_queue.get(timeout=float(cfg.expert_settings.block_delay))
-                logging.debug(f'Worker {worker_id}: Begin {self.NAME} analysis on {next_task.uid}')
-            except Empty:
-                self.active[worker_id].value = 0
-            else:
-                self.active[worker_id].value = 1
-                next_task.processed_analysis.update({self.NAME: {}})
-                self.worker_processing_with_timeout(worker_id, next_task)
+        # the analysis runs in a separate process, so that we can enforce the timeout and that the worker survives
+        # crashes; the process is kept alive between tasks and only replaced after a timeout, a crash or after
+        # `max_tasks_per_worker` tasks
+        task_process = PersistentTaskProcess(
+            self.process_next_object, name=f'{self.NAME}-Task-{worker_id}', max_tasks=self.max_tasks_per_worker
+        )
+        try:
+            while self.stop_condition.value == 0:
+                try:
+                    next_task = self.in_queue.get(timeout=float(cfg.expert_settings.block_delay))
+                    logging.debug(f'Worker {worker_id}: Begin {self.NAME} analysis on {next_task.uid}')
+                except Empty:
+                    self.active[worker_id].value = 0
+                else:
+                    self.active[worker_id].value = 1
+                    next_task.processed_analysis.update({self.NAME: {}})
+                    self.worker_processing_with_timeout(worker_id, next_task, task_process)
+        finally:
+            task_process.shutdown()
 
         logging.debug(f'worker {worker_id} stopped')
 
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import json
 import logging
 import re
-import subprocess
 from pathlib import Path
 
+import yara
+
 from analysis.PluginBase import AnalysisBasePlugin, PluginInitException
-from helperFunctions.fileSystem import get_src_dir
+from helperFunctions.fileSystem import SIGNATURE_DIR
+
+RULE_AND_HEX_STRING_REGEX = re.compile(r'^\s*(?:(?:private|global)\s+)*rule\s+(\w+)|^\s*(\$\w*)\s*=\s*\{', re.MULTILINE)
 
 
 class YaraBasePlugin(AnalysisBasePlugin):
@@ -32,86 +34,93 @@ class YaraBasePlugin(AnalysisBasePlugin):
                 plugin=self,
             )
         self.SYSTEM_VERSION = self.get_yara_system_version()  # pylint: disable=invalid-name
+        self._rules: yara.Rules | None = None
+        self._hex_strings: set[tuple[str, str]] = set()
         super().__init__(view_updater=view_updater)
 
     def get_yara_system_version(self):
-        with subprocess.Popen(['yara', '--version'], stdout=subprocess.PIPE) as process:
-            yara_version = process.stdout.readline().decode().strip()
-
         access_time = int(Path(self.signature_path).stat().st_mtime)
-        return f'{yara_version}-{access_time}'
+        return f'{yara.__version__}-{access_time}'
 
     def process_object(self, file_object):
         if self.signature_path is not None:
-            compiled_flag = '-C' if Path(self.signature_path).read_bytes().startswith(b'YARA') else ''
-            command = f'yara {compiled_flag} --print-meta --print-strings {self.signature_path} {file_object.file_path}'
-            with subprocess.Popen(command, shell=True, stdout=subprocess.PIPE) as process:
-                output = process.stdout.read().decode()
             try:
-                result = self._parse_yara_output(output)
+                # the file may already have been scanned with the signatures of all YARA plugins (see YaraScanStage)
+                result = file_object.temporary_data.pop('yara_matches', None)
+                if result is None:
+                    matches = self._get_rules().match(data=file_object.binary)
+                    result = _convert_yara_matches(matches, self._hex_strings)
                 file_object.processed_analysis[self.NAME] = result
                 file_object.processed_analysis[self.NAME]['summary'] = list(result.keys())
-            except (ValueError, TypeError):
+            except yara.Error as error:
+                logging.warning(f'YARA scan of {file_object.uid} failed: {error}')
                 file_object.processed_analysis[self.NAME] = {'failed': 'Processing corrupted. Likely bad call to yara.'}
         else:
             file_object.processed_analysis[self.NAME] = {'failed': 'Signature path not set'}
         return file_object
 
+    def _get_rules(self) -> yara.Rules:
+        # the rules are loaded only once in each analysis process (the processes are reused for many files)
+        if self._rules is None:
+            if Path(self.signature_path).read_bytes().startswith(b'YARA'):  # compiled rules
+                self._rules = yara.load(self.signature_path)
+            else:
+                self._rules = yara.compile(filepath=self.signature_path)
+            self._hex_strings = _get_hex_strings(Path(self.FILE).parent.parent / 'signatures')
+        return self._rules
+
     @staticmethod
     def _get_signature_file_name(plugin_path):
         return plugin_path.split('/')[-3] + '.yc'
 
     def _get_signature_file(self, plugin_path):
         sig_file_name = self._get_signature_file_name(plugin_path)
-        return str(Path(get_src_dir()) / 'analysis/signatures' / sig_file_name)
-
-    @staticmethod
-    def _parse_yara_output(output):
-        resulting_matches = {}
-
-        match_blocks, rules = _split_output_in_rules_and_matches(output)
-
-        matches_regex = re.compile(r'((0x[a-f0-9]*):(\$[a-zA-Z0-9_]+):\s(.+))+')
-        for index, rule in enumerate(rules):
-            for match in matches_regex.findall(match_blocks[index]):
-                _append_match_to_result(match, resulting_matches, rule)
-
-        return resulting_matches
+        return str(Path(SIGNATURE_DIR) / sig_file_name)
 
 
-def _split_output_in_rules_and_matches(output):
-    split_regex = re.compile(r'\n*.*\[.*\]\s/.+\n*')
-    match_blocks = split_regex.split(output)
-    while '' in match_blocks:
-        match_blocks.remove('')
-
-    rule_regex = re.compile(r'(\w*)\s\[(.*)\]\s([.]{0,2}/)(.+)')
-    rules = rule_regex.findall(output)
-
-    if not len(match_blocks) == len(rules):
-        raise ValueError()
-    return match_blocks, rules
-
-
-def _append_match_to_result(match, resulting_matches: dict[str, dict], rule):
-    rule_name, meta_string, _, _ = rule
-    _, offset, matched_tag, matched_string = match
-    resulting_matches.setdefault(
-        rule_name, dict(rule=rule_name, matches=True, strings=[], meta=_parse_meta_data(meta_string))
-    )
-    resulting_matches[rule_name]['strings'].append((int(offset, 16), matched_tag, matched_string))
-
-
-def _parse_meta_data(meta_data_string):
+def _get_hex_strings(signature_dir: Path) -> set[tuple[str, str]]:
     '''
-    Will be of form 'item0=lowercaseboolean0,item1="value1",item2=value2,..'
+    yara-python does not tell if a matched string is a hex string. Therefore, the rule names and identifiers of the hex
+    strings are collected from the signature sources (the YARA command line tool printed hex strings as hex bytes).
     '''
-    meta_data = {}
-    for item in meta_data_string.split(','):
-        if '=' in item:
-            key, value = item.split('=', maxsplit=1)
-            value = json.loads(value) if value in ['true', 'false'] else value.strip('"')
-            meta_data[key] = value
-        else:
-            logging.warning(f'Malformed meta string \'{meta_data_string}\'')
-    return meta_data
+    hex_strings = set()
+    for signature_file in sorted(signature_dir.glob('*.yara')):
+        rule = None
+        for rule_name, identifier in RULE_AND_HEX_STRING_REGEX.findall(signature_file.read_text()):
+            if rule_name:
+                rule = rule_name
+            else:
+                hex_strings.add((rule, identifier))
+    return hex_strings
+
+
+def _convert_yara_matches(matches: list[yara.Match], hex_strings: set[tuple[str, str]]) -> dict[str, dict]:
+    '''
+    Convert the matches of yara-python to the result format of the YARA plugins (which is the same as the format of the
+    parsed output of the YARA command line tool that was used before):
+    ``{rule_name: {'rule': rule_name, 'matches': True, 'strings': [(offset, identifier, string)], 'meta': {...}}}``
+    '''
+    return {
+        match.rule: {
+            'rule': match.rule,
+            'matches': True,
+            'strings': [
+                (
+                    instance.offset,
+                    string_match.identifier,
+                    _convert_matched_data(instance.matched_data, (match.rule, string_match.identifier) in hex_strings),
+                )
+                for string_match in match.strings
+                for instance in string_match.instances
+            ],
+            'meta': {key: value if isinstance(value, bool) else str(value) for key, value in match.meta.items()},
+        }
+        for match in matches
+    }
+
+
+def _convert_matched_data(data: bytes, is_hex_string: bool) -> str:
+    # same representation as in the output of the YARA command line tool
+    if is_hex_string:
+        return ' '.join(f'{byte:02X}' for byte in data[:64]) + (' ...' if len(data) > 64 else '')
+    return ''.join(chr(byte) if 32 <= byte <= 126 else f'\\x{byte:02X}' for byte in data)
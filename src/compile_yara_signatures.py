@@ -17,26 +17,24 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
+from __future__ import annotations
+
 import os
-import subprocess
 import sys
-from subprocess import PIPE, STDOUT, CalledProcessError
-from tempfile import NamedTemporaryFile
+from tempfile import TemporaryDirectory
 
 from common_helper_files import get_dirs_in_dir, get_files_in_dir
 
-from helperFunctions.fileSystem import get_src_dir
-
-SIGNATURE_DIR = os.path.join(get_src_dir(), 'analysis/signatures')
+from helperFunctions.fileSystem import FUSED_SIGNATURE_FILE, SIGNATURE_DIR, get_src_dir
 
 
-def _create_joint_signature_file(directory, tmp_file):
+def _create_joint_signature_file(directory, target_path):
     all_signatures = list()
     for signature_file in sorted(get_files_in_dir(directory)):
         with open(signature_file, 'rb') as fd:
             all_signatures.append(fd.read())
 
-    with open(tmp_file.name, 'wb') as fd:
+    with open(target_path, 'wb') as fd:
         fd.write(b'\x0a'.join(all_signatures))
 
 
@@ -44,13 +42,34 @@ def _get_plugin_name(plugin_path):
     return plugin_path.split('/')[-2]
 
 
-def _create_compiled_signature_file(directory, tmp_file):
+def _create_compiled_signature_file(directory, joint_signature_file):
     target_path = os.path.join(SIGNATURE_DIR, f'{_get_plugin_name(directory)}.yc')
+    compile_signature_file(joint_signature_file, target_path)
+
+
+def _create_fused_signature_file(joint_signature_files):
+    # must be created after the signature files of the plugins (they are not used if they are newer)
+    compile_signature_file(joint_signature_files, FUSED_SIGNATURE_FILE)
+
+
+def compile_signature_file(sources: str | dict[str, str], target_path: str) -> bool:
+    '''
+    Compile YARA signatures with yara-python. The compiled rules are loaded with yara-python (``yara.load``), which
+    only accepts rules compiled with the same version of libyara (so they must not be compiled with ``yarac``).
+
+    :param sources: The path of a signature file or a dict with namespace -> path of a signature file.
+    :param target_path: The path of the compiled signature file.
+    :return: ``True`` if the signatures were compiled successfully and ``False`` otherwise.
+    '''
+    import yara  # pylint: disable=import-outside-toplevel  # yara-python may not be installed yet (see installer)
+
     try:
-        command = f'yarac -d test_flag=false {tmp_file.name} {target_path}'
-        subprocess.run(command, stdout=PIPE, stderr=STDOUT, shell=True, check=True)
-    except CalledProcessError:
-        print(f'[ERROR] Creation of {os.path.split(target_path)[0]} failed !!')
+        sources_kwarg = {'filepaths': sources} if isinstance(sources, dict) else {'filepath': sources}
+        yara.compile(externals={'test_flag': False}, **sources_kwarg).save(target_path)
+        return True
+    except yara.Error as error:
+        print(f'[ERROR] Creation of {target_path} failed: {error}')
+        return False
 
 
 def _create_signature_dir():
@@ -60,13 +79,18 @@ def _create_signature_dir():
 
 def main():
     _create_signature_dir()
-    for plugin_dir in get_dirs_in_dir(os.path.join(get_src_dir(), 'plugins/analysis')):
-        signature_dir = os.path.join(plugin_dir, 'signatures')
-        if os.path.isdir(signature_dir):
-            print(f'Compile signatures in {signature_dir}')
-            with NamedTemporaryFile(mode='w') as tmp_file:
-                _create_joint_signature_file(signature_dir, tmp_file)
-                _create_compiled_signature_file(signature_dir, tmp_file)
+    joint_signature_files = {}
+    with TemporaryDirectory() as tmp_dir:
+        for plugin_dir in get_dirs_in_dir(os.path.join(get_src_dir(), 'plugins/analysis')):
+            signature_dir = os.path.join(plugin_dir, 'signatures')
+            if os.path.isdir(signature_dir):
+                print(f'Compile signatures in {signature_dir}')
+                joint_signature_file = os.path.join(tmp_dir, f'{_get_plugin_name(signature_dir)}.yara')
+                _create_joint_signature_file(signature_dir, joint_signature_file)
+                _create_compiled_signature_file(signature_dir, joint_signature_file)
+                joint_signature_files[_get_plugin_name(signature_dir)] = joint_signature_file
+        print(f'Compile fused signatures of all plugins to {FUSED_SIGNATURE_FILE}')
+        _create_fused_signature_file(joint_signature_files)
 
     return 0
 
@@ -3,6 +3,7 @@ from __future__ import annotations
 import configparser
 from configparser import ConfigParser
 from pathlib import Path
+from typing import Optional
 
 from pydantic import BaseModel, Extra
 from werkzeug.local import LocalProxy
@@ -46,12 +47,17 @@ class DataStorage(BaseModel):
     postgres_admin_user: str
     postgres_admin_pw: str
 
+    postgres_pool_size: int = 1
+    postgres_max_overflow: int = 4
+
     redis_fact_db: str
     redis_test_db: str
     redis_host: str
     redis_port: int
 
     firmware_file_storage_directory: str
+    ngram_index_directory: Optional[str] = None
+    unpack_cache_directory: Optional[str] = None
 
     user_database: str
     password_salt: str
@@ -74,6 +80,10 @@ class Unpack(BaseModel):
     whitelist: list
     max_depth: int
     memory_limit: int = 2048
+    extraction_timeout: int = 300
+    persistent_extractors: bool = False
+    extractor_base_port: int = 9900
+    storage_threads: int = 4
 
 
 class DefaultPlugins(BaseModel):
@@ -82,6 +92,7 @@ class DefaultPlugins(BaseModel):
 
 class PluginDefaults(BaseModel):
     threads: int = 2
+    max_tasks_per_worker: int = 1000
 
 
 class Database(BaseModel):
@@ -89,6 +100,7 @@ class Database(BaseModel):
     results_per_page: int
     number_of_latest_firmwares_to_display: int = 10
     ajax_stats_reload_time: int
+    approximate_count_threshold: int = 0
 
 
 class Statistics(BaseModel):
@@ -108,6 +120,11 @@ class ExpertSettings(BaseModel):
     nginx: bool
     intercom_poll_delay: float
     radare2_host: str
+    result_batch_size: int = 100
+    result_flush_interval: float = 0.5
+    result_queue_size: int = 1000
+    yara_scan_threads: int = 4
+    binary_search_threads: int = 0
 
 
 # We need to allow extra here since we don't know what plugins will be loaded
@@ -12,6 +12,11 @@ def get_src_dir() -> str:
     return str(Path(__file__).parent.parent)
 
 
+SIGNATURE_DIR = str(Path(get_src_dir()) / 'analysis' / 'signatures')
+# the signatures of all YARA based plugins compiled into a single ruleset (with the plugin names as namespaces)
+FUSED_SIGNATURE_FILE = str(Path(SIGNATURE_DIR) / 'fused_yara_plugins.yc')
+
+
 def get_template_dir() -> Path:
     '''
     Retrieves the absolute path of the template directory.
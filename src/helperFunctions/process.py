@@ -9,6 +9,7 @@ from contextlib import suppress
 from multiprocessing import Pipe, Process
 from signal import SIGTERM
 from threading import Thread
+from typing import Any
 
 import psutil
 
@@ -100,6 +101,109 @@ class ExceptionSafeProcess(Process):
         return self._exception
 
 
+class TaskProcessError(Exception):
+    '''
+    Raised by :class:`PersistentTaskProcess` if a task could not be processed because of an exception in the task
+    function or because the process terminated unexpectedly. The message contains the stack trace (if available).
+    '''
+
+
+class PersistentTaskProcess:
+    '''
+    A long-lived process that executes ``function`` for each task it receives. In contrast to starting a new process
+    for each task, the process (and all state the function may have initialized) is kept alive between tasks. The
+    process is only replaced after a timeout, if it terminated unexpectedly or after it processed ``max_tasks`` tasks.
+    Tasks and results are transferred through a ``multiprocessing.Pipe`` and must therefore be picklable.
+
+    :param function: The function that is called with each task as argument. Its return value is the result.
+    :param name: The name of the process.
+    :param max_tasks: The number of tasks after which the process is recycled (``0`` means no limit).
+    '''
+
+    def __init__(self, function: Callable, name: str | None = None, max_tasks: int = 0):
+        self.function = function
+        self.name = name
+        self.max_tasks = max_tasks
+        self.task_count = 0
+        self.process: Process | None = None
+        self._connection = None
+
+    def execute(self, task: Any, timeout: float) -> Any:
+        '''
+        Process ``task`` in the persistent process (the process is started if it is not running).
+
+        :param task: The task that is passed to ``function``.
+        :param timeout: Time in seconds after which the task is aborted and the process is terminated.
+        :return: The return value of ``function``.
+        :raises TimeoutError: If the task did not finish in time.
+        :raises TaskProcessError: If an exception occurred in ``function`` or the process terminated unexpectedly.
+        '''
+        if self.process is None or not self.process.is_alive():
+            self._start()
+        try:
+            self._connection.send(task)
+            task_finished = self._connection.poll(timeout)
+            if task_finished:
+                result, stack_trace = self._connection.recv()
+        except (EOFError, OSError) as error:
+            self.terminate()
+            raise TaskProcessError(f'Process terminated unexpectedly: {error}') from error
+        if not task_finished:
+            self.terminate()
+            raise TimeoutError(f'Task did not finish after {timeout} seconds')
+        self.task_count += 1
+        if self.max_tasks and self.task_count >= self.max_tasks:
+            self.shutdown()
+        if stack_trace is not None:
+            raise TaskProcessError(stack_trace)
+        return result
+
+    def _start(self):
+        self._connection, child_connection = Pipe()
+        self.process = Process(target=_run_tasks, args=(self.function, child_connection), name=self.name)
+        self.process.start()
+        child_connection.close()  # we need to close our end or else we won't notice if the process terminates
+        self.task_count = 0
+
+    def shutdown(self, timeout: float = 5.0):
+        '''
+        Stop the process gracefully. If it does not stop until `timeout` is reached, it is terminated.
+
+        :param timeout: Timeout for joining the process in seconds.
+        '''
+        if self.process is None:
+            return
+        with suppress(OSError):
+            self._connection.send(None)
+        self.process.join(timeout=timeout)
+        self.terminate()
+
+    def terminate(self):
+        '''
+        Terminate the process and all of its children. A new process will be started with the next task.
+        '''
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            terminate_process_and_children(self.process)
+        self._connection.close()
+        self.process, self._connection = None, None
+
+
+def _run_tasks(function: Callable, connection):
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:  # the parent process terminated
+            break
+        if task is None:
+            break
+        try:
+            connection.send((function(task), None))
+        except Exception:  # pylint: disable=broad-except
+            connection.send((None, traceback.format_exc()))
+
+
 def terminate_process_and_children(process: Process) -> None:
     '''
     Terminate a process and all of its child processes.
@@ -73,6 +73,9 @@ def _setup_argparser(name, description, command_line_options, version=__VERSION_
         '-t', '--testing', default=False, action='store_true', help='shutdown system after one iteration'
     )
     parser.add_argument('--no-radare', default=False, action='store_true', help='don\'t start radare server')
+    parser.add_argument(
+        '--reconcile-counters', default=False, action='store_true', help='recount the summary counters of the statistic'
+    )
     return parser.parse_args(command_line_options[1:])
 
 
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import re
+from hashlib import sha256
+from pathlib import Path
 from typing import AnyStr
 
 from helperFunctions.data_conversion import make_bytes
 from helperFunctions.hash import get_sha256
 
 UID_REGEX = re.compile(r'[a-f0-9]{64}_[0-9]+')
+CHUNK_SIZE = 2**20
 
 
 def create_uid(input_data: bytes) -> str:
@@ -21,6 +24,21 @@ def create_uid(input_data: bytes) -> str:
     return f'{hash_value}_{size}'
 
 
+def create_uid_from_file(file_path: str | Path) -> str:
+    '''
+    generate the UID of a file without loading the whole file into memory (the file is hashed in chunks)
+
+    :param file_path: the path of the file
+    :return: a string containing the UID
+    '''
+    hash_object, size = sha256(), 0
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hash_object.update(chunk)
+            size += len(chunk)
+    return f'{hash_object.hexdigest()}_{size}'
+
+
 def is_uid(input_string: AnyStr) -> bool:
     '''
     Check if a string is a valid UID
@@ -1,105 +1,141 @@
 from __future__ import annotations
 
-import subprocess
+import logging
+import os
+from collections.abc import Callable, Iterable, Iterator
+from io import BytesIO
+from itertools import islice
+from multiprocessing import Pool
 from os.path import basename
-from pathlib import Path
-from subprocess import PIPE, STDOUT, CalledProcessError
-from tempfile import NamedTemporaryFile
+from time import time
 
 import yara
 
 from config import cfg
+from helperFunctions.yara_prefilter import get_ngram_query
 from storage.db_interface_common import DbInterfaceCommon
 from storage.fsorganizer import FSOrganizer
+from storage.ngram_index import get_ngram_index
+
+SHARD_SIZE = 100  # number of files scanned by a worker process at once
+PARTIAL_RESULT_INTERVAL = 5  # minimum time in seconds between two partial results
+
+_worker_rules: yara.Rules | None = None  # the rules of the search (loaded once in each worker process)
 
 
 class YaraBinarySearchScanner:
     '''
     This class provides functionality to scan files in the database for yara patterns. The public method allows to
     either match a given set of patterns on all files in the database or focus only on files included in a single
-    firmware.
+    firmware. In both cases, the files are split into shards which are scanned in parallel by a pool of worker
+    processes. The rules are compiled once and loaded once by each worker. If the n-gram index is enabled, files that
+    cannot match because they do not contain the literal strings that the rules require are not scanned.
 
-    :param config: The FACT configuration.
+    :param worker_count: The number of worker processes (defaults to the number of CPU cores).
     '''
 
-    def __init__(self):
-        self.matches = []
+    def __init__(self, worker_count: int | None = None):
         self.db_path = cfg.data_storage.firmware_file_storage_directory
         self.db = DbInterfaceCommon()
         self.fs_organizer = FSOrganizer()
+        self.worker_count = worker_count or cfg.expert_settings.binary_search_threads or os.cpu_count()
+        self.ngram_index = get_ngram_index()
+
+    def _get_file_paths(self, firmware_uid: str | None) -> Iterator[str]:
+        if firmware_uid is None:  # all files in the file storage
+            for directory, subdirectories, files in os.walk(self.db_path):
+                # skip hidden entries (e.g. the directory of temporary files of the file storage)
+                subdirectories[:] = [name for name in subdirectories if not name.startswith('.')]
+                yield from (os.path.join(directory, file) for file in sorted(files) if not file.startswith('.'))
+        else:
+            yield from self._get_file_paths_of_files_included_in_fw(firmware_uid)
 
-    def _execute_yara_search(self, rule_file_path: str, target_path: str | None = None) -> str:
-        '''
-        Scans the (whole) db directory with the provided rule file and returns the (raw) results.
-        Yara-python cannot be used, because it (currently) supports single-file scanning only.
-
-        :param rule_file_path: The file path to the yara rule file.
-        :return: The output from the yara scan.
-        '''
-        compiled_flag = '-C' if Path(rule_file_path).read_bytes().startswith(b'YARA') else ''
-        command = f'yara -r {compiled_flag} {rule_file_path} {target_path or self.db_path}'
-        yara_process = subprocess.run(command, shell=True, stdout=PIPE, stderr=STDOUT, text=True)
-        return yara_process.stdout
-
-    def _execute_yara_search_for_single_firmware(self, rule_file_path: str, firmware_uid: str) -> str:
-        file_paths = self._get_file_paths_of_files_included_in_fw(firmware_uid)
-        result = (self._execute_yara_search(rule_file_path, path) for path in file_paths)
-        return '\n'.join(result)
+    def _get_candidate_file_paths(self, yara_rules: bytes, firmware_uid: str | None) -> Iterator[str]:
+        if self.ngram_index is None:
+            return self._get_file_paths(firmware_uid)
+        excluded_files = self.ngram_index.get_excluded_files(get_ngram_query(yara_rules.decode()))
+        logging.debug(f'Binary search: {len(excluded_files)} files excluded by the n-gram index')
+        return (path for path in self._get_file_paths(firmware_uid) if basename(path) not in excluded_files)
 
     def _get_file_paths_of_files_included_in_fw(self, fw_uid: str) -> list[str]:
-        return [self.fs_organizer.generate_path_from_uid(uid) for uid in self.db.get_all_files_in_fw(fw_uid)]
+        return [self.fs_organizer.generate_path_from_uid(uid) for uid in sorted(self.db.get_all_files_in_fw(fw_uid))]
 
-    @staticmethod
-    def _parse_raw_result(raw_result: str) -> dict[str, list[str]]:
-        '''
-        :param raw_result: raw yara scan result
-        :return: dict of matching rules with lists of matched UIDs as values
+    def _scan_files(
+        self, compiled_rules: bytes, file_paths: Iterable[str]
+    ) -> Iterator[tuple[dict[str, set[str]], int]]:
         '''
-        results = {}
-        for line in raw_result.split('\n'):
-            if line and 'warning' not in line:
-                rule, match = line.split(' ')
-                results.setdefault(rule, []).append(basename(match))
-        return results
-
-    @staticmethod
-    def _eliminate_duplicates(result_dict: dict[str, list[str]]):
-        for key in result_dict:
-            result_dict[key] = sorted(set(result_dict[key]))
+        Scan the files with a pool of worker processes.
 
-    def get_binary_search_result(self, task: tuple[bytes, str | None]) -> dict[str, list[str]] | str:
+        :return: The matching UIDs of each rule and the number of scanned files for each shard (as soon as it is done)
+        '''
+        with Pool(self.worker_count, initializer=_init_worker, initargs=(compiled_rules,)) as pool:
+            yield from pool.imap_unordered(_scan_shard, _split_into_shards(file_paths))
+
+    def get_binary_search_result(
+        self,
+        task: tuple[bytes, str | None],
+        partial_result_callback: Callable[[dict[str, list[str]], int], None] | None = None,
+    ) -> dict[str, list[str]] | str:
         '''
         Perform a yara search on the files in the database.
 
         :param task: A tuple containing the yara_rules (byte string with the contents of the yara rule file) and
             optionally a firmware uid if only the contents of a single firmware are to be scanned.
+        :param partial_result_callback: An optional function that is called with the results found so far and the
+            number of scanned files while the search is running.
         :return: dict of matching rules with lists of (unique) matched UIDs as values or an error message.
         '''
-        with NamedTemporaryFile() as temp_rule_file:
-            yara_rules, firmware_uid = task
-            try:
-                self._prepare_temp_rule_file(temp_rule_file, yara_rules)
-                raw_result = self._get_raw_result(firmware_uid, temp_rule_file)
-                results = self._parse_raw_result(raw_result)
-                self._eliminate_duplicates(results)
-                return results
-            except yara.SyntaxError as yara_error:
-                return f'There seems to be an error in the rule file:\n{yara_error}'
-            except CalledProcessError as process_error:
-                return f'Error when calling YARA:\n{process_error.output.decode()}'
-
-    def _get_raw_result(self, firmware_uid: str | None, temp_rule_file: NamedTemporaryFile) -> str:
-        if firmware_uid is None:
-            raw_result = self._execute_yara_search(temp_rule_file.name)
-        else:
-            raw_result = self._execute_yara_search_for_single_firmware(temp_rule_file.name, firmware_uid)
-        return raw_result
+        yara_rules, firmware_uid = task
+        results, scanned_files, last_update = {}, 0, time()
+        try:
+            compiled_rules = self._compile_rules(yara_rules)
+            file_paths = self._get_candidate_file_paths(yara_rules, firmware_uid)
+            for shard_results, shard_size in self._scan_files(compiled_rules, file_paths):
+                for rule, uids in shard_results.items():
+                    results.setdefault(rule, set()).update(uids)
+                scanned_files += shard_size
+                if partial_result_callback is not None and time() - last_update > PARTIAL_RESULT_INTERVAL:
+                    partial_result_callback(_sort_results(results), scanned_files)
+                    last_update = time()
+            return _sort_results(results)
+        except yara.SyntaxError as yara_error:
+            return f'There seems to be an error in the rule file:\n{yara_error}'
+        except yara.Error as yara_error:
+            return f'Error when calling YARA:\n{yara_error}'
 
     @staticmethod
-    def _prepare_temp_rule_file(temp_rule_file: NamedTemporaryFile, yara_rules: bytes):
-        compiled_rules = yara.compile(source=yara_rules.decode())
-        compiled_rules.save(file=temp_rule_file)
-        temp_rule_file.flush()
+    def _compile_rules(yara_rules: bytes) -> bytes:
+        compiled_rules = BytesIO()
+        yara.compile(source=yara_rules.decode()).save(file=compiled_rules)
+        return compiled_rules.getvalue()
+
+
+def _split_into_shards(file_paths: Iterable[str]) -> Iterator[list[str]]:
+    iterator = iter(file_paths)
+    while shard := list(islice(iterator, SHARD_SIZE)):
+        yield shard
+
+
+def _init_worker(compiled_rules: bytes):
+    global _worker_rules  # pylint: disable=global-statement
+    _worker_rules = yara.load(file=BytesIO(compiled_rules))
+
+
+def _scan_shard(file_paths: list[str]) -> tuple[dict[str, set[str]], int]:
+    results = {}
+    for path in file_paths:
+        try:
+            matches = _worker_rules.match(path)
+        except yara.Error as error:  # e.g. the file was deleted in the meantime
+            logging.warning(f'Binary search: could not scan {path}: {error}')
+            continue
+        for match in matches:
+            results.setdefault(match.rule, set()).add(basename(path))
+    return results, len(file_paths)
+
+
+def _sort_results(results: dict[str, set[str]]) -> dict[str, list[str]]:
+    return {rule: sorted(uids) for rule, uids in results.items()}
 
 
 def is_valid_yara_rule_file(yara_rules: str | bytes) -> bool:
@@ -0,0 +1,318 @@
+'''
+Extract the literal byte sequences ("atoms") that files must contain to match a set of YARA rules and convert them to a
+trigram query for the n-gram index (see ``storage.ngram_index``).
+
+The query must never exclude a file that matches one of the rules. Therefore, only conditions and strings that are
+understood completely are used and everything else (e.g. regular expressions, ``nocase`` strings, ``not``, string
+counts or offsets, modules, other rules) is interpreted as "any file may match".
+'''
+from __future__ import annotations
+
+import logging
+import re
+from typing import NamedTuple
+
+import numpy as np
+
+from storage.ngram_index import Query
+
+TOKEN_REGEX = re.compile(
+    r'''
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+    | (?P<text>"(?:\\.|[^"\\\n])*")
+    | (?P<number>0x[0-9a-fA-F]+|\d+(?:KB|MB)?)
+    | (?P<operator>\.\.|==|!=|<=|>=|<<|>>)
+    | (?P<identifier>[$#@!][\w]*\*?|[A-Za-z_]\w*)
+    | (?P<punctuation>\S)
+    ''',
+    re.VERBOSE | re.DOTALL,
+)
+HEX_STRING_REGEX = re.compile(r'\{(?:[^}"/]|/\*.*?\*/|//[^\n]*)*\}', re.DOTALL)
+REGEX_REGEX = re.compile(r'/(?:\\.|[^/\\\n])*/[is]*')
+HEX_TOKEN_REGEX = re.compile(r'//[^\n]*|/\*.*?\*/|\[[^\]]*\]|~?[0-9A-Fa-f?]{2}|[()|]', re.DOTALL)
+TEXT_ESCAPES = {'n': b'\n', 't': b'\t', 'r': b'\r', '"': b'"', '\\': b'\\'}
+UNSUPPORTED_MODIFIERS = {'nocase', 'xor', 'base64', 'base64wide'}
+BOOLEAN_OPERATORS = {'and', 'or', ')'}
+
+
+class _Token(NamedTuple):
+    kind: str
+    value: str
+
+
+class _Rule(NamedTuple):
+    name: str
+    is_private: bool
+    strings: dict[str, Query]
+    condition: list[_Token]
+
+
+class _ParsingError(Exception):
+    pass
+
+
+def get_ngram_query(yara_rules: str) -> Query:
+    '''
+    Get the trigram query of a set of YARA rules. A file can only match one of the rules if it matches the query.
+
+    :param yara_rules: The source of the YARA rules (the rules must be valid).
+    :return: The trigram query or ``None`` if any file may match.
+    '''
+    try:
+        rules = _parse_rules(_tokenize(yara_rules))
+    except (_ParsingError, IndexError, KeyError, ValueError) as error:
+        logging.debug(f'Could not extract atoms from YARA rules: {error}')
+        return None
+    # private rules do not appear in the results
+    return _or([_ConditionParser(rule).parse() for rule in rules if not rule.is_private])
+
+
+def _tokenize(source: str) -> list[_Token]:
+    tokens, position = [], 0
+    while position < len(source):
+        if _is_string_definition(tokens) and source[position] == '{':
+            match = HEX_STRING_REGEX.match(source, position)
+            kind = 'hex'
+        elif (_is_string_definition(tokens) or tokens and tokens[-1].value == 'matches') and source[position] == '/':
+            match = REGEX_REGEX.match(source, position)
+            kind = 'regex'
+        else:
+            match = TOKEN_REGEX.match(source, position)
+            kind = match.lastgroup
+        if match is None:
+            raise _ParsingError(f'invalid token at position {position}')
+        if kind != 'space':
+            tokens.append(_Token(kind, match.group()))
+        position = match.end()
+    return tokens
+
+
+def _is_string_definition(tokens: list[_Token]) -> bool:
+    return len(tokens) >= 2 and tokens[-1].value == '=' and tokens[-2].value.startswith('$')
+
+
+def _parse_rules(tokens: list[_Token]) -> list[_Rule]:
+    rules, index = [], 0
+    while index < len(tokens):
+        if tokens[index].value in {'import', 'include'}:
+            index += 2
+            continue
+        modifiers = set()
+        while tokens[index].value in {'private', 'global'}:
+            modifiers.add(tokens[index].value)
+            index += 1
+        if tokens[index].value != 'rule':
+            raise _ParsingError(f'unexpected token {tokens[index].value}')
+        name = tokens[index + 1].value
+        index = _skip_to(tokens, index, '{') + 1
+        strings, condition = {}, []
+        while tokens[index].value != '}':
+            section = tokens[index].value
+            if tokens[index + 1].value != ':':
+                raise _ParsingError(f'unexpected token {section} in rule {name}')
+            index += 2
+            section_end = _get_section_end(tokens, index)
+            if section == 'strings':
+                strings = _parse_strings(tokens[index:section_end])
+            elif section == 'condition':
+                condition = tokens[index:section_end]
+            index = section_end
+        rules.append(_Rule(name, 'private' in modifiers, strings, condition))
+        index += 1
+    return rules
+
+
+def _skip_to(tokens: list[_Token], index: int, value: str) -> int:
+    while tokens[index].value != value:
+        index += 1
+    return index
+
+
+def _get_section_end(tokens: list[_Token], index: int) -> int:
+    while not (
+        tokens[index].value == '}'
+        or tokens[index].value in {'meta', 'strings', 'condition'}
+        and tokens[index + 1].value == ':'
+    ):
+        index += 1
+    return index
+
+
+def _parse_strings(tokens: list[_Token]) -> dict[str, Query]:
+    strings, index = {}, 0
+    while index < len(tokens):
+        identifier, value = tokens[index].value, tokens[index + 2]
+        index += 3
+        modifiers = set()
+        while index < len(tokens) and not tokens[index].value.startswith('$'):
+            if tokens[index].kind == 'identifier':
+                modifiers.add(tokens[index].value)
+            index += 1
+        if identifier == '$':  # anonymous strings can only be referenced as a set -> any unique key will do
+            identifier = f'$#{len(strings)}'
+        elif identifier in strings:
+            raise _ParsingError(f'duplicate string identifier {identifier}')
+        strings[identifier] = _get_string_query(value, modifiers)
+    return strings
+
+
+def _get_string_query(string: _Token, modifiers: set[str]) -> Query:
+    if string.kind == 'hex':
+        return _and([_get_atom_query(atom) for atom in _get_hex_string_atoms(string.value)])
+    if string.kind != 'text' or modifiers & UNSUPPORTED_MODIFIERS:
+        return None
+    atom = _decode_text_string(string.value)
+    variants = []
+    if 'wide' in modifiers:
+        variants.append(b''.join(bytes([char, 0]) for char in atom))
+    if 'ascii' in modifiers or 'wide' not in modifiers:
+        variants.append(atom)
+    return _or([_get_atom_query(variant) for variant in variants])
+
+
+def _decode_text_string(text: str) -> bytes:
+    result, index = b'', 1
+    while index < len(text) - 1:
+        if text[index] == '\\':
+            if text[index + 1] == 'x':
+                result += bytes([int(text[index + 2 : index + 4], 16)])
+                index += 4
+                continue
+            result += TEXT_ESCAPES[text[index + 1]]
+            index += 2
+        else:
+            result += text[index].encode()
+            index += 1
+    return result
+
+
+def _get_hex_string_atoms(hex_string: str) -> list[bytes]:
+    '''
+    Get the sequences of fixed bytes of a hex string (jumps, wildcards, alternatives and negations end a sequence).
+    '''
+    atoms, current, depth = [], b'', 0
+    for token in HEX_TOKEN_REGEX.findall(hex_string[1:-1]):
+        if token.startswith('/'):  # comment
+            continue
+        if depth == 0 and len(token) == 2 and '?' not in token:
+            current += bytes.fromhex(token)
+            continue
+        depth += {'(': 1, ')': -1}.get(token, 0)
+        atoms.append(current)
+        current = b''
+    return [atom for atom in [*atoms, current] if atom]
+
+
+def _get_atom_query(atom: bytes) -> Query:
+    if len(atom) < 3:
+        return None
+    return ('ngrams', np.unique([int.from_bytes(atom[index : index + 3], 'big') for index in range(len(atom) - 2)]))
+
+
+def _and(queries: list[Query]) -> Query:
+    queries = [query for query in queries if query is not None]
+    ngrams = [query[1] for query in queries if query[0] == 'ngrams']
+    others = [query for query in queries if query[0] != 'ngrams']
+    if ngrams:  # all trigrams of all operands are required
+        others.insert(0, ('ngrams', np.unique(np.concatenate(ngrams))))
+    if not others:
+        return None
+    return others[0] if len(others) == 1 else ('and', others)
+
+
+def _or(queries: list[Query]) -> Query:
+    if not queries or any(query is None for query in queries):
+        return None
+    return queries[0] if len(queries) == 1 else ('or', queries)
+
+
+class _ConditionParser:
+    '''
+    A parser for the boolean structure of a rule condition (operator precedence: ``not`` > ``and`` > ``or``). Each
+    operand that is not a string reference or a string set (e.g. ``all of them``) is interpreted as "any file".
+    '''
+
+    def __init__(self, rule: _Rule):
+        self.rule = rule
+        self.tokens = rule.condition
+        self.index = 0
+
+    def parse(self) -> Query:
+        query = self._parse_or()
+        if self.index != len(self.tokens):
+            raise _ParsingError(f'unexpected token {self.tokens[self.index].value} in rule {self.rule.name}')
+        return query
+
+    def _next_value(self) -> str | None:
+        return self.tokens[self.index].value if self.index < len(self.tokens) else None
+
+    def _parse_or(self) -> Query:
+        queries = [self._parse_and()]
+        while self._next_value() == 'or':
+            self.index += 1
+            queries.append(self._parse_and())
+        return _or(queries)
+
+    def _parse_and(self) -> Query:
+        queries = [self._parse_not()]
+        while self._next_value() == 'and':
+            self.index += 1
+            queries.append(self._parse_not())
+        return _and(queries)
+
+    def _parse_not(self) -> Query:
+        if self._next_value() == 'not':
+            self.index += 1
+            self._parse_not()
+            return None
+        if self._next_value() == '(':
+            self.index += 1
+            query = self._parse_or()
+            if self._next_value() != ')':
+                raise _ParsingError(f'missing ")" in rule {self.rule.name}')
+            self.index += 1
+            if self._next_value() not in BOOLEAN_OPERATORS | {None}:  # e.g. "(filesize + 1) > 2"
+                self._get_operand()
+                return None
+            return query
+        return self._get_operand_query(self._get_operand())
+
+    def _get_operand(self) -> list[str]:
+        operand, depth = [], 0
+        while self._next_value() is not None and (depth > 0 or self._next_value() not in BOOLEAN_OPERATORS):
+            depth += {'(': 1, ')': -1}.get(self._next_value(), 0)
+            operand.append(self._next_value())
+            self.index += 1
+        if not operand:
+            raise _ParsingError(f'missing operand in rule {self.rule.name}')
+        return operand
+
+    def _get_operand_query(self, operand: list[str]) -> Query:
+        if operand[0] in self.rule.strings and (len(operand) == 1 or operand[1] in {'at', 'in'}):
+            return self.rule.strings[operand[0]]
+        if len(operand) >= 3 and operand[1] == 'of':
+            return self._get_string_set_query(operand)
+        return None
+
+    def _get_string_set_query(self, operand: list[str]) -> Query:
+        if operand[2] == 'them':
+            string_set, rest = list(self.rule.strings), operand[3:]
+        elif operand[2] == '(' and ')' in operand:
+            end = operand.index(')')
+            string_set, rest = [item for item in operand[3:end] if item != ','], operand[end + 1 :]
+            if not all(item.startswith('$') for item in string_set):  # a set of rules
+                return None
+        else:
+            return None
+        if rest and rest[0] not in {'at', 'in'}:
+            return None
+        queries = [
+            query
+            for identifier, query in self.rule.strings.items()
+            if any(identifier == item or item.endswith('*') and identifier.startswith(item[:-1]) for item in string_set)
+        ]
+        if operand[0] == 'all':
+            return _and(queries)
+        if operand[0] == 'any' or operand[0].isdigit() and int(operand[0]) > 0:
+            return _or(queries)
+        return None
@@ -69,6 +69,8 @@ def main(command_line_options=None, config_path: str | None = None, skip_user_cr
 
     db_setup = DbSetup(db_name=fact_db)
     db_setup.connection.create_tables()
+    db_setup.migrate_tables()
+    db_setup.create_indexes()
     db_setup.set_table_privileges()
     return 0
 
@@ -151,7 +151,11 @@ def install_statistic_cronjob():
     current_dir = get_directory_of_current_file()
     statistic_update_script_path = current_dir / 'update_statistic.py'
     crontab_file_path = current_dir.parent / 'update_statistic.cron'
-    cron_content = f'0    *    *    *    *    {statistic_update_script_path} > /dev/null 2>&1\n'
+    cron_content = (
+        f'0    *    *    *    *    {statistic_update_script_path} > /dev/null 2>&1\n'
+        # the reconciliation of the summary counters is expensive -> only once a week
+        f'30   3    *    *    0    {statistic_update_script_path} --reconcile-counters > /dev/null 2>&1\n'
+    )
     crontab_file_path.write_text(cron_content)
     crontab_process = subprocess.run(f'crontab {crontab_file_path}', shell=True, stdout=PIPE, stderr=STDOUT, text=True)
     if crontab_process.returncode != 0:
@@ -9,6 +9,7 @@ from subprocess import PIPE, STDOUT
 
 import requests
 
+from compile_yara_signatures import compile_signature_file
 from compile_yara_signatures import main as compile_signatures
 from config import cfg
 from helperFunctions.fileSystem import get_src_dir
@@ -38,6 +39,7 @@ def main(skip_docker, distribution):
 
     # install yara
     _install_yara()
+    _install_yara_python()
 
     _install_checksec()
 
@@ -52,13 +54,7 @@ def main(skip_docker, distribution):
 
     # compiling yara signatures
     compile_signatures()
-    yarac_process = subprocess.run(
-        'yarac -d test_flag=false ../test/unit/analysis/test.yara ../analysis/signatures/Yara_Base_Plugin.yc',
-        shell=True,
-        capture_output=True,
-        text=True,
-    )
-    if yarac_process.returncode != 0:
+    if not compile_signature_file('../test/unit/analysis/test.yara', '../analysis/signatures/Yara_Base_Plugin.yc'):
         raise InstallationError('Failed to compile yara test signatures')
 
     with OperateInDirectory('../../'):
@@ -155,6 +151,27 @@ def _install_yara():  # pylint: disable=too-complex
                 raise InstallationError(f'Error in yara installation.\n{cmd_process.stdout}')
 
 
+def _install_yara_python():
+    # the python binding from PyPI is built without the "magic" module (which is used by some of the signatures)
+    yara_python = next(
+        line
+        for line in read_package_list_from_file(INSTALL_DIR / 'requirements_common.txt')
+        if line.startswith('yara-python')
+    )
+    logging.info(f'Installing {yara_python} with "magic" module')
+    Path('yara-python').mkdir(exist_ok=True)
+    with OperateInDirectory('yara-python', remove=True):
+        for command in [
+            f'pip3 download --no-binary :all: --no-deps {yara_python}',
+            'tar xf *.tar.gz --strip-components=1',
+            'python3 setup.py build --enable-magic',
+            'pip3 install --no-build-isolation --force-reinstall --no-deps .',
+        ]:
+            cmd_process = subprocess.run(command, shell=True, stdout=PIPE, stderr=STDOUT, text=True)
+            if cmd_process.returncode != 0:
+                raise InstallationError(f'Error in yara-python installation.\n{cmd_process.stdout}')
+
+
 def _install_checksec():
     checksec_path = BIN_DIR / 'checksec'
 
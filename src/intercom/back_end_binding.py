@@ -3,6 +3,7 @@ from __future__ import annotations
 import difflib
 import logging
 from collections.abc import Callable
+from functools import partial
 from multiprocessing import Process, Value
 from pathlib import Path
 from time import sleep
@@ -11,7 +12,12 @@ from config import cfg
 from helperFunctions.process import stop_processes
 from helperFunctions.program_setup import get_log_file_for_component
 from helperFunctions.yara_binary_search import YaraBinarySearchScanner
-from intercom.common_redis_binding import InterComListener, InterComListenerAndResponder, InterComRedisInterface
+from intercom.common_redis_binding import (
+    InterComListener,
+    InterComListenerAndResponder,
+    InterComRedisInterface,
+    get_partial_result_key,
+)
 from objects.firmware import Firmware
 from storage.binary_service import BinaryService
 from storage.db_interface_common import DbInterfaceCommon
@@ -206,10 +212,22 @@ class InterComBackEndBinarySearchTask(InterComListenerAndResponder):
     CONNECTION_TYPE = 'binary_search_task'
     OUTGOING_CONNECTION_TYPE = 'binary_search_task_resp'
 
-    def get_response(self, task):
+    def post_processing(self, task, task_id):
+        logging.debug(f'request received: {self.CONNECTION_TYPE} -> {task_id}')
         yara_binary_searcher = YaraBinarySearchScanner()
-        uid_list = yara_binary_searcher.get_binary_search_result(task)
-        return uid_list, task
+        store_partial_result = partial(self._store_partial_result, task_id)
+        uid_list = yara_binary_searcher.get_binary_search_result(task, store_partial_result)
+        self.redis.set(task_id, (uid_list, task))
+        logging.debug(f'response send: {self.OUTGOING_CONNECTION_TYPE} -> {task_id}')
+        self._delete_partial_result(task_id)
+        return task
+
+    def _store_partial_result(self, task_id: str, partial_result: dict[str, list[str]], scanned_files: int):
+        self.redis.set(get_partial_result_key(task_id), (partial_result, scanned_files))
+
+    def _delete_partial_result(self, task_id: str):
+        # the partial result is not needed anymore once the search is finished and the result was stored
+        self.redis.delete(get_partial_result_key(task_id))
 
 
 class InterComBackEndDeleteFile(InterComListener):
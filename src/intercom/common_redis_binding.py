@@ -15,6 +15,11 @@ def generate_task_id(input_data: Any) -> str:
     return task_id
 
 
+def get_partial_result_key(task_id: str) -> str:
+    # partial results of long-running tasks are stored under this key until the task is finished
+    return f'{task_id}_partial'
+
+
 class InterComRedisInterface:
     def __init__(self):
         self.redis = RedisInterface()
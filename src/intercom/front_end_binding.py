@@ -5,7 +5,7 @@ from time import sleep, time
 from typing import Any
 
 from config import cfg
-from intercom.common_redis_binding import InterComRedisInterface, generate_task_id
+from intercom.common_redis_binding import InterComRedisInterface, generate_task_id, get_partial_result_key
 
 
 class InterComFrontEndBinding(InterComRedisInterface):
@@ -58,6 +58,13 @@ class InterComFrontEndBinding(InterComRedisInterface):
         result = self._response_listener('binary_search_task_resp', request_id, timeout=time() + 10)
         return result if result is not None else (None, None)
 
+    def get_binary_search_partial_result(self, request_id) -> tuple[dict[str, list[str]], int] | None:
+        '''
+        Get the results found so far and the number of scanned files of a running binary search (or ``None`` if there
+        is no partial result yet).
+        '''
+        return self.redis.get(get_partial_result_key(request_id), delete=False)
+
     def get_backend_logs(self):
         return self._request_response_listener(None, 'logs_task', 'logs_task_resp')
 
@@ -7,7 +7,7 @@ from common_helper_files import get_binary_from_file
 
 from helperFunctions.data_conversion import get_value_of_first_key, make_bytes, make_unicode_string
 from helperFunctions.hash import get_sha256
-from helperFunctions.uid import create_uid
+from helperFunctions.uid import create_uid_from_file
 from helperFunctions.virtual_file_path import get_base_of_virtual_path, get_top_of_virtual_path
 
 
@@ -95,17 +95,11 @@ class FileObject:  # pylint: disable=too-many-instance-attributes
         #: for debugging purposes and as placeholder in UI.
         self.analysis_exception = None
 
+        self._binary = None
+        self._sha256 = None
+        self._size = None
         if binary is not None:
             self.set_binary(binary)
-        else:
-            #: Binary representation of this file in bytes.
-            self.binary = None
-
-            #: SHA256 hash of this file.
-            self.sha256 = None
-
-            #: Size of this file in bytes
-            self.size = None
 
         #: Name of this file. Similar to ``file_path``, this probably is generated for carved objects.
         self.file_name = make_unicode_string(file_name) if file_name is not None else file_name
@@ -131,14 +125,77 @@ class FileObject:  # pylint: disable=too-many-instance-attributes
         self.binary = make_bytes(binary)
         self.sha256 = get_sha256(self.binary)
         self.size = len(self.binary)
-        self._uid = create_uid(binary)
+        self._uid = f'{self.sha256}_{self.size}'  # same as `create_uid()` but without hashing the binary again
 
     def create_binary_from_path(self) -> None:
-        if self.file_path is not None:
-            if self.binary is None:
-                self._create_from_file(self.file_path)
-            if self.file_name is None:
-                self.file_name = make_unicode_string(Path(self.file_path).name)
+        '''
+        Set the file name from ``file_path`` (if it is not set) and compute hash and size of the file by hashing it in
+        chunks (so that the UID is still available if the file is removed afterwards). The file is not loaded into
+        memory here: the binary is loaded from ``file_path`` when it is accessed for the first time.
+        '''
+        if self.file_path is not None and self.file_name is None:
+            self.file_name = make_unicode_string(Path(self.file_path).name)
+        if self._sha256 is None or self._size is None:
+            self._compute_hash_and_size()
+
+    @property
+    def binary(self) -> bytes | None:
+        '''
+        Binary representation of this file in bytes.
+        If it was not set, it is loaded from ``file_path`` on first access.
+        '''
+        if self._binary is None and self._file_is_available():
+            self._binary = get_binary_from_file(self.file_path)
+        return self._binary
+
+    @binary.setter
+    def binary(self, binary: bytes | None):
+        self._binary = binary
+
+    def binary_is_loaded(self) -> bool:
+        '''
+        Check if the binary is in memory (without loading it from ``file_path``).
+        '''
+        return self._binary is not None
+
+    @property
+    def sha256(self) -> str | None:
+        '''
+        SHA256 hash of this file.
+        '''
+        if self._sha256 is None:
+            self._compute_hash_and_size()
+        return self._sha256
+
+    @sha256.setter
+    def sha256(self, sha256: str | None):
+        self._sha256 = sha256
+
+    @property
+    def size(self) -> int | None:
+        '''
+        Size of this file in bytes.
+        '''
+        if self._size is None:
+            self._compute_hash_and_size()
+        return self._size
+
+    @size.setter
+    def size(self, size: int | None):
+        self._size = size
+
+    def _compute_hash_and_size(self):
+        if self._binary is not None:
+            sha256, size = get_sha256(self._binary), len(self._binary)
+        elif self._file_is_available():  # hash the file without loading it into memory
+            sha256, size = create_uid_from_file(self.file_path).split('_')
+        else:
+            return
+        self._sha256 = self._sha256 or sha256
+        self._size = self._size if self._size is not None else int(size)
+
+    def _file_is_available(self) -> bool:
+        return self.file_path is not None and Path(self.file_path).is_file()
 
     @property
     def uid(self) -> str:
@@ -148,8 +205,8 @@ class FileObject:  # pylint: disable=too-many-instance-attributes
 
         :return: uid of this file.
         '''
-        if self._uid is None and self.binary is not None:
-            self._uid = create_uid(self.binary)
+        if self._uid is None and self.sha256 is not None:
+            self._uid = f'{self.sha256}_{self.size}'
         return self._uid
 
     @uid.setter
@@ -172,10 +229,6 @@ class FileObject:  # pylint: disable=too-many-instance-attributes
         virtual_path = self.get_virtual_paths_for_one_uid(root_uid=root_uid)[0]
         return get_top_of_virtual_path(virtual_path)
 
-    def _create_from_file(self, file_path: str):
-        self.set_binary(get_binary_from_file(file_path))
-        self.create_binary_from_path()
-
     def add_included_file(self, file_object) -> None:
         '''
         This functions adds a file to this object's list of included files.
@@ -3,9 +3,14 @@ from __future__ import annotations
 import logging
 from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from itertools import count
 from multiprocessing import Queue, Value
+from multiprocessing.connection import wait
+from pathlib import Path
 from queue import Empty
-from time import sleep, time
+from time import time
+from typing import NamedTuple
 
 from packaging.version import InvalidVersion
 from packaging.version import parse as parse_version
@@ -17,15 +22,24 @@ from helperFunctions.logging import TerminalColors, color_string
 from helperFunctions.plugin import import_plugins
 from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions, stop_process
 from objects.file import FileObject
+from scheduler.analysis_result_writer import AnalysisResultWriter
 from scheduler.analysis_status import AnalysisStatus
 from scheduler.task_scheduler import AnalysisTaskScheduler, MANDATORY_PLUGINS
-from statistic.analysis_stats import get_plugin_stats
+from scheduler.yara_scan import YaraScanStage
+from statistic.analysis_stats import DurationStats, get_plugin_stats
 from storage.db_interface_backend import BackendDbInterface
 from storage.db_interface_base import DbInterfaceError
 from storage.fsorganizer import FSOrganizer
 from storage.unpacking_locks import UnpackingLockManager
 
 
+class RunningTask(NamedTuple):
+    task_id: str
+    file_object: FileObject
+    running_analyses: set[str]
+    up_to_date_analyses: set[str]
+
+
 class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
     '''
     The analysis scheduler is responsible for
@@ -80,12 +94,16 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
 
     Running the analysis tasks is achieved through (multiprocessing.Queue)s. Each plugin has an in-queue, triggered
     by the scheduler using the `add_job` function, and an out-queue that is processed by the result collector. The
-    actual analysis process is out of scope. Database interaction happens before (pre_analysis) and after
-    (post_analysis) the running of a task, to store intermediate results for live updates, and final results.
+    actual analysis process is out of scope. Database interaction happens once before the analysis tasks of a file are
+    started (pre_analysis), to store the file object, and after the running of each task (post_analysis), to store its
+    result. By default, results are passed to the result writer, which stores them in batches in its own process.
+    If more than one YARA based plugin runs on a file, the file is scanned only once with the signatures of all of them
+    by the YARA scan stage before these analyses are started.
+    The number of DB round trips for each file is counted in ``temporary_data['db_round_trips']``.
 
     :param config: The ConfigParser object shared by all backend entities.
     :param pre_analysis: A database callback to execute before running an analysis task.
-    :param post_analysis: A database callback to execute after running an analysis task.
+    :param post_analysis: A database callback to execute after running an analysis task (replaces the result writer).
     :param db_interface: An object reference to an instance of BackEndDbInterface.
     '''
 
@@ -103,12 +121,25 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         self.unpacking_locks: UnpackingLockManager = unpacking_locks
 
         self.status = AnalysisStatus()
+        self.result_latency = DurationStats()
+        # the state of files with running analyses (only used inside the task runner process)
+        self.running_tasks: dict[str, RunningTask] = {}
+        self.task_counter = count()
         self.task_scheduler = AnalysisTaskScheduler(self.analysis_plugins)
 
         self.fs_organizer = FSOrganizer()
         self.db_backend_service = db_interface if db_interface else BackendDbInterface()
         self.pre_analysis = pre_analysis if pre_analysis else self.db_backend_service.add_object
-        self.post_analysis = post_analysis if post_analysis else self.db_backend_service.add_analysis
+        self.result_writer = None
+        if post_analysis is None:  # results are stored in batches by the result writer process
+            self.result_writer = AnalysisResultWriter(
+                self.db_backend_service, completion_callback=self.status.remove_from_current_analyses
+            )
+            self.result_writer.start()
+            post_analysis = self.result_writer.add_result
+        self.post_analysis = post_analysis
+        self.yara_scan_stage = YaraScanStage(self.analysis_plugins, self.process_queue)
+        self.yara_scan_stage.start()
         self._start_runner_process()
         self._start_result_collector()
         logging.info('Analysis System online...')
@@ -122,14 +153,18 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         logging.debug('Shutting down...')
         self.stop_condition.value = 1
         futures = []
-        # first shut down scheduling, then analysis plugins and lastly the result collector
+        # first shut down scheduling and the YARA scan, then analysis plugins, the result collector and lastly the
+        # result writer
         stop_process(self.schedule_process, cfg.expert_settings.block_delay + 1)
+        self.yara_scan_stage.shutdown()
         with ThreadPoolExecutor() as pool:
             for plugin in self.analysis_plugins.values():
                 futures.append(pool.submit(plugin.shutdown))
             for future in futures:
                 future.result()  # call result to make sure all threads are finished and there are no exceptions
         stop_process(self.result_collector_process, cfg.expert_settings.block_delay + 1)
+        if self.result_writer is not None:  # the remaining results are stored before the writer is stopped
+            self.result_writer.shutdown()
         self.process_queue.close()
         self.status.shutdown()
         logging.info('Analysis System offline')
@@ -145,11 +180,21 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         self.pre_analysis(fo)
         self.unpacking_locks.release_unpacking_lock(fo.uid)
         self.status.add_update_to_current_analyses(fo, included_files)
+        # the analysis metadata of all files is fetched at once (it is used for deciding which analyses can be skipped)
+        analysis_metadata = (
+            {}
+            if self._is_forced_update(fo)
+            else self.db_backend_service.get_analysis_metadata([fo.uid, *included_files])
+        )
+        root_uid = fo.get_root_uid()
         for child_uid in included_files:
-            child_fo = self.db_backend_service.get_object(child_uid)
+            # only the virtual file paths in this firmware are needed (e.g. for the analysis status)
+            child_fo = self.db_backend_service.get_object(child_uid, root_uid=root_uid)
             child_fo.force_update = getattr(fo, 'force_update', False)  # propagate forced update to children
+            child_fo.temporary_data['analysis_metadata'] = analysis_metadata.get(child_uid, {})
             self.task_scheduler.schedule_analysis_tasks(child_fo, fo.scheduled_analysis)
             self._check_further_process_or_complete(child_fo)
+        fo.temporary_data['analysis_metadata'] = analysis_metadata.get(fo.uid, {})
         self._check_further_process_or_complete(fo)
 
     def start_analysis_of_object(self, fo: FileObject):
@@ -261,51 +306,149 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
                 self._process_next_analysis_task(task)
 
     def _process_next_analysis_task(self, fw_object: FileObject):
-        try:
-            self.pre_analysis(fw_object)
-        except DbInterfaceError as error:
-            # trying to add an object to the DB could lead to an error if the root FW or the parents are missing
-            # (e.g. because they were recently deleted)
-            logging.error(f'Could not add {fw_object.uid} to the DB: {error}')
-            self.status.remove_from_current_analyses(fw_object)
-            return
-
-        self.unpacking_locks.release_unpacking_lock(fw_object.uid)
-        analysis_to_do = fw_object.scheduled_analysis.pop()
-        if analysis_to_do not in self.analysis_plugins:
-            logging.error(f'Plugin \'{analysis_to_do}\' not available')
-            self._check_further_process_or_complete(fw_object)
+        db_round_trips = self.db_backend_service.round_trips
+        task_id = fw_object.temporary_data.get('analysis_task_id')
+        # an analysis or the YARA scan of a file in self.running_tasks has finished
+        if 'finished_analysis' in fw_object.temporary_data or 'fused_yara_matches' in fw_object.temporary_data:
+            if task_id not in self.running_tasks:
+                logging.debug(f'Discarding result of {fw_object.uid}: analysis was aborted')
+                return
+            task = self.running_tasks[task_id]
+            if 'finished_analysis' in fw_object.temporary_data:
+                self._merge_finished_analysis(task, fw_object)
+            else:
+                self._start_analyses_waiting_for_yara_scan(task, fw_object)
         else:
-            self._start_or_skip_analysis(analysis_to_do, fw_object)
-
-    def _start_or_skip_analysis(self, analysis_to_do: str, file_object: FileObject):
-        if not self._is_forced_update(file_object) and self._analysis_is_already_in_db_and_up_to_date(
-            analysis_to_do, file_object.uid
-        ):
-            logging.debug(f'skipping analysis "{analysis_to_do}" for {file_object.uid} (analysis already in DB)')
-            if analysis_to_do in self.task_scheduler.get_cumulative_remaining_dependencies(
-                file_object.scheduled_analysis
-            ):
-                self._add_completed_analysis_results_to_file_object(analysis_to_do, file_object)
-            self._check_further_process_or_complete(file_object)
-        elif analysis_to_do not in MANDATORY_PLUGINS and self._next_analysis_is_blacklisted(
-            analysis_to_do, file_object
-        ):
+            task = self._register_new_task(fw_object)
+            # the file object is only stored once per analysis cycle (later steps only add analysis results) and not at
+            # all if it was already stored together with the other files extracted by the unpacker
+            try:
+                if not fw_object.temporary_data.get('stored_in_db'):
+                    self.pre_analysis(fw_object)
+            except DbInterfaceError as error:
+                # trying to add an object to the DB could lead to an error if the root FW or the parents are missing
+                # (e.g. because they were recently deleted)
+                logging.error(f'Could not add {fw_object.uid} to the DB: {error}')
+                self.running_tasks.pop(task.task_id)
+                self.status.remove_from_current_analyses(fw_object)
+                return
+            self.unpacking_locks.release_unpacking_lock(fw_object.uid)
+
+        self._start_ready_analyses(task)
+        _add_db_round_trips(task.file_object, self.db_backend_service.round_trips - db_round_trips)
+        if not task.running_analyses:
+            self._complete_task(task)
+
+    def _register_new_task(self, fw_object: FileObject) -> RunningTask:
+        task = RunningTask(
+            f'{fw_object.uid}:{next(self.task_counter)}', fw_object, set(), self._get_up_to_date_analyses(fw_object)
+        )
+        fw_object.temporary_data['analysis_task_id'] = task.task_id
+        self.running_tasks[task.task_id] = task
+        fused_yara_analyses = set(fw_object.scheduled_analysis).intersection(self._get_fused_yara_plugins())
+        if len(fused_yara_analyses - task.up_to_date_analyses) > 1:  # the file is scanned once for all of them
+            fw_object.temporary_data['analyses_waiting_for_yara_scan'] = []
+        return task
+
+    def _get_fused_yara_plugins(self) -> dict:
+        return self.yara_scan_stage.plugins if self.yara_scan_stage.enabled else {}
+
+    @staticmethod
+    def _merge_finished_analysis(task: RunningTask, result_fo: FileObject):
+        finished_analysis = result_fo.temporary_data.pop('finished_analysis', None)
+        task.running_analyses.discard(finished_analysis)
+        # the DB round trips of the result collector (for storing the result) are counted for the analyzed file
+        _add_db_round_trips(task.file_object, result_fo.temporary_data.pop('result_db_round_trips', 0))
+        if finished_analysis in result_fo.processed_analysis:
+            task.file_object.processed_analysis[finished_analysis] = result_fo.processed_analysis[finished_analysis]
+        for plugin in task.file_object.scheduled_analysis[:]:
+            if plugin not in result_fo.scheduled_analysis:  # unscheduled by the result collector (dependency failed)
+                task.file_object.scheduled_analysis.remove(plugin)
+                task.file_object.processed_analysis[plugin] = result_fo.processed_analysis[plugin]
+
+    def _start_ready_analyses(self, task: RunningTask):
+        # plugins that do not depend on each other are started at the same time (each with a copy of the file object)
+        fw_object = task.file_object
+        while True:
+            ready_analyses = self.task_scheduler.get_plugins_ready_for_analysis(
+                fw_object.scheduled_analysis, task.running_analyses
+            )
+            if not ready_analyses:
+                break
+            for analysis_to_do in ready_analyses:
+                fw_object.scheduled_analysis.remove(analysis_to_do)
+                if analysis_to_do not in self.analysis_plugins:
+                    logging.error(f'Plugin \'{analysis_to_do}\' not available')
+                elif analysis_to_do in task.up_to_date_analyses:
+                    logging.debug(f'skipping analysis "{analysis_to_do}" for {fw_object.uid} (analysis already in DB)')
+                elif self._start_or_skip_analysis(analysis_to_do, fw_object):
+                    task.running_analyses.add(analysis_to_do)
+
+    def _start_analyses_waiting_for_yara_scan(self, task: RunningTask, scanned_fo: FileObject):
+        fw_object = task.file_object
+        fw_object.temporary_data['fused_yara_matches'] = scanned_fo.temporary_data['fused_yara_matches']
+        for analysis in fw_object.temporary_data.pop('analyses_waiting_for_yara_scan'):
+            self.analysis_plugins[analysis].add_job(_get_copy_for_analysis(fw_object, analysis))
+
+    def _complete_task(self, task: RunningTask):
+        fw_object = task.file_object
+        fw_object.temporary_data.pop('fused_yara_matches', None)
+        if fw_object.scheduled_analysis:
+            logging.error(f'Could not schedule {fw_object.scheduled_analysis} for {fw_object.uid}: dependency error')
+            fw_object.scheduled_analysis = []
+        self.running_tasks.pop(task.task_id)
+        logging.debug(f'{fw_object.temporary_data.get("db_round_trips", 0)} DB round trips for {fw_object.uid}')
+        self._check_further_process_or_complete(fw_object)
+
+    def _start_or_skip_analysis(self, analysis_to_do: str, file_object: FileObject) -> bool:
+        '''
+        Start the analysis or skip it, if the file type is blacklisted.
+
+        :return: ``True`` if the analysis was started and ``False`` if it was skipped.
+        '''
+        if analysis_to_do not in MANDATORY_PLUGINS and self._next_analysis_is_blacklisted(analysis_to_do, file_object):
             logging.debug(f'skipping analysis "{analysis_to_do}" for {file_object.uid} (blacklisted file type)')
             analysis_result = self._get_skipped_analysis_result(analysis_to_do)
             file_object.processed_analysis[analysis_to_do] = analysis_result
             self.post_analysis(file_object.uid, analysis_to_do, analysis_result)
-            self._check_further_process_or_complete(file_object)
-        else:
-            if file_object.binary is None:
-                self._set_binary(file_object)
-            self.analysis_plugins[analysis_to_do].add_job(file_object)
-
-    def _set_binary(self, file_object: FileObject):
-        # the file_object.binary may be missing in case of an update
-        if file_object.file_path is None:
+            return False
+        if file_object.file_path is None and not file_object.binary_is_loaded():
+            # the file path may be missing in case of an update (the binary is loaded lazily by the plugin)
             file_object.file_path = self.fs_organizer.generate_path(file_object)
-        file_object.create_binary_from_path()
+        if not self._wait_for_yara_scan(analysis_to_do, file_object):
+            self.analysis_plugins[analysis_to_do].add_job(_get_copy_for_analysis(file_object, analysis_to_do))
+        return True
+
+    def _wait_for_yara_scan(self, analysis_to_do: str, file_object: FileObject) -> bool:
+        '''
+        YARA based plugins use the matches of the fused YARA scan of the file (if it is scanned for more than one of
+        them, see ``_register_new_task``). If the file was not yet scanned, the scan is started and the analysis is
+        started by the task runner once the scan has finished (see ``_start_analyses_waiting_for_yara_scan``).
+
+        :return: ``True`` if the analysis waits for the YARA scan and ``False`` if it can be started right away.
+        '''
+        waiting_analyses = file_object.temporary_data.get('analyses_waiting_for_yara_scan')
+        if waiting_analyses is None or analysis_to_do not in self._get_fused_yara_plugins():
+            return False
+        if not waiting_analyses:
+            self.yara_scan_stage.add_job(_get_copy_for_analysis(file_object))
+        waiting_analyses.append(analysis_to_do)
+        return True
+
+    def _get_object_without_binary(self, file_object: FileObject) -> FileObject:
+        '''
+        File objects travel through the scheduler and plugin queues without their binary, since it would otherwise be
+        pickled and copied for every plugin. If the file is in the file storage, the binary is removed and loaded
+        lazily by the analysis process of the plugin instead (see ``FileObject.binary``).
+        '''
+        if not file_object.binary_is_loaded():
+            return file_object
+        storage_path = self.fs_organizer.generate_path(file_object)
+        if not Path(storage_path).is_file():
+            return file_object
+        fo_copy = copy(file_object)
+        fo_copy.binary, fo_copy.file_path = None, storage_path
+        return fo_copy
 
     # ---- 1. Is forced update ----
 
@@ -318,16 +461,64 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
 
     # ---- 2. Analysis present and plugin version unchanged ----
 
-    def _analysis_is_already_in_db_and_up_to_date(self, analysis_to_do: str, uid: str) -> bool:
-        db_entry = self.db_backend_service.get_analysis(uid, analysis_to_do)
+    def _get_up_to_date_analyses(self, file_object: FileObject) -> set[str]:
+        '''
+        Decide for all scheduled analyses of a file at once which of them are already in the DB and up to date and can
+        therefore be skipped. The metadata of all analyses of the file is fetched with a single query (unless it was
+        already fetched together with other files and stored in ``temporary_data``). An analysis that is up to date
+        still runs if one of its dependencies runs, because its result would be outdated afterwards. The results of
+        skipped analyses needed by analyses that run (and the result of ``file_type``) are added to the file object.
+
+        :return: The names of the analyses that can be skipped.
+        '''
+        analysis_metadata = file_object.temporary_data.pop('analysis_metadata', None)
+        if self._is_forced_update(file_object) or not file_object.scheduled_analysis:
+            return set()
+        if analysis_metadata is None:
+            analysis_metadata = self.db_backend_service.get_analysis_metadata([file_object.uid]).get(
+                file_object.uid, {}
+            )
+        scheduled_analyses = {plugin for plugin in file_object.scheduled_analysis if plugin in self.analysis_plugins}
+        up_to_date_analyses = {
+            plugin
+            for plugin in scheduled_analyses
+            if self._analysis_is_already_in_db_and_up_to_date(plugin, file_object.uid, analysis_metadata)
+        }
+        outdated_analyses = scheduled_analyses - up_to_date_analyses
+        while outdated_analyses:
+            outdated_analyses = {
+                plugin
+                for plugin in up_to_date_analyses
+                if not outdated_analyses.isdisjoint(self.analysis_plugins[plugin].DEPENDENCIES)
+            }
+            up_to_date_analyses.difference_update(outdated_analyses)
+
+        analyses_to_run = scheduled_analyses - up_to_date_analyses
+        if analyses_to_run:
+            required_results = {'file_type'}.union(
+                *(self.analysis_plugins[plugin].DEPENDENCIES for plugin in analyses_to_run)
+            )
+            missing_results = required_results.intersection(up_to_date_analyses) - set(file_object.processed_analysis)
+            if missing_results:
+                file_object.processed_analysis.update(
+                    self.db_backend_service.get_analyses(file_object.uid, missing_results)
+                )
+        return up_to_date_analyses
+
+    def _analysis_is_already_in_db_and_up_to_date(
+        self, analysis_to_do: str, uid: str, analysis_metadata: dict[str, dict]
+    ) -> bool:
+        db_entry = analysis_metadata.get(analysis_to_do)
         if db_entry is None or 'failed' in db_entry:
             return False
         if db_entry['plugin_version'] is None:
             logging.error(f'Plugin Version missing: UID: {uid}, Plugin: {analysis_to_do}')
             return False
-        return self._analysis_is_up_to_date(db_entry, self.analysis_plugins[analysis_to_do], uid)
+        return self._analysis_is_up_to_date(db_entry, self.analysis_plugins[analysis_to_do], analysis_metadata)
 
-    def _analysis_is_up_to_date(self, db_entry: dict, analysis_plugin: AnalysisBasePlugin, uid: str) -> bool:
+    def _analysis_is_up_to_date(
+        self, db_entry: dict, analysis_plugin: AnalysisBasePlugin, analysis_metadata: dict[str, dict]
+    ) -> bool:
         current_system_version = getattr(analysis_plugin, 'SYSTEM_VERSION', None)
         try:
             if self._current_version_is_newer(analysis_plugin.VERSION, current_system_version, db_entry):
@@ -339,7 +530,7 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
             logging.exception(f'Error while parsing plugin version: {error}')
             return False
 
-        return self._dependencies_are_up_to_date(db_entry, analysis_plugin, uid)
+        return self._dependencies_are_up_to_date(db_entry, analysis_plugin, analysis_metadata)
 
     @staticmethod
     def _current_version_is_newer(
@@ -351,10 +542,13 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         )
         return plugin_version_is_newer or system_version_is_newer
 
-    def _dependencies_are_up_to_date(self, db_entry: dict, analysis_plugin: AnalysisBasePlugin, uid: str) -> bool:
+    @staticmethod
+    def _dependencies_are_up_to_date(
+        db_entry: dict, analysis_plugin: AnalysisBasePlugin, analysis_metadata: dict[str, dict]
+    ) -> bool:
         for dependency in analysis_plugin.DEPENDENCIES:
-            dependency_entry = self.db_backend_service.get_analysis(uid, dependency)
-            if db_entry['analysis_date'] < dependency_entry['analysis_date']:
+            dependency_entry = analysis_metadata.get(dependency)
+            if dependency_entry is None or db_entry['analysis_date'] < dependency_entry['analysis_date']:
                 return False
         return True
 
@@ -416,40 +610,67 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         self.result_collector_process.start()
 
     def _result_collector(self):
+        # instead of polling all out-queues in turn, we wait until any of them has new results
+        plugins_by_queue_reader = {
+            plugin.out_queue._reader: (plugin_name, plugin)  # pylint: disable=protected-access
+            for plugin_name, plugin in self.analysis_plugins.items()
+        }
         while self.stop_condition.value == 0:
-            nop = True
-            for plugin_name, plugin in self.analysis_plugins.items():
-                try:
-                    fw = plugin.out_queue.get_nowait()
-                except (Empty, ValueError):
-                    pass
-                else:
-                    nop = False
-                    if plugin_name in fw.processed_analysis:
-                        if fw.analysis_exception:
-                            self.task_scheduler.reschedule_failed_analysis_task(fw)
-
-                        self.post_analysis(fw.uid, plugin_name, fw.processed_analysis[plugin_name])
-                    self._check_further_process_or_complete(fw)
-            if nop:
-                sleep(cfg.expert_settings.block_delay)
+            for reader in wait(list(plugins_by_queue_reader), timeout=cfg.expert_settings.block_delay):
+                plugin_name, plugin = plugins_by_queue_reader[reader]
+                self._collect_results_of_plugin(plugin_name, plugin)
+
+    def _collect_results_of_plugin(self, plugin_name: str, plugin: AnalysisBasePlugin):
+        while True:
+            try:
+                fw = plugin.out_queue.get_nowait()
+            except (Empty, ValueError):
+                return
+            self._handle_analysis_result(plugin_name, fw)
+
+    def _handle_analysis_result(self, plugin_name: str, fw: FileObject):
+        if plugin_name in fw.processed_analysis:
+            if fw.analysis_exception:
+                self.task_scheduler.reschedule_failed_analysis_task(fw)
+            else:
+                self._update_result_latency(fw.processed_analysis[plugin_name])
+
+            db_round_trips = self.db_backend_service.round_trips
+            self.post_analysis(fw.uid, plugin_name, fw.processed_analysis[plugin_name])
+            fw.temporary_data['result_db_round_trips'] = self.db_backend_service.round_trips - db_round_trips
+        # the task runner keeps track of the analysis progress of the file
+        fw.temporary_data['finished_analysis'] = plugin_name
+        self.process_queue.put(fw)
+
+    def _update_result_latency(self, analysis_result: dict):
+        # the analysis date is set by the plugin when the analysis is finished
+        if 'analysis_date' in analysis_result:
+            self.result_latency.add(time() - analysis_result['analysis_date'])
 
     def _check_further_process_or_complete(self, fw_object):
         if not fw_object.scheduled_analysis:
             logging.info(f'Analysis Completed:\n{fw_object}')
-            self.status.remove_from_current_analyses(fw_object)
+            self._complete_analysis(fw_object)
         else:
-            self.process_queue.put(fw_object)
+            self.process_queue.put(self._get_object_without_binary(fw_object))
+
+    def _complete_analysis(self, fw_object: FileObject):
+        if self.result_writer is None:  # the results were already stored by the `post_analysis` callback
+            self.status.remove_from_current_analyses(fw_object)
+        else:  # the analysis is only completed once the results of the object were stored by the writer
+            self.result_writer.add_completed_object(self._get_object_without_binary(fw_object))
 
     # ---- miscellaneous functions ----
 
     def get_combined_analysis_workload(self):
-        return self.process_queue.qsize() + sum(plugin.in_queue.qsize() for plugin in self.analysis_plugins.values())
+        plugin_queue_sizes = sum(plugin.in_queue.qsize() for plugin in self.analysis_plugins.values())
+        return self.process_queue.qsize() + self.yara_scan_stage.get_queue_size() + plugin_queue_sizes
 
     def get_scheduled_workload(self) -> dict:
         '''
         Get the current workload of this scheduler. The workload is represented through
         - the general in-queue,
+        - the latency between the completion of an analysis and the storage of its result,
         - the currently running analyses in each plugin and the plugin in-queues,
         - the progress for each currently analyzed firmware and
         - recently finished analyses.
@@ -460,6 +681,7 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
 
             {
                 'analysis_main_scheduler': int(),
+                'result_latency': dict(),
                 'plugins': dict(),
                 'current_analyses': dict(),
                 'recently_finished_analyses': dict(),
@@ -470,6 +692,7 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         self.status.clear_recently_finished()
         workload = {
             'analysis_main_scheduler': self.process_queue.qsize(),
+            'result_latency': self.result_latency.get_stats(),
             'plugins': {},
             'current_analyses': self.status.get_current_analyses_stats(),
             'recently_finished_analyses': dict(self.status.recently_finished),
@@ -499,7 +722,31 @@ class AnalysisScheduler:  # pylint: disable=too-many-instance-attributes
         for _, plugin in self.analysis_plugins.items():
             if plugin.check_exceptions():
                 return True
-        return check_worker_exceptions([self.schedule_process, self.result_collector_process], 'Scheduler')
+        if self.yara_scan_stage.check_exceptions():
+            return True
+        processes = [self.schedule_process, self.result_collector_process]
+        if self.result_writer is not None:
+            processes.append(self.result_writer.writer_process)
+        return check_worker_exceptions(processes, 'Scheduler')
+
+
+def _get_copy_for_analysis(file_object: FileObject, analysis: str | None = None) -> FileObject:
+    # the original object may be changed by other analyses finishing while the copy is queued -> copy mutable fields
+    fo_copy = copy(file_object)
+    fo_copy.processed_analysis = dict(file_object.processed_analysis)
+    fo_copy.scheduled_analysis = list(file_object.scheduled_analysis)
+    fo_copy.temporary_data = dict(file_object.temporary_data)
+    fo_copy.temporary_data.pop('analyses_waiting_for_yara_scan', None)
+    # each plugin only gets its own matches of the fused YARA scan (if the scan failed, the plugin scans the file)
+    fused_yara_matches = fo_copy.temporary_data.pop('fused_yara_matches', {})
+    if analysis in fused_yara_matches:
+        fo_copy.temporary_data['yara_matches'] = fused_yara_matches[analysis]
+    return fo_copy
+
+
+def _add_db_round_trips(file_object: FileObject, db_round_trips: int):
+    # the number of DB round trips during the analysis of a file (for performance monitoring)
+    file_object.temporary_data['db_round_trips'] = file_object.temporary_data.get('db_round_trips', 0) + db_round_trips
 
 
 def _fix_system_version(system_version: str | None) -> str:
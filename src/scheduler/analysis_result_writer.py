@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import logging
+from multiprocessing import Queue
+from queue import Empty
+from time import time
+from typing import Callable, Tuple
+
+from config import cfg
+from helperFunctions.process import ExceptionSafeProcess, stop_process
+from objects.file import FileObject
+from storage.db_interface_backend import BackendDbInterface
+
+AnalysisResult = Tuple[str, str, dict]  # (uid, plugin, analysis result)
+
+
+class AnalysisResultWriter:
+    '''
+    The result writer stores analysis results in the database in its own process. Results are buffered and stored in
+    batches (with a single upsert per batch, see ``BackendDbInterface.add_analyses``). A batch is stored once it is
+    full or once its first result was buffered for ``flush_interval`` seconds. The results are passed to the writer
+    through a bounded queue: If the writer falls behind, adding a result blocks until there is space in the queue
+    again (back-pressure). Thus, the result collector never has to wait for the database itself.
+    Since the results are stored asynchronously, the completion of an analysis must also be signalled through the
+    writer (see ``add_completed_object``): The ``completion_callback`` is called only after all results of the object
+    that were added before were stored.
+
+    :param db_interface: The database interface used for storing the results.
+    :param batch_size: The maximum number of results stored at once.
+    :param flush_interval: The maximum time in seconds a result is buffered before it is stored.
+    :param queue_size: The maximum number of results waiting in the queue.
+    :param completion_callback: Is called (in the writer process) with each completed object after its results were
+        stored.
+    '''
+
+    def __init__(
+        self,
+        db_interface: BackendDbInterface | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        queue_size: int | None = None,
+        completion_callback: Callable[[FileObject], None] | None = None,
+    ):
+        self.db_interface = db_interface if db_interface else BackendDbInterface()
+        self.batch_size = batch_size or cfg.expert_settings.result_batch_size
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else cfg.expert_settings.result_flush_interval
+        )
+        self.queue = Queue(maxsize=queue_size or cfg.expert_settings.result_queue_size)
+        self.completion_callback = completion_callback
+        self.writer_process = None
+
+    def start(self):
+        self.writer_process = ExceptionSafeProcess(target=self._writer_loop)
+        self.writer_process.start()
+
+    def shutdown(self):
+        '''
+        Store all remaining results and stop the writer process. Should only be called after all processes adding
+        results were stopped.
+        '''
+        self.queue.put(None)  # None marks the end of the queue
+        stop_process(self.writer_process, cfg.expert_settings.block_delay + 10)
+        self.queue.close()
+
+    def add_result(self, uid: str, plugin: str, analysis_result: dict):
+        '''
+        Add an analysis result to the write queue (same signature as ``BackendDbInterface.add_analysis``). Blocks if the
+        queue is full.
+        '''
+        self.queue.put((uid, plugin, analysis_result))
+
+    def add_completed_object(self, file_object: FileObject):
+        '''
+        Signal that the analysis of a file object is completed. The ``completion_callback`` is called with the object
+        after all results that were added before were stored. Blocks if the queue is full.
+        '''
+        self.queue.put(file_object)
+
+    def get_queue_size(self) -> int:
+        return self.queue.qsize()
+
+    def _writer_loop(self):
+        while True:
+            batch, finished = self._get_next_batch()
+            if batch:
+                self._store_batch(batch)
+            if finished:
+                break
+
+    def _get_next_batch(self) -> tuple[list[AnalysisResult | FileObject], bool]:
+        batch = []
+        result = self.queue.get()
+        deadline = time() + self.flush_interval
+        while result is not None:
+            batch.append(result)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                result = self.queue.get(timeout=max(deadline - time(), 0))
+            except Empty:
+                break
+        return batch, result is None
+
+    def _store_batch(self, batch: list[AnalysisResult | FileObject]):
+        results = [item for item in batch if not isinstance(item, FileObject)]
+        round_trips = self.db_interface.round_trips
+        try:
+            if results:
+                self.db_interface.add_analyses(results)
+        except Exception:  # pylint: disable=broad-except
+            # the writer must keep running (otherwise the queue fills up and blocks the result collector for good)
+            logging.exception(f'Could not store {len(results)} analysis results')
+        else:
+            logging.debug(
+                f'Stored {len(results)} analysis results ({self.db_interface.round_trips - round_trips} DB round trips)'
+            )
+        for file_object in (item for item in batch if isinstance(item, FileObject)):
+            if self.completion_callback is not None:
+                self.completion_callback(file_object)
@@ -51,6 +51,25 @@ class AnalysisTaskScheduler:
             if all(dependency in met_dependencies for dependency in self.plugins[plugin].DEPENDENCIES)
         ]
 
+    def get_plugins_ready_for_analysis(self, scheduled_analysis: list[str], running_analyses: set[str]) -> list[str]:
+        '''
+        Get all scheduled plugins that can be started right away, i.e. plugins whose dependencies are neither scheduled
+        nor running. Since the black-/whitelist check needs the result of `file_type`, all other plugins must wait for
+        it, if it is scheduled or running. Unknown plugins are always returned (so that they can be discarded).
+
+        :param scheduled_analysis: The plugins scheduled for a file (that were not started yet).
+        :param running_analyses: The plugins that are currently running for a file.
+        :return: The plugins that can be started (a subset of `scheduled_analysis`).
+        '''
+        pending_analyses = set(scheduled_analysis).union(running_analyses)
+        if 'file_type' in pending_analyses:
+            return ['file_type'] if 'file_type' in scheduled_analysis else []
+        return [
+            plugin
+            for plugin in scheduled_analysis
+            if plugin not in self.plugins or pending_analyses.isdisjoint(self.plugins[plugin].DEPENDENCIES)
+        ]
+
     def _add_dependencies_recursively(self, scheduled_analyses: list[str]) -> list[str]:
         scheduled_analyses_set = set(scheduled_analyses)
         while True:
@@ -7,6 +7,8 @@ from time import sleep
 from config import cfg
 from helperFunctions.logging import TerminalColors, color_string
 from helperFunctions.process import check_worker_exceptions, new_worker_was_started, start_single_worker, stop_processes
+from storage.db_interface_base import DbInterfaceError
+from unpacker.extraction_container import ExtractionContainer
 from unpacker.unpack import Unpacker
 
 THROTTLE_INTERVAL = 2
@@ -14,10 +16,14 @@ THROTTLE_INTERVAL = 2
 
 class UnpackingScheduler:  # pylint: disable=too-many-instance-attributes
     '''
-    This scheduler performs unpacking on firmware objects
+    This scheduler performs unpacking on firmware objects.
+    If a ``db_interface`` is given, each unpacked file is stored in the database together with the files extracted
+    from it using bulk statements (see ``BackendDbInterface.add_unpacked_objects``).
     '''
 
-    def __init__(self, post_unpack=None, analysis_workload=None, fs_organizer=None, unpacking_locks=None):
+    def __init__(  # pylint: disable=too-many-arguments
+        self, post_unpack=None, analysis_workload=None, fs_organizer=None, unpacking_locks=None, db_interface=None
+    ):
         self.stop_condition = Value('i', 0)
         self.throttle_condition = Value('i', 0)
         self.get_analysis_workload = analysis_workload
@@ -27,6 +33,7 @@ class UnpackingScheduler:  # pylint: disable=too-many-instance-attributes
         self.workers = []
         self.post_unpack = post_unpack
         self.unpacking_locks = unpacking_locks
+        self.db_interface = db_interface
         self.start_unpack_workers()
         self.work_load_process = self.start_work_load_monitor()
         logging.info('Unpacker Module online')
@@ -61,20 +68,37 @@ class UnpackingScheduler:  # pylint: disable=too-many-instance-attributes
             self.workers.append(start_single_worker(process_index, 'Unpacking', self.unpack_worker))
 
     def unpack_worker(self, worker_id):
+        extraction_container = ExtractionContainer(worker_id) if cfg.unpack.persistent_extractors else None
         unpacker = Unpacker(
             worker_id=worker_id,
             fs_organizer=self.fs_organizer,
             unpacking_locks=self.unpacking_locks,
+            extraction_container=extraction_container,
         )
-        while self.stop_condition.value == 0:
-            with suppress(Empty):
-                fo = self.in_queue.get(timeout=cfg.expert_settings.block_delay)
-                extracted_objects = unpacker.unpack(fo)
-                logging.debug(
-                    f'[worker {worker_id}] unpacking of {fo.uid} complete: {len(extracted_objects)} files extracted'
-                )
-                self.post_unpack(fo)
-                self.schedule_extracted_files(extracted_objects)
+        try:
+            if extraction_container is not None:
+                extraction_container.start()
+            while self.stop_condition.value == 0:
+                with suppress(Empty):
+                    fo = self.in_queue.get(timeout=cfg.expert_settings.block_delay)
+                    extracted_objects = unpacker.unpack(fo)
+                    logging.debug(
+                        f'[worker {worker_id}] unpacking of {fo.uid} complete: {len(extracted_objects)} files extracted'
+                    )
+                    if self.db_interface is not None:
+                        self._store_unpacked_objects(fo, extracted_objects)
+                    self.post_unpack(fo)
+                    self.schedule_extracted_files(extracted_objects)
+        finally:
+            if extraction_container is not None:
+                extraction_container.stop()
+
+    def _store_unpacked_objects(self, fo, extracted_objects):
+        try:
+            self.db_interface.add_unpacked_objects(fo, extracted_objects)
+        except DbInterfaceError as error:
+            # the files are stored one by one before their analysis instead (where errors are handled)
+            logging.warning(f'Could not store the files extracted from {fo.uid} in the DB: {error}')
 
     def schedule_extracted_files(self, object_list):
         for item in object_list:
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from multiprocessing import Queue, Value
+from pathlib import Path
+from queue import Empty
+
+import yara
+from common_helper_files import get_binary_from_file
+
+from analysis.PluginBase import AnalysisBasePlugin
+from analysis.YaraPluginBase import YaraBasePlugin, _convert_yara_matches, _get_hex_strings
+from config import cfg
+from helperFunctions.fileSystem import FUSED_SIGNATURE_FILE
+from helperFunctions.process import (
+    PersistentTaskProcess,
+    TaskProcessError,
+    check_worker_exceptions,
+    start_single_worker,
+    stop_processes,
+)
+from objects.file import FileObject
+
+
+class YaraScanStage:
+    '''
+    The YARA scan stage scans each file only once with the signatures of all YARA based analysis plugins instead of
+    each plugin scanning the file with its own signatures. The signatures are compiled into a single ruleset with one
+    namespace per plugin (see ``compile_yara_signatures.py``). The matches of each namespace are converted to the
+    result of the plugin and handed back to the scheduler with the file object (in
+    ``temporary_data['fused_yara_matches']``). The scheduler passes each plugin only its own matches and the plugin only
+    does its post-processing. Plugin versions, system versions and results of the plugins are not affected by this.
+
+    A plugin is not part of the stage if its signatures were compiled after the fused signatures (i.e. they are
+    outdated). If the scan of a file fails, the result is empty and the plugins scan the file themselves.
+
+    :param analysis_plugins: The analysis plugins of the scheduler (the YARA based plugins are selected).
+    :param result_queue: The queue to which scanned file objects are passed.
+    :param worker_count: The number of scan processes.
+    :param signature_path: The path of the fused signatures.
+    '''
+
+    def __init__(
+        self,
+        analysis_plugins: dict[str, AnalysisBasePlugin],
+        result_queue: Queue,
+        worker_count: int | None = None,
+        signature_path: str = FUSED_SIGNATURE_FILE,
+    ):
+        self.signature_path = signature_path
+        self.plugins = self._get_fused_plugins(analysis_plugins)
+        self.timeout = min((plugin.TIMEOUT for plugin in self.plugins.values()), default=0)
+        self.hex_strings = {
+            name: _get_hex_strings(Path(plugin.FILE).parent.parent / 'signatures')
+            for name, plugin in self.plugins.items()
+        }
+        self.worker_count = worker_count if worker_count is not None else cfg.expert_settings.yara_scan_threads
+        self.in_queue = Queue()
+        self.result_queue = result_queue
+        self.stop_condition = Value('i', 0)
+        self.workers = []
+        self._rules: yara.Rules | None = None
+
+    def _get_fused_plugins(self, analysis_plugins: dict[str, AnalysisBasePlugin]) -> dict[str, YaraBasePlugin]:
+        if not Path(self.signature_path).is_file():
+            logging.warning(f'Fused YARA signatures {self.signature_path} not found. Run "compile_yara_signatures.py".')
+            return {}
+        fused_signatures_mtime = Path(self.signature_path).stat().st_mtime
+        fused_plugins = {}
+        for name, plugin in analysis_plugins.items():
+            if not isinstance(plugin, YaraBasePlugin) or not plugin.signature_path:
+                continue
+            if Path(plugin.signature_path).stat().st_mtime > fused_signatures_mtime:
+                logging.warning(f'Fused YARA signatures are outdated: {name} scans files with its own signatures')
+                continue
+            fused_plugins[name] = plugin
+        return fused_plugins
+
+    @property
+    def enabled(self) -> bool:
+        return self.worker_count > 0 and len(self.plugins) > 1
+
+    def start(self):
+        if not self.enabled:
+            return
+        for process_index in range(self.worker_count):
+            self.workers.append(start_single_worker(process_index, 'YARA-Scan', self.worker))
+        logging.debug(f'YARA scan stage: {len(self.workers)} workers started for plugins {sorted(self.plugins)}')
+
+    def shutdown(self):
+        self.stop_condition.value = 1
+        stop_processes(self.workers, timeout=cfg.expert_settings.block_delay + 1)
+        self.in_queue.close()
+
+    def add_job(self, file_object: FileObject):
+        self.in_queue.put(file_object)
+
+    def worker(self, worker_id: int):
+        # as for the analysis plugins, the scan runs in a separate process that survives timeouts and crashes
+        task_process = PersistentTaskProcess(self.scan, name=f'YARA-Scan-Task-{worker_id}')
+        try:
+            while self.stop_condition.value == 0:
+                try:
+                    file_object = self.in_queue.get(timeout=float(cfg.expert_settings.block_delay))
+                except Empty:
+                    continue
+                try:
+                    fused_matches = task_process.execute(file_object, timeout=self.timeout)
+                except (TimeoutError, TaskProcessError) as error:
+                    logging.warning(f'Worker {worker_id}: YARA scan of {file_object.uid} failed: {error}')
+                    fused_matches = {}
+                file_object.temporary_data['fused_yara_matches'] = fused_matches
+                self.result_queue.put(file_object)
+        finally:
+            task_process.shutdown()
+
+    def scan(self, file_object: FileObject) -> dict[str, dict]:
+        '''
+        Scan the file with the fused signatures.
+
+        :param file_object: The file object (the binary is loaded from the file storage if it is not set).
+        :return: The result of each YARA plugin (in the format of ``YaraBasePlugin.process_object``) by plugin name.
+        '''
+        # the binary is not loaded into the file object, so that it is not sent back to the scheduler
+        binary = file_object.binary if file_object.binary_is_loaded() else get_binary_from_file(file_object.file_path)
+        matches_by_plugin = defaultdict(list)
+        for match in self._get_rules().match(data=binary, timeout=self.timeout):
+            matches_by_plugin[match.namespace].append(match)
+        return {name: _convert_yara_matches(matches_by_plugin[name], self.hex_strings[name]) for name in self.plugins}
+
+    def _get_rules(self) -> yara.Rules:
+        # the rules are loaded only once in each scan process
+        if self._rules is None:
+            self._rules = yara.load(self.signature_path)
+        return self._rules
+
+    def get_queue_size(self) -> int:
+        return self.in_queue.qsize()
+
+    def check_exceptions(self) -> bool:
+        return check_worker_exceptions(self.workers, 'YARA-Scan', self.worker)
@@ -29,6 +29,8 @@ try:
 except (ImportError, ModuleNotFoundError):
     sys.exit(1)
 
+import psutil
+
 from analysis.PluginBase import PluginInitException
 from config import cfg
 from helperFunctions.process import complete_shutdown
@@ -36,6 +38,8 @@ from intercom.back_end_binding import InterComBackEndBinding
 from scheduler.analysis import AnalysisScheduler
 from scheduler.comparison_scheduler import ComparisonScheduler
 from scheduler.unpacking_scheduler import UnpackingScheduler
+from storage.db_connection import check_connection_budget
+from storage.db_interface_backend import BackendDbInterface
 from storage.unpacking_locks import UnpackingLockManager
 
 
@@ -57,6 +61,7 @@ class FactBackend(FactBase):
             post_unpack=self.analysis_service.start_analysis_of_object,
             analysis_workload=self.analysis_service.get_combined_analysis_workload,
             unpacking_locks=self.unpacking_lock_manager,
+            db_interface=BackendDbInterface(),
         )
         self.compare_service = ComparisonScheduler()
         self.intercom = InterComBackEndBinding(
@@ -76,6 +81,8 @@ class FactBackend(FactBase):
             # If we don't have enough rights to change the permissions we assume they are right
             # E.g. in FACT_docker the correct group is not the group named 'docker'
             logging.warning('Could not change permissions of docker-mount-base-dir. Ignoring.')
+        # all worker processes of the backend were started at this point and each one may use the database
+        check_connection_budget(process_count=len(psutil.Process().children(recursive=True)) + 1)
 
         while self.run:
             self.work_load_stat.update(
@@ -1,17 +1,45 @@
 from __future__ import annotations
 
 import ctypes
+from multiprocessing import Array, Value
 
 import numpy as np
 
 from analysis.PluginBase import AnalysisBasePlugin
 
 
+class DurationStats:
+    '''
+    A rolling window of the last ``limit`` durations (in seconds) that can be shared between processes. If the window
+    is full, the oldest value is overwritten.
+
+    :param limit: The maximum number of durations that are kept.
+    '''
+
+    def __init__(self, limit: int = 1000):
+        self.limit = limit
+        self.durations = Array(ctypes.c_float, limit)
+        self.count = Value('i', 0)
+        self.index = Value('i', 0)
+
+    def add(self, duration: float):
+        with self.durations.get_lock():
+            self.durations[self.index.value] = duration
+            self.index.value = (self.index.value + 1) % self.limit
+            self.count.value = min(self.count.value + 1, self.limit)
+
+    def get_stats(self) -> dict[str, str] | None:
+        return _get_stats(self.durations, self.count.value, self.limit)
+
+
 def get_plugin_stats(plugin: AnalysisBasePlugin) -> dict[str, str] | None:
+    return _get_stats(plugin.analysis_stats, plugin.analysis_stats_count.value, plugin.ANALYSIS_STATS_LIMIT)
+
+
+def _get_stats(durations: Array, stats_count: int, limit: int) -> dict[str, str] | None:
     try:
-        stats_count = plugin.analysis_stats_count.value
-        stats_array = np.array(plugin.analysis_stats.get_obj(), ctypes.c_float)
-        if stats_count < plugin.ANALYSIS_STATS_LIMIT:
+        stats_array = np.array(durations.get_obj(), ctypes.c_float)
+        if stats_count < limit:
             stats_array = stats_array[:stats_count]
         return dict(
             min=_format_float(stats_array.min()),
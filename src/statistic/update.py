@@ -118,16 +118,18 @@ class StatsUpdater:
         firmware_packing_stats = dict(
             self.db.count_values_in_summary(plugin='unpacker', q_filter=self.match, firmware=True)
         )
+        file_types = self.db.get_unpacking_file_types_by_summary(['packed', 'data lost'], q_filter=self.match)
+        entropies = self.db.get_unpacking_entropies(['packed', 'unpacked'], q_filter=self.match)
         return {
             'used_unpackers': self.db.get_used_unpackers(q_filter=self.match),
-            'packed_file_types': self.db.get_unpacking_file_types('packed', q_filter=self.match),
-            'data_loss_file_types': self.db.get_unpacking_file_types('data lost', q_filter=self.match),
+            'packed_file_types': file_types['packed'],
+            'data_loss_file_types': file_types['data lost'],
             'overall_unpack_ratio': self._get_ratio(fo_packing_stats, firmware_packing_stats, ['unpacked', 'packed']),
             'overall_data_loss_ratio': self._get_ratio(
                 fo_packing_stats, firmware_packing_stats, ['data lost', 'no data lost']
             ),
-            'average_packed_entropy': self.db.get_unpacking_entropy('packed', q_filter=self.match),
-            'average_unpacked_entropy': self.db.get_unpacking_entropy('unpacked', q_filter=self.match),
+            'average_packed_entropy': entropies['packed'],
+            'average_unpacked_entropy': entropies['unpacked'],
         }
 
     def get_architecture_stats(self):
@@ -162,9 +164,7 @@ class StatsUpdater:
             return 0.0
 
     def get_executable_stats(self) -> dict[str, list[tuple[str, int, float, str]]]:
-        total = self.db.get_regex_mime_match_count('^ELF.*executable')
-        stats = []
-        for label, query_match in [
+        executable_stats = [
             ('big endian', '^ELF.*MSB.*executable'),
             ('little endian', '^ELF.*LSB.*executable'),
             ('stripped', '^ELF.*executable.*, stripped'),
@@ -174,18 +174,20 @@ class StatsUpdater:
             ('dynamically linked', '^ELF.*executable.*dynamically linked'),
             ('statically linked', '^ELF.*executable.*statically linked'),
             ('section info missing', '^ELF.*executable.*section header'),
-        ]:
-            count = self.db.get_regex_mime_match_count(query_match)
+        ]
+        # all counts are computed in a single scan of the file_type analyses
+        counts = self.db.get_regex_mime_match_counts(['^ELF.*executable', *(regex for _, regex in executable_stats)])
+        total = counts['^ELF.*executable']
+        stats = []
+        for label, query_match in executable_stats:
+            count = counts[query_match]
             stats.append((label, count, count / (total if total else 1), query_match))
         return {'executable_stats': stats}
 
     def get_ip_stats(self) -> dict[str, Stats]:
-        ip_stats = {
-            key: self.db.count_distinct_values_in_array(
-                AnalysisEntry.result[key], plugin='ip_and_uri_finder', q_filter=self.match
-            )
-            for key in ['ips_v4', 'ips_v6', 'uris']
-        }
+        ip_stats = self.db.count_distinct_values_in_arrays(
+            ['ips_v4', 'ips_v6', 'uris'], plugin='ip_and_uri_finder', q_filter=self.match
+        )
         self._remove_location_info(ip_stats)
         return ip_stats
 
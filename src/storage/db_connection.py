@@ -1,12 +1,62 @@
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.engine import URL
+import logging
+import os
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, Engine
 from sqlalchemy.orm import sessionmaker
 
 from config import cfg
 from storage.schema import Base
 
+# The engines (and therefore the connection pools) of the current process. There is one engine per DB user (role) and
+# database that is shared by all connections and interfaces of the process.
+_engines: dict[tuple, Engine] = {}
+# the number of DB round trips (executed statements and commits) of each engine in the current process
+_round_trips: dict[Engine, int] = {}
+
+
+def get_engine(engine_url: URL, **kwargs) -> Engine:
+    '''
+    Get the shared engine of the current process for a DB URL. The engine is created on first use. Sessions return
+    their connections to the pool of the engine so that they can be reused instead of opening a new connection to the
+    database for every session.
+
+    :param engine_url: The URL of the database (including the user).
+    :param kwargs: Additional arguments for ``sqlalchemy.create_engine`` (engines with different arguments are not
+        shared).
+    :return: The engine.
+    '''
+    key = (engine_url, repr(sorted(kwargs.items())))
+    if key not in _engines:
+        engine = create_engine(
+            engine_url,
+            pool_size=cfg.data_storage.postgres_pool_size,
+            max_overflow=cfg.data_storage.postgres_max_overflow,
+            future=True,
+            **kwargs,
+        )
+        _round_trips[engine] = 0
+        event.listen(engine, 'before_cursor_execute', _count_round_trip)
+        event.listen(engine, 'commit', _count_round_trip)
+        _engines[key] = engine
+    return _engines[key]
+
+
+def _count_round_trip(connection, *_):
+    _round_trips[connection.engine] += 1
+
+
+def _reset_engines_after_fork():
+    # the connections of the parent process must not be used by the child process (the connections would be corrupted
+    # if both processes used them), so the child gets new pools without closing the connections of the parent
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_engines_after_fork)
+
 
 class DbConnection:
     def __init__(self, user: str = None, password: str = None, db_name: str | None = None, **kwargs):
@@ -26,9 +76,15 @@ class DbConnection:
             port=port,
             database=database,
         )
-        self.engine = create_engine(engine_url, pool_size=100, future=True, **kwargs)
+        self.engine = get_engine(engine_url, **kwargs)
         self.session_maker = sessionmaker(bind=self.engine, future=True)  # future=True => sqlalchemy 2.0 support
 
+    @property
+    def round_trips(self) -> int:
+        '''The number of DB round trips (executed statements and commits) of this connection's engine in the current
+        process (the engine is shared by all connections of the same DB user).'''
+        return _round_trips[self.engine]
+
     def create_tables(self):  # pylint: disable=no-self-use
         raise Exception('Only the admin connection may create tables')
 
@@ -54,3 +110,29 @@ class AdminConnection(DbConnection):
 
     def create_tables(self):
         self.base.metadata.create_all(self.engine)
+
+
+def check_connection_budget(process_count: int):
+    '''
+    Check if the connection pools of all processes fit into the connection limit of the database and log a warning
+    otherwise. Each process keeps up to ``postgres-pool-size`` idle connections per DB user open and may temporarily
+    open up to ``postgres-max-overflow`` additional connections.
+
+    :param process_count: The number of processes that may use the database.
+    '''
+    with ReadOnlyConnection().engine.connect() as connection:
+        max_connections = int(connection.execute(text('SHOW max_connections')).scalar())
+        reserved_connections = int(connection.execute(text('SHOW superuser_reserved_connections')).scalar())
+    available_connections = max_connections - reserved_connections
+    idle_connections = process_count * cfg.data_storage.postgres_pool_size
+    peak_connections = process_count * (cfg.data_storage.postgres_pool_size + cfg.data_storage.postgres_max_overflow)
+    message = (
+        f'{process_count} processes keep up to {idle_connections} and use up to {peak_connections} DB connections '
+        f'per DB user ({available_connections} connections are available)'
+    )
+    if idle_connections > available_connections:
+        logging.warning(
+            f'{message}. Please decrease postgres-pool-size or increase max_connections in the postgres config.'
+        )
+    else:
+        logging.info(message)
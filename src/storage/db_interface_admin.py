@@ -2,11 +2,25 @@ from __future__ import annotations
 
 import logging
 
+from sqlalchemy import delete, exists, func, or_, select
+
 from intercom.front_end_binding import InterComFrontEndBinding
 from storage.db_connection import DbConnection, ReadWriteDeleteConnection
 from storage.db_interface_base import ReadWriteDbInterface
-from storage.db_interface_common import DbInterfaceCommon
-from storage.schema import ComparisonEntry, FileObjectEntry
+from storage.db_interface_common import DbInterfaceCommon, get_included_files_cte
+from storage.schema import (
+    AnalysisEntry,
+    ComparisonEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    VirtualFilePathEntry,
+    comparisons_table,
+    fw_files_table,
+    included_files_table,
+)
+
+# files are deleted (and handed to the backend for the deletion from the file system) in batches of this size
+DELETE_BATCH_SIZE = 1000
 
 
 class AdminDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
@@ -23,22 +37,110 @@ class AdminDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
                 session.delete(fo_entry)
 
     def delete_firmware(self, uid, delete_root_file=True):
-        removed_fp, uids_to_delete = 0, set()
+        '''
+        Delete a firmware and all included files that are not also included in other firmware. The root firmware uid
+        is removed from the virtual file paths of the files that are included in other firmware.
+        The files to delete are determined with a single query and are deleted with a few statements per batch of
+        files (starting with the most deeply nested files so that an interrupted deletion can be resumed).
+
+        :param uid: The uid of the firmware
+        :param delete_root_file: Whether the file of the firmware itself should be deleted from the file system
+        :return: tuple with numbers of removed virtual file path entries and deleted files
+        '''
         with self.get_read_write_session() as session:
             fw: FileObjectEntry = session.get(FileObjectEntry, uid)
             if not fw or not fw.is_firmware:
                 logging.error(f'Trying to remove FW with UID {uid} but it could not be found in the DB.')
                 return 0, 0
+            included_files = self._get_included_files_by_ownership(uid, session)
+            uids_to_delete = self._get_files_to_delete(uid, included_files, session)
+            # files that are not deleted (because they are also included in other firmware) are only removed from
+            # the virtual file paths of the firmware
+            remaining_files = sorted(set(included_files).difference(uids_to_delete))
+            for batch in _split_into_batches(remaining_files):
+                session.execute(
+                    delete(VirtualFilePathEntry)
+                    .where(VirtualFilePathEntry.root_uid == uid, VirtualFilePathEntry.file_uid.in_(batch))
+                    .execution_options(synchronize_session=False)
+                )
 
-            for child_uid in fw.get_included_uids():
-                child_removed_fp, child_uids_to_delete = self._remove_virtual_path_entries(uid, child_uid, session)
-                removed_fp += child_removed_fp
-                uids_to_delete.update(child_uids_to_delete)
-        self.delete_object(uid)
+        # the most deeply nested files are deleted first so that the remaining files are still part of the firmware
+        uids_to_delete.sort(key=lambda fo_uid: included_files[fo_uid][0], reverse=True)
+        for batch in _split_into_batches(uids_to_delete):
+            with self.get_read_write_session() as session:
+                self._delete_files(batch, session)
+            self.intercom.delete_file(batch)
+        with self.get_read_write_session() as session:
+            self._delete_files([uid], session)
         if delete_root_file:
-            uids_to_delete.add(uid)
-        self.intercom.delete_file(list(uids_to_delete))
-        return removed_fp, len(uids_to_delete)
+            self.intercom.delete_file([uid])
+        return len(remaining_files), len(uids_to_delete) + int(delete_root_file)
+
+    @staticmethod
+    def _get_included_files_by_ownership(root_uid: str, session) -> dict[str, tuple[int, bool, bool]]:
+        '''
+        Get all files included in a firmware (except the firmware itself) with one query.
+
+        :param root_uid: The uid of the root firmware
+        :return: dictionary with uid -> (depth, is only included in this firmware, is a firmware) for each file
+        '''
+        included = get_included_files_cte([root_uid], with_depth=True)
+        in_other_firmware = exists().where(
+            VirtualFilePathEntry.file_uid == FileObjectEntry.uid, VirtualFilePathEntry.root_uid != root_uid
+        )
+        query = (
+            select(
+                FileObjectEntry.uid,
+                func.min(included.c.depth),
+                ~in_other_firmware,
+                FileObjectEntry.is_firmware,
+            )
+            .join(included, FileObjectEntry.uid == included.c.uid)
+            .where(FileObjectEntry.uid != root_uid)
+            .group_by(FileObjectEntry.uid)
+        )
+        return {uid: (depth, exclusive, is_firmware) for uid, depth, exclusive, is_firmware in session.execute(query)}
+
+    @staticmethod
+    def _get_files_to_delete(root_uid: str, included_files: dict[str, tuple[int, bool, bool]], session) -> list[str]:
+        '''
+        Get the files that are only included in this firmware. A file is only deleted if all its parents are also
+        deleted (files with other parents and firmware are not deleted even if they are only included in this
+        firmware according to the virtual file paths).
+        '''
+        candidates = {
+            uid for uid, (_, exclusive, is_firmware) in included_files.items() if exclusive and not is_firmware
+        }
+        parents = {}
+        for batch in _split_into_batches(list(candidates)):
+            query = select(included_files_table).where(included_files_table.c.child_uid.in_(batch))
+            for parent_uid, child_uid in session.execute(query):
+                parents.setdefault(child_uid, set()).add(parent_uid)
+        while True:
+            remaining = {uid for uid in candidates if parents.get(uid, set()) <= candidates | {root_uid}}
+            if remaining == candidates:
+                return list(candidates)
+            candidates = remaining
+
+    @staticmethod
+    def _delete_files(uid_list: list[str], session):
+        comparisons = select(comparisons_table.c.comparison_id).where(comparisons_table.c.file_uid.in_(uid_list))
+        comparison_ids = list(session.execute(comparisons).scalars())
+        statements = [
+            delete(comparisons_table).where(comparisons_table.c.comparison_id.in_(comparison_ids)),
+            delete(ComparisonEntry).where(ComparisonEntry.comparison_id.in_(comparison_ids)),
+            delete(AnalysisEntry).where(AnalysisEntry.uid.in_(uid_list)),
+            delete(included_files_table).where(
+                or_(included_files_table.c.parent_uid.in_(uid_list), included_files_table.c.child_uid.in_(uid_list))
+            ),
+            delete(fw_files_table).where(
+                or_(fw_files_table.c.root_uid.in_(uid_list), fw_files_table.c.file_uid.in_(uid_list))
+            ),
+            delete(FirmwareEntry).where(FirmwareEntry.uid.in_(uid_list)),
+            delete(FileObjectEntry).where(FileObjectEntry.uid.in_(uid_list)),
+        ]
+        for statement in statements:
+            session.execute(statement.execution_options(synchronize_session=False))
 
     def delete_comparison(self, comparison_id: str):
         try:
@@ -48,32 +150,6 @@ class AdminDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
         except Exception as exception:
             logging.warning(f'Could not delete comparison {comparison_id}: {exception}', exc_info=True)
 
-    def _remove_virtual_path_entries(self, root_uid: str, fo_uid: str, session) -> tuple[int, set[str]]:
-        '''
-        Recursively checks if the provided root_uid is the only entry in the virtual path of the file object belonging
-        to fo_uid. If this is the case, the file object is deleted from the database. Otherwise, only the entry from
-        the virtual path is removed.
 
-        :param root_uid: The uid of the root firmware
-        :param fo_uid: The uid of the current file object
-        :return: tuple with numbers of recursively removed virtual file path entries and deleted files
-        '''
-        removed_fp = 0
-        uids_to_delete = set()
-        fo_entry: FileObjectEntry = session.get(FileObjectEntry, fo_uid)
-        if fo_entry is None:
-            return 0, set()
-        for child_uid in fo_entry.get_included_uids():
-            child_removed_fp, child_uids_to_delete = self._remove_virtual_path_entries(root_uid, child_uid, session)
-            removed_fp += child_removed_fp
-            uids_to_delete.update(child_uids_to_delete)
-        if any(root != root_uid for root in fo_entry.virtual_file_paths):
-            # file is included in other firmwares -> only remove root_uid from virtual_file_paths
-            fo_entry.virtual_file_paths = {
-                uid: path_list for uid, path_list in fo_entry.virtual_file_paths.items() if uid != root_uid
-            }
-            removed_fp += 1
-        else:  # file is only included in this firmware -> delete file
-            uids_to_delete.add(fo_uid)
-            # FO DB entry gets deleted automatically when all parents are deleted by cascade
-        return removed_fp, uids_to_delete
+def _split_into_batches(uid_list: list[str]) -> list[list[str]]:
+    return [uid_list[index : index + DELETE_BATCH_SIZE] for index in range(0, len(uid_list), DELETE_BATCH_SIZE)]
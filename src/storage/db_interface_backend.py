@@ -1,26 +1,39 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Iterable
+from contextlib import suppress
 
-from sqlalchemy import select
+from sqlalchemy import and_, case, func, literal, select, union, union_all
+from sqlalchemy.dialects.postgresql import Insert, insert
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import Subquery
 
-from helperFunctions.virtual_file_path import update_virtual_file_path
 from objects.file import FileObject
 from objects.firmware import Firmware
 from storage.db_interface_base import DbInterfaceError, DbSerializationError, ReadWriteDbInterface
-from storage.db_interface_common import DbInterfaceCommon
+from storage.db_interface_common import PLUGINS_WITH_SUMMARY_STATS, PLUGINS_WITH_TAG_PROPAGATION, DbInterfaceCommon
 from storage.entry_conversion import (
     create_analysis_entries,
     create_file_object_entry,
     create_firmware_entry,
     get_analysis_without_meta,
+    get_virtual_file_path_rows,
+)
+from storage.schema import (
+    AnalysisEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    VirtualFilePathEntry,
+    firmware_aggregate_table,
+    fw_files_table,
+    get_sha256_hex,
+    included_files_table,
+    summary_counter_table,
 )
-from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry
 
 
 class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
-
     # ===== Create / INSERT =====
 
     def add_object(self, fw_object: FileObject):
@@ -41,6 +54,9 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
             self._update_parents(file_object.parent_firmware_uids, file_object.parents, fo_entry, session)
             analyses = create_analysis_entries(file_object, fo_entry)
             session.add_all([fo_entry, *analyses])
+            session.flush()
+            _insert_virtual_file_paths(session, [file_object])
+            update_firmware_aggregates(session, [file_object.uid])
 
     def _update_parents(
         self, root_fw_uids: list[str], parent_uids: list[str], fo_entry: FileObjectEntry, session: Session
@@ -66,6 +82,66 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
             firmware_entry = create_firmware_entry(firmware, fo_entry)
             analyses = create_analysis_entries(firmware, fo_entry)
             session.add_all([fo_entry, firmware_entry, *analyses])
+            session.flush()
+            _insert_virtual_file_paths(session, [firmware])
+            update_firmware_aggregates(session, [firmware.uid])
+
+    def add_unpacked_objects(self, parent: FileObject, children: list[FileObject]):
+        '''
+        Store a file and all files that were extracted from it (i.e. the result of one ``Unpacker.unpack`` call) in a
+        single transaction. Instead of one transaction per file, each kind of rows (file objects, included files,
+        firmware files, virtual file paths and analyses) is stored with a single bulk statement. New file objects are
+        inserted and the virtual file paths of files that are already in the DB are appended.
+        The stored objects are marked with ``temporary_data['stored_in_db']`` so that they are not stored again before
+        their analysis (see ``AnalysisScheduler``).
+
+        :param parent: The unpacked file (it is stored with ``add_object`` if it was not stored with this method yet).
+        :param children: The files extracted from ``parent``.
+        '''
+        if not parent.temporary_data.get('stored_in_db'):
+            self.add_object(parent)
+        with self.get_read_write_session() as session:
+            if children:
+                self._insert_file_objects(children, session)
+                _insert_virtual_file_paths(session, children)
+                included_files = [
+                    {'parent_uid': parent_uid, 'child_uid': child.uid}
+                    for child in children
+                    for parent_uid in child.parents
+                ]
+                session.execute(insert(included_files_table).values(included_files).on_conflict_do_nothing())
+                fw_files = [
+                    {'root_uid': root_uid, 'file_uid': child.uid}
+                    for child in children
+                    for root_uid in child.parent_firmware_uids
+                ]
+                session.execute(insert(fw_files_table).values(fw_files).on_conflict_do_nothing())
+            analyses = {
+                (fo.uid, plugin): analysis_dict
+                for fo in [parent, *children]
+                for plugin, analysis_dict in fo.processed_analysis.items()
+            }
+            if analyses:
+                session.execute(_get_analysis_upsert(analyses))
+            update_firmware_aggregates(session, [fo.uid for fo in [parent, *children]])
+        for fo in [parent, *children]:
+            fo.temporary_data['stored_in_db'] = True
+
+    @staticmethod
+    def _insert_file_objects(file_objects: list[FileObject], session: Session):
+        rows = [
+            {
+                'uid': fo.uid,
+                'sha256': fo.sha256,
+                'file_name': fo.file_name,
+                'depth': fo.depth,
+                'size': fo.size,
+                'comments': fo.comments,
+                'is_firmware': isinstance(fo, Firmware),
+            }
+            for fo in file_objects
+        ]
+        session.execute(insert(FileObjectEntry).values(rows).on_conflict_do_nothing())
 
     def add_analysis(self, uid: str, plugin: str, analysis_dict: dict):
         try:
@@ -84,6 +160,33 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
             logging.error(f'Bad value in analysis result of {plugin} on {uid}: {str(error)}\n{analysis_dict}')
             raise
 
+    def add_analyses(self, analyses: list[tuple[str, str, dict]]):
+        '''
+        Store multiple analysis results at once. All results are inserted or updated (if the analysis already exists)
+        with a single upsert (``INSERT ... ON CONFLICT DO UPDATE``). If the upsert fails (e.g. because a file object is
+        missing or an analysis result can't be stored), the results are stored one by one, so that only the erroneous
+        results are lost (the errors are logged).
+
+        :param analyses: A list of tuples of UID, plugin name and analysis result.
+        '''
+        # the same analysis may occur multiple times (e.g. if it was rescheduled) but may only be upserted once
+        analyses_by_key = {(uid, plugin): analysis_dict for uid, plugin, analysis_dict in analyses}
+        if not analyses_by_key:
+            return
+        try:
+            self._upsert_analyses(analyses_by_key)
+        except (DbInterfaceError, ValueError):
+            for (uid, plugin), analysis_dict in analyses_by_key.items():
+                with suppress(ValueError):  # the error is logged by `add_analysis` -> store the other results
+                    self.add_analysis(uid, plugin, analysis_dict)
+
+    def _upsert_analyses(self, analyses_by_key: dict[tuple[str, str], dict]):
+        with self.get_read_write_session() as session:
+            session.execute(_get_analysis_upsert(analyses_by_key))
+            update_firmware_aggregates(
+                session, {uid for uid, _ in analyses_by_key}, {plugin for _, plugin in analyses_by_key}
+            )
+
     def analysis_exists(self, uid: str, plugin: str) -> bool:
         with self.get_read_only_session() as session:
             query = select(AnalysisEntry.uid).filter_by(uid=uid, plugin=plugin)
@@ -108,6 +211,7 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
                 file_object=fo_backref,
             )
             session.add(analysis)
+            update_firmware_aggregates(session, [uid], [plugin])
 
     # ===== Update / UPDATE =====
 
@@ -134,9 +238,10 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
             entry.depth = file_object.depth
             entry.size = file_object.size
             entry.comments = file_object.comments
-            entry.virtual_file_paths = update_virtual_file_path(file_object.virtual_file_path, entry.virtual_file_paths)
             entry.is_firmware = isinstance(file_object, Firmware)
             self._update_parents(file_object.parent_firmware_uids, file_object.parents, entry, session)
+            _insert_virtual_file_paths(session, [file_object])
+            update_firmware_aggregates(session, [file_object.uid])
 
     def update_analysis(self, uid: str, plugin: str, analysis_data: dict):
         with self.get_read_write_session() as session:
@@ -146,8 +251,133 @@ class BackendDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
             entry.summary = analysis_data.get('summary')
             entry.tags = analysis_data.get('tags')
             entry.result = get_analysis_without_meta(analysis_data)
+            update_firmware_aggregates(session, [uid], [plugin])
 
     def update_file_object_parents(self, file_uid: str, root_uid: str, parent_uid):
         with self.get_read_write_session() as session:
             fo_entry = session.get(FileObjectEntry, file_uid)
             self._update_parents([root_uid], [parent_uid], fo_entry, session)
+            update_firmware_aggregates(session, [file_uid])
+
+
+def update_firmware_aggregates(session: Session, uid_list: Iterable[str], plugins: Iterable[str] | None = None):
+    '''
+    Update the copies of the analysis summaries and tags of the files ``uid_list`` in all firmware that include them
+    (table ``firmware_aggregate``) with a single upsert. This must be called in the same transaction whenever analyses
+    are stored or files are added to a firmware. The summary item counters of the statistics (table
+    ``summary_counter``) are updated with the difference between the old and the new summaries. The rows of deleted
+    files and firmware are deleted by the DB (``ON DELETE CASCADE``).
+
+    :param session: The session of the transaction that changed the files (it is flushed).
+    :param uid_list: The UIDs of the changed files.
+    :param plugins: Only update the analyses of these plugins (optional).
+    '''
+    session.flush()
+    uid_list = list(uid_list)
+    # the summary of a firmware also contains the summary of the firmware itself
+    roots = union(
+        select(fw_files_table.c.root_uid, fw_files_table.c.file_uid.label('uid')).where(
+            fw_files_table.c.file_uid.in_(uid_list)
+        ),
+        select(FileObjectEntry.uid, FileObjectEntry.uid).where(
+            FileObjectEntry.uid.in_(uid_list), FileObjectEntry.is_firmware
+        ),
+    ).subquery()
+    query = (
+        select(
+            roots.c.root_uid,
+            AnalysisEntry.plugin,
+            AnalysisEntry.uid,
+            AnalysisEntry.summary,
+            # only the tags of the included files of some plugins are propagated to the firmware
+            case(
+                (
+                    and_(AnalysisEntry.plugin.in_(PLUGINS_WITH_TAG_PROPAGATION), roots.c.root_uid != AnalysisEntry.uid),
+                    AnalysisEntry.tags,
+                )
+            ).label('tags'),
+        )
+        .join(roots, roots.c.uid == AnalysisEntry.uid)
+        .where(AnalysisEntry.uid.in_(uid_list))
+    )
+    if plugins is not None:
+        query = query.where(AnalysisEntry.plugin.in_(list(plugins)))
+    _update_summary_counters(session, uid_list, plugins, query.subquery())
+    statement = insert(firmware_aggregate_table).from_select(['root_uid', 'plugin', 'uid', 'summary', 'tags'], query)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['root_uid', 'plugin', 'uid'],
+            set_={'summary': statement.excluded.summary, 'tags': statement.excluded.tags},
+        )
+    )
+
+
+def _update_summary_counters(
+    session: Session, uid_list: list[str], plugins: Iterable[str] | None, new_aggregates: Subquery
+):
+    # the stored aggregates are about to be replaced by the new ones: their items are subtracted and the new items added
+    counted_plugins = [p for p in PLUGINS_WITH_SUMMARY_STATS if plugins is None or p in set(plugins)]
+    if not counted_plugins:
+        return
+    old_aggregates = firmware_aggregate_table.alias('old_aggregate')
+    items = union_all(
+        *(
+            select(
+                aggregates.c.root_uid,
+                aggregates.c.plugin,
+                func.unnest(aggregates.c.summary).label('item'),
+                (aggregates.c.root_uid == aggregates.c.uid).label('firmware'),
+                literal(difference).label('difference'),
+            ).where(aggregates.c.uid.in_(uid_list), aggregates.c.plugin.in_(counted_plugins))
+            for aggregates, difference in [(old_aggregates, -1), (new_aggregates, 1)]
+        )
+    ).subquery()
+    key = [items.c.root_uid, items.c.plugin, items.c.item, items.c.firmware]
+    difference = func.sum(items.c.difference)
+    query = select(*key, get_sha256_hex(items.c.item), difference).group_by(*key).having(difference != 0)
+    statement = insert(summary_counter_table).from_select(
+        ['root_uid', 'plugin', 'item', 'firmware', 'item_hash', 'count'], query
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=['root_uid', 'plugin', 'item_hash', 'firmware'],
+            set_={'count': summary_counter_table.c.count + statement.excluded.count},
+        )
+    )
+
+
+def _insert_virtual_file_paths(session: Session, file_objects: list[FileObject]):
+    '''
+    Virtual file paths are only ever appended: paths that are already in the DB are skipped and the paths of a file in
+    other firmware are not touched (they are deleted together with the firmware, see ``AdminDbInterface``).
+    '''
+    rows = [row for fo in file_objects for row in get_virtual_file_path_rows(fo)]
+    if rows:
+        session.execute(insert(VirtualFilePathEntry).values(rows).on_conflict_do_nothing())
+
+
+def _get_analysis_upsert(analyses_by_key: dict[tuple[str, str], dict]) -> Insert:
+    rows = []
+    for (uid, plugin), analysis_dict in analyses_by_key.items():
+        if any(item not in analysis_dict for item in ['plugin_version', 'analysis_date']):
+            raise DbInterfaceError(f'Analysis data of {plugin} is incomplete: {analysis_dict}')
+        rows.append(
+            {
+                'uid': uid,
+                'plugin': plugin,
+                'plugin_version': analysis_dict['plugin_version'],
+                'system_version': analysis_dict.get('system_version'),
+                'analysis_date': analysis_dict['analysis_date'],
+                'summary': analysis_dict.get('summary'),
+                'tags': analysis_dict.get('tags'),
+                'result': get_analysis_without_meta(analysis_dict),
+            }
+        )
+    statement = insert(AnalysisEntry).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[AnalysisEntry.uid, AnalysisEntry.plugin],
+        set_={
+            column: statement.excluded[column]
+            for column in ['plugin_version', 'system_version', 'analysis_date', 'summary', 'tags', 'result']
+        },
+    )
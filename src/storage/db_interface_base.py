@@ -22,6 +22,11 @@ class ReadOnlyDbInterface:
         self.connection = connection or ReadOnlyConnection()
         self.ro_session = None
 
+    @property
+    def round_trips(self) -> int:
+        '''The number of DB round trips of this interface's connection in the current process.'''
+        return self.connection.round_trips
+
     @contextmanager
     def get_read_only_session(self) -> Session:
         if self.ro_session is not None:
@@ -35,7 +40,7 @@ class ReadOnlyDbInterface:
             logging.exception(f'{message}: {err}')
             raise DbInterfaceError(message) from err
         finally:
-            self.ro_session.invalidate()
+            self.ro_session.close()  # returns the connection to the pool
             self.ro_session = None
 
 
@@ -57,4 +62,4 @@ class ReadWriteDbInterface(ReadOnlyDbInterface):
             logging.exception(f'{message}: {err}')
             raise DbInterfaceError(message) from err
         finally:
-            session.invalidate()
+            session.close()
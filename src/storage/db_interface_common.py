@@ -1,20 +1,29 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
-from sqlalchemy import distinct, func, select
+from sqlalchemy import and_, distinct, exists, func, literal, select
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.sql import Select
+from sqlalchemy.sql.selectable import CTE
 
 from objects.file import FileObject
 from objects.firmware import Firmware
 from storage.db_interface_base import ReadOnlyDbInterface
 from storage.entry_conversion import analysis_entry_to_dict, file_object_from_entry, firmware_from_entry
 from storage.query_conversion import build_query_from_dict
-from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry, fw_files_table, included_files_table
+from storage.schema import (
+    AnalysisEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    VirtualFilePathEntry,
+    firmware_aggregate_table,
+    fw_files_table,
+    included_files_table,
+)
 
 PLUGINS_WITH_TAG_PROPAGATION = [  # FIXME This should be inferred in a sensible way. This is not possible yet.
     'crypto_material',
@@ -24,7 +33,47 @@ PLUGINS_WITH_TAG_PROPAGATION = [  # FIXME This should be inferred in a sensible
     'software_components',
     'users_and_passwords',
 ]
+# the items of the summaries of these plugins are counted when analyses are stored (see `summary_counter` table)
+PLUGINS_WITH_SUMMARY_STATS = ['crypto_material', 'exploit_mitigations', 'known_vulnerabilities', 'unpacker']
 Summary = Dict[str, List[str]]
+# files can (indirectly) include themselves, so the recursion of queries that count the depth needs a limit
+MAX_INCLUSION_DEPTH = 100
+
+
+def get_firmware_without_aggregates_query() -> Select:
+    '''
+    Get a query for the UIDs of analyzed firmware without aggregates of the firmware object itself (e.g. firmware that
+    were analyzed before the aggregates were introduced, see ``update_firmware_aggregates``).
+    '''
+    firmware_aggregate = firmware_aggregate_table.c
+    return select(FirmwareEntry.uid).where(
+        exists().where(AnalysisEntry.uid == FirmwareEntry.uid),
+        ~exists().where(
+            and_(firmware_aggregate.root_uid == FirmwareEntry.uid, firmware_aggregate.uid == FirmwareEntry.uid)
+        ),
+    )
+
+
+def get_included_files_cte(uid_list: Iterable[str], with_depth: bool = False) -> CTE:
+    '''
+    Get a recursive common table expression (``WITH RECURSIVE``) with the UIDs (column ``uid``) of all files that are
+    (recursively) included in one of the files of ``uid_list``. If ``with_depth`` is set, the CTE has an additional
+    column ``depth`` with the depth of the file relative to the files of ``uid_list`` (a file that is included multiple
+    times appears once for each depth).
+    '''
+    if not with_depth:
+        included = select(included_files_table.c.child_uid.label('uid'))
+        included = included.where(included_files_table.c.parent_uid.in_(list(uid_list))).cte(recursive=True)
+        return included.union(  # UNION (instead of UNION ALL) removes duplicates and therefore ends cycles
+            select(included_files_table.c.child_uid).join(included, included_files_table.c.parent_uid == included.c.uid)
+        )
+    included = select(included_files_table.c.child_uid.label('uid'), literal(1).label('depth'))
+    included = included.where(included_files_table.c.parent_uid.in_(list(uid_list))).cte(recursive=True)
+    return included.union(
+        select(included_files_table.c.child_uid, included.c.depth + 1)
+        .join(included, included_files_table.c.parent_uid == included.c.uid)
+        .where(included.c.depth < MAX_INCLUSION_DEPTH)
+    )
 
 
 class DbInterfaceCommon(ReadOnlyDbInterface):
@@ -47,10 +96,16 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
 
     # ===== Read / SELECT =====
 
-    def get_object(self, uid: str, analysis_filter: list[str] | None = None) -> FileObject | Firmware | None:
+    def get_object(
+        self, uid: str, analysis_filter: list[str] | None = None, root_uid: str | None = None
+    ) -> FileObject | Firmware | None:
+        '''
+        Get a file object or firmware from the DB. If ``root_uid`` is set, only the virtual file paths of a file in
+        this firmware are loaded (common files can have thousands of paths).
+        '''
         if self.is_firmware(uid):
             return self.get_firmware(uid, analysis_filter=analysis_filter)
-        return self.get_file_object(uid, analysis_filter=analysis_filter)
+        return self.get_file_object(uid, analysis_filter=analysis_filter, root_uid=root_uid)
 
     def get_firmware(self, uid: str, analysis_filter: list[str] | None = None) -> Firmware | None:
         with self.get_read_only_session() as session:
@@ -64,12 +119,20 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
         firmware.analysis_tags = self._collect_analysis_tags_from_children(firmware.uid)
         return firmware
 
-    def get_file_object(self, uid: str, analysis_filter: list[str] | None = None) -> FileObject | None:
+    def get_file_object(
+        self, uid: str, analysis_filter: list[str] | None = None, root_uid: str | None = None
+    ) -> FileObject | None:
         with self.get_read_only_session() as session:
             fo_entry = session.get(FileObjectEntry, uid)
             if fo_entry is None:
                 return None
-            return file_object_from_entry(fo_entry, analysis_filter=analysis_filter)
+            if root_uid is None:
+                return file_object_from_entry(fo_entry, analysis_filter=analysis_filter)
+            file_object = file_object_from_entry(
+                fo_entry, analysis_filter=analysis_filter, virtual_file_paths=fo_entry.get_virtual_file_paths(root_uid)
+            )
+            file_object.parent_firmware_uids = fo_entry.get_root_uids()  # not only the root of the loaded paths
+            return file_object
 
     def get_objects_by_uid_list(
         self, uid_list: list[str], analysis_filter: list[str] | None = None
@@ -89,8 +152,15 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
                 .join(children_table, children_table.c.child_uid == FileObjectEntry.uid)
                 .group_by(FileObjectEntry)
             )
+            vfp_dict = self.get_vfps_for_uid_list(uid_list)
             file_objects = [
-                file_object_from_entry(fo_entry, analysis_filter, {f for f in included_files if f}, set(parents))
+                file_object_from_entry(
+                    fo_entry,
+                    analysis_filter,
+                    {f for f in included_files if f},
+                    set(parents),
+                    vfp_dict.get(fo_entry.uid, {}),
+                )
                 for fo_entry, included_files, parents in session.execute(query)
             ]
             fw_query = select(FirmwareEntry).filter(FirmwareEntry.uid.in_(uid_list))
@@ -111,6 +181,48 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
             return None
         return analysis_entry_to_dict(entry)
 
+    def get_analyses(self, uid: str, plugin_list: list[str] | set[str]) -> dict[str, dict]:
+        '''
+        Get the analysis results of multiple plugins for one file with a single query.
+
+        :param uid: The UID of the file.
+        :param plugin_list: The names of the analysis plugins.
+        :return: A dict with plugin names as keys and analysis results as values (missing analyses are omitted).
+        '''
+        with self.get_read_only_session() as session:
+            query = select(AnalysisEntry).filter(AnalysisEntry.uid == uid, AnalysisEntry.plugin.in_(plugin_list))
+            return {entry.plugin: analysis_entry_to_dict(entry) for entry in session.execute(query).scalars()}
+
+    def get_analysis_metadata(self, uid_list: list[str] | set[str]) -> dict[str, dict[str, dict]]:
+        '''
+        Get the metadata of all analyses of multiple files with a single query (without the analysis results). Used by
+        the analysis scheduler to decide which analyses are already up to date.
+
+        :param uid_list: The UIDs of the files.
+        :return: A dict ``{uid: {plugin: {'plugin_version': ..., 'system_version': ..., 'analysis_date': ...}}}``.
+                 The analysis metadata also contains the key ``failed`` if the analysis failed.
+        '''
+        result = {}
+        with self.get_read_only_session() as session:
+            query = select(
+                AnalysisEntry.uid,
+                AnalysisEntry.plugin,
+                AnalysisEntry.plugin_version,
+                AnalysisEntry.system_version,
+                AnalysisEntry.analysis_date,
+                AnalysisEntry.result.has_key('failed'),
+            ).filter(AnalysisEntry.uid.in_(uid_list))
+            for uid, plugin, plugin_version, system_version, analysis_date, failed in session.execute(query):
+                metadata = {
+                    'plugin_version': plugin_version,
+                    'system_version': system_version,
+                    'analysis_date': analysis_date,
+                }
+                if failed:
+                    metadata['failed'] = True
+                result.setdefault(uid, {})[plugin] = metadata
+        return result
+
     # ===== included files. =====
 
     def get_list_of_all_included_files(self, fo: FileObject) -> set[str]:
@@ -125,18 +237,20 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
             return set(session.execute(query).scalars())
 
     def get_all_files_in_fo(self, fo: FileObject) -> set[str]:
-        '''Get a set of UIDs of all files (recursively) contained in a file'''
-        with self.get_read_only_session() as session:
-            return self._get_files_in_files(session, fo.files_included).union({fo.uid, *fo.files_included})
+        '''Get a set of UIDs of all files (recursively) contained in a file (including the file itself)'''
+        return self.get_included_files_recursively([fo.uid]).union({fo.uid})
+
+    def get_included_files_recursively(self, uid_list: Iterable[str]) -> set[str]:
+        '''
+        Get the UIDs of all files that are (recursively) included in one of the files with a single recursive query.
 
-    def _get_files_in_files(self, session, uid_set: set[str], recursive: bool = True) -> set[str]:
-        if not uid_set:
-            return set()
-        query = select(FileObjectEntry).filter(FileObjectEntry.uid.in_(uid_set))
-        included_files = {child.uid for fo in session.execute(query).scalars() for child in fo.included_files}
-        if recursive and included_files:
-            included_files.update(self._get_files_in_files(session, included_files))
-        return included_files
+        :param uid_list: The UIDs of the files whose subtrees are traversed.
+        :return: The UIDs of the included files (the files of ``uid_list`` are only part of the result if they are
+            included in one of the other files).
+        '''
+        included = get_included_files_cte(uid_list)
+        with self.get_read_only_session() as session:
+            return set(session.execute(select(included.c.uid)).scalars())
 
     # ===== summary =====
 
@@ -160,12 +274,26 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
             return None
         if 'summary' not in fo.processed_analysis[selected_analysis]:
             return None
-        if not isinstance(fo, Firmware):
-            included_files = fo.list_of_all_included_files or self.get_list_of_all_included_files(fo)
-        else:
-            included_files = self.get_all_files_in_fw(fo.uid).union({fo.uid})
+        if isinstance(fo, Firmware):
+            return self._get_firmware_summary(fo.uid, selected_analysis)
+        included_files = fo.list_of_all_included_files or self.get_list_of_all_included_files(fo)
         return self._collect_summary_for_uid_list(included_files, selected_analysis)
 
+    def _get_firmware_summary(self, fw_uid: str, plugin: str) -> Summary:
+        '''
+        The summaries of all files in a firmware are copied when the analyses are stored (see
+        ``update_firmware_aggregates``), so they can be fetched with a single index lookup.
+        '''
+        with self.get_read_only_session() as session:
+            query = select(firmware_aggregate_table.c.uid, firmware_aggregate_table.c.summary).filter(
+                firmware_aggregate_table.c.root_uid == fw_uid, firmware_aggregate_table.c.plugin == plugin
+            )
+            summary = {}
+            for uid, summary_list in session.execute(query):  # type: str, list[str]
+                for item in set(summary_list or []):
+                    summary.setdefault(item, []).append(uid)
+        return summary
+
     def _collect_summary_for_uid_list(self, uid_list: set[str] | list[str], plugin: str) -> Summary:
         with self.get_read_only_session() as session:
             query = select(AnalysisEntry.uid, AnalysisEntry.summary).filter(
@@ -182,13 +310,11 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
     def _collect_analysis_tags_from_children(self, uid: str) -> dict:
         unique_tags = {}
         with self.get_read_only_session() as session:
-            query = (
-                select(FileObjectEntry.uid, AnalysisEntry.plugin, AnalysisEntry.tags)
-                .filter(FileObjectEntry.root_firmware.any(uid=uid))
-                .join(AnalysisEntry, FileObjectEntry.uid == AnalysisEntry.uid)
-                .filter(AnalysisEntry.tags != JSONB.NULL, AnalysisEntry.plugin.in_(PLUGINS_WITH_TAG_PROPAGATION))
+            # the tags of the included files are aggregated when the analyses are stored
+            query = select(firmware_aggregate_table.c.plugin, firmware_aggregate_table.c.tags).filter(
+                firmware_aggregate_table.c.root_uid == uid, firmware_aggregate_table.c.tags != JSONB.NULL
             )
-            for _, plugin_name, tags in session.execute(query):
+            for plugin_name, tags in session.execute(query):
                 for tag_type, tag in tags.items():
                     if tag_type == 'root_uid' or not tag['propagate']:
                         continue
@@ -200,6 +326,48 @@ class DbInterfaceCommon(ReadOnlyDbInterface):
                     unique_tags[plugin_name][key] = tag
         return unique_tags
 
+    # ===== virtual file paths =====
+
+    def get_vfps_for_uid_list(
+        self, uid_list: Iterable[str], root_uid: str | None = None, parent_uid: str | None = None
+    ) -> dict[str, dict[str, list[str]]]:
+        '''
+        Get the virtual file paths of multiple files with one query. If ``root_uid`` or ``parent_uid`` is set, only the
+        paths in this firmware or with this parent are fetched.
+
+        :param uid_list: The UIDs of the files.
+        :param root_uid: The UID of a firmware (optional).
+        :param parent_uid: The UID of a parent file (optional).
+        :return: dictionary with uid -> virtual file path dictionary (root uid -> list of paths) for each file
+        '''
+        with self.get_read_only_session() as session:
+            query = (
+                select(VirtualFilePathEntry.file_uid, VirtualFilePathEntry.root_uid, VirtualFilePathEntry.virtual_path)
+                .filter(VirtualFilePathEntry.file_uid.in_(list(uid_list)))
+                .order_by(VirtualFilePathEntry.virtual_path)
+            )
+            if root_uid is not None:
+                query = query.filter(VirtualFilePathEntry.root_uid == root_uid)
+            if parent_uid is not None:
+                query = query.filter(VirtualFilePathEntry.parent_uid == parent_uid)
+            result = {}
+            for uid, root, virtual_path in session.execute(query):
+                result.setdefault(uid, {}).setdefault(root, []).append(virtual_path)
+            return result
+
+    def get_vfps_in_firmware(self, uid_list: Iterable[str], root_uid: str | None) -> dict[str, dict[str, list[str]]]:
+        '''
+        Get the virtual file paths of multiple files in firmware ``root_uid``. Files that are not included in this
+        firmware (e.g. if ``root_uid`` is the UID of a file object) and all files if ``root_uid`` is not set get all
+        their virtual file paths as fallback.
+        '''
+        uid_list = list(uid_list)
+        result = self.get_vfps_for_uid_list(uid_list, root_uid=root_uid) if root_uid else {}
+        missing_uids = [uid for uid in uid_list if uid not in result]
+        if missing_uids:
+            result.update(self.get_vfps_for_uid_list(missing_uids))
+        return result
+
     # ===== misc. =====
 
     def get_firmware_number(self, query: dict | None = None) -> int:
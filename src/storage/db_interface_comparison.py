@@ -14,7 +14,7 @@ from helperFunctions.data_conversion import (
 from helperFunctions.virtual_file_path import get_top_of_virtual_path
 from storage.db_interface_base import ReadWriteDbInterface
 from storage.db_interface_common import DbInterfaceCommon
-from storage.schema import AnalysisEntry, ComparisonEntry, FileObjectEntry, fw_files_table
+from storage.schema import AnalysisEntry, ComparisonEntry, FileObjectEntry, VirtualFilePathEntry
 
 
 class FactComparisonException(Exception):
@@ -125,24 +125,17 @@ class ComparisonDbInterface(DbInterfaceCommon, ReadWriteDbInterface):
 
     def get_vfp_of_included_text_files(self, root_uid: str, blacklist: set[str]) -> dict[str, set[str]]:
         with self.get_read_only_session() as session:
+            # only the paths in this firmware are fetched (and not the paths in all other firmware)
             query = (
-                select(FileObjectEntry.virtual_file_paths, FileObjectEntry.uid)
-                .join(fw_files_table, FileObjectEntry.uid == fw_files_table.c.file_uid)
-                .filter(fw_files_table.c.root_uid == root_uid)
-                .filter(FileObjectEntry.uid.not_in(blacklist))
-                .join(AnalysisEntry, AnalysisEntry.uid == FileObjectEntry.uid)
+                select(VirtualFilePathEntry.virtual_path, VirtualFilePathEntry.file_uid)
+                .filter(VirtualFilePathEntry.root_uid == root_uid)
+                .filter(VirtualFilePathEntry.file_uid.not_in(blacklist))
+                .join(AnalysisEntry, AnalysisEntry.uid == VirtualFilePathEntry.file_uid)
                 .filter(AnalysisEntry.plugin == 'file_type')
                 .filter(AnalysisEntry.result['mime'] == type_coerce('text/plain', JSONB))
             )
-            return self._transpose_vfp_dict(
-                {uid: vfp_dict[root_uid] for vfp_dict, uid in session.execute(query) if root_uid in vfp_dict}
-            )
-
-    @staticmethod
-    def _transpose_vfp_dict(list_dict: dict[str, list[str]]) -> dict[str, set[str]]:
-        """transposes results from {uid: [vfps]} to {vfp: {uid}}"""
-        transposed = {}
-        for uid, path_list in list_dict.items():
-            for vfp in path_list:
+            # results are transposed from (vfp, uid) rows to {vfp: {uid}}
+            transposed = {}
+            for vfp, uid in session.execute(query):
                 transposed.setdefault(get_top_of_virtual_path(vfp), set()).add(uid)
-        return transposed
+            return transposed
@@ -1,18 +1,39 @@
 from __future__ import annotations
 
+import json
+import logging
 import re
+from copy import deepcopy
 from typing import Any, NamedTuple
 
 from sqlalchemy import Column, func, select
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import Select
 
+from config import cfg
 from helperFunctions.data_conversion import get_value_of_first_key
 from helperFunctions.tag import TagColor
 from helperFunctions.virtual_file_path import get_top_of_virtual_path, get_uids_from_virtual_path
 from objects.firmware import Firmware
 from storage.db_interface_common import DbInterfaceCommon
-from storage.query_conversion import build_generic_search_query, build_query_from_dict, query_parent_firmware
-from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry, SearchCacheEntry, included_files_table
+from storage.query_conversion import (
+    FILE_OBJECT_SORT_KEY,
+    FIRMWARE_SORT_KEY,
+    Explain,
+    apply_cursor,
+    build_generic_search_query,
+    build_query_from_dict,
+    get_cursor,
+    query_parent_firmware,
+)
+from storage.schema import (
+    AnalysisEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    SearchCacheEntry,
+    VirtualFilePathEntry,
+    included_files_table,
+)
 from web_interface.components.dependency_graph import DepGraphData
 from web_interface.file_tree.file_tree import FileTreeData, VirtualPathFileTree
 from web_interface.file_tree.file_tree_node import FileTreeNode
@@ -51,35 +72,53 @@ class FrontEndDbInterface(DbInterfaceCommon):
                 return ''
             if fo_entry.is_firmware:
                 return self._get_hid_firmware(fo_entry.firmware)
-            return self._get_hid_fo(fo_entry, root_uid)
+        return self._get_hid_fo(uid, root_uid)
 
     @staticmethod
     def _get_hid_firmware(firmware: FirmwareEntry) -> str:
         part = '' if firmware.device_part in ['', None] else f' {firmware.device_part}'
         return f'{firmware.vendor} {firmware.device_name} -{part} {firmware.version} ({firmware.device_class})'
 
-    @staticmethod
-    def _get_hid_fo(fo_entry: FileObjectEntry, root_uid: str | None = None) -> str:
-        vfp_list = fo_entry.virtual_file_paths.get(root_uid) or get_value_of_first_key(fo_entry.virtual_file_paths)
-        return get_top_of_virtual_path(vfp_list[0])
+    def _get_hid_fo(self, uid: str, root_uid: str | None = None) -> str:
+        return self._get_hid_dict_fo([uid], root_uid).get(uid, '')
+
+    def _get_hid_dict_fo(self, uid_list: list[str], root_uid: str | None = None) -> dict[str, str]:
+        '''
+        The hid of a file object is the file name of its first virtual file path (preferably in firmware ``root_uid``).
+        Only this path is fetched for each file (instead of all paths of all firmware the file is included in).
+        '''
+        with self.get_read_only_session() as session:
+            query = (
+                select(VirtualFilePathEntry.file_uid, VirtualFilePathEntry.virtual_path)
+                .filter(VirtualFilePathEntry.file_uid.in_(uid_list))
+                .distinct(VirtualFilePathEntry.file_uid)
+                .order_by(
+                    VirtualFilePathEntry.file_uid,
+                    (VirtualFilePathEntry.root_uid == root_uid).desc(),
+                    VirtualFilePathEntry.root_uid,
+                    VirtualFilePathEntry.virtual_path,
+                )
+            )
+            return {uid: get_top_of_virtual_path(virtual_path) for uid, virtual_path in session.execute(query)}
 
     # --- "nice list" ---
 
     def get_data_for_nice_list(self, uid_list: list[str], root_uid: str | None) -> list[dict]:
         with self.get_read_only_session() as session:
             mime_dict = self._get_mime_types_for_uid_list(session, uid_list)
-            query = select(
-                FileObjectEntry.uid, FileObjectEntry.size, FileObjectEntry.file_name, FileObjectEntry.virtual_file_paths
-            ).filter(FileObjectEntry.uid.in_(uid_list))
+            vfps = self.get_vfps_in_firmware(uid_list, root_uid)
+            query = select(FileObjectEntry.uid, FileObjectEntry.size, FileObjectEntry.file_name).filter(
+                FileObjectEntry.uid.in_(uid_list)
+            )
             nice_list_data = [
                 {
                     'uid': uid,
                     'size': size,
                     'file_name': file_name,
                     'mime-type': mime_dict.get(uid, 'file-type-plugin/not-run-yet'),
-                    'current_virtual_path': self._get_current_vfp(virtual_file_path, root_uid),
+                    'current_virtual_path': self._get_current_vfp(vfps.get(uid, {}), root_uid),
                 }
-                for uid, size, file_name, virtual_file_path in session.execute(query)
+                for uid, size, file_name in session.execute(query)
             ]
             self._replace_uids_in_nice_list(nice_list_data, root_uid)
             return nice_list_data
@@ -97,22 +136,14 @@ class FrontEndDbInterface(DbInterfaceCommon):
 
     def _get_hid_dict(self, uid_set: set[str], root_uid: str) -> dict[str, str]:
         with self.get_read_only_session() as session:
-            query = (
-                select(FileObjectEntry, FirmwareEntry)
-                .outerjoin(FirmwareEntry, FirmwareEntry.uid == FileObjectEntry.uid)
-                .filter(FileObjectEntry.uid.in_(uid_set))
-            )
-            result = {}
-            for fo_entry, fw_entry in session.execute(query):
-                if fw_entry is None:  # FO
-                    result[fo_entry.uid] = self._get_hid_fo(fo_entry, root_uid)
-                else:  # FW
-                    result[fo_entry.uid] = self._get_hid_firmware(fw_entry)
+            query = select(FirmwareEntry).filter(FirmwareEntry.uid.in_(uid_set))
+            result = {fw_entry.uid: self._get_hid_firmware(fw_entry) for fw_entry in session.execute(query).scalars()}
+        result.update(self._get_hid_dict_fo([uid for uid in uid_set if uid not in result], root_uid))
         return result
 
     @staticmethod
     def _get_current_vfp(vfp: dict[str, list[str]], root_uid: str) -> list[str]:
-        return vfp[root_uid] if root_uid in vfp else get_value_of_first_key(vfp)
+        return vfp[root_uid] if root_uid in vfp else get_value_of_first_key(vfp) or []
 
     def get_file_name(self, uid: str) -> str:
         with self.get_read_only_session() as session:
@@ -180,7 +211,7 @@ class FrontEndDbInterface(DbInterfaceCommon):
         as_meta: bool = False,
     ):
         with self.get_read_only_session() as session:
-            query = build_generic_search_query(search_dict, only_fo_parent_firmware, inverted)
+            query = self._build_search_query(search_dict, only_fo_parent_firmware, inverted)
             query = self._apply_offset_and_limit(query, skip, limit)
             results = session.execute(query).scalars()
 
@@ -188,6 +219,43 @@ class FrontEndDbInterface(DbInterfaceCommon):
                 return [self._get_meta_for_entry(element) for element in results]
             return [element.uid for element in results]
 
+    def generic_search_page(
+        self,
+        search_dict: dict,
+        limit: int,
+        cursor: str | None = None,
+        skip: int = 0,
+        only_fo_parent_firmware: bool = False,
+        inverted: bool = False,
+        as_meta: bool = False,
+    ) -> tuple[list, str | None]:
+        '''
+        Like ``generic_search`` but with keyset pagination (see ``storage.query_conversion.apply_cursor``): Pages after
+        the first one should be fetched using the cursor of the previous page instead of an offset.
+
+        :return: The results of the page and the cursor of the next page (``None`` if this is the last page).
+        '''
+        with self.get_read_only_session() as session:
+            query = self._build_search_query(search_dict, only_fo_parent_firmware, inverted)
+            sort_key = (
+                FIRMWARE_SORT_KEY if query.column_descriptions[0]['entity'] is FirmwareEntry else FILE_OBJECT_SORT_KEY
+            )
+            query = self._apply_offset_and_limit(apply_cursor(query, sort_key, cursor, limit), skip, None)
+            entries = list(session.execute(query).scalars())
+
+            next_cursor = None
+            if limit and len(entries) == limit:
+                next_cursor = get_cursor([getattr(entries[-1], column.key) for column in sort_key])
+            if as_meta:
+                return [self._get_meta_for_entry(element) for element in entries], next_cursor
+            return [element.uid for element in entries], next_cursor
+
+    @staticmethod
+    def _build_search_query(search_dict: dict, only_fo_parent_firmware: bool, inverted: bool) -> Select:
+        # the logged queries can be replayed by `advise_db_indexes.py` to find missing indexes
+        logging.debug(f'Search query: {json.dumps(search_dict)}')
+        return build_generic_search_query(search_dict, only_fo_parent_firmware, inverted)
+
     def _get_meta_for_entry(self, entry: FirmwareEntry | FileObjectEntry) -> MetaEntry:
         if isinstance(entry, FirmwareEntry):
             return self._get_meta_for_fw(entry)
@@ -198,7 +266,7 @@ class FrontEndDbInterface(DbInterfaceCommon):
     def _get_meta_for_fo(self, entry: FileObjectEntry) -> MetaEntry:
         root_hid = self._get_fo_root_hid(entry)
         tags = {self._get_unpacker_name(entry): TagColor.LIGHT_BLUE}
-        return MetaEntry(entry.uid, f'{root_hid}{self._get_hid_fo(entry)}', tags, 0)
+        return MetaEntry(entry.uid, f'{root_hid}{self._get_hid_fo(entry.uid)}', tags, 0)
 
     @staticmethod
     def _get_fo_root_hid(entry: FileObjectEntry) -> str:
@@ -234,6 +302,12 @@ class FrontEndDbInterface(DbInterfaceCommon):
         if search_dict == {}:  # if the query is empty: show only firmware on browse DB page
             return self.get_firmware_number()
 
+        threshold = cfg.database.approximate_count_threshold
+        if threshold:
+            estimate = self.estimate_number_of_matches(search_dict, only_parent_firmwares, inverted)
+            if estimate > threshold:  # counting all matches exactly would take too long
+                return estimate
+
         if not only_parent_firmwares:
             return self.get_file_object_number(search_dict)
 
@@ -241,12 +315,22 @@ class FrontEndDbInterface(DbInterfaceCommon):
             query = query_parent_firmware(search_dict, inverted=inverted, count=True)
             return session.execute(query).scalar()
 
+    def estimate_number_of_matches(self, search_dict: dict, only_parent_firmwares: bool, inverted: bool) -> int:
+        '''
+        Get the number of matches of a search query as estimated by the query planner (without executing the query).
+        The estimate is only as good as the table statistics of the DB (see ``ANALYZE``).
+        '''
+        query = build_generic_search_query(deepcopy(search_dict), only_parent_firmwares, inverted)
+        with self.get_read_only_session() as session:
+            plan = session.execute(Explain(query)).scalar()
+        return int(plan[0]['Plan']['Plan Rows'])
+
     # --- file tree
 
     def generate_file_tree_nodes_for_uid_list(
         self, uid_list: list[str], root_uid: str, parent_uid: str | None, whitelist: list[str] | None = None
     ):
-        file_tree_data = self.get_file_tree_data(uid_list)
+        file_tree_data = self.get_file_tree_data(uid_list, root_uid)
         for entry in file_tree_data:
             yield from self.generate_file_tree_level(entry.uid, root_uid, parent_uid, whitelist, entry)
 
@@ -259,27 +343,28 @@ class FrontEndDbInterface(DbInterfaceCommon):
         data: FileTreeData | None = None,
     ):
         if data is None:
-            data = self.get_file_tree_data([uid])[0]
+            data = self.get_file_tree_data([uid], root_uid)[0]
         try:
             yield from VirtualPathFileTree(root_uid, parent_uid, data, whitelist).get_file_tree_nodes()
         except (KeyError, TypeError):  # the file has not been analyzed yet
             yield FileTreeNode(uid, root_uid, not_analyzed=True, name=f'{uid} (not analyzed yet)')
 
-    def get_file_tree_data(self, uid_list: list[str]) -> list[FileTreeData]:
+    def get_file_tree_data(self, uid_list: list[str], root_uid: str | None = None) -> list[FileTreeData]:
         with self.get_read_only_session() as session:
             # get included files in a separate query because it is way faster than FileObjectEntry.get_included_uids()
             included_files = self._get_included_files_for_uid_list(session, uid_list)
             # get analysis data in a separate query because the analysis may be missing (=> no row in joined result)
             type_analyses = self._get_mime_types_for_uid_list(session, uid_list)
-            query = select(
-                FileObjectEntry.uid,
-                FileObjectEntry.file_name,
-                FileObjectEntry.size,
-                FileObjectEntry.virtual_file_paths,
-            ).filter(FileObjectEntry.uid.in_(uid_list))
+            # only get the virtual file paths in the current firmware (a file may be included in thousands of firmware)
+            vfps = self.get_vfps_in_firmware(uid_list, root_uid)
+            query = select(FileObjectEntry.uid, FileObjectEntry.file_name, FileObjectEntry.size).filter(
+                FileObjectEntry.uid.in_(uid_list)
+            )
             return [
-                FileTreeData(uid, file_name, size, vfp, type_analyses.get(uid), included_files.get(uid, set()))
-                for uid, file_name, size, vfp in session.execute(query)
+                FileTreeData(
+                    uid, file_name, size, vfps.get(uid, {}), type_analyses.get(uid), included_files.get(uid, set())
+                )
+                for uid, file_name, size in session.execute(query)
             ]
 
     @staticmethod
@@ -304,24 +389,46 @@ class FrontEndDbInterface(DbInterfaceCommon):
 
     # --- REST ---
 
-    def rest_get_firmware_uids(self, offset: int, limit: int, query: dict = None, recursive=False, inverted=False):
+    def rest_get_firmware_uids(
+        self,
+        offset: int | None,
+        limit: int | None,
+        query: dict = None,
+        recursive=False,
+        inverted=False,
+        cursor: str | None = None,
+    ) -> list[str]:
+        '''
+        Get the UIDs of the firmware matching the query sorted by UID. The cursor of the next page is the UID of the
+        last result (see ``storage.query_conversion.get_cursor``).
+        '''
         if query is None:
             query = {}
         if recursive:
-            return self.generic_search(query, skip=offset, limit=limit, only_fo_parent_firmware=True, inverted=inverted)
-        with self.get_read_only_session() as session:
+            db_query = self._build_search_query(query, True, inverted).with_only_columns(FirmwareEntry.uid)
+        else:
             db_query = build_query_from_dict(query_dict=query, query=select(FirmwareEntry.uid), fw_only=True)
-            db_query = self._apply_offset_and_limit(db_query, offset, limit)
-            db_query = db_query.order_by(FirmwareEntry.uid.asc())
-            return list(session.execute(db_query).scalars())
+        return self._get_uid_page(db_query, FirmwareEntry.uid, offset, limit, cursor)
 
-    def rest_get_file_object_uids(self, offset: int | None, limit: int | None, query=None) -> list[str]:
+    def rest_get_file_object_uids(
+        self, offset: int | None, limit: int | None, query=None, cursor: str | None = None
+    ) -> list[str]:
+        '''
+        Get the UIDs of the file objects matching the query sorted by UID. The cursor of the next page is the UID of the
+        last result (see ``storage.query_conversion.get_cursor``).
+        '''
         if query:
-            return self.generic_search(query, skip=offset, limit=limit)
-        with self.get_read_only_session() as session:
+            db_query = self._build_search_query(query, False, False).with_only_columns(FileObjectEntry.uid)
+        else:
             db_query = select(FileObjectEntry.uid)
-            db_query = self._apply_offset_and_limit(db_query, offset, limit)
-            return list(session.execute(db_query).scalars())
+        return self._get_uid_page(db_query, FileObjectEntry.uid, offset, limit, cursor)
+
+    def _get_uid_page(
+        self, query: Select, uid_column: Column, offset: int | None, limit: int | None, cursor: str | None
+    ) -> list[str]:
+        with self.get_read_only_session() as session:
+            query = self._apply_offset_and_limit(apply_cursor(query, (uid_column,), cursor, limit), offset, None)
+            return list(session.execute(query).scalars())
 
     # --- missing/failed analyses ---
 
@@ -388,11 +495,12 @@ class FrontEndDbInterface(DbInterfaceCommon):
             return []
         with self.get_read_only_session() as session:
             libraries_by_uid = self._get_elf_analysis_libraries(session, fo.files_included)
+            # only the paths of the included files inside this file are needed for the graph
+            vfps = self.get_vfps_for_uid_list(fo.files_included, parent_uid=uid)
             query = (
                 select(
                     FileObjectEntry.uid,
                     FileObjectEntry.file_name,
-                    FileObjectEntry.virtual_file_paths,
                     AnalysisEntry.result['mime'],
                     AnalysisEntry.result['full'],
                 )
@@ -401,8 +509,8 @@ class FrontEndDbInterface(DbInterfaceCommon):
                 .filter(AnalysisEntry.plugin == 'file_type')
             )
             return [
-                DepGraphData(uid, file_name, vfp, mime, full_type, libraries_by_uid.get(uid))
-                for uid, file_name, vfp, mime, full_type in session.execute(query)
+                DepGraphData(uid, file_name, vfps.get(uid, {}), mime, full_type, libraries_by_uid.get(uid))
+                for uid, file_name, mime, full_type in session.execute(query)
             ]
 
     @staticmethod
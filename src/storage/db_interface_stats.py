@@ -4,13 +4,23 @@ import logging
 from collections import Counter
 from typing import Any, Callable, Iterator, List, Tuple
 
-from sqlalchemy import column, func, select
+from sqlalchemy import Float, cast, column, delete, exists, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY, VARCHAR, array, insert
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import InstrumentedAttribute, aliased
-from sqlalchemy.sql import Select
+from sqlalchemy.sql import ColumnElement, Select
 
 from storage.db_interface_base import ReadOnlyDbInterface, ReadWriteDbInterface
-from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry, StatsEntry
+from storage.db_interface_common import PLUGINS_WITH_SUMMARY_STATS, get_firmware_without_aggregates_query
+from storage.schema import (
+    AnalysisEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    StatsEntry,
+    firmware_aggregate_table,
+    get_sha256_hex,
+    summary_counter_table,
+)
 
 Stats = List[Tuple[str, int]]
 RelativeStats = List[Tuple[str, int, float]]  # stats with relative share as third element
@@ -69,6 +79,32 @@ class StatsUpdateDbInterface(ReadWriteDbInterface):
                 query = query.filter_by(**q_filter)
             return session.execute(query).scalar()
 
+    def get_filtered_aggregates(
+        self,
+        aggregates: dict[str, ColumnElement],
+        plugin: str,
+        q_filter: dict | None = None,
+        include_firmware: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Compute multiple aggregates over the analyses of plugin `plugin` in a single scan. This is meant for conditional
+        aggregates, e.g. `func.count().filter(AnalysisEntry.summary.any('packed'))` (`COUNT(*) FILTER (WHERE ...)`).
+
+        :param aggregates: The aggregate expressions with their labels.
+        :param plugin: The name of the analysis plugin.
+        :param q_filter: Optional query filter (e.g. `{'device_class': 'router'}`)
+        :param include_firmware: If `True`, the analyses of the firmware are also aggregated (only if a filter is set).
+        :return: The results of the aggregates by label.
+        """
+        with self.get_read_only_session() as session:
+            query = select(*(aggregate.label(label) for label, aggregate in aggregates.items())).filter(
+                AnalysisEntry.plugin == plugin
+            )
+            if self._filter_is_not_empty(q_filter):
+                query = self._join_all(query) if include_firmware else self._join_fw_or_fo(query, is_firmware=False)
+                query = query.filter_by(**q_filter)
+            return dict(session.execute(query).one()._mapping)
+
     def count_distinct_values(self, key: InstrumentedAttribute, q_filter=None) -> Stats:
         """
         Get a sorted list of tuples with all unique values of a column `key` and the count of occurrences.
@@ -131,14 +167,46 @@ class StatsUpdateDbInterface(ReadWriteDbInterface):
                 query = query.filter_by(**q_filter)
             return _sort_tuples(session.execute(query))
 
+    def count_distinct_values_in_arrays(self, keys: list[str], plugin: str, q_filter=None) -> dict[str, Stats]:
+        """
+        Get the unique values and their count of multiple arrays in the results of the analysis plugin `plugin` with a
+        single scan (see `count_distinct_values_in_array`).
+
+        :param keys: The keys of the arrays in the analysis results (e.g. `['ips_v4', 'ips_v6']`).
+        :param plugin: The name of the analysis plugin.
+        :param q_filter: Optional query filter (e.g. `{'device_class': 'router'}`)
+        :return: The list of unique values with their count for each key.
+        """
+        with self.get_read_only_session() as session:
+            key_table = func.unnest(array(keys)).table_valued('key').render_derived()
+            element = func.jsonb_array_elements(AnalysisEntry.result.op('->')(key_table.c.key)).label('array_element')
+            query = (
+                select(key_table.c.key, element, func.count())
+                .select_from(AnalysisEntry)
+                .join(key_table, true())
+                .filter(AnalysisEntry.plugin == plugin)
+                .group_by(key_table.c.key, 'array_element')
+            )
+            if self._filter_is_not_empty(q_filter):
+                query = self._join_fw_or_fo(query, is_firmware=False)
+                query = query.filter_by(**q_filter)
+            result = {key: [] for key in keys}
+            for key, value, count in session.execute(query):
+                result[key].append((value, count))
+            return {key: _sort_tuples(stats) for key, stats in result.items()}
+
     def count_values_in_summary(self, plugin: str, q_filter: dict | None = None, firmware: bool = False) -> Stats:
         """
-        Get counts of all values from all summaries of plugin `plugin`.
+        Get counts of all values from all summaries of plugin `plugin`. The values of the plugins in
+        `PLUGINS_WITH_SUMMARY_STATS` are counted when the analyses are stored, so that only the counters of the
+        (matching) firmware need to be added up.
 
         :param plugin: The analysis plugin name.
         :param q_filter: Optional query filter (e.g. `{'device_class': 'router'}`)
         :param firmware: If true query only entries of FW root objects. Otherwise, query included objects.
         """
+        if plugin in PLUGINS_WITH_SUMMARY_STATS:
+            return self._sum_summary_counters(plugin, q_filter, firmware)
         with self.get_read_only_session() as session:
             query = select(func.unnest(AnalysisEntry.summary)).filter(AnalysisEntry.plugin == plugin)
             query = self._join_fw_or_fo(query, firmware)
@@ -146,6 +214,67 @@ class StatsUpdateDbInterface(ReadWriteDbInterface):
                 query = query.filter_by(**q_filter)
             return count_occurrences(session.execute(query).scalars())
 
+    def _sum_summary_counters(self, plugin: str, q_filter: dict | None, firmware: bool) -> Stats:
+        with self.get_read_only_session() as session:
+            count = func.sum(summary_counter_table.c.count)
+            query = (
+                select(summary_counter_table.c.item, count)
+                .where(summary_counter_table.c.plugin == plugin, summary_counter_table.c.firmware == firmware)
+                .group_by(summary_counter_table.c.item)
+                .having(count > 0)
+            )
+            if self._filter_is_not_empty(q_filter):
+                query = query.join(FirmwareEntry, FirmwareEntry.uid == summary_counter_table.c.root_uid)
+                query = query.filter_by(**q_filter)
+            return _sort_tuples((item, int(count)) for item, count in session.execute(query))
+
+    def reconcile_summary_counters(self):
+        """
+        Recount the summary values of all firmware (see `count_values_in_summary`) to correct counters that drifted
+        (e.g. because the same file was updated concurrently) and delete the counters of values that no longer occur.
+        This is expensive and should only be run occasionally (see `update_statistic.py --reconcile-counters`). It needs
+        a DB user that can delete rows. The counters are not reconciled as long as there are firmware without
+        aggregates (they are created by `DbSetup.migrate_tables`), because their counters would be deleted.
+        """
+        with self.get_read_only_session() as session:
+            if session.execute(get_firmware_without_aggregates_query().limit(1)).first() is not None:
+                logging.warning('Skipping reconciliation of summary counters: some firmware have no aggregates yet')
+                return
+        aggregates = firmware_aggregate_table
+        key = [
+            aggregates.c.root_uid,
+            aggregates.c.plugin,
+            func.unnest(aggregates.c.summary).label('item'),
+            (aggregates.c.root_uid == aggregates.c.uid).label('firmware'),
+        ]
+        items = select(*key).where(aggregates.c.plugin.in_(PLUGINS_WITH_SUMMARY_STATS)).subquery()
+        recount = (
+            select(*items.c, get_sha256_hex(items.c.item).label('item_hash'), func.count().label('count'))
+            .group_by(*items.c)
+            .subquery()
+        )
+        counter = summary_counter_table.c
+        obsolete_counters = delete(summary_counter_table).where(
+            ~exists().where(
+                recount.c.root_uid == counter.root_uid,
+                recount.c.plugin == counter.plugin,
+                recount.c.item_hash == counter.item_hash,
+                recount.c.firmware == counter.firmware,
+            )
+        )
+        statement = insert(summary_counter_table).from_select(
+            ['root_uid', 'plugin', 'item', 'firmware', 'item_hash', 'count'], select(*recount.c)
+        )
+        with self.get_read_write_session() as session:
+            session.execute(obsolete_counters)  # also the counters that dropped to 0 when analyses were updated
+            session.execute(
+                statement.on_conflict_do_update(  # only counters that drifted are written
+                    index_elements=['root_uid', 'plugin', 'item_hash', 'firmware'],
+                    set_={'count': statement.excluded.count},
+                    where=summary_counter_table.c.count != statement.excluded.count,
+                )
+            )
+
     def get_arch_stats(self, q_filter: dict | None = None) -> list[tuple[str, int, str]]:
         """
         Get architecture stats per firmware. Returns tuples with arch, count, and root_uid.
@@ -171,34 +300,54 @@ class StatsUpdateDbInterface(ReadWriteDbInterface):
             return list(session.execute(query))
 
     def get_unpacking_file_types(self, summary_key: str, q_filter: dict | None = None) -> Stats:
+        return self.get_unpacking_file_types_by_summary([summary_key], q_filter)[summary_key]
+
+    def get_unpacking_file_types_by_summary(
+        self, summary_keys: list[str], q_filter: dict | None = None
+    ) -> dict[str, Stats]:
+        """
+        Get the MIME types of the files with each unpacker summary value in `summary_keys` (e.g. "packed") with a
+        single query.
+        """
         with self.get_read_only_session() as session:
             unpacker_analysis = aliased(AnalysisEntry)
             key = AnalysisEntry.result['mime']
+            counts = [
+                func.count(key).filter(unpacker_analysis.summary.any(summary_key)) for summary_key in summary_keys
+            ]
             query = (
-                select(key, func.count(key))
+                select(key, *counts)
                 .select_from(unpacker_analysis)
                 .join(AnalysisEntry, AnalysisEntry.uid == unpacker_analysis.uid)
                 .filter(AnalysisEntry.plugin == 'file_type')
                 .filter(unpacker_analysis.plugin == 'unpacker')
-                .filter(unpacker_analysis.summary.any(summary_key))
+                .filter(unpacker_analysis.summary.overlap(cast(summary_keys, ARRAY(VARCHAR))))
                 .group_by(key)
             )
             if self._filter_is_not_empty(q_filter):
                 query = self._join_all(query)
                 query = query.filter_by(**q_filter)
-            return _sort_tuples(session.execute(query))
+            rows = session.execute(query).all()
+            return {
+                summary_key: _sort_tuples((row[0], row[index]) for row in rows if row[index])
+                for index, summary_key in enumerate(summary_keys, start=1)
+            }
 
     def get_unpacking_entropy(self, summary_key: str, q_filter: dict | None = None) -> float:
-        with self.get_read_only_session() as session:
-            query = (
-                select(AnalysisEntry.result['entropy'])
-                .filter(AnalysisEntry.plugin == 'unpacker')
-                .filter(AnalysisEntry.summary.any(summary_key))
-            )
-            if self._filter_is_not_empty(q_filter):
-                query = self._join_all(query)
-                query = query.filter_by(**q_filter)
-            return _avg([float(entropy) for entropy in session.execute(query).scalars()])
+        return self.get_unpacking_entropies([summary_key], q_filter)[summary_key]
+
+    def get_unpacking_entropies(self, summary_keys: list[str], q_filter: dict | None = None) -> dict[str, float]:
+        """
+        Get the average entropy of the files with each unpacker summary value in `summary_keys` with a single scan.
+        """
+        entropy = AnalysisEntry.result['entropy'].astext.cast(Float)
+        averages = self.get_filtered_aggregates(
+            {key: func.avg(entropy).filter(AnalysisEntry.summary.any(key)) for key in summary_keys},
+            plugin='unpacker',
+            q_filter=q_filter,
+            include_firmware=True,
+        )
+        return {key: 0.0 if average is None else float(average) for key, average in averages.items()}
 
     def get_used_unpackers(self, q_filter: dict | None = None) -> Stats:
         with self.get_read_only_session() as session:
@@ -211,16 +360,18 @@ class StatsUpdateDbInterface(ReadWriteDbInterface):
             return count_occurrences([plugin for plugin, count in session.execute(query) if int(count) > 0])
 
     def get_regex_mime_match_count(self, regex: str, q_filter: dict | None = None) -> int:
-        with self.get_read_only_session() as session:
-            query = (
-                select(func.count(AnalysisEntry.uid))
-                .filter(AnalysisEntry.plugin == 'file_type')
-                .filter(AnalysisEntry.result['full'].astext.regexp_match(regex))
-            )
-            if self._filter_is_not_empty(q_filter):
-                query = self._join_fw_or_fo(query, is_firmware=False)
-                query = query.filter_by(**q_filter)
-            return session.execute(query).scalar()
+        return self.get_regex_mime_match_counts([regex], q_filter)[regex]
+
+    def get_regex_mime_match_counts(self, regex_list: list[str], q_filter: dict | None = None) -> dict[str, int]:
+        """
+        Count the files whose full file type matches each regex in `regex_list` with a single scan.
+        """
+        full_type = AnalysisEntry.result['full'].astext
+        return self.get_filtered_aggregates(
+            {regex: func.count().filter(full_type.regexp_match(regex)) for regex in regex_list},
+            plugin='file_type',
+            q_filter=q_filter,
+        )
 
     def get_release_date_stats(self, q_filter: dict | None = None) -> list[tuple[int, int, int]]:
         with self.get_read_only_session() as session:
@@ -291,12 +442,6 @@ def _convert_to_tuples(query_result) -> Iterator[tuple[str, int]]:
     return (tuple(item) if not isinstance(item, tuple) else item for item in query_result)
 
 
-def _avg(values: list[float]) -> float:
-    if len(values) == 0:
-        return 0
-    return sum(values) / len(values)
-
-
 class StatsDbViewer(ReadOnlyDbInterface):
     """
     Statistic module frontend interface
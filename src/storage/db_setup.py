@@ -1,8 +1,41 @@
 from __future__ import annotations
 
+import logging
+
+from sqlalchemy import select
+
 from config import cfg
 from storage.db_connection import AdminConnection, DbConnection
+from storage.db_interface_backend import update_firmware_aggregates
 from storage.db_interface_base import ReadWriteDbInterface
+from storage.db_interface_common import get_firmware_without_aggregates_query
+from storage.schema import fw_files_table
+
+# trigram indexes for `$like` and `$regex` queries (they need the extension pg_trgm which may not be installed)
+TRIGRAM_INDEXES = {
+    'file_object_file_name_trigram_index': 'file_object USING gin (file_name gin_trgm_ops)',
+    'analysis_file_type_full_trigram_index': (
+        'analysis USING gin ((result ->> \'full\') gin_trgm_ops) WHERE plugin = \'file_type\''
+    ),
+}
+# the virtual file paths used to be stored as JSONB map (root UID -> list of paths) in `file_object.virtual_file_paths`
+# (the parent UID is the second last element of the path, see `helperFunctions.virtual_file_path`)
+VIRTUAL_FILE_PATH_MIGRATION = '''
+    INSERT INTO virtual_file_path (file_uid, root_uid, path_hash, parent_uid, virtual_path)
+    SELECT file_object.uid, paths.key, encode(sha256(convert_to(path.value, 'UTF8')), 'hex'),
+        CASE WHEN cardinality(path.parts) = 1 THEN path.parts[1] ELSE path.parts[cardinality(path.parts) - 1] END,
+        path.value
+    FROM file_object
+        CROSS JOIN jsonb_each(file_object.virtual_file_paths) AS paths
+        CROSS JOIN LATERAL (
+            SELECT value, array_remove(string_to_array(value, '|'), '') AS parts
+            FROM jsonb_array_elements_text(paths.value)
+        ) AS path
+    WHERE jsonb_typeof(file_object.virtual_file_paths) = 'object'
+    ON CONFLICT DO NOTHING;
+'''
+# the number of files whose aggregates are created in one transaction when the aggregates of a firmware are missing
+AGGREGATE_BACKFILL_BATCH_SIZE = 1000
 
 
 class Privileges:
@@ -58,3 +91,76 @@ class DbSetup(ReadWriteDbInterface):
     def grant_privilege(self, user_name: str, privilege: str):
         with self.get_read_write_session() as session:
             session.execute(f'GRANT {privilege} ON ALL TABLES IN SCHEMA public TO {user_name};')
+
+    def migrate_tables(self):
+        '''
+        Migrate the data of an existing database to the current schema. Missing tables must be created with
+        ``create_tables`` before. Migrations that are not needed (e.g. for a new database) are skipped.
+        '''
+        self._migrate_virtual_file_paths()
+        self._backfill_firmware_aggregates()
+
+    def _migrate_virtual_file_paths(self):
+        if not self.column_exists('file_object', 'virtual_file_paths'):
+            return
+        logging.info('Migrating virtual file paths to table virtual_file_path (this may take a while)')
+        with self.get_read_write_session() as session:  # the old column is only dropped if the migration succeeds
+            session.execute(VIRTUAL_FILE_PATH_MIGRATION)
+            session.execute('ALTER TABLE file_object DROP COLUMN virtual_file_paths;')
+
+    def _backfill_firmware_aggregates(self):
+        '''
+        Create the missing summary and tag aggregates (and summary counters) of firmware that were analyzed before the
+        aggregates were introduced (see ``update_firmware_aggregates``). The aggregates of the firmware object itself
+        are created last, so that a firmware with an interrupted backfill is processed again.
+        '''
+        with self.get_read_only_session() as session:
+            root_uids = list(session.execute(get_firmware_without_aggregates_query()).scalars())
+        if root_uids:
+            logging.info(f'Creating the summary aggregates of {len(root_uids)} firmware (this may take a while)')
+        for root_uid in root_uids:
+            with self.get_read_only_session() as session:
+                files_query = select(fw_files_table.c.file_uid).where(fw_files_table.c.root_uid == root_uid)
+                uid_list = [*session.execute(files_query).scalars(), root_uid]
+            for index in range(0, len(uid_list), AGGREGATE_BACKFILL_BATCH_SIZE):
+                with self.get_read_write_session() as session:
+                    update_firmware_aggregates(session, uid_list[index : index + AGGREGATE_BACKFILL_BATCH_SIZE])
+
+    def column_exists(self, table_name: str, column_name: str) -> bool:
+        with self.get_read_only_session() as session:
+            return bool(
+                session.execute(
+                    'SELECT 1 FROM information_schema.columns '
+                    f'WHERE table_name = \'{table_name}\' AND column_name = \'{column_name}\''
+                ).scalar()
+            )
+
+    def create_indexes(self):
+        '''
+        Create the indexes of the schema that are missing (tables that already exist are not changed by
+        ``create_tables``) and the trigram indexes if the extension pg_trgm is available.
+        '''
+        for table in self.connection.base.metadata.sorted_tables:
+            for index in table.indexes:
+                if not self.index_exists(index.name):
+                    index.create(self.connection.engine)
+        if not self.create_trigram_extension():
+            logging.warning('Extension pg_trgm is not available: Skipping the creation of trigram indexes')
+            return
+        for name, definition in TRIGRAM_INDEXES.items():
+            self.create_index(name, definition)
+
+    def create_trigram_extension(self) -> bool:
+        with self.get_read_write_session() as session:
+            if not session.execute('SELECT 1 FROM pg_available_extensions WHERE name = \'pg_trgm\'').scalar():
+                return False
+            session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+        return True
+
+    def create_index(self, name: str, definition: str):
+        with self.get_read_write_session() as session:
+            session.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition};')
+
+    def index_exists(self, name: str) -> bool:
+        with self.get_read_only_session() as session:
+            return bool(session.execute(f'SELECT 1 FROM pg_indexes WHERE indexname = \'{name}\'').scalar())
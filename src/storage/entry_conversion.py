@@ -4,10 +4,13 @@ from datetime import datetime
 from time import time
 
 from helperFunctions.data_conversion import convert_time_to_str
+from helperFunctions.hash import get_sha256
+from helperFunctions.virtual_file_path import get_uids_from_virtual_path
 from objects.file import FileObject
 from objects.firmware import Firmware
 from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry
 
+STORED_PATHS_KEY = 'stored_virtual_file_paths'
 META_KEYS = {'tags', 'summary', 'analysis_date', 'plugin_version', 'system_version', 'file_system_flag'}
 
 
@@ -29,9 +32,10 @@ def file_object_from_entry(
     analysis_filter: list[str] | None = None,
     included_files: set[str] | None = None,
     parents: set[str] | None = None,
+    virtual_file_paths: dict[str, list[str]] | None = None,
 ) -> FileObject:
     file_object = FileObject()
-    _populate_fo_data(fo_entry, file_object, analysis_filter, included_files, parents)
+    _populate_fo_data(fo_entry, file_object, analysis_filter, included_files, parents, virtual_file_paths)
     return file_object
 
 
@@ -41,11 +45,20 @@ def _populate_fo_data(
     analysis_filter: list[str] | None = None,
     included_files: set[str] | None = None,
     parents: set[str] | None = None,
+    virtual_file_paths: dict[str, list[str]] | None = None,
 ):
     file_object.uid = fo_entry.uid
     file_object.size = fo_entry.size
     file_object.file_name = fo_entry.file_name
-    file_object.virtual_file_path = fo_entry.virtual_file_paths
+    file_object.virtual_file_path = (
+        fo_entry.get_virtual_file_paths() if virtual_file_paths is None else virtual_file_paths
+    )
+    # the paths that are already in the DB are not inserted again when the object is updated
+    file_object.temporary_data[STORED_PATHS_KEY] = {
+        (root_uid, virtual_path)
+        for root_uid, vfp_list in file_object.virtual_file_path.items()
+        for virtual_path in vfp_list
+    }
     file_object.processed_analysis = {
         analysis_entry.plugin: analysis_entry_to_dict(analysis_entry)
         for analysis_entry in fo_entry.analyses
@@ -94,13 +107,32 @@ def create_file_object_entry(file_object: FileObject) -> FileObjectEntry:
         depth=file_object.depth,
         size=file_object.size,
         comments=file_object.comments,
-        virtual_file_paths=file_object.virtual_file_path,
         is_firmware=isinstance(file_object, Firmware),
         firmware=None,
         analyses=[],
     )
 
 
+def get_virtual_file_path_rows(file_object: FileObject) -> list[dict]:
+    '''
+    Get the rows of the virtual file paths of the file that are not already in the DB (i.e. that were not loaded from
+    the DB together with the object).
+    '''
+    stored_paths = file_object.temporary_data.get(STORED_PATHS_KEY, set())
+    return [
+        {
+            'file_uid': file_object.uid,
+            'root_uid': root_uid,
+            'parent_uid': get_uids_from_virtual_path(virtual_path)[-1],
+            'virtual_path': virtual_path,
+            'path_hash': get_sha256(virtual_path),
+        }
+        for root_uid, vfp_list in file_object.virtual_file_path.items()
+        for virtual_path in vfp_list
+        if (root_uid, virtual_path) not in stored_paths
+    ]
+
+
 def sanitize(analysis_data: dict):
     '''Null bytes are not legal in PostgreSQL JSON columns -> remove them'''
     for key, value in list(analysis_data.items()):
@@ -1,9 +1,21 @@
+from __future__ import annotations
+
 import logging
+import os
+import shutil
+import threading
+from mmap import ACCESS_READ, mmap
 from pathlib import Path
 
 from common_helper_files import delete_file, write_binary_to_file
 
 from config import cfg
+from storage.ngram_index import get_ngram_index
+
+# files are stored in a temporary directory in the file storage (i.e. on the same file system) first and renamed after
+# they are complete (the name starts with a dot, so the directory is not mistaken for a directory of stored files)
+TMP_DIR_NAME = '.tmp'
+STORED_FILE_MODE = 0o644
 
 
 class FSOrganizer:
@@ -15,6 +27,7 @@ class FSOrganizer:
         self.data_storage_path = Path(cfg.data_storage.firmware_file_storage_directory).absolute()
 
         self.data_storage_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ngram_index = get_ngram_index()
 
     def store_file(self, file_object):
         if file_object.binary is None:
@@ -24,6 +37,51 @@ class FSOrganizer:
             write_binary_to_file(file_object.binary, destination_path, overwrite=False)
             file_object.file_path = destination_path
             file_object.create_binary_from_path()
+            if self.ngram_index is not None:
+                self._add_to_ngram_index(file_object.uid, file_object.binary)
+
+    def store_file_from_path(self, file_object, source_path: str | Path):
+        '''
+        Store a file (e.g. an extracted file) without loading it into memory: The file is hard-linked into the file
+        storage if possible (and copied otherwise). The binary of ``file_object`` is not set (it can be loaded from
+        its new ``file_path``), so its UID must already be set.
+
+        :param file_object: The file object of the file.
+        :param source_path: The path of the file. The file must not be changed afterwards (it may share its inode
+            with the stored file and its mode is reset).
+        '''
+        destination_path = Path(self.generate_path(file_object))
+        if not destination_path.is_file():
+            destination_path.parent.mkdir(parents=True, exist_ok=True)
+            # the file is renamed after it is complete, so that other processes never see a partially written file
+            tmp_dir = self.data_storage_path / TMP_DIR_NAME
+            tmp_dir.mkdir(exist_ok=True)
+            tmp_path = tmp_dir / f'{destination_path.name}.{os.getpid()}.{threading.get_ident()}'
+            self._link_or_copy(Path(source_path), tmp_path)
+            tmp_path.rename(destination_path)
+        file_object.file_path = str(destination_path)
+        if self.ngram_index is not None and destination_path.stat().st_size > 0:
+            with destination_path.open('rb') as file, mmap(file.fileno(), 0, access=ACCESS_READ) as binary:
+                self._add_to_ngram_index(file_object.uid, binary)
+
+    @staticmethod
+    def _link_or_copy(source_path: Path, target_path: Path):
+        # extracted files can have any mode (e.g. world-writable or setuid): the mode of a linked file is reset and
+        # files of other users are copied (the owner of a linked file can not be changed)
+        if source_path.stat().st_uid == os.getuid():
+            try:
+                os.link(source_path, target_path)
+                os.chmod(target_path, STORED_FILE_MODE)
+                return
+            except OSError:  # e.g. the file is on another file system
+                pass
+        shutil.copyfile(source_path, target_path)
+
+    def _add_to_ngram_index(self, uid: str, binary: bytes | mmap):
+        try:
+            self.ngram_index.add_file(uid, binary)
+        except OSError as error:  # the file is still found by binary searches (it is scanned in any case)
+            logging.warning(f'Could not add {uid} to the n-gram index: {error}')
 
     def delete_file(self, uid):
         local_file_path = self.generate_path_from_uid(uid)
@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from time import time_ns
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from config import cfg
+
+NGRAM_COUNT = 2**24  # the index uses byte trigrams
+CHUNK_SIZE = 2**24  # files are processed in chunks of this size to limit the memory usage
+SMALL_FILE_SIZE = 2**16  # the trigrams of smaller files are sorted instead of marked in a table of all trigrams
+FLUSH_THRESHOLD = 256  # number of indexed files that are collected before they are stored as a new segment
+MAX_SEGMENT_SIZE = 2**26  # maximum number of postings (distinct trigrams of all files) in a segment
+MERGE_FACTOR = 8  # segments are merged if there are more than this many segments that are smaller than the maximum
+BLOCK_SIZE = 2**10  # number of trigrams of a block of the trigram directory of a segment
+
+# A query describes which trigrams a file must contain to possibly match. It is either ``None`` (any file may match),
+# ``('ngrams', ngrams)`` (the file contains all trigrams) or ``('and' | 'or', queries)``.
+Query = Optional[tuple]
+
+
+class PostingLists(NamedTuple):
+    uids: list[str]
+    ngrams: np.ndarray  # the sorted distinct trigrams of all files
+    counts: np.ndarray  # the number of files that contain each trigram
+    postings: np.ndarray  # the sorted indices (in uids) of the files that contain each trigram (one after the other)
+
+
+class Segment(NamedTuple):
+    '''
+    The posting lists of a segment as they are stored. The trigram directory is compact even if the segment contains
+    most of the possible trigrams: It consists of a bitmap of the contained trigrams, the counts of the contained
+    trigrams and the number of contained trigrams and postings before each block of ``BLOCK_SIZE`` trigrams.
+    '''
+
+    uids: list[str]
+    bitmap: np.ndarray
+    counts: np.ndarray
+    block_ranks: np.ndarray
+    block_offsets: np.ndarray
+    postings: np.ndarray
+
+
+def get_ngram_index() -> NgramIndex | None:
+    '''
+    :return: The n-gram index if it is enabled in the config (``ngram-index-directory``) or ``None`` otherwise.
+    '''
+    if not cfg.data_storage.ngram_index_directory:
+        return None
+    return NgramIndex(cfg.data_storage.ngram_index_directory)
+
+
+def get_ngrams(binary: bytes) -> np.ndarray:
+    '''
+    Get the distinct byte trigrams of ``binary`` (each trigram is represented by the integer of its three bytes).
+
+    :param binary: The contents of a file.
+    :return: The sorted trigrams.
+    '''
+    if len(binary) < SMALL_FILE_SIZE:
+        return np.unique(_get_ngrams_of_chunk(binary))
+    is_contained = np.zeros(NGRAM_COUNT, dtype=bool)
+    for offset in range(0, len(binary) - 2, CHUNK_SIZE):
+        is_contained[_get_ngrams_of_chunk(binary[offset : offset + CHUNK_SIZE + 2])] = True
+    return np.flatnonzero(is_contained).astype(np.uint32)
+
+
+def _get_ngrams_of_chunk(chunk: bytes) -> np.ndarray:
+    data = np.frombuffer(chunk, dtype=np.uint8).astype(np.uint32)
+    return data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+
+
+class NgramIndex:
+    '''
+    An inverted index of the byte trigrams of the files in the file storage. It is used by the binary search to skip
+    files that cannot match the search rules because they do not contain the trigrams of all literal strings that a
+    rule requires (see ``helperFunctions.yara_prefilter``).
+
+    The index is maintained incrementally: The trigrams of each stored file are written to a pending file. If enough
+    files are pending, they are combined to a new immutable segment (the posting lists of the files). Small
+    segments are merged from time to time to keep the number of segments low. Files that are not in the index (e.g.
+    files that were stored before the index was enabled) are never excluded from a search.
+
+    :param index_dir: The directory of the index.
+    '''
+
+    def __init__(self, index_dir: str):
+        self.index_dir = Path(index_dir)
+        self.pending_dir = self.index_dir / 'pending'
+        self.segment_dir = self.index_dir / 'segments'
+        self.pending_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_dir.mkdir(exist_ok=True)
+
+    def add_file(self, uid: str, binary: bytes):
+        '''
+        Add a file to the index. The file is stored in a new segment as soon as enough files are pending.
+
+        :param uid: The UID of the file.
+        :param binary: The contents of the file.
+        '''
+        tmp_path = self.pending_dir / f'.{uid}.{os.getpid()}.npy'
+        np.save(tmp_path, get_ngrams(binary))
+        tmp_path.rename(self.pending_dir / f'{uid}.npy')
+        if len(self._get_pending_files()) >= FLUSH_THRESHOLD:
+            with self._lock(blocking=False) as locked:
+                if locked:  # else another process is already storing the pending files
+                    self._flush()
+
+    def flush(self):
+        '''
+        Store all pending files in new segments.
+        '''
+        with self._lock():
+            self._flush()
+
+    def get_excluded_files(self, query: Query) -> set[str]:
+        '''
+        Get the files in the index that do not contain the trigrams that the query requires.
+
+        :param query: The trigram query of the search rules.
+        :return: The UIDs of the files that cannot match.
+        '''
+        if query is None:
+            return set()
+        excluded = set()
+        with self._lock():
+            self._flush()
+            for segment in self._get_segments():
+                excluded.update(uid for uid, match in zip(segment.uids, _evaluate(query, segment)) if not match)
+        return excluded
+
+    def get_size(self) -> int:
+        '''
+        :return: The size of the index in bytes.
+        '''
+        return sum(path.stat().st_size for path in self.index_dir.glob('**/*') if path.is_file())
+
+    @contextmanager
+    def _lock(self, blocking: bool = True):
+        with open(self.index_dir / 'lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _get_pending_files(self) -> list[Path]:
+        return sorted(path for path in self.pending_dir.glob('*.npy') if not path.name.startswith('.'))
+
+    def _get_segment_dirs(self) -> list[Path]:
+        return sorted(path for path in self.segment_dir.iterdir() if not path.name.startswith('.'))
+
+    def _get_segments(self) -> list[Segment]:
+        return [_load_segment(path) for path in self._get_segment_dirs()]
+
+    def _flush(self):
+        pending_files = self._get_pending_files()
+        batch, batch_size = [], 0
+        for path in pending_files:
+            ngrams = np.load(path)
+            if batch and batch_size + len(ngrams) > MAX_SEGMENT_SIZE:
+                self._store_segment(_merge_posting_lists(batch))
+                batch, batch_size = [], 0
+            batch.append(
+                PostingLists([path.stem], ngrams, np.ones(len(ngrams), np.uint16), np.zeros(len(ngrams), np.uint16))
+            )
+            batch_size += len(ngrams)
+        if batch:
+            self._store_segment(_merge_posting_lists(batch))
+        for path in pending_files:
+            path.unlink()
+        self._merge_small_segments()
+
+    def _merge_small_segments(self):
+        segment_sizes = (
+            (len(np.load(path / 'postings.npy', mmap_mode='r')), path) for path in self._get_segment_dirs()
+        )
+        small_segments = sorted((size, path) for size, path in segment_sizes if size < MAX_SEGMENT_SIZE)
+        while len(small_segments) > MERGE_FACTOR:
+            to_merge, merged_size = [], 0
+            while small_segments and merged_size + small_segments[0][0] <= MAX_SEGMENT_SIZE:
+                size, path = small_segments.pop(0)
+                to_merge.append(path)
+                merged_size += size
+            if len(to_merge) < 2:
+                break
+            self._store_segment(_merge_posting_lists([_get_posting_lists(_load_segment(path)) for path in to_merge]))
+            for path in to_merge:
+                for file in path.iterdir():
+                    file.unlink()
+                path.rmdir()
+            logging.debug(f'merged {len(to_merge)} segments of the n-gram index')
+
+    def _store_segment(self, posting_lists: PostingLists):
+        segment = _create_segment(posting_lists)
+        name = f'{time_ns()}_{os.getpid()}'
+        tmp_dir = self.segment_dir / f'.{name}'
+        tmp_dir.mkdir()
+        (tmp_dir / 'uids.txt').write_text('\n'.join(segment.uids))
+        for field in Segment._fields[1:]:
+            np.save(tmp_dir / f'{field}.npy', getattr(segment, field))
+        tmp_dir.rename(self.segment_dir / name)
+
+
+def _load_segment(path: Path) -> Segment:
+    return Segment(
+        (path / 'uids.txt').read_text().split('\n'),
+        *(np.load(path / f'{field}.npy', mmap_mode='r') for field in Segment._fields[1:]),
+    )
+
+
+def _create_segment(posting_lists: PostingLists) -> Segment:
+    is_contained = np.zeros(NGRAM_COUNT, dtype=bool)
+    is_contained[posting_lists.ngrams] = True
+    block_ranks = np.concatenate(([0], np.cumsum(is_contained.reshape(-1, BLOCK_SIZE).sum(axis=1))))
+    offsets = np.concatenate(([0], np.cumsum(posting_lists.counts.astype(np.int64))))
+    return Segment(
+        posting_lists.uids,
+        np.packbits(is_contained),
+        posting_lists.counts,
+        block_ranks.astype(np.uint32),
+        offsets[block_ranks],
+        posting_lists.postings,
+    )
+
+
+def _get_posting_lists(segment: Segment) -> PostingLists:
+    ngrams = np.flatnonzero(np.unpackbits(segment.bitmap)).astype(np.uint32)
+    return PostingLists(segment.uids, ngrams, segment.counts, segment.postings)
+
+
+def _get_postings(segment: Segment, ngram: int) -> np.ndarray | None:
+    '''
+    :return: The postings of the trigram or ``None`` if it is not in the segment.
+    '''
+    block, index_in_block = divmod(ngram, BLOCK_SIZE)
+    bits = np.unpackbits(segment.bitmap[block * BLOCK_SIZE // 8 : (block + 1) * BLOCK_SIZE // 8])
+    if not bits[index_in_block]:
+        return None
+    block_rank = int(segment.block_ranks[block])
+    rank = block_rank + int(bits[:index_in_block].sum())
+    start = int(segment.block_offsets[block]) + int(segment.counts[block_rank:rank].sum(dtype=np.int64))
+    return segment.postings[start : start + int(segment.counts[rank])]
+
+
+def _merge_posting_lists(parts: list[PostingLists]) -> PostingLists:
+    '''
+    Merge posting lists with a counting sort: The postings of each part are copied to the next free positions of their
+    trigrams. The parts are processed in order and therefore the postings of each trigram stay sorted.
+    '''
+    counts = np.zeros(NGRAM_COUNT, dtype=np.int64)
+    for part in parts:
+        counts[part.ngrams] += part.counts
+    next_positions = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    uid_count = sum(len(part.uids) for part in parts)
+    postings = np.empty(int(counts.sum()), dtype=np.uint16 if uid_count <= 2**16 else np.uint32)
+    uids = []
+    for part in parts:
+        if len(part.uids) == 1:  # a single file has one posting per trigram
+            postings[next_positions[part.ngrams]] = len(uids)
+            next_positions[part.ngrams] += 1
+        else:
+            part_counts = part.counts.astype(np.int64)
+            part_offsets = np.concatenate(([0], np.cumsum(part_counts)[:-1]))
+            rank_in_ngram = np.arange(len(part.postings)) - np.repeat(part_offsets, part_counts)
+            destinations = np.repeat(next_positions[part.ngrams], part_counts) + rank_in_ngram
+            postings[destinations] = part.postings + len(uids)
+            next_positions[part.ngrams] += part_counts
+        uids.extend(part.uids)
+    ngrams = np.flatnonzero(counts).astype(np.uint32)
+    return PostingLists(uids, ngrams, counts[ngrams].astype(postings.dtype), postings)
+
+
+def _evaluate(query: Query, segment: Segment) -> np.ndarray:
+    '''
+    :return: A mask of the files of the segment that may match the query.
+    '''
+    if query is None:
+        return np.ones(len(segment.uids), dtype=bool)
+    operator, operands = query
+    if operator == 'and':
+        result = np.ones(len(segment.uids), dtype=bool)
+        for subquery in operands:
+            result &= _evaluate(subquery, segment)
+        return result
+    if operator == 'or':
+        result = np.zeros(len(segment.uids), dtype=bool)
+        for subquery in operands:
+            result |= _evaluate(subquery, segment)
+        return result
+    return _get_files_with_all_ngrams(operands, segment)
+
+
+def _get_files_with_all_ngrams(ngrams: np.ndarray, segment: Segment) -> np.ndarray:
+    postings = [_get_postings(segment, int(ngram)) for ngram in ngrams]
+    if any(ngram_postings is None for ngram_postings in postings):
+        return np.zeros(len(segment.uids), dtype=bool)  # at least one of the trigrams is in no file of the segment
+    result = np.ones(len(segment.uids), dtype=bool)
+    # start with the shortest posting lists so that the search can stop early
+    for ngram_postings in sorted(postings, key=len):
+        files_with_ngram = np.zeros(len(segment.uids), dtype=bool)
+        files_with_ngram[ngram_postings] = True
+        result &= files_with_ngram
+        if not result.any():
+            break
+    return result
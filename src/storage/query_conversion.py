@@ -1,16 +1,22 @@
 from __future__ import annotations
 
-from json import dumps
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from json import JSONDecodeError, dumps, loads
 from typing import Any
 
-from sqlalchemy import func, or_, select, type_coerce
+from sqlalchemy import Column, func, or_, select, tuple_, type_coerce
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import aliased
-from sqlalchemy.sql import Select
+from sqlalchemy.sql import ClauseElement, Executable, Select
 
 from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry
 
-FIRMWARE_ORDER = FirmwareEntry.vendor.asc(), FirmwareEntry.device_name.asc()
+# the UID makes the sort keys unique so that they can be used for keyset pagination (see `apply_cursor`)
+FIRMWARE_SORT_KEY = FirmwareEntry.vendor, FirmwareEntry.device_name, FirmwareEntry.uid
+FILE_OBJECT_SORT_KEY = FileObjectEntry.file_name, FileObjectEntry.uid
+FIRMWARE_ORDER = tuple(column.asc() for column in FIRMWARE_SORT_KEY)
 
 
 class QueryConversionException(Exception):
@@ -27,7 +33,59 @@ def build_generic_search_query(search_dict: dict, only_fo_parent_firmware: bool,
     if only_fo_parent_firmware:
         return query_parent_firmware(search_dict, inverted)
 
-    return build_query_from_dict(search_dict).order_by(FileObjectEntry.file_name.asc())
+    return build_query_from_dict(search_dict).order_by(*(column.asc() for column in FILE_OBJECT_SORT_KEY))
+
+
+def apply_cursor(query: Select, sort_key: tuple[Column, ...], cursor: str | None, limit: int | None) -> Select:
+    '''
+    Keyset pagination: Instead of skipping the results of the previous pages (OFFSET), only results with a sort key
+    greater than the one of the last result of the previous page are selected. This way, the DB can start at the
+    position of the cursor in the index and every page is as fast as the first one.
+
+    :param query: The query (its ORDER BY clause is replaced).
+    :param sort_key: The columns that the results are sorted by (the last column must be unique).
+    :param cursor: The cursor of the previous page (see ``get_cursor``) or ``None`` for the first page.
+    :param limit: The page size (optional).
+    '''
+    query = query.order_by(None).order_by(*(column.asc() for column in sort_key))
+    if cursor is not None:
+        query = query.filter(tuple_(*sort_key) > tuple_(*decode_cursor(cursor, len(sort_key))))
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def get_cursor(values: list) -> str:
+    '''
+    Get the (opaque) cursor of the next page from the sort key values of the last result of the current page.
+    '''
+    return urlsafe_b64encode(dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    try:
+        values = loads(urlsafe_b64decode(cursor.encode()))
+    except (BinasciiError, JSONDecodeError, UnicodeError, ValueError) as error:
+        raise QueryConversionException(f'Invalid cursor: {cursor}') from error
+    if not isinstance(values, list) or len(values) != length:
+        raise QueryConversionException(f'Invalid cursor: {cursor}')
+    return values
+
+
+class Explain(Executable, ClauseElement):
+    '''
+    ``EXPLAIN`` statement of a query: Executing it returns the execution plan of the query in JSON format.
+    '''
+
+    inherit_cache = False
+
+    def __init__(self, query: Select):
+        self.query = query
+
+
+@compiles(Explain, 'postgresql')
+def _compile_explain(element: Explain, compiler, **kwargs):
+    return f'EXPLAIN (FORMAT JSON) {compiler.process(element.query, **kwargs)}'
 
 
 def query_parent_firmware(search_dict: dict, inverted: bool, count: bool = False) -> Select:
@@ -185,6 +243,13 @@ def _add_json_filter(key, value, subkey):
                 column = column.astext
                 break
             value[key_] = dumps(value_)
-    else:
-        value = type_coerce(value, JSONB)
-    return _dict_key_to_filter(column, key, value)
+        return _dict_key_to_filter(column, key, value)
+    # the equality implies the containment (`@>`) which can use the index of the results (see `storage.schema`)
+    containment = AnalysisEntry.result.contains(_to_nested_dict(subkey.split('.'), value))
+    return containment & _dict_key_to_filter(column, key, type_coerce(value, JSONB))
+
+
+def _to_nested_dict(keys: list[str], value: Any) -> dict:
+    for nested_key in reversed(keys):
+        value = {nested_key: value}
+    return value
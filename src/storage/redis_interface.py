@@ -30,6 +30,14 @@ class RedisInterface:
         value = self._redis_pop(key) if delete else self.redis.get(key)
         return self._combine_if_split(value, delete=delete)
 
+    def delete(self, key: str):
+        '''
+        Delete a value (and its chunks if it was split).
+        '''
+        value = self._redis_pop(key)
+        if value is not None and value.startswith(CHUNK_MAGIC):
+            self.redis.delete(*value.decode().split(SEPARATOR)[1:])
+
     def queue_put(self, key: str, value: Any):
         self.redis.rpush(key, self._split_if_necessary(dumps(value)))
 
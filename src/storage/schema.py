@@ -9,19 +9,24 @@ from sqlalchemy import (
     Date,
     Float,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
     PrimaryKeyConstraint,
     Table,
     event,
+    func,
     select,
 )
 from sqlalchemy.dialects.postgresql import ARRAY, CHAR, JSONB, VARCHAR
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 from sqlalchemy.orm import Session, backref, declarative_base, relationship
+from sqlalchemy.sql import ColumnElement
 
 Base = declarative_base()
 UID = VARCHAR(78)
+# the results of these plugins are indexed for searches (see `_add_json_filter` in `storage.query_conversion`)
+INDEXED_RESULT_PLUGINS = ['cpu_architecture', 'file_hashes', 'file_type', 'software_components']
 
 # primary_key=True implies `unique=True` and `nullable=False`
 
@@ -40,12 +45,26 @@ class AnalysisEntry(Base):
 
     file_object = relationship('FileObjectEntry', back_populates='analyses')
 
-    __table_args__ = (PrimaryKeyConstraint('uid', 'plugin', name='_analysis_primary_key'),)
+    __table_args__ = (
+        PrimaryKeyConstraint('uid', 'plugin', name='_analysis_primary_key'),
+        Index('analysis_summary_index', 'summary', postgresql_using='gin'),
+    )
 
     def __repr__(self) -> str:
         return f'AnalysisEntry({self.uid}, {self.plugin}, {self.plugin_version})'
 
 
+# containment (`@>`) queries on the results of the indexed plugins and `$in` queries on the MIME type can use an index
+Index(
+    'analysis_result_index',
+    AnalysisEntry.result,
+    postgresql_using='gin',
+    postgresql_ops={'result': 'jsonb_path_ops'},
+    postgresql_where=AnalysisEntry.plugin.in_(INDEXED_RESULT_PLUGINS),
+)
+Index('analysis_mime_index', AnalysisEntry.result['mime'].astext, postgresql_where=AnalysisEntry.plugin == 'file_type')
+
+
 included_files_table = Table(
     'included_files',
     Base.metadata,
@@ -68,17 +87,51 @@ comparisons_table = Table(
     Column('file_uid', UID, ForeignKey('file_object.uid'), primary_key=True),
 )
 
+# a copy of the analysis summaries and propagated tags of all files in a firmware (including the firmware itself) so
+# that the summary and tags of a firmware can be read with an index lookup (see `update_firmware_aggregates` in
+# `storage.db_interface_backend`)
+firmware_aggregate_table = Table(
+    'firmware_aggregate',
+    Base.metadata,
+    Column('root_uid', UID, ForeignKey('file_object.uid', ondelete='CASCADE'), primary_key=True),
+    Column('plugin', VARCHAR(64), primary_key=True),
+    Column('uid', UID, ForeignKey('file_object.uid', ondelete='CASCADE'), primary_key=True, index=True),
+    Column('summary', ARRAY(VARCHAR, dimensions=1)),
+    Column('tags', JSONB),
+)
+
+# the number of occurrences of each summary item of some plugins in each firmware (`firmware` is true for the items of
+# the firmware itself and false for the items of the included files) so that the statistics do not need to unnest all
+# summaries (see `update_firmware_aggregates` in `storage.db_interface_backend`). Summary items can be too long for a
+# btree index, so the key contains the SHA256 hash of the item (see `get_sha256_hex`) instead of the item itself.
+summary_counter_table = Table(
+    'summary_counter',
+    Base.metadata,
+    Column('root_uid', UID, ForeignKey('file_object.uid', ondelete='CASCADE'), primary_key=True),
+    Column('plugin', VARCHAR(64), primary_key=True),
+    Column('item_hash', CHAR(64), primary_key=True),
+    Column('firmware', Boolean, primary_key=True),
+    Column('item', VARCHAR, nullable=False),
+    Column('count', Integer, nullable=False),
+)
+
+
+def get_sha256_hex(text: ColumnElement) -> ColumnElement:
+    """
+    The SHA256 hash of a text in the DB as hex string (the same as ``helperFunctions.hash.get_sha256`` in Python).
+    """
+    return func.encode(func.sha256(func.convert_to(text, 'UTF8')), 'hex')
+
 
 class FileObjectEntry(Base):
     __tablename__ = 'file_object'
 
     uid = Column(UID, primary_key=True)
-    sha256 = Column(CHAR(64), nullable=False)
+    sha256 = Column(CHAR(64), nullable=False, index=True)
     file_name = Column(VARCHAR, nullable=False)
     depth = Column(Integer, nullable=False)
     size = Column(BigInteger, nullable=False)
     comments = Column(MutableList.as_mutable(JSONB))
-    virtual_file_paths = Column(MutableDict.as_mutable(JSONB))
     is_firmware = Column(Boolean, nullable=False)
 
     firmware = relationship('FirmwareEntry', back_populates='root_object', uselist=False, cascade='all, delete')  # 1:1
@@ -114,6 +167,32 @@ class FileObjectEntry(Base):
         cascade='all, delete',  # comparisons should also be deleted when the file object is deleted
         backref=backref('file_objects'),
     )
+    virtual_file_path_entries = relationship(  # 1:n
+        'VirtualFilePathEntry',
+        order_by='VirtualFilePathEntry.virtual_path',
+        viewonly=True,  # the paths are only appended with bulk inserts and deleted by the DB (`ON DELETE CASCADE`)
+        lazy='dynamic',  # a file can have thousands of paths -> query only the paths that are needed
+    )
+
+    def get_virtual_file_paths(self, root_uid: str | None = None) -> dict[str, list[str]]:
+        """
+        Get the virtual file paths of the file (root UID -> list of paths). If ``root_uid`` is set, only the paths in
+        this firmware are loaded.
+        """
+        query = self.virtual_file_path_entries
+        if root_uid is not None:
+            query = query.filter(VirtualFilePathEntry.root_uid == root_uid)
+        vfp_dict = {}
+        for entry in query:
+            vfp_dict.setdefault(entry.root_uid, []).append(entry.virtual_path)
+        return vfp_dict
+
+    def get_root_uids(self) -> set[str]:
+        """
+        Get the UIDs of all firmware that contain the file (the roots of its virtual file paths).
+        """
+        query = self.virtual_file_path_entries.with_entities(VirtualFilePathEntry.root_uid).order_by(None).distinct()
+        return {root_uid for root_uid, in query}
 
     def get_included_uids(self) -> set[str]:
         return {child.uid for child in self.included_files}
@@ -125,6 +204,27 @@ class FileObjectEntry(Base):
         return f'FileObject({self.uid}, {self.file_name}, {self.is_firmware})'
 
 
+class VirtualFilePathEntry(Base):
+    """
+    A virtual file path (e.g. ``|root_uid|parent_uid|/path/to/file``) of a file in a firmware. A file has one path per
+    occurrence, so common files (e.g. libc) can have thousands of them. The root and parent UID are the first and the
+    last UID of the path and are stored separately, so that the paths of a file in one firmware or in one container
+    can be queried with an index. Paths can be too long for a btree index, so the key contains the SHA256 hash of the
+    path instead of the path itself.
+    """
+
+    __tablename__ = 'virtual_file_path'
+
+    file_uid = Column(UID, ForeignKey('file_object.uid', ondelete='CASCADE'), primary_key=True)
+    root_uid = Column(UID, primary_key=True, index=True)
+    path_hash = Column(CHAR(64), primary_key=True)
+    parent_uid = Column(UID, nullable=False, index=True)
+    virtual_path = Column(VARCHAR, nullable=False)
+
+    def __repr__(self) -> str:
+        return f'VirtualFilePath({self.file_uid}, {self.virtual_path})'
+
+
 class FirmwareEntry(Base):
     __tablename__ = 'firmware'
 
@@ -171,6 +271,17 @@ class WebInterfaceTemplateEntry(Base):
     template = Column(LargeBinary, nullable=False)
 
 
+@event.listens_for(Session, 'before_flush')
+def collect_orphan_candidates(session, *_):
+    """
+    Remember the included files of file_object DB entries that are about to be deleted. Only these files can become
+    orphans by the deletion (see ``delete_file_orphans``).
+    """
+    for deleted_object in session.deleted:
+        if isinstance(deleted_object, FileObjectEntry):
+            session.info.setdefault('orphan_candidates', {})[deleted_object.uid] = deleted_object.get_included_uids()
+
+
 @event.listens_for(Session, 'persistent_to_deleted')
 def delete_file_orphans(session, deleted_object):
     """
@@ -180,7 +291,12 @@ def delete_file_orphans(session, deleted_object):
     we need this event, that is triggered each time an object from the DB is deleted.
     """
     if isinstance(deleted_object, FileObjectEntry):
-        query = select(FileObjectEntry).filter(~FileObjectEntry.parent_files.any(), ~FileObjectEntry.is_firmware)
+        candidates = session.info.get('orphan_candidates', {}).pop(deleted_object.uid, None)
+        if not candidates:
+            return
+        query = select(FileObjectEntry).filter(
+            FileObjectEntry.uid.in_(candidates), ~FileObjectEntry.parent_files.any(), ~FileObjectEntry.is_firmware
+        )
         for item in session.execute(query).scalars():
             logging.debug(f'deletion of {deleted_object} triggers deletion of {item} (cascade)')
             session.delete(item)
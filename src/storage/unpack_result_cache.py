@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from config import cfg
+
+
+class CachedUnpackResult(NamedTuple):
+    meta: dict  # the contents of the ``reports/meta.json`` of the extractor (the result of the unpacker "plugin")
+    files: list[tuple[str, str]]  # the UIDs and paths (relative to the extraction directory) of the extracted files
+
+
+def get_unpack_result_cache() -> UnpackResultCache | None:
+    '''
+    :return: The unpack result cache if it is enabled in the config (``unpack-cache-directory``) or ``None`` otherwise.
+    '''
+    if not cfg.data_storage.unpack_cache_directory:
+        return None
+    return UnpackResultCache(cfg.data_storage.unpack_cache_directory)
+
+
+class UnpackResultCache:
+    '''
+    A persistent cache of the extraction results of containers (e.g. a squashfs image that is part of many firmware
+    versions). If a container is extracted again, the extracted files (which are already in the file storage) can be
+    taken from the cache instead of running the extractor and hashing all files again. Each result is stored together
+    with the version of the extractor that produced it and is only used with the same extractor version.
+
+    :param cache_dir: The directory of the cache.
+    '''
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, uid: str, extractor_version: str) -> CachedUnpackResult | None:
+        '''
+        Get the extraction result of a container.
+
+        :param uid: The UID of the container.
+        :param extractor_version: The current version of the extractor.
+        :return: The cached result or ``None`` if there is no result of this extractor version.
+        '''
+        try:
+            entry = json.loads(self._get_path(uid).read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            logging.warning(f'Could not read cached unpack result of {uid}: {error}')
+            return None
+        if entry.get('extractor_version') != extractor_version:  # the extractor was updated
+            return None
+        return CachedUnpackResult(entry['meta'], [tuple(item) for item in entry['files']])
+
+    def add(self, uid: str, extractor_version: str, result: CachedUnpackResult):
+        '''
+        Store the extraction result of a container (an existing result is replaced).
+
+        :param uid: The UID of the container.
+        :param extractor_version: The version of the extractor that produced the result.
+        :param result: The extraction result.
+        '''
+        path = self._get_path(uid)
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+        entry = {'extractor_version': extractor_version, 'meta': result.meta, 'files': result.files}
+        try:
+            tmp_path.write_text(json.dumps(entry))
+            tmp_path.rename(path)
+        except (OSError, TypeError, ValueError) as error:  # the cache is optional, so this is not an error
+            logging.warning(f'Could not store unpack result of {uid} in the cache: {error}')
+
+    def _get_path(self, uid: str) -> Path:
+        return self.cache_dir / uid[:2] / f'{uid}.json'
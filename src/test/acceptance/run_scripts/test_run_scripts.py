@@ -51,6 +51,11 @@ def test_start_scripts_with_main(script, create_tables):
     gc.collect()
 
 
+def test_update_statistic_with_reconciliation(create_tables):
+    assert update_statistic.main(['update_statistic', '-t', '--reconcile-counters']) == 0
+    gc.collect()
+
+
 @pytest.mark.skip(reason='Not working in CI')
 def test_fact_complete_start():
     cmd_process = subprocess.run(
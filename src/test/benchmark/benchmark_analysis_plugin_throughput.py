@@ -0,0 +1,88 @@
+'''
+Benchmark the throughput (files/s) of analysis plugin workers.
+
+Compares the persistent analysis processes (``current``) with the previous behaviour of starting a new process and a
+``multiprocessing.Manager`` list for each (file, plugin) pair (``legacy``).
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_analysis_plugin_throughput [--files 500] [--size 4096]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+from multiprocessing import Manager
+from time import time
+
+import config
+from analysis.PluginBase import AnalysisBasePlugin
+from helperFunctions.process import ExceptionSafeProcess, terminate_process_and_children
+from objects.file import FileObject
+from plugins.analysis.dummy.code.dummy import AnalysisPlugin as DummyPlugin
+from plugins.analysis.hash.code.hash import AnalysisPlugin as FileHashesPlugin
+from test.common_helper import CommonDatabaseMock
+
+PLUGINS = [DummyPlugin, FileHashesPlugin]
+
+
+class _LegacyWorkerMixin:
+    '''Reimplementation of the old "one process per task" behaviour for comparison.'''
+
+    def __init__(self, *args, **kwargs):
+        self.manager = Manager()
+        super().__init__(*args, **kwargs)
+
+    def shutdown(self):
+        super().shutdown()
+        self.manager.shutdown()
+
+    def worker_processing_with_timeout(self, worker_id, next_task, task_process):  # pylint: disable=unused-argument
+        result = self.manager.list()
+        process = ExceptionSafeProcess(target=lambda: result.append(self.process_next_object(next_task)))
+        process.start()
+        process.join(timeout=self.TIMEOUT)
+        if process.is_alive() or process.exception:
+            terminate_process_and_children(process)
+            self._handle_failed_analysis(next_task, worker_id, 'Timeout' if process.is_alive() else 'Exception')
+        else:
+            self.out_queue.put(result.pop())
+
+
+def _get_plugin_class(plugin_class: type[AnalysisBasePlugin], legacy: bool) -> type[AnalysisBasePlugin]:
+    if not legacy:
+        return plugin_class
+    return type(f'Legacy{plugin_class.__name__}', (_LegacyWorkerMixin, plugin_class), {})
+
+
+def measure_throughput(plugin_class: type[AnalysisBasePlugin], files: list[FileObject], legacy: bool) -> float:
+    plugin = _get_plugin_class(plugin_class, legacy)(view_updater=CommonDatabaseMock())
+    try:
+        start = time()
+        for fo in files:
+            plugin.in_queue.put(fo)  # bypass `add_job` so that dependencies are not checked
+        for _ in files:
+            plugin.out_queue.get(timeout=60)
+        return len(files) / (time() - start)
+    finally:
+        plugin.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, default=500, help='number of files to analyze')
+    parser.add_argument('-s', '--size', type=int, default=4096, help='size of each file in bytes')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+
+    files = [FileObject(binary=os.urandom(args.size)) for _ in range(args.files)]
+    print(f'{"plugin":<32}{"legacy [files/s]":>20}{"current [files/s]":>20}{"speedup":>10}')
+    for plugin_class in PLUGINS:
+        before = measure_throughput(plugin_class, files, legacy=True)
+        after = measure_throughput(plugin_class, files, legacy=False)
+        print(f'{plugin_class.NAME:<32}{before:>20.1f}{after:>20.1f}{after / before:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
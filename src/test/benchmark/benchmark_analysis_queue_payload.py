@@ -0,0 +1,95 @@
+'''
+Benchmark the queue throughput and peak memory usage of passing file objects to analysis plugins.
+
+Compares sending the binary through the queues to each plugin and back (``with binary``) with sending file objects
+without binary and loading it from the file storage in the analysis process (``without binary``). Each plugin is
+simulated by a process that receives the file objects from its own queue and sends them back through a shared queue.
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_analysis_queue_payload [--files 20] [--size 50] [--plugins 4]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+import resource
+from multiprocessing import Pipe, Process, Queue
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import time
+
+from common_helper_files import get_binary_from_file
+
+from objects.file import FileObject
+
+
+def _plugin_process(in_queue: Queue, out_queue: Queue, file_count: int):
+    for _ in range(file_count):
+        fo = in_queue.get()
+        binary_was_loaded = fo.binary is None
+        if binary_was_loaded:  # same as in AnalysisBasePlugin.process_next_object
+            fo.binary = get_binary_from_file(fo.file_path)
+        fo.processed_analysis['size'] = len(fo.binary)
+        if binary_was_loaded:
+            fo.binary = None
+        out_queue.put(fo)
+    out_queue.put(_get_peak_rss())
+
+
+def _get_peak_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run_scenario(file_path: str, file_count: int, plugin_count: int, with_binary: bool, connection):
+    fo = FileObject(file_path=file_path)
+    if not with_binary:
+        fo.binary = None
+    in_queues = [Queue() for _ in range(plugin_count)]
+    out_queue = Queue()
+    processes = [Process(target=_plugin_process, args=(queue, out_queue, file_count)) for queue in in_queues]
+    for process in processes:
+        process.start()
+
+    start = time()
+    for _ in range(file_count):
+        for queue in in_queues:
+            queue.put(fo)
+    results = [out_queue.get() for _ in range(file_count * plugin_count + plugin_count)]
+    duration = time() - start
+
+    for process in processes:
+        process.join()
+    plugin_rss = sum(result for result in results if isinstance(result, int))
+    connection.send((file_count * plugin_count / duration, _get_peak_rss(), plugin_rss))
+
+
+def measure(file_path: str, file_count: int, plugin_count: int, with_binary: bool) -> tuple[float, int, int]:
+    # each scenario runs in a new process so that the peak RSS values are not influenced by the other scenario
+    receiving_end, sending_end = Pipe()
+    process = Process(target=_run_scenario, args=(file_path, file_count, plugin_count, with_binary, sending_end))
+    process.start()
+    result = receiving_end.recv()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, default=20, help='number of files')
+    parser.add_argument('-s', '--size', type=int, default=50, help='size of each file in MiB')
+    parser.add_argument('-p', '--plugins', type=int, default=4, help='number of plugins')
+    args = parser.parse_args()
+
+    with TemporaryDirectory(prefix='fact_benchmark_') as tmp_dir:
+        file_path = Path(tmp_dir) / 'test_file'
+        file_path.write_bytes(os.urandom(args.size * 2**20))
+        print(f'{args.files} files of {args.size} MiB, {args.plugins} plugins')
+        print(f'{"":<16}{"throughput [files/s]":>22}{"peak RSS scheduler [MiB]":>26}{"peak RSS plugins [MiB]":>24}')
+        for label, with_binary in [('with binary', True), ('without binary', False)]:
+            throughput, scheduler_rss, plugin_rss = measure(str(file_path), args.files, args.plugins, with_binary)
+            print(f'{label:<16}{throughput:>22.1f}{scheduler_rss / 2**20:>26.1f}{plugin_rss / 2**20:>24.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Benchmark the throughput (results/s) of storing analysis results in the database.
+
+Compares storing each result on its own with ``BackendDbInterface.add_analysis`` (``single``) with storing batches of
+results with a single upsert with ``BackendDbInterface.add_analyses`` (as done by the ``AnalysisResultWriter``).
+The benchmark uses the test database (the tables are created before and dropped after the benchmark).
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_analysis_result_writer [--results 2000] [--batch-sizes 1 10 100 1000]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+from time import time
+
+import config
+from objects.file import FileObject
+from storage.db_connection import ReadWriteConnection
+from storage.db_interface_backend import BackendDbInterface
+from storage.db_setup import DbSetup
+from test.common_helper import clear_test_tables, setup_test_tables
+
+
+def _get_results(uid_list: list[str], plugin: str) -> list[tuple[str, str, dict]]:
+    return [
+        (uid, plugin, {'plugin_version': '1.0', 'analysis_date': time(), 'summary': ['foo'], 'result': 'bar' * 100})
+        for uid in uid_list
+    ]
+
+
+def measure(backend: BackendDbInterface, results: list[tuple[str, str, dict]], batch_size: int | None):
+    round_trips = backend.round_trips
+    start = time()
+    if batch_size is None:
+        for uid, plugin, analysis in results:
+            backend.add_analysis(uid, plugin, analysis)
+    else:
+        for index in range(0, len(results), batch_size):
+            backend.add_analyses(results[index : index + batch_size])
+    duration = time() - start
+    return len(results) / duration, (backend.round_trips - round_trips) / len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--results', type=int, default=2000, help='number of analysis results')
+    parser.add_argument('-b', '--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000], help='batch sizes')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+    test_db = config.cfg.data_storage.postgres_test_database
+
+    db_setup = DbSetup(db_name=test_db)
+    setup_test_tables(db_setup)
+    try:
+        backend = BackendDbInterface(connection=ReadWriteConnection(db_name=test_db))
+        file_objects = [FileObject(binary=os.urandom(32), file_name='benchmark') for _ in range(args.results)]
+        for fo in file_objects:
+            backend.insert_file_object(fo)
+        uid_list = [fo.uid for fo in file_objects]
+
+        print(f'{args.results} analysis results')
+        print(f'{"":<20}{"insert [results/s]":>20}{"update [results/s]":>20}{"round trips/result":>20}')
+        for batch_size in [None, *args.batch_sizes]:
+            label = 'single' if batch_size is None else f'batch size {batch_size}'
+            plugin = f'benchmark_{batch_size}'
+            insert_throughput, round_trips = measure(backend, _get_results(uid_list, plugin), batch_size)
+            update_throughput, _ = measure(backend, _get_results(uid_list, plugin), batch_size)
+            print(f'{label:<20}{insert_throughput:>20.1f}{update_throughput:>20.1f}{round_trips:>20.3f}')
+    finally:
+        clear_test_tables(db_setup)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+'''
+Benchmark the latency of DB queries with pooled connections and with a new connection for every session.
+
+Before the connection pools were shared, each session was invalidated after use, so that every query (or group of
+queries) opened a new connection to the database (``reconnect``). Now, sessions return their connection to the pool of
+the shared engine of the process (``pooled``). The benchmark executes typical queries of the frontend and the backend
+with both variants. It uses the test database (the tables are created before and dropped after the benchmark).
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_db_query_latency [--queries 1000]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+from statistics import mean, quantiles
+from time import perf_counter
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import config
+from objects.file import FileObject
+from storage.db_connection import ReadOnlyConnection, ReadWriteConnection
+from storage.db_interface_backend import BackendDbInterface
+from storage.db_interface_common import DbInterfaceCommon
+from storage.db_setup import DbSetup
+from test.common_helper import clear_test_tables, setup_test_tables
+
+
+def measure(query, arguments: list, connection_count: list[int]) -> tuple[list[float], float]:
+    latencies, connections = [], connection_count[0]
+    for argument in arguments:
+        start = perf_counter()
+        query(argument)
+        latencies.append(perf_counter() - start)
+    return latencies, (connection_count[0] - connections) / len(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--queries', type=int, default=1000, help='number of executions of each query')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+    test_db = config.cfg.data_storage.postgres_test_database
+
+    db_setup = DbSetup(db_name=test_db)
+    setup_test_tables(db_setup)
+    try:
+        backend = BackendDbInterface(connection=ReadWriteConnection(db_name=test_db))
+        db = DbInterfaceCommon(connection=ReadOnlyConnection(db_name=test_db))
+        file_objects = [FileObject(binary=os.urandom(32), file_name='benchmark') for _ in range(args.queries)]
+        for fo in file_objects:
+            backend.insert_file_object(fo)
+        uid_list = [fo.uid for fo in file_objects]
+
+        connection_count = [0]  # the number of connections opened to the database
+
+        def _count_connection(*_):
+            connection_count[0] += 1
+
+        event.listen(db.connection.engine, 'connect', _count_connection)
+        queries = {
+            'exists': db.exists,
+            'get_object': db.get_object,
+            'get_analysis': lambda uid: db.get_analysis(uid, 'file_type'),
+        }
+        print(f'{args.queries} executions of each query')
+        print(f'{"query":<20}{"":<12}{"mean [ms]":>12}{"p50 [ms]":>12}{"p99 [ms]":>12}{"connections/query":>20}')
+        for label, query in queries.items():
+            for variant in ['reconnect', 'pooled']:
+                if variant == 'reconnect':  # the old behaviour: the connection is discarded after each session
+                    with patch.object(Session, 'close', Session.invalidate):
+                        latencies, connections = measure(query, uid_list, connection_count)
+                else:
+                    query(uid_list[0])  # warm up the pool
+                    latencies, connections = measure(query, uid_list, connection_count)
+                percentiles = quantiles(latencies, n=100)
+                print(
+                    f'{label:<20}{variant:<12}{mean(latencies) * 1000:>12.3f}{percentiles[49] * 1000:>12.3f}'
+                    f'{percentiles[98] * 1000:>12.3f}{connections:>20.3f}'
+                )
+    finally:
+        clear_test_tables(db_setup)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Benchmark the unpacking throughput (archives/s) with a new extractor container for every file and with a
+long-running extractor container (see ``unpacker.extraction_container.ExtractionContainer``).
+
+The benchmark extracts a number of small (nested) archives, since the start-up time of the container dominates the
+unpacking time for small files. Docker and the extractor image are required.
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_extractor_throughput [--archives 50] [--files 5]
+'''
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import time
+
+import config
+from unpacker.extraction_container import ExtractionContainer
+from unpacker.unpack_base import UnpackBase
+
+
+def _create_archive(path: Path, file_count: int):
+    inner = io.BytesIO()
+    with zipfile.ZipFile(inner, 'w') as inner_archive:
+        inner_archive.writestr('nested.txt', os.urandom(64).hex())
+    with zipfile.ZipFile(path, 'w') as archive:
+        for index in range(file_count):
+            archive.writestr(f'file_{index}.bin', os.urandom(1024))
+        archive.writestr('nested.zip', inner.getvalue())
+
+
+def _unpack_all(unpacker: UnpackBase, archives: list[Path]) -> float:
+    start = time()
+    for archive in archives:
+        with TemporaryDirectory(dir=unpacker.get_tmp_dir_base()) as tmp_dir:
+            assert unpacker.extract_files_from_file(str(archive), tmp_dir), f'extraction of {archive} failed'
+    return time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--archives', type=int, default=50, help='number of archives')
+    parser.add_argument('-f', '--files', type=int, default=5, help='number of files in each archive')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+
+    with TemporaryDirectory() as tmp_dir:
+        archives = [Path(tmp_dir) / f'archive_{index}.zip' for index in range(args.archives)]
+        for archive in archives:
+            _create_archive(archive, args.files)
+
+        duration_new = _unpack_all(UnpackBase(), archives)
+
+        container = ExtractionContainer(0)
+        start = time()
+        container.start()
+        startup = time() - start
+        try:
+            duration_persistent = _unpack_all(UnpackBase(extraction_container=container), archives)
+        finally:
+            container.stop()
+
+    print(f'{"mode":<32}{"duration [s]":>14}{"archives/s":>12}')
+    print(f'{"new container per archive":<32}{duration_new:>14.2f}{args.archives / duration_new:>12.1f}')
+    print(f'{"long-running container":<32}{duration_persistent:>14.2f}{args.archives / duration_persistent:>12.1f}')
+    print(f'\nstart-up of the long-running container: {startup:.2f} s')
+    print(f'speedup: {duration_new / duration_persistent:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+'''
+Benchmark the cost of updating the firmware aggregates (``update_firmware_aggregates``) on the write path.
+
+Stores analysis results of files that are included in one or more firmware with ``BackendDbInterface.add_analyses``
+with and without updating the aggregates (the update is replaced by a no-op) and measures the time of creating the
+aggregates of existing firmware (``DbSetup.migrate_tables``). The benchmark uses the test database (the tables are
+created before and dropped after the benchmark).
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_firmware_aggregates [--files 2000] [--firmware 1 5] [--batch-size 100]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+from time import time
+from unittest import mock
+
+import config
+from objects.file import FileObject
+from objects.firmware import Firmware
+from storage.db_connection import ReadWriteConnection
+from storage.db_interface_backend import BackendDbInterface
+from storage.db_setup import DbSetup
+from storage.schema import firmware_aggregate_table, summary_counter_table
+from test.common_helper import clear_test_tables, create_test_firmware, setup_test_tables
+
+PLUGIN = 'crypto_material'  # a plugin with summary counters
+
+
+def _create_firmware(backend: BackendDbInterface, file_objects: list[FileObject], firmware_count: int):
+    for _ in range(firmware_count):
+        firmware: Firmware = create_test_firmware()
+        firmware.set_binary(os.urandom(32))
+        backend.insert_object(firmware)
+        for fo in file_objects:
+            fo.parents, fo.parent_firmware_uids = [firmware.uid], {firmware.uid}
+            fo.virtual_file_path = {firmware.uid: [f'|{firmware.uid}|/{fo.file_name}']}
+        backend.add_unpacked_objects(firmware, file_objects)
+
+
+def _store_results(backend: BackendDbInterface, uid_list: list[str], batch_size: int) -> float:
+    results = [
+        (uid, PLUGIN, {'plugin_version': '1.0', 'analysis_date': time(), 'summary': [f'item {index % 10}']})
+        for index, uid in enumerate(uid_list)
+    ]
+    start = time()
+    for index in range(0, len(results), batch_size):
+        backend.add_analyses(results[index : index + batch_size])
+    return len(results) / (time() - start)
+
+
+def _measure_backfill(db_setup: DbSetup) -> float:
+    with db_setup.get_read_write_session() as session:
+        session.execute(firmware_aggregate_table.delete())
+        session.execute(summary_counter_table.delete())
+    start = time()
+    db_setup.migrate_tables()
+    return time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, default=2000, help='number of files')
+    parser.add_argument('-f', '--firmware', type=int, nargs='+', default=[1, 5], help='number of firmware per file')
+    parser.add_argument('-b', '--batch-size', type=int, default=100, help='number of results stored at once')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+    test_db = config.cfg.data_storage.postgres_test_database
+
+    print(f'{args.files} analysis results (batch size {args.batch_size})')
+    print(f'{"firmware per file":<20}{"without [results/s]":>22}{"with [results/s]":>20}{"backfill [s]":>14}')
+    for firmware_count in args.firmware:
+        db_setup = DbSetup(db_name=test_db)
+        setup_test_tables(db_setup)
+        try:
+            backend = BackendDbInterface(connection=ReadWriteConnection(db_name=test_db))
+            file_objects = [FileObject(binary=os.urandom(32), file_name=f'file_{i}') for i in range(args.files)]
+            _create_firmware(backend, file_objects, firmware_count)
+            uid_list = [fo.uid for fo in file_objects]
+            _store_results(backend, uid_list, args.batch_size)  # both measurements update existing results
+
+            with mock.patch('storage.db_interface_backend.update_firmware_aggregates', lambda *_, **__: None):
+                without_aggregates = _store_results(backend, uid_list, args.batch_size)
+            with_aggregates = _store_results(backend, uid_list, args.batch_size)
+            backfill = _measure_backfill(db_setup)
+            print(f'{firmware_count:<20}{without_aggregates:>22.1f}{with_aggregates:>20.1f}{backfill:>14.2f}')
+        finally:
+            clear_test_tables(db_setup)
+
+
+if __name__ == '__main__':
+    main()
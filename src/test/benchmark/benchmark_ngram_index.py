@@ -0,0 +1,127 @@
+'''
+Benchmark the n-gram index of the binary search (index size overhead and search speedup).
+
+The benchmark stores a corpus of files in a temporary file storage and indexes them with ``NgramIndex``. Afterwards,
+binary searches with different rules are executed with and without the index (the results must be identical). By
+default, a synthetic corpus is used that resembles the files of a firmware: text files, executables (low entropy code
+with a limited set of instructions) and compressed data (high entropy). A real corpus can be used with ``--files-dir``.
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_ngram_index [--files 2000] [--size 256] [--workers 4] [--files-dir DIR]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+import random
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import time
+
+import config
+from helperFunctions.hash import get_sha256
+from helperFunctions.yara_binary_search import YaraBinarySearchScanner
+from helperFunctions.yara_prefilter import get_ngram_query
+from storage.ngram_index import NgramIndex
+
+RULES = {
+    'rare string': b'rule rare { strings: $a = "rare needle 1234" condition: $a }',
+    'common string': b'rule common { strings: $a = "password" condition: $a }',
+    'hex string': b'rule hex { strings: $a = { 13 37 C0 DE ?? 00 BE EF } condition: $a }',
+    'two rules': b'rule a { strings: $a = "rare needle" condition: $a } rule b { strings: $b = "admin:" condition: $b }',
+    'regex (no atoms)': b'rule regex { strings: $a = /rare needle [0-9]+/ condition: $a }',
+}
+
+
+def _generate_file(index: int, size: int, words: list[bytes], instructions: list[bytes]) -> bytes:
+    kind = index % 4
+    if kind in (0, 1):  # text
+        binary = b' '.join(random.choices(words, k=size // 6))[:size]
+    elif kind == 2:  # code
+        binary = b''.join(random.choices(instructions, k=size // 4))
+    else:  # compressed
+        binary = os.urandom(size)
+    if index % 100 == 0:
+        binary += b'rare needle 1234'
+    if index % 100 == 1:
+        binary += b'\x13\x37\xc0\xde\x42\x00\xbe\xef'
+    return binary
+
+
+def _create_synthetic_corpus(file_count: int, file_size: int) -> list[bytes]:
+    random.seed(0)
+    words = [bytes(random.choices(b'abcdefghijklmnopqrstuvwxyz', k=random.randint(2, 10))) for _ in range(5000)]
+    words.extend([b'password', b'admin:', b'root'])
+    instructions = [os.urandom(4) for _ in range(512)]
+    return [_generate_file(index, file_size, words, instructions) for index in range(file_count)]
+
+
+def _store_files(storage_dir: Path, binaries: list[bytes]):
+    for binary in binaries:
+        uid = f'{get_sha256(binary)}_{len(binary)}'
+        path = storage_dir / uid[:2] / uid
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(binary)
+
+
+def _get_dir_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.glob('**/*') if path.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, default=2000, help='number of files of the synthetic corpus')
+    parser.add_argument('-s', '--size', type=int, default=256, help='file size of the synthetic corpus in KiB')
+    parser.add_argument('-d', '--files-dir', default=None, help='directory with a corpus of files (recursive)')
+    parser.add_argument('-w', '--workers', type=int, default=4, help='worker processes of the binary search')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+
+    if args.files_dir:
+        binaries = [path.read_bytes() for path in Path(args.files_dir).rglob('*') if path.is_file()]
+    else:
+        binaries = _create_synthetic_corpus(args.files, args.size * 1024)
+
+    with TemporaryDirectory() as tmp_dir:
+        storage_dir, index_dir = Path(tmp_dir) / 'files', Path(tmp_dir) / 'index'
+        storage_dir.mkdir()
+        _store_files(storage_dir, binaries)
+        config.cfg.data_storage.firmware_file_storage_directory = str(storage_dir)
+
+        start = time()
+        index = NgramIndex(str(index_dir))
+        for path in storage_dir.glob('*/*'):
+            index.add_file(path.name, path.read_bytes())
+        index.flush()
+        duration = time() - start
+        storage_size, index_size = _get_dir_size(storage_dir), index.get_size()
+        print(f'corpus: {len(binaries)} files, {storage_size / 2**20:.1f} MiB')
+        print(f'index: {index_size / 2**20:.1f} MiB ({index_size / storage_size:.0%} of the corpus)')
+        print(f'indexing: {duration:.2f} s ({storage_size / 2**20 / duration:.1f} MiB/s)\n')
+
+        scanner = YaraBinarySearchScanner(worker_count=args.workers)
+        print(f'{"rules":<20}{"without index [s]":>19}{"with index [s]":>16}{"speedup":>9}{"scanned":>9}{"matches":>9}')
+        for label, rules in RULES.items():
+            scanner.ngram_index = None
+            start = time()
+            expected_result = scanner.get_binary_search_result((rules, None))
+            duration_without_index = time() - start
+
+            scanner.ngram_index = index
+            start = time()
+            result = scanner.get_binary_search_result((rules, None))
+            duration_with_index = time() - start
+            assert result == expected_result, 'the results with and without index should be identical'
+
+            excluded = len(index.get_excluded_files(get_ngram_query(rules.decode())))
+            matches = len({uid for uid_list in result.values() for uid in uid_list})
+            print(
+                f'{label:<20}{duration_without_index:>19.2f}{duration_with_index:>16.2f}'
+                f'{duration_without_index / duration_with_index:>8.1f}x{len(binaries) - excluded:>9}{matches:>9}'
+            )
+
+
+if __name__ == '__main__':
+    main()
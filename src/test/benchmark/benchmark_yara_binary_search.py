@@ -0,0 +1,111 @@
+'''
+Benchmark the duration of a binary search (YARA search over the whole file storage or the files of a firmware).
+
+Compares the previous implementation of ``YaraBinarySearchScanner`` with the sharded search with a pool of worker
+processes and yara-python (with different numbers of worker processes). The previous implementation scanned the whole
+file storage with a single ``yara -r`` process and the files of a single firmware with one ``yara`` process per file.
+The benchmark creates a temporary file storage with random files (the files of the "firmware" are the first tenth of
+the files). The previous implementation requires the YARA command line tool.
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_yara_binary_search [--files 2000] [--size 256] [--workers 1 2 4 8]
+'''
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import time
+
+import config
+from helperFunctions.hash import get_sha256
+from helperFunctions.yara_binary_search import YaraBinarySearchScanner
+
+RULES = b'''
+rule search_string { strings: $a = "binary search benchmark" condition: $a }
+rule search_hex { strings: $a = { 7F 45 4C 46 ?? 01 01 } condition: $a }
+rule search_regex { strings: $a = /[a-z]{4}-[0-9]{4}-[a-z]{4}/ condition: $a }
+'''
+
+
+def _create_file_storage(storage_dir: Path, file_count: int, file_size: int):
+    for index in range(file_count):
+        binary = os.urandom(file_size)
+        if index % 10 == 0:
+            binary += b'binary search benchmark'
+        uid = f'{get_sha256(binary)}_{len(binary)}'
+        path = storage_dir / uid[:2] / uid
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(binary)
+
+
+def _search_with_subprocess(rule_file: Path, storage_dir: Path) -> int:
+    output = subprocess.run(['yara', '-r', str(rule_file), str(storage_dir)], capture_output=True, text=True).stdout
+    return len({line.split(' ')[1] for line in output.splitlines()})
+
+
+def _search_single_firmware_with_subprocess(rule_file: Path, file_paths: list[str]) -> int:
+    matches = set()
+    for path in file_paths:
+        output = subprocess.run(['yara', str(rule_file), path], capture_output=True, text=True).stdout
+        matches.update(line.split(' ')[1] for line in output.splitlines())
+    return len(matches)
+
+
+def _search_with_scanner(worker_count: int, firmware_files: list[str] | None = None) -> int:
+    scanner = YaraBinarySearchScanner(worker_count=worker_count)
+    scanner._get_file_paths_of_files_included_in_fw = lambda _: firmware_files  # pylint: disable=protected-access
+    result = scanner.get_binary_search_result((RULES, None if firmware_files is None else 'firmware_uid'))
+    return len({uid for uid_list in result.values() for uid in uid_list})
+
+
+def _run_scenarios(scenarios: list[tuple[str, Callable[[], int]]], file_count: int):
+    print(f'{"":<24}{"duration [s]":>14}{"files/s":>12}{"matches":>10}')
+    for label, search in scenarios:
+        start = time()
+        matches = search()
+        duration = time() - start
+        print(f'{label:<24}{duration:>14.2f}{file_count / duration:>12.1f}{matches:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', '--files', type=int, default=2000, help='number of files in the file storage')
+    parser.add_argument('-s', '--size', type=int, default=256, help='file size in KiB')
+    parser.add_argument('-w', '--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='worker processes')
+    parser.add_argument('-C', '--config_file', default=None, help='path to config file')
+    args = parser.parse_args()
+    config.load(args.config_file)
+
+    with TemporaryDirectory() as tmp_dir:
+        storage_dir = Path(tmp_dir) / 'files'
+        storage_dir.mkdir()
+        _create_file_storage(storage_dir, args.files, args.size * 1024)
+        rule_file = Path(tmp_dir) / 'rules.yara'
+        rule_file.write_bytes(RULES)
+        config.cfg.data_storage.firmware_file_storage_directory = str(storage_dir)
+
+        print(f'whole file storage: {args.files} files of {args.size} KiB')
+        scenarios = [('yara -r', lambda: _search_with_subprocess(rule_file, storage_dir))]
+        scenarios.extend(
+            (f'{workers} worker processes', lambda workers=workers: _search_with_scanner(workers))
+            for workers in args.workers
+        )
+        _run_scenarios(scenarios, args.files)
+
+        firmware_files = sorted(str(path) for path in storage_dir.glob('*/*'))[: args.files // 10]
+        print(f'\nsingle firmware: {len(firmware_files)} files of {args.size} KiB')
+        scenarios = [('yara for each file', lambda: _search_single_firmware_with_subprocess(rule_file, firmware_files))]
+        scenarios.extend(
+            (f'{workers} worker processes', lambda workers=workers: _search_with_scanner(workers, firmware_files))
+            for workers in args.workers
+        )
+        _run_scenarios(scenarios, len(firmware_files))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+'''
+Benchmark the per-file latency of the YARA based analysis plugins.
+
+Compares calling the YARA command line tool for each file (``subprocess``, the previous implementation of
+``YaraBasePlugin.process_object`` without parsing the output) with scanning the file with yara-python and rules that
+are loaded only once (``in-process``). Requires compiled signatures (``compile_yara_signatures.py``) and for the
+``subprocess`` scenario the YARA command line tool.
+
+Additionally, scanning each file once with the fused signatures of all plugins (``YaraScanStage``) is compared with
+scanning it with the signatures of each plugin separately (``all plugins``, only the in-process scan).
+
+Usage (from the ``src`` directory)::
+
+    python3 -m test.benchmark.benchmark_yara_plugin_latency [--files-dir test/data] [--max-size 10]
+'''
+from __future__ import annotations
+
+import argparse
+import subprocess
+from multiprocessing import Queue
+from pathlib import Path
+from statistics import mean, quantiles
+from time import perf_counter
+
+from analysis.YaraPluginBase import YaraBasePlugin
+from helperFunctions.fileSystem import get_src_dir
+from scheduler.yara_scan import YaraScanStage
+
+PLUGINS = ['crypto_hints', 'crypto_material', 'known_vulnerabilities', 'software_components']
+
+
+class _BenchmarkYaraPlugin(YaraBasePlugin):
+    '''Only the YARA scan of the plugin (without starting analysis processes or plugin specific post-processing).'''
+
+    def __init__(self, plugin_name: str):  # pylint: disable=super-init-not-called
+        self.NAME = plugin_name  # pylint: disable=invalid-name
+        self.FILE = str(Path(get_src_dir()) / 'plugins' / 'analysis' / plugin_name / 'code' / f'{plugin_name}.py')
+        self.signature_path = self._get_signature_file(self.FILE)
+        self._rules = None
+        self._hex_strings = set()
+
+
+class _FileMock:
+    def __init__(self, path: Path):
+        self.uid = path.name
+        self.file_path = str(path)
+        self.binary = path.read_bytes()
+        self.processed_analysis = {}
+        self.temporary_data = {}
+
+
+def _scan_with_subprocess(signature_path: str, file_path: str):
+    command = ['yara', '-C', '--print-meta', '--print-strings', signature_path, file_path]
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+        process.stdout.read().decode()
+
+
+def _measure(function, files: list[_FileMock]) -> tuple[float, float]:
+    latencies = []
+    for file in files:
+        start = perf_counter()
+        function(file)
+        latencies.append((perf_counter() - start) * 1000)
+    return mean(latencies), quantiles(latencies, n=20)[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-d', '--files-dir', default='test/data', help='directory with test files (recursive)')
+    parser.add_argument('-s', '--max-size', type=int, default=10, help='maximum file size in MiB')
+    args = parser.parse_args()
+
+    paths = [p for p in Path(args.files_dir).rglob('*') if p.is_file() and p.stat().st_size <= args.max_size * 2**20]
+    files = [_FileMock(path) for path in paths]
+    print(f'{len(files)} files from {args.files_dir}, latency per file in ms')
+    print(f'{"plugin":<24}{"subprocess mean":>18}{"p95":>10}{"in-process mean":>18}{"p95":>10}{"speedup":>10}')
+    plugins = {}
+    for plugin_name in PLUGINS:
+        plugin = _BenchmarkYaraPlugin(plugin_name)
+        if not Path(plugin.signature_path).is_file():
+            print(f'{plugin_name:<24}signature file not found')
+            continue
+        legacy_mean, legacy_p95 = _measure(lambda fo: _scan_with_subprocess(plugin.signature_path, fo.file_path), files)
+        plugin._get_rules()  # pylint: disable=protected-access
+        current_mean, current_p95 = _measure(plugin.process_object, files)
+        print(
+            f'{plugin_name:<24}{legacy_mean:>18.2f}{legacy_p95:>10.2f}{current_mean:>18.2f}{current_p95:>10.2f}'
+            f'{legacy_mean / current_mean:>9.1f}x'
+        )
+        plugins[plugin_name] = plugin
+
+    yara_scan_stage = YaraScanStage(plugins, Queue(), worker_count=1)
+    if not yara_scan_stage.enabled:
+        print('fused signatures not found')
+        return
+    print(f'\n{"":<24}{"all plugins mean":>18}{"p95":>10}{"fused scan mean":>18}{"p95":>10}{"speedup":>10}')
+    separate_mean, separate_p95 = _measure(
+        lambda fo: [plugin.process_object(fo) for plugin in yara_scan_stage.plugins.values()], files
+    )
+    yara_scan_stage.scan(files[0])  # load the rules
+    fused_mean, fused_p95 = _measure(yara_scan_stage.scan, files)
+    print(
+        f'{len(yara_scan_stage.plugins)} plugins{"":<15}{separate_mean:>18.2f}{separate_p95:>10.2f}{fused_mean:>18.2f}'
+        f'{fused_p95:>10.2f}{separate_mean / fused_mean:>9.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
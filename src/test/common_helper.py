@@ -170,6 +170,9 @@ class CommonDatabaseMock:  # pylint: disable=too-many-public-methods
     def get_number_of_total_matches(self, *_, **__):
         return 10
 
+    def generic_search_page(self, search_dict, limit, cursor=None, skip=0, **kwargs):
+        return self.generic_search(search_dict, skip, limit, **kwargs), None
+
     def exists(self, uid):
         return uid in (self.fw_uid, self.fo_uid, self.fw2_uid, 'error')
 
@@ -259,6 +262,8 @@ def store_binary_on_file_system(tmp_dir: str, test_object: FileObject | Firmware
 
 def setup_test_tables(db_setup):
     db_setup.connection.create_tables()
+    db_setup.migrate_tables()
+    db_setup.create_indexes()
     db_setup.set_table_privileges()
 
 
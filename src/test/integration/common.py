@@ -22,6 +22,8 @@ class MockFSOrganizer:
 
 
 class MockDbInterface:
+    round_trips = 0
+
     def __init__(self, *_, **__):
         self._objects = {}
 
@@ -31,5 +33,11 @@ class MockDbInterface:
     def get_analysis(self, *_):
         pass
 
+    def get_analyses(self, *_):
+        return {}
+
+    def get_analysis_metadata(self, *_):
+        return {}
+
     def get_specific_fields_of_db_entry(self, uid, field_dict):
         pass
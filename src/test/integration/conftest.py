@@ -49,6 +49,9 @@ class MockDataStorage(BaseModel, extra=Extra.forbid):
     postgres_admin_user: str
     postgres_admin_pw: str
 
+    postgres_pool_size: int = 1
+    postgres_max_overflow: int = 4
+
     redis_fact_db: str
     redis_test_db: str
     redis_host: str
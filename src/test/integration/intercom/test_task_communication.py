@@ -8,6 +8,7 @@ import pytest
 from intercom.back_end_binding import (
     InterComBackEndAnalysisPlugInsPublisher,
     InterComBackEndAnalysisTask,
+    InterComBackEndBinarySearchTask,
     InterComBackEndCompareTask,
     InterComBackEndFileDiffTask,
     InterComBackEndPeekBinaryTask,
@@ -16,6 +17,7 @@ from intercom.back_end_binding import (
     InterComBackEndSingleFileTask,
     InterComBackEndTarRepackTask,
 )
+from intercom.common_redis_binding import get_partial_result_key
 from intercom.front_end_binding import InterComFrontEndBinding
 from test.common_helper import create_test_firmware
 
@@ -56,6 +58,7 @@ class TestInterComTaskCommunication:
     def test_analysis_task(self, intercom_frontend):
         task_listener = InterComBackEndAnalysisTask()
         test_fw = create_test_firmware()
+        test_fw.set_binary(test_fw.binary)  # like an uploaded firmware: the binary is set but there is no file path
         test_fw.file_path = None
         intercom_frontend.add_analysis_task(test_fw)
         task = task_listener.get_next_task()
@@ -156,3 +159,22 @@ class TestInterComTaskCommunication:
         assert task == 'valid_uid', 'task not correct'
         result = intercom_frontend.get_repacked_binary_and_file_name('valid_uid_0.0')
         assert result == (b'test', 'test.tar'), 'retrieved binary not correct'
+
+    def test_binary_search_task(self, intercom_frontend, monkeypatch):
+        def get_binary_search_result(_, task, partial_result_callback):
+            assert task == (b'rule', None)
+            partial_result_callback({'rule': ['uid_1']}, 1)
+            assert intercom_frontend.get_binary_search_partial_result('valid_uid_0.0') == ({'rule': ['uid_1']}, 1)
+            return {'rule': ['uid_1', 'uid_2']}
+
+        monkeypatch.setattr(
+            'intercom.back_end_binding.YaraBinarySearchScanner.get_binary_search_result', get_binary_search_result
+        )
+        monkeypatch.setattr('intercom.front_end_binding.generate_task_id', lambda *_: 'valid_uid_0.0')
+        intercom_frontend.add_binary_search_request(b'rule')
+
+        task_listener = InterComBackEndBinarySearchTask()
+        task_listener.get_next_task()
+        assert task_listener.redis.redis.get(get_partial_result_key('valid_uid_0.0')) is None, 'should be deleted'
+        result = intercom_frontend.get_binary_search_result('valid_uid_0.0')
+        assert result == ({'rule': ['uid_1', 'uid_2']}, (b'rule', None))
@@ -52,9 +52,9 @@ def test_scheduler(finished_event, intermediate_event):
     def count_pre_analysis(file_object):
         interface.add_object(file_object)
         elements_finished.value += 1
-        if elements_finished.value == 16:
+        if elements_finished.value == 8:
             finished_event.set()
-        elif elements_finished.value == 8:
+        elif elements_finished.value == 4:
             intermediate_event.set()
 
     analyzer = AnalysisScheduler(
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from ...common_helper import create_test_firmware
 from .helper import TEST_FW, create_fw_with_child_fo, create_fw_with_parent_and_child
 
@@ -23,36 +25,17 @@ def test_delete_cascade(db):
     assert db.common.exists(fo.uid) is False, 'deletion should be cascaded to child objects'
 
 
-def test_remove_vp_no_other_fw(db):
-    fo, fw = create_fw_with_child_fo()
-    db.backend.insert_object(fw)
-    db.backend.insert_object(fo)
-
-    with db.admin.get_read_write_session() as session:
-        removed_vps, deleted_uids = db.admin._remove_virtual_path_entries(
-            fw.uid, fo.uid, session
-        )  # pylint: disable=protected-access
-
-    assert removed_vps == 0
-    assert deleted_uids == {fo.uid}
-
-
-def test_remove_vp_other_fw(db):
-    fo, fw = create_fw_with_child_fo()
-    fo.virtual_file_path.update({'some_other_fw_uid': ['some_vfp']})
+def test_get_included_files_by_ownership(db):
+    fw, parent, child = create_fw_with_parent_and_child()
+    child.virtual_file_path.update({'some_other_fw_uid': ['some_vfp']})
     db.backend.insert_object(fw)
-    db.backend.insert_object(fo)
+    db.backend.insert_object(parent)
+    db.backend.insert_object(child)
 
     with db.admin.get_read_write_session() as session:
-        removed_vps, deleted_files = db.admin._remove_virtual_path_entries(
-            fw.uid, fo.uid, session
-        )  # pylint: disable=protected-access
-    fo_entry = db.common.get_object(fo.uid)
+        included_files = db.admin._get_included_files_by_ownership(fw.uid, session)  # pylint: disable=protected-access
 
-    assert fo_entry is not None
-    assert removed_vps == 1
-    assert deleted_files == set()
-    assert fw.uid not in fo_entry.virtual_file_path
+    assert included_files == {parent.uid: (1, True, False), child.uid: (2, False, False)}
 
 
 def test_delete_firmware(db):
@@ -94,3 +77,43 @@ def test_delete_but_fo_is_in_fw(db):
     assert fw.uid in db.admin.intercom.deleted_files
     assert db.common.exists(fw.uid) is False
     assert db.common.exists(fo.uid) is True, 'should have been spared by cascade delete because it is in another FW'
+
+
+@mock.patch('storage.db_interface_admin.DELETE_BATCH_SIZE', 1)
+def test_delete_firmware_shared_child_of_deleted_parent(db):
+    fw, parent, child = create_fw_with_parent_and_child()
+    fw2 = create_test_firmware()
+    fw2.uid = 'fw2_uid'
+    child.parents.append(fw2.uid)
+    child.parent_firmware_uids.add(fw2.uid)
+    child.virtual_file_path.update({fw2.uid: [f'|{fw2.uid}|/some/path']})
+    db.backend.insert_object(fw)
+    db.backend.insert_object(fw2)
+    db.backend.insert_object(parent)
+    db.backend.insert_object(child)
+
+    removed_vps, deleted_files = db.admin.delete_firmware(fw.uid)
+
+    assert removed_vps == 1
+    assert deleted_files == 2
+    assert db.admin.intercom.deleted_files == [parent.uid, fw.uid]
+    assert db.common.exists(parent.uid) is False
+    child_from_db = db.common.get_object(child.uid)
+    assert child_from_db.virtual_file_path == {fw2.uid: [f'|{fw2.uid}|/some/path']}
+    assert child_from_db.parents == {fw2.uid}
+    assert db.common.get_all_files_in_fw(fw2.uid) == {child.uid}
+
+
+@mock.patch('storage.db_interface_admin.DELETE_BATCH_SIZE', 1)
+def test_delete_firmware_deepest_files_first(db):
+    fw, parent, child = create_fw_with_parent_and_child()
+    db.backend.insert_object(fw)
+    db.backend.insert_object(parent)
+    db.backend.insert_object(child)
+    db.backend.add_analysis(child.uid, 'dummy', {'result': {}, 'plugin_version': '0', 'analysis_date': 0.0})
+
+    db.admin.delete_firmware(fw.uid, delete_root_file=False)
+
+    assert db.admin.intercom.deleted_files == [child.uid, parent.uid]
+    assert not db.common.exists(fw.uid)
+    assert db.common.get_analysis(child.uid, 'dummy') is None
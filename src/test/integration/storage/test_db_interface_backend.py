@@ -2,9 +2,10 @@ from copy import deepcopy
 
 import pytest
 
+from storage.entry_conversion import get_virtual_file_path_rows
 from test.common_helper import create_test_file_object, create_test_firmware  # pylint: disable=wrong-import-order
 
-from .helper import TEST_FO, TEST_FW, create_fw_with_child_fo
+from .helper import TEST_FO, TEST_FW, create_fw_with_child_fo, create_fw_with_parent_and_child
 
 
 def test_insert_objects(db):
@@ -108,6 +109,22 @@ def test_update_file_object(db):
     assert db_fo.comments == fo.comments
 
 
+def test_update_object_only_inserts_new_paths(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    for fo in (fw, parent_fo, child_fo):
+        db.backend.insert_object(fo)
+    db_fo = db.backend.get_object(child_fo.uid)
+    assert get_virtual_file_path_rows(db_fo) == [], 'paths loaded from the DB should not be inserted again'
+
+    new_path = f'|{fw.uid}|{parent_fo.uid}|/some/other/path'
+    db_fo.virtual_file_path[fw.uid].append(new_path)
+    assert [row['virtual_path'] for row in get_virtual_file_path_rows(db_fo)] == [new_path]
+    db.backend.update_object(db_fo)
+    assert sorted(db.common.get_object(child_fo.uid).virtual_file_path[fw.uid]) == sorted(
+        [*child_fo.virtual_file_path[fw.uid], new_path]
+    )
+
+
 def test_update_firmware(db):
     fw = create_test_firmware()
     db.backend.insert_object(fw)
@@ -152,3 +169,118 @@ def test_update_analysis(db):
     assert analysis['content'] == 'file efgh'
     assert analysis['summary'] == updated_analysis_data['summary']
     assert analysis['plugin_version'] == updated_analysis_data['plugin_version']
+
+
+def test_add_analyses(db):
+    db.backend.insert_file_object(TEST_FO)
+    round_trips = db.backend.round_trips
+    db.backend.add_analyses(
+        [
+            (TEST_FO.uid, 'dummy', {'content': 'outdated', 'plugin_version': '1', 'analysis_date': 1.0}),
+            (TEST_FO.uid, 'dummy', {'content': 'updated', 'plugin_version': '2', 'analysis_date': 2.0}),
+            (TEST_FO.uid, 'new', {'content': 'new', 'plugin_version': '1', 'summary': ['s'], 'analysis_date': 1.0}),
+        ]
+    )
+    assert db.backend.round_trips == round_trips + 3, 'one upsert, one update of the firmware aggregates and one commit'
+
+    updated_analysis = db.common.get_analysis(TEST_FO.uid, 'dummy')
+    assert updated_analysis['content'] == 'updated'
+    assert updated_analysis['plugin_version'] == '2'
+    new_analysis = db.common.get_analysis(TEST_FO.uid, 'new')
+    assert new_analysis['content'] == 'new'
+    assert new_analysis['summary'] == ['s']
+
+
+def test_add_analyses_with_errors(db):
+    db.backend.insert_file_object(TEST_FO)
+    db.backend.add_analyses(
+        [
+            (TEST_FO.uid, 'new', {'content': 'new', 'plugin_version': '1', 'analysis_date': 1.0}),
+            ('unknown_uid', 'new', {'content': 'missing file', 'plugin_version': '1', 'analysis_date': 1.0}),
+            (TEST_FO.uid, 'incomplete', {'content': 'no version and date'}),
+            (TEST_FO.uid, 'bad_value', {'plugin_version': '1\x00', 'analysis_date': 1.0}),
+        ]
+    )
+    # the results are stored one by one if the upsert fails so that valid results are not lost
+    assert db.common.get_analysis(TEST_FO.uid, 'new')['content'] == 'new'
+    assert db.common.get_analysis(TEST_FO.uid, 'incomplete') is None
+    assert db.common.get_analysis(TEST_FO.uid, 'bad_value') is None
+    assert not db.common.exists('unknown_uid')
+
+
+def test_round_trips(db):
+    round_trips = db.backend.round_trips
+    db.backend.insert_object(TEST_FW)
+    assert db.backend.round_trips > round_trips
+
+    round_trips = db.backend.round_trips
+    assert db.backend.analysis_exists(TEST_FW.uid, 'dummy')
+    assert db.backend.round_trips == round_trips + 1, 'one SELECT and no commit expected'
+
+
+def test_sessions_reuse_connections(db):
+    dbapi_connections = []
+    for _ in range(2):
+        with db.backend.get_read_only_session() as session:
+            dbapi_connections.append(session.connection().connection.dbapi_connection)
+    assert dbapi_connections[0] is dbapi_connections[1], 'the connection should be returned to the pool and reused'
+    assert db.backend.connection.engine.pool.checkedout() == 0
+
+
+def test_add_unpacked_objects(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    fw.processed_analysis['unpacker'] = {'plugin_version': '1.0', 'analysis_date': 1.0, 'plugin_used': 'zip'}
+    child_fo.processed_analysis = {}
+    round_trips = db.backend.round_trips
+    db.backend.add_unpacked_objects(fw, [parent_fo])
+    db.backend.add_unpacked_objects(parent_fo, [child_fo])
+    assert db.backend.round_trips - round_trips < 25, 'the objects should be stored with a few bulk statements'
+
+    assert fw.temporary_data['stored_in_db'] and child_fo.temporary_data['stored_in_db']
+    assert db.common.get_analysis(fw.uid, 'unpacker')['plugin_used'] == 'zip'
+    assert db.common.get_object(parent_fo.uid).parents == {fw.uid}
+    assert db.common.get_object(child_fo.uid).parents == {parent_fo.uid}
+    assert db.common.get_all_files_in_fw(fw.uid) == {parent_fo.uid, child_fo.uid}
+    assert db.common.get_object(child_fo.uid).virtual_file_path == child_fo.virtual_file_path
+
+
+def test_add_unpacked_objects_existing_child(db):
+    fo, fw = create_fw_with_child_fo()
+    db.backend.insert_object(fw)
+    db.backend.insert_object(fo)
+    fw2 = create_test_firmware()
+    fw2.uid = 'fw2_uid'
+    fw2.virtual_file_path = {fw2.uid: [fw2.uid]}
+    fw2.temporary_data['stored_in_db'] = False
+    fo_copy = create_test_file_object()
+    fo_copy.parents = [fw2.uid]
+    fo_copy.parent_firmware_uids = {fw2.uid}
+    fo_copy.virtual_file_path = {fw2.uid: [f'|{fw2.uid}|/other/path']}
+
+    db.backend.add_unpacked_objects(fw2, [fo_copy])
+
+    fo_from_db = db.common.get_object(fo.uid)
+    assert fo_from_db.parents == {fw.uid, fw2.uid}
+    assert fo_from_db.virtual_file_path == {**fo.virtual_file_path, **fo_copy.virtual_file_path}
+    assert db.common.get_all_files_in_fw(fw2.uid) == {fo.uid}
+
+
+def test_firmware_aggregates_are_updated(db):
+    fo, fw = create_fw_with_child_fo()
+    db.backend.insert_object(fw)
+    db.backend.insert_object(fo)
+    assert set(db.common.get_summary(fw, 'dummy')['file exclusive sum b']) == {fo.uid}
+
+    tags = {'tag': {'color': 'success', 'value': 'foo', 'propagate': True}}
+    analysis = {'plugin_version': '2', 'analysis_date': 2.0, 'summary': ['new sum'], 'tags': tags}
+    db.backend.add_analyses([(fo.uid, 'dummy', analysis), (fo.uid, 'software_components', analysis)])
+    summary = db.common.get_summary(fw, 'dummy')
+    assert 'file exclusive sum b' not in summary, 'the outdated summary should have been replaced'
+    assert summary['new sum'] == [fo.uid]
+    assert db.common._collect_analysis_tags_from_children(fw.uid) == {'software_components': tags}
+
+    fw2 = create_test_firmware()
+    fw2.uid = 'fw2_uid'
+    db.backend.insert_object(fw2)
+    db.backend.update_file_object_parents(fo.uid, fw2.uid, fw2.uid)
+    assert db.common.get_summary(fw2, 'dummy')['new sum'] == [fo.uid], 'the file was added to the firmware'
@@ -112,6 +112,25 @@ def test_all_files_in_fo(db):
     assert db.common.get_all_files_in_fo(parent_fo) == {parent_fo.uid, child_fo.uid}
 
 
+def test_get_included_files_recursively(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    db.backend.insert_object(fw)
+    db.backend.insert_object(parent_fo)
+    db.backend.insert_object(child_fo)
+    assert db.common.get_included_files_recursively([fw.uid]) == {parent_fo.uid, child_fo.uid}
+    assert db.common.get_included_files_recursively([parent_fo.uid, child_fo.uid]) == {child_fo.uid}
+    assert db.common.get_included_files_recursively([child_fo.uid]) == set()
+
+
+def test_get_included_files_recursively_with_cycle(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    db.backend.insert_object(fw)
+    db.backend.insert_object(parent_fo)
+    db.backend.insert_object(child_fo)
+    db.backend.update_file_object_parents(fw.uid, fw.uid, child_fo.uid)  # the firmware includes itself indirectly
+    assert db.common.get_included_files_recursively([fw.uid]) == {fw.uid, parent_fo.uid, child_fo.uid}
+
+
 def test_get_objects_by_uid_list(db):
     fo, fw = create_fw_with_child_fo()
     db.backend.insert_object(fw)
@@ -135,6 +154,33 @@ def test_get_analysis(db):
     assert result['system_version'] is None
 
 
+def test_get_analyses(db):
+    db.backend.insert_object(TEST_FW)
+    result = db.common.get_analyses(TEST_FW.uid, ['file_type', 'dummy', 'unknown plugin'])
+    assert set(result) == {'file_type', 'dummy'}
+    assert result['file_type'] == db.common.get_analysis(TEST_FW.uid, 'file_type')
+    assert db.common.get_analyses(TEST_FW.uid, []) == {}
+
+
+def test_get_analysis_metadata(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    fw.processed_analysis['test_plugin'] = generate_analysis_entry(plugin_version='1.2', analysis_result={'a': 1})
+    child_fo.processed_analysis['test_plugin'] = generate_analysis_entry(analysis_result={'failed': 'reason'})
+    db.backend.insert_object(fw)
+    db.backend.insert_object(parent_fo)
+    db.backend.insert_object(child_fo)
+
+    result = db.common.get_analysis_metadata([fw.uid, child_fo.uid, 'unknown uid'])
+    assert set(result) == {fw.uid, child_fo.uid}
+    assert set(result[fw.uid]) == set(fw.processed_analysis)
+    assert result[fw.uid]['test_plugin'] == {
+        'plugin_version': '1.2',
+        'system_version': None,
+        'analysis_date': fw.processed_analysis['test_plugin']['analysis_date'],
+    }
+    assert result[child_fo.uid]['test_plugin']['failed'] is True
+
+
 def test_get_complete_object(db):
     fw, parent_fo, child_fo = create_fw_with_parent_and_child()
     fw.processed_analysis['test_plugin'] = generate_analysis_entry(summary=['entry0'])
@@ -306,3 +352,47 @@ def test_collect_analysis_tags(db):
     assert 'foo' in fo.analysis_tags and 'bar' in fo.analysis_tags
     assert set(fo.analysis_tags['foo']) == {'tag_a', 'tag_b'}
     assert fo.analysis_tags['foo']['tag_a'] == tags1['tag_a']
+
+
+def test_get_vfps_for_uid_list(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    child_fo.virtual_file_path['other_fw_uid'] = ['|other_fw_uid|/other/path']
+    for fo in (fw, parent_fo, child_fo):
+        db.backend.insert_object(fo)
+
+    assert db.common.get_vfps_for_uid_list([child_fo.uid]) == {child_fo.uid: child_fo.virtual_file_path}
+    assert db.common.get_vfps_for_uid_list([child_fo.uid], root_uid='other_fw_uid') == {
+        child_fo.uid: {'other_fw_uid': ['|other_fw_uid|/other/path']}
+    }
+    assert db.common.get_vfps_for_uid_list([parent_fo.uid, child_fo.uid], parent_uid=parent_fo.uid) == {
+        child_fo.uid: {fw.uid: child_fo.virtual_file_path[fw.uid]}
+    }
+    assert db.common.get_vfps_for_uid_list(['unknown_uid']) == {}
+
+
+def test_get_object_with_root_uid(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    child_fo.virtual_file_path['other_fw_uid'] = ['|other_fw_uid|/other/path']
+    for fo in (fw, parent_fo, child_fo):
+        db.backend.insert_object(fo)
+
+    assert db.common.get_object(child_fo.uid).virtual_file_path == child_fo.virtual_file_path
+    db_fo = db.common.get_object(child_fo.uid, root_uid=fw.uid)
+    assert db_fo.virtual_file_path == {fw.uid: child_fo.virtual_file_path[fw.uid]}, 'only paths in fw should be loaded'
+    assert db_fo.parent_firmware_uids == {fw.uid, 'other_fw_uid'}
+
+
+def test_get_vfps_in_firmware(db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    child_fo.virtual_file_path['other_fw_uid'] = ['|other_fw_uid|/other/path']
+    for fo in (fw, parent_fo, child_fo):
+        db.backend.insert_object(fo)
+
+    result = db.common.get_vfps_in_firmware([parent_fo.uid, child_fo.uid], fw.uid)
+    assert result == {
+        parent_fo.uid: parent_fo.virtual_file_path,
+        child_fo.uid: {fw.uid: [child_fo.virtual_file_path[fw.uid][0]]},
+    }
+    # if the root is not a firmware (e.g. in the file tree of a file object), all paths are returned
+    result = db.common.get_vfps_in_firmware([child_fo.uid], parent_fo.uid)
+    assert result == {child_fo.uid: child_fo.virtual_file_path}
@@ -1,7 +1,9 @@
+from unittest.mock import patch
+
 import pytest
 
 from storage.db_interface_frontend import CachedQuery
-from storage.query_conversion import QueryConversionException
+from storage.query_conversion import QueryConversionException, get_cursor
 from test.common_helper import (
     generate_analysis_entry,  # pylint: disable=wrong-import-order; pylint: disable=wrong-import-order
 )
@@ -323,6 +325,43 @@ def test_search_limit_skip_and_order(db):
     assert result == expected_result_fo[2:], 'skip does not work correctly'
 
 
+@pytest.mark.parametrize(
+    ('query', 'only_parent_firmware', 'expected'),
+    [
+        ({}, False, ['uid_3', 'uid_1', 'uid_2', 'uid_4', 'uid_5']),
+        ({'device_class': 'foo'}, True, ['uid_3', 'uid_1', 'uid_2', 'uid_4', 'uid_5']),
+        ({'device_class': 'foo'}, False, ['uid_1', 'uid_2', 'uid_3', 'uid_5', 'uid_4']),
+    ],
+)
+def test_generic_search_page(db, query, only_parent_firmware, expected):
+    insert_test_fw(db, 'uid_1', device_class='foo', vendor='v1', device_name='n2', file_name='f1')
+    insert_test_fw(db, 'uid_2', device_class='foo', vendor='v1', device_name='n3', file_name='f2')
+    insert_test_fw(db, 'uid_3', device_class='foo', vendor='v1', device_name='n1', file_name='f3')
+    insert_test_fw(db, 'uid_4', device_class='foo', vendor='v2', device_name='n1', file_name='f4')
+    insert_test_fw(db, 'uid_5', device_class='foo', vendor='v2', device_name='n1', file_name='f3')  # same sort values
+
+    result, cursor, pages = [], None, 0
+    while True:
+        page, cursor = db.frontend.generic_search_page(
+            query, limit=2, cursor=cursor, only_fo_parent_firmware=only_parent_firmware
+        )
+        result.extend(page)
+        pages += 1
+        if cursor is None:
+            break
+    assert result == expected
+    assert pages == 3
+    assert db.frontend.generic_search_page(query, limit=2, skip=4, only_fo_parent_firmware=only_parent_firmware) == (
+        expected[4:],
+        None,
+    )
+
+
+def test_generic_search_page_invalid_cursor(db):
+    with pytest.raises(QueryConversionException):
+        db.frontend.generic_search_page({}, limit=2, cursor='foo')
+
+
 def test_search_analysis_result(db):
     insert_test_fw(db, 'uid_1')
     insert_test_fw(db, 'uid_2')
@@ -480,6 +519,43 @@ def test_rest_get_firmware_uids(db):
     ) == [test_fw1.uid, test_fw2.uid]
 
 
+def test_rest_get_uids_with_cursor(db):
+    for uid in ['fw3', 'fw1', 'fw2']:
+        insert_test_fw(db, uid, vendor='foo_vendor', file_name=f'file_{uid}')
+    insert_test_fo(db, 'fo1', 'file_fo1', parent_fw='fw1')
+
+    first_page = db.frontend.rest_get_firmware_uids(offset=None, limit=2)
+    assert first_page == ['fw1', 'fw2']
+    cursor = get_cursor(first_page[-1:])
+    assert db.frontend.rest_get_firmware_uids(offset=None, limit=2, cursor=cursor) == ['fw3']
+    assert db.frontend.rest_get_firmware_uids(
+        offset=None, limit=None, query={'vendor': 'foo_vendor'}, cursor=cursor
+    ) == ['fw3']
+    assert db.frontend.rest_get_firmware_uids(
+        offset=None, limit=1, query={'file_name': 'file_fo1'}, recursive=True, inverted=True, cursor=cursor
+    ) == ['fw3']
+
+    assert db.frontend.rest_get_file_object_uids(offset=None, limit=2, cursor=get_cursor(['fo1'])) == ['fw1', 'fw2']
+    assert db.frontend.rest_get_file_object_uids(
+        offset=None, limit=None, query={'file_name': {'$like': 'file_'}}, cursor=get_cursor(['fw2'])
+    ) == ['fw3']
+
+
+@pytest.mark.cfg_defaults({'database': {'approximate-count-threshold': 1}})
+def test_get_number_of_total_matches_estimate(db):
+    for uid in ['fw1', 'fw2', 'fw3']:
+        insert_test_fw(db, uid, vendor='foo_vendor')
+    estimate = db.frontend.estimate_number_of_matches({'vendor': 'foo_vendor'}, False, False)
+    assert isinstance(estimate, int)
+    assert estimate > 0
+
+    with patch.object(db.frontend, 'estimate_number_of_matches', return_value=1000):
+        assert db.frontend.get_number_of_total_matches({'vendor': 'foo_vendor'}, False, False) == 1000
+    with patch.object(db.frontend, 'estimate_number_of_matches', return_value=1):
+        # estimates below the threshold are not used (the exact count is cheap)
+        assert db.frontend.get_number_of_total_matches({'vendor': 'foo_vendor'}, False, False) == 3
+
+
 def test_find_missing_analyses(db):
     fw, parent_fo, child_fo = create_fw_with_parent_and_child()
     fw.processed_analysis = {'plugin1': DUMMY_RESULT, 'plugin2': DUMMY_RESULT, 'plugin3': DUMMY_RESULT}
@@ -2,9 +2,18 @@
 from math import isclose
 
 import pytest
+from sqlalchemy import select, update
 
+from storage.db_connection import ReadWriteDeleteConnection
 from storage.db_interface_stats import StatsDbViewer, StatsUpdateDbInterface, count_occurrences
-from storage.schema import AnalysisEntry, FileObjectEntry, FirmwareEntry, StatsEntry
+from storage.schema import (
+    AnalysisEntry,
+    FileObjectEntry,
+    FirmwareEntry,
+    StatsEntry,
+    firmware_aggregate_table,
+    summary_counter_table,
+)
 from test.common_helper import (  # pylint: disable=wrong-import-order
     create_test_file_object,
     create_test_firmware,
@@ -20,6 +29,11 @@ def stats_db():
     yield updater
 
 
+@pytest.fixture
+def reconciling_stats_db():
+    yield StatsUpdateDbInterface(connection=ReadWriteDeleteConnection())  # the reconciliation deletes counters
+
+
 @pytest.fixture
 def stats_viewer():
     viewer = StatsDbViewer()
@@ -210,27 +224,85 @@ def test_count_distinct_analysis(db, stats_db, q_filter, expected_result):
     assert result == expected_result
 
 
-def test_count_values_in_summary(db, stats_db):
+@pytest.mark.parametrize('plugin', ['foo', 'unpacker'])  # the summary values of "unpacker" are counted
+def test_count_values_in_summary(db, stats_db, plugin):
     fw, parent_fo, child_fo = create_fw_with_parent_and_child()
-    fw.processed_analysis = {'foo': generate_analysis_entry(summary=['s1', 's2'])}
-    parent_fo.processed_analysis = {'foo': generate_analysis_entry(summary=['s3', 's4'])}
-    child_fo.processed_analysis = {'foo': generate_analysis_entry(summary=['s4'])}
+    fw.processed_analysis = {plugin: generate_analysis_entry(summary=['s1', 's2'])}
+    parent_fo.processed_analysis = {plugin: generate_analysis_entry(summary=['s3', 's4'])}
+    child_fo.processed_analysis = {plugin: generate_analysis_entry(summary=['s4'])}
     db.backend.add_object(fw)
     db.backend.add_object(parent_fo)
     db.backend.add_object(child_fo)
 
     assert stats_db.count_values_in_summary('plugin that did not run', firmware=True) == []
-    assert stats_db.count_values_in_summary('foo', firmware=True) == [('s1', 1), ('s2', 1)]
-    assert stats_db.count_values_in_summary('foo', firmware=True, q_filter={'vendor': fw.vendor}) == [
+    assert stats_db.count_values_in_summary(plugin, firmware=True) == [('s1', 1), ('s2', 1)]
+    assert stats_db.count_values_in_summary(plugin, firmware=True, q_filter={'vendor': fw.vendor}) == [
         ('s1', 1),
         ('s2', 1),
     ]
-    assert stats_db.count_values_in_summary('foo', firmware=False) == [('s3', 1), ('s4', 2)]
-    assert stats_db.count_values_in_summary('foo', firmware=False, q_filter={'vendor': fw.vendor}) == [
+    assert stats_db.count_values_in_summary(plugin, firmware=False) == [('s3', 1), ('s4', 2)]
+    assert stats_db.count_values_in_summary(plugin, firmware=False, q_filter={'vendor': fw.vendor}) == [
         ('s3', 1),
         ('s4', 2),
     ]
-    assert stats_db.count_values_in_summary('foo', firmware=False, q_filter={'vendor': 'different'}) == []
+    assert stats_db.count_values_in_summary(plugin, firmware=False, q_filter={'vendor': 'different'}) == []
+
+
+def test_summary_counters(db, stats_db, reconciling_stats_db):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    fw.processed_analysis = {'unpacker': generate_analysis_entry(summary=['packed'])}
+    parent_fo.processed_analysis = {'unpacker': generate_analysis_entry(summary=['packed'])}
+    child_fo.processed_analysis = {'unpacker': generate_analysis_entry(summary=['packed'])}
+    for fo in (fw, parent_fo, child_fo):
+        db.backend.add_object(fo)
+    fw2 = create_test_firmware()
+    fw2.uid = 'fw2'
+    db.backend.add_object(fw2)
+    db.backend.update_file_object_parents(child_fo.uid, fw2.uid, fw2.uid)
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 3)]
+
+    # the old summary values are subtracted when an analysis is updated
+    db.backend.update_analysis(child_fo.uid, 'unpacker', generate_analysis_entry(summary=['unpacked']))
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 1), ('unpacked', 2)]
+
+    # the counters of a firmware are deleted together with the firmware
+    db.admin.delete_firmware(fw2.uid)
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 1), ('unpacked', 1)]
+
+    with stats_db.get_read_write_session() as session:
+        session.execute(update(summary_counter_table).values(count=summary_counter_table.c.count + 5))
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 6), ('unpacked', 6)]
+    reconciling_stats_db.reconcile_summary_counters()
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 1), ('unpacked', 1)]
+    assert stats_db.count_values_in_summary('unpacker', firmware=True) == [('packed', 1)]
+    with stats_db.get_read_only_session() as session:
+        counts = session.execute(select(summary_counter_table.c.count)).scalars().all()
+    assert sorted(counts) == [1, 1, 1], 'counters of values that no longer occur should be deleted'
+
+
+def test_summary_counters_long_item(db, stats_db, reconciling_stats_db):
+    long_item = 'x' * 10_000  # too long for a btree index
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    for fo in (fw, parent_fo, child_fo):
+        fo.processed_analysis = {'unpacker': generate_analysis_entry(summary=[long_item])}
+        db.backend.add_object(fo)
+    assert stats_db.count_values_in_summary('unpacker') == [(long_item, 2)]
+    reconciling_stats_db.reconcile_summary_counters()
+    assert stats_db.count_values_in_summary('unpacker') == [(long_item, 2)]
+    assert stats_db.count_values_in_summary('unpacker', firmware=True) == [(long_item, 1)]
+
+
+def test_reconcile_without_aggregates(db, stats_db, reconciling_stats_db):
+    fw, parent_fo, _ = create_fw_with_parent_and_child()
+    fw.processed_analysis = {'unpacker': generate_analysis_entry(summary=['packed'])}
+    parent_fo.processed_analysis = {'unpacker': generate_analysis_entry(summary=['packed'])}
+    db.backend.add_object(fw)
+    db.backend.add_object(parent_fo)
+    with db.admin.get_read_write_session() as session:  # like a DB from before the aggregates were introduced
+        session.execute(firmware_aggregate_table.delete())
+    reconciling_stats_db.reconcile_summary_counters()
+    assert stats_db.count_values_in_summary('unpacker') == [('packed', 1)], 'counters should not be reset'
+    assert stats_db.count_values_in_summary('unpacker', firmware=True) == [('packed', 1)]
 
 
 @pytest.mark.parametrize(
@@ -258,6 +330,48 @@ def test_count_distinct_array(db, stats_db, q_filter, plugin, expected_result):
     assert stats == expected_result
 
 
+@pytest.mark.parametrize(
+    'q_filter, expected_result',
+    [
+        (None, {'key1': [('value2', 1), ('value1', 2)], 'key2': [('value3', 1)], 'key3': []}),
+        ({'vendor': 'unknown'}, {'key1': [], 'key2': [], 'key3': []}),
+    ],
+)
+def test_count_distinct_arrays(db, stats_db, q_filter, expected_result):
+    insert_test_fw(db, 'root_fw', vendor='foobar')
+    insert_test_fo(
+        db, 'fo1', parent_fw='root_fw', analysis={'foo': generate_analysis_entry(analysis_result={'key1': ['value1']})}
+    )
+    insert_test_fo(
+        db,
+        'fo2',
+        parent_fw='root_fw',
+        analysis={'foo': generate_analysis_entry(analysis_result={'key1': ['value1', 'value2'], 'key2': ['value3']})},
+    )
+
+    stats = stats_db.count_distinct_values_in_arrays(['key1', 'key2', 'key3'], plugin='foo', q_filter=q_filter)
+    assert stats == expected_result
+
+
+def test_get_regex_mime_match_counts(db, stats_db):
+    insert_test_fw(db, 'root_fw', vendor='foobar')
+    for uid, full_type in [('fo1', 'ELF 32-bit LSB executable'), ('fo2', 'ELF 64-bit LSB executable'), ('fo3', 'data')]:
+        insert_test_fo(
+            db,
+            uid,
+            parent_fw='root_fw',
+            analysis={'file_type': generate_analysis_entry(analysis_result={'full': full_type})},
+        )
+
+    assert stats_db.get_regex_mime_match_counts(['^ELF', '^ELF 64-bit', 'foo']) == {
+        '^ELF': 2,
+        '^ELF 64-bit': 1,
+        'foo': 0,
+    }
+    assert stats_db.get_regex_mime_match_counts(['^ELF'], q_filter={'vendor': 'foobar'}) == {'^ELF': 2}
+    assert stats_db.get_regex_mime_match_counts(['^ELF'], q_filter={'vendor': 'other'}) == {'^ELF': 0}
+
+
 def test_get_unpacking_file_types(db, stats_db):
     insert_test_fw(
         db,
@@ -282,6 +396,11 @@ def test_get_unpacking_file_types(db, stats_db):
     assert stats_db.get_unpacking_file_types('packed') == [('some/file', 1)]
     assert stats_db.get_unpacking_file_types('packed', q_filter={'vendor': 'foobar'}) == [('some/file', 1)]
     assert stats_db.get_unpacking_file_types('packed', q_filter={'vendor': 'other'}) == []
+    assert stats_db.get_unpacking_file_types_by_summary(['packed', 'unpacked', 'data lost']) == {
+        'packed': [('some/file', 1)],
+        'unpacked': [('firmware/image', 1)],
+        'data lost': [],
+    }
 
 
 def test_get_unpacking_entropy(db, stats_db):
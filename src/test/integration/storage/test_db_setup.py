@@ -1,7 +1,14 @@
 # pylint: disable=redefined-outer-name,unused-argument,wrong-import-order
+import json
+
 import pytest
+from sqlalchemy import delete, text
 
+from helperFunctions.hash import get_sha256
 from storage.db_setup import DbSetup
+from storage.schema import VirtualFilePathEntry, firmware_aggregate_table, summary_counter_table
+from test.common_helper import generate_analysis_entry
+from test.integration.storage.helper import create_fw_with_child_fo, create_fw_with_parent_and_child
 
 
 @pytest.fixture
@@ -21,3 +28,73 @@ def test_db_exists(db, db_setup, cfg_tuple):
     db_name = cfg.data_storage.postgres_database
     assert db_setup.database_exists(db_name)
     assert not db_setup.database_exists('foobar')
+
+
+def test_create_indexes(db, db_setup):
+    assert db_setup.index_exists('analysis_result_index')
+    db_setup.create_index('test_index', 'file_object (size)')
+    assert db_setup.index_exists('test_index')
+    with db_setup.get_read_write_session() as session:
+        session.execute('DROP INDEX analysis_result_index, test_index;')
+    assert not db_setup.index_exists('analysis_result_index')
+
+    db_setup.create_indexes()  # missing indexes of the schema are created
+    assert db_setup.index_exists('analysis_result_index')
+
+
+def test_migrate_virtual_file_paths(db, db_setup):
+    fw, parent_fo, child_fo = create_fw_with_parent_and_child()
+    long_path = f'|{fw.uid}|{parent_fo.uid}|/{"a" * 10_000}'  # too long to be part of a btree index
+    child_fo.virtual_file_path[fw.uid].append(long_path)
+    for file_object in (fw, parent_fo, child_fo):
+        db.backend.insert_object(file_object)
+    expected_paths = db.common.get_vfps_for_uid_list([fw.uid, parent_fo.uid, child_fo.uid])
+    assert long_path in expected_paths[child_fo.uid][fw.uid]
+
+    # an existing database still has the paths in the old JSONB column
+    with db_setup.get_read_write_session() as session:
+        session.execute('ALTER TABLE file_object ADD COLUMN virtual_file_paths JSONB;')
+        for uid, paths in expected_paths.items():
+            session.execute(
+                text('UPDATE file_object SET virtual_file_paths = CAST(:paths AS JSONB) WHERE uid = :uid'),
+                {'paths': json.dumps(paths), 'uid': uid},
+            )
+        session.execute(delete(VirtualFilePathEntry))
+
+    db_setup.migrate_tables()
+    assert not db_setup.column_exists('file_object', 'virtual_file_paths')
+    assert db.common.get_vfps_for_uid_list([fw.uid, parent_fo.uid, child_fo.uid]) == expected_paths
+    assert db.common.get_vfps_for_uid_list([child_fo.uid], parent_uid=parent_fo.uid) == {
+        child_fo.uid: expected_paths[child_fo.uid]
+    }
+
+    db_setup.migrate_tables()  # the migration is skipped if it is not needed
+
+
+def test_backfill_firmware_aggregates(db, db_setup):
+    fo, fw = create_fw_with_child_fo()
+    tags = {'tag': {'color': 'success', 'value': 'foo', 'propagate': True}}
+    fo.processed_analysis['software_components'] = generate_analysis_entry(summary=['item'], tags=tags)
+    fw.processed_analysis['software_components'] = generate_analysis_entry(summary=['fw item'])
+    fo.processed_analysis['crypto_material'] = generate_analysis_entry(summary=['key'])  # a plugin with counters
+    db.backend.insert_object(fw)
+    db.backend.insert_object(fo)
+    expected_summary = db.common.get_summary(fw, 'software_components')
+    assert expected_summary == {'item': [fo.uid], 'fw item': [fw.uid]}
+
+    # the aggregates of firmware that were analyzed before the aggregates were introduced are missing
+    with db_setup.get_read_write_session() as session:
+        session.execute(delete(firmware_aggregate_table))
+        session.execute(delete(summary_counter_table))
+    assert db.common.get_summary(fw, 'software_components') == {}
+
+    db_setup.migrate_tables()
+    assert db.common.get_summary(fw, 'software_components') == expected_summary
+    assert db.common._collect_analysis_tags_from_children(fw.uid) == {'software_components': tags}
+    with db_setup.get_read_only_session() as session:
+        counters = set(session.execute(summary_counter_table.select()))
+    assert counters == {(fw.uid, 'crypto_material', get_sha256('key'), False, 'key', 1)}
+
+    db_setup.migrate_tables()  # the aggregates are not created again (and the counters are not changed)
+    with db_setup.get_read_only_session() as session:
+        assert set(session.execute(summary_counter_table.select())) == counters
@@ -4,7 +4,7 @@ from os import urandom
 
 import pytest
 
-from storage.redis_interface import CHUNK_MAGIC, RedisInterface
+from storage.redis_interface import CHUNK_MAGIC, SEPARATOR, RedisInterface
 
 CHUNK_SIZE = 1_000
 
@@ -37,6 +37,19 @@ def test_set_and_get_chunked(redis):
     assert redis.get('key') is None
 
 
+def test_delete(redis):
+    redis.set('key', 'value')
+    redis.delete('key')
+    assert redis.redis.get('key') is None
+    redis.delete('key')  # deleting a missing key should not raise an error
+
+    redis.set('chunked_key', urandom(int(CHUNK_SIZE * 2.5)))
+    chunk_keys = redis.redis.get('chunked_key').decode().split(SEPARATOR)[1:]
+    redis.delete('chunked_key')
+    assert redis.redis.get('chunked_key') is None
+    assert not any(redis.redis.exists(key) for key in chunk_keys), 'the chunks should also be deleted'
+
+
 def test_queue_put_and_get(redis):
     values = [1, '2', b'3']
     for value in values:
@@ -8,6 +8,7 @@ from analysis.PluginBase import AnalysisBasePlugin, PluginInitException
 from helperFunctions.fileSystem import get_src_dir
 from objects.file import FileObject
 from plugins.analysis.dummy.code.dummy import AnalysisPlugin as DummyPlugin
+from test.common_helper import get_test_data_dir
 
 PLUGIN_PATH = Path(get_src_dir()) / 'plugins' / 'analysis'
 
@@ -145,3 +146,32 @@ def test_timeout(analysis_plugin, monkeypatch):
 def test_attribute_check():
     with pytest.raises(PluginInitException):
         AnalysisBasePlugin()
+
+
+class FailingPlugin(DummyPlugin):
+    def process_object(self, file_object):
+        raise RuntimeError('analysis failed')
+
+
+@pytest.mark.AnalysisPluginTestConfig(plugin_class=FailingPlugin, start_processes=True)
+def test_exception(analysis_plugin):
+    for _ in range(2):  # the worker must survive exceptions
+        analysis_plugin.add_job(FileObject(binary=b'test', scheduled_analysis=[]))
+        fo_out = analysis_plugin.out_queue.get(timeout=5)
+        assert fo_out.analysis_exception == ('dummy_plugin_for_testing_only', 'Exception occurred during analysis')
+
+
+class BinarySizePlugin(DummyPlugin):
+    def process_object(self, file_object):
+        file_object.processed_analysis[self.NAME] = {'size': len(file_object.binary)}
+        return file_object
+
+
+@pytest.mark.AnalysisPluginTestConfig(plugin_class=BinarySizePlugin, start_processes=True)
+def test_binary_is_loaded_from_file_path(analysis_plugin):
+    test_file = Path(get_test_data_dir()) / 'get_files_test' / 'testfile1'
+    fo = FileObject(file_path=str(test_file), scheduled_analysis=[])  # the binary is not loaded
+    analysis_plugin.add_job(fo)
+    fo_out = analysis_plugin.out_queue.get(timeout=5)
+    assert fo_out.processed_analysis['dummy_plugin_for_testing_only']['size'] == test_file.stat().st_size
+    assert not fo_out.binary_is_loaded(), 'the binary should not be sent back'
@@ -1,17 +1,32 @@
 # pylint: disable=wrong-import-order
 
-import logging
 import os
-from pathlib import Path
 
 import pytest
 
-from analysis.YaraPluginBase import YaraBasePlugin, _parse_meta_data, _split_output_in_rules_and_matches
+import yara
+
+from analysis.YaraPluginBase import YaraBasePlugin, _convert_yara_matches, _get_hex_strings
 from helperFunctions.fileSystem import get_src_dir
 from objects.file import FileObject
 from test.common_helper import get_test_data_dir
 
-YARA_TEST_OUTPUT = Path(get_test_data_dir(), 'yara_matches').read_text()
+TEST_RULES = '''
+rule text_rule
+{
+    meta:
+        description = "foo, \\"bar\\""
+        open_source = true
+        score = 5
+    strings:
+        $a = "test"
+        $b = { 00 01 FF }
+    condition:
+        any of them
+}
+
+private rule no_strings { condition: true }
+'''
 
 
 class YaraPlugin(YaraBasePlugin):
@@ -42,15 +57,26 @@ class TestAnalysisYaraBasePlugin:
         assert processed_file.processed_analysis[analysis_plugin.NAME]['summary'] == [], 'summary not empty'
 
 
-def test_parse_yara_output():
-    matches = YaraBasePlugin._parse_yara_output(YARA_TEST_OUTPUT)  # pylint: disable=protected-access
+def test_convert_yara_matches():
+    matches = yara.compile(source=TEST_RULES).match(data=b'a test\x00\x01\xff\x01test')
+    result = _convert_yara_matches(matches, {('text_rule', '$b')})
+
+    assert list(result) == ['text_rule'], 'private rules should not be part of the result'
+    assert result['text_rule']['rule'] == 'text_rule'
+    assert result['text_rule']['matches'] is True
+    assert result['text_rule']['strings'] == [(2, '$a', 'test'), (10, '$a', 'test'), (6, '$b', '00 01 FF')]
+    assert result['text_rule']['meta'] == {'description': 'foo, "bar"', 'open_source': True, 'score': '5'}
+
+
+def test_convert_yara_matches_escaped():
+    matches = yara.compile(source='rule r { strings: $a = { 41 00 42 } condition: $a }').match(data=b'A\x00B')
+    assert _convert_yara_matches(matches, set())['r']['strings'] == [(0, '$a', 'A\\x00B')]
 
-    assert isinstance(matches, dict), 'matches should be dict'
-    assert 'PgpPublicKeyBlock' in matches, 'Pgp block should have been matched'
-    assert matches['PgpPublicKeyBlock']['strings'][0][0] == 0, 'first block should start at 0x0'
-    assert 'r_libjpeg8_8d12b1_0' in matches
-    assert matches['r_libjpeg8_8d12b1_0']['meta']['description'] == 'foo [bar]'
-    assert len(matches) == 7, 'not all matches found'
+
+def test_get_hex_strings(tmp_path):
+    (tmp_path / 'test.yara').write_text(TEST_RULES)
+    assert _get_hex_strings(tmp_path) == {('text_rule', '$b')}
+    assert _get_hex_strings(tmp_path / 'non-existing') == set()
 
 
 def test_get_signature_file_name():
@@ -59,13 +85,10 @@ def test_get_signature_file_name():
     )  # pylint: disable=protected-access
 
 
-def test_parse_meta_data_error(caplog):
-    with caplog.at_level(logging.WARNING):
-        _parse_meta_data('illegal,meta,entry')
-        assert 'Malformed meta' in caplog.messages[0]
-
-
-def test_split_output_uneven():
-    uneven_yara_output = 'rule1 [meta=0,data=1] /path\n0x0:$a1: AA BB \nrule2 [meta=0,data=1] /path\n'
-    with pytest.raises(ValueError):
-        _split_output_in_rules_and_matches(uneven_yara_output)
+@pytest.mark.AnalysisPluginTestConfig(plugin_class=YaraPlugin)
+def test_process_object_with_matches_of_scan_stage(analysis_plugin):
+    test_file = FileObject(file_path=os.path.join(get_test_data_dir(), 'yara_test_file'))
+    test_file.temporary_data['yara_matches'] = {'fused_rule': {'rule': 'fused_rule', 'matches': True}}
+    results = analysis_plugin.process_object(test_file).processed_analysis[analysis_plugin.NAME]
+    assert results['summary'] == ['fused_rule'], 'the file should not be scanned again'
+    assert 'yara_matches' not in test_file.temporary_data
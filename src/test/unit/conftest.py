@@ -58,6 +58,12 @@ class CommonIntercomMock:
             return {'test_rule': ['test_uid']}, b'some yara rule'
         return None, None
 
+    @staticmethod
+    def get_binary_search_partial_result(request_id):
+        if request_id == 'running_binary_search_id':
+            return {'test_rule': ['test_uid', 'test_uid_2'], 'test_rule_2': ['test_uid']}, 1234
+        return None
+
     def add_compare_task(self, compare_id, force=False):
         self.task_list.append((compare_id, force))
 
@@ -1,9 +1,16 @@
 import logging
+import os
 from time import sleep
 
 import pytest
 
-from helperFunctions.process import ExceptionSafeProcess, check_worker_exceptions, new_worker_was_started
+from helperFunctions.process import (
+    ExceptionSafeProcess,
+    PersistentTaskProcess,
+    TaskProcessError,
+    check_worker_exceptions,
+    new_worker_was_started,
+)
 
 
 def breaking_process(wait: bool = False):
@@ -74,3 +81,50 @@ def test_new_worker_was_started():
 
     assert new_worker_was_started(old, new)
     assert not new_worker_was_started(old, old)
+
+
+def _get_pid_or_fail(task: str) -> int:
+    if task == 'exception':
+        raise RuntimeError('now that\'s annoying')
+    if task == 'crash':
+        os._exit(1)  # pylint: disable=protected-access
+    if task == 'sleep':
+        sleep(5)
+    return os.getpid()
+
+
+class TestPersistentTaskProcess:
+    def setup_method(self):
+        self.task_process = PersistentTaskProcess(_get_pid_or_fail, max_tasks=3)
+
+    def teardown_method(self):
+        self.task_process.shutdown()
+
+    def test_process_is_reused(self):
+        pids = {self.task_process.execute('foo', timeout=5) for _ in range(3)}
+        assert len(pids) == 1
+        assert os.getpid() not in pids
+
+    def test_recycle_after_max_tasks(self):
+        pids = [self.task_process.execute('foo', timeout=5) for _ in range(4)]
+        assert len(set(pids[:3])) == 1
+        assert pids[3] != pids[0]
+
+    def test_exception(self):
+        pid = self.task_process.execute('foo', timeout=5)
+        with pytest.raises(TaskProcessError, match='now that\'s annoying'):
+            self.task_process.execute('exception', timeout=5)
+        assert self.task_process.execute('foo', timeout=5) == pid, 'process should survive exceptions'
+
+    def test_crash(self):
+        pid = self.task_process.execute('foo', timeout=5)
+        with pytest.raises(TaskProcessError, match='terminated unexpectedly'):
+            self.task_process.execute('crash', timeout=5)
+        assert self.task_process.execute('foo', timeout=5) != pid
+
+    def test_timeout(self):
+        pid = self.task_process.execute('foo', timeout=5)
+        with pytest.raises(TimeoutError):
+            self.task_process.execute('sleep', timeout=0.1)
+        assert self.task_process.process is None
+        assert self.task_process.execute('foo', timeout=5) != pid
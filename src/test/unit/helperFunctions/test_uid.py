@@ -1,16 +1,27 @@
 import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
-from helperFunctions.uid import create_uid, is_list_of_uids, is_uid
+from helperFunctions.uid import create_uid, create_uid_from_file, is_list_of_uids, is_uid
 
 
 class TestHelperFunctionsUID(unittest.TestCase):
-
     test_uid = '9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08_4'
 
     def test_create_uid(self):
         result = create_uid('test')
         assert result == self.test_uid, 'uid not correct'
 
+    def test_create_uid_from_file(self):
+        with TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / 'test_file'
+            file_path.write_bytes(b'test')
+            assert create_uid_from_file(file_path) == self.test_uid
+            with patch('helperFunctions.uid.CHUNK_SIZE', 3):
+                file_path.write_bytes(b'foobar' * 3 + b'x')
+                assert create_uid_from_file(str(file_path)) == create_uid(b'foobar' * 3 + b'x')
+
     def test_is_uid(self):
         assert not is_uid(None)
         assert not is_uid('blah')
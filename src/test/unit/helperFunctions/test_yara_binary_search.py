@@ -1,13 +1,16 @@
 # pylint: disable=protected-access
 import unittest
 from os import path
-from subprocess import CalledProcessError
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest import mock
 from unittest.mock import patch
 
 import pytest
+import yara
 
 from helperFunctions import yara_binary_search
+from storage.ngram_index import NgramIndex
 from test.common_helper import get_test_data_dir  # pylint: disable=wrong-import-order
 
 TEST_FILE_1 = 'binary_search_test'
@@ -23,8 +26,8 @@ class MockCommonDbInterface:
         return []
 
 
-def mock_check_output(call, *_, shell=True, stderr=None, **__):
-    raise CalledProcessError(1, call, b'', stderr)
+def mock_scan_shard(*_):
+    raise yara.Error('could not open file')
 
 
 @pytest.mark.cfg_defaults(
@@ -55,36 +58,72 @@ class TestHelperFunctionsYaraBinarySearch(unittest.TestCase):
         assert isinstance(result, str)
         assert 'There seems to be an error in the rule file' in result
 
-    @patch('helperFunctions.yara_binary_search.subprocess.run', side_effect=mock_check_output)
-    def test_get_binary_search_yara_error(self, _):
+    @patch('helperFunctions.yara_binary_search._scan_shard', mock_scan_shard)
+    def test_get_binary_search_yara_error(self):
         result = self.yara_binary_scanner.get_binary_search_result((self.yara_rule, None))
         assert isinstance(result, str)
         assert 'Error when calling YARA' in result
 
-    def test_eliminate_duplicates(self):
-        test_dict = {1: [1, 2, 3, 3], 2: [1, 1, 2, 3]}
-        self.yara_binary_scanner._eliminate_duplicates(test_dict)
-        assert test_dict == {1: [1, 2, 3], 2: [1, 2, 3]}
-
-    def test_parse_raw_result(self):
-        raw_result = 'rule_1 match_1\nrule_1 match_2\nrule_2 match_1'
-        result = self.yara_binary_scanner._parse_raw_result(raw_result)
-        assert result == {'rule_1': ['match_1', 'match_2'], 'rule_2': ['match_1']}
-
-    def test_execute_yara_search(self):
-        test_rule_path = path.join(get_test_data_dir(), 'yara_binary_search_test_rule')
-        result = self.yara_binary_scanner._execute_yara_search(test_rule_path)
-        assert 'test_rule' in result
-
-    def test_execute_yara_search_for_single_file(self):
-        test_rule_path = path.join(get_test_data_dir(), 'yara_binary_search_test_rule')
-        result = self.yara_binary_scanner._execute_yara_search(
-            test_rule_path, target_path=path.join(get_test_data_dir(), TEST_FILE_1, TEST_FILE_1)
+    @patch('helperFunctions.yara_binary_search.SHARD_SIZE', 1)
+    @patch('helperFunctions.yara_binary_search.PARTIAL_RESULT_INTERVAL', -1)
+    def test_get_binary_search_partial_results(self):
+        partial_results = []
+        yara_rule = b'rule test_rule_3 {strings: $a = "this file" condition: $a}'
+        result = self.yara_binary_scanner.get_binary_search_result(
+            (yara_rule, None), lambda *args: partial_results.append(args)
         )
-        assert 'test_rule' in result
+        assert result == {'test_rule_3': [TEST_FILE_2, TEST_FILE_3]}
+        assert sorted(scanned_files for _, scanned_files in partial_results) == [1, 2, 3], 'one for each shard'
+        assert partial_results[-1][0] == result
+
+    def test_get_binary_search_result_with_ngram_index(self):
+        with TemporaryDirectory() as tmp_dir:
+            index = NgramIndex(tmp_dir)
+            for file_path in self.yara_binary_scanner._get_file_paths(None):
+                if path.basename(file_path) != TEST_FILE_3:  # files that are not in the index are always scanned
+                    index.add_file(path.basename(file_path), Path(file_path).read_bytes())
+            self.yara_binary_scanner.ngram_index = index
+
+            candidates = self.yara_binary_scanner._get_candidate_file_paths(self.yara_rule, None)
+            assert sorted(path.basename(file_path) for file_path in candidates) == [TEST_FILE_1, TEST_FILE_3]
+            result = self.yara_binary_scanner.get_binary_search_result((self.yara_rule, None))
+            assert result == {'test_rule': [TEST_FILE_1]}
+
+            yara_rule = b'rule test_rule_3 {strings: $a = "this file" condition: $a}'
+            result = self.yara_binary_scanner.get_binary_search_result((yara_rule, 'single_firmware'))
+            assert result == {'test_rule_3': [TEST_FILE_2, TEST_FILE_3]}
+
+    def test_get_file_paths(self):
+        result = list(self.yara_binary_scanner._get_file_paths(None))
+        assert sorted(path.basename(file_path) for file_path in result) == [TEST_FILE_1, TEST_FILE_2, TEST_FILE_3]
+        result = list(self.yara_binary_scanner._get_file_paths('single_firmware'))
+        assert [path.basename(file_path) for file_path in result] == [TEST_FILE_2, TEST_FILE_3]
+
+    def test_get_file_paths_without_hidden_files(self):
+        with TemporaryDirectory() as tmp_dir:
+            Path(tmp_dir, 'ab').mkdir()
+            Path(tmp_dir, 'ab', 'ab_uid').write_bytes(b'foo')
+            Path(tmp_dir, 'ab', '.ab_uid.123.456').write_bytes(b'foo')
+            Path(tmp_dir, '.tmp').mkdir()
+            Path(tmp_dir, '.tmp', 'cd_uid.123.456').write_bytes(b'foo')
+            self.yara_binary_scanner.db_path = tmp_dir
+            result = list(self.yara_binary_scanner._get_file_paths(None))
+        assert result == [path.join(tmp_dir, 'ab', 'ab_uid')], 'temporary files should be skipped'
+
+    def test_scan_shard(self):
+        compiled_rules = self.yara_binary_scanner._compile_rules(self.yara_rule)
+        yara_binary_search._init_worker(compiled_rules)
+        file_paths = [path.join(get_test_data_dir(), TEST_FILE_1, TEST_FILE_1), '/non/existing/file']
+        assert yara_binary_search._scan_shard(file_paths) == ({'test_rule': {TEST_FILE_1}}, 2)
 
     def test_get_file_paths_of_files_included_in_fo(self):
         result = self.yara_binary_scanner._get_file_paths_of_files_included_in_fw('single_firmware')
         assert len(result) == 2
         assert path.basename(result[0]) == TEST_FILE_2
         assert path.basename(result[1]) == TEST_FILE_3
+
+
+@patch('helperFunctions.yara_binary_search.SHARD_SIZE', 2)
+def test_split_into_shards():
+    assert list(yara_binary_search._split_into_shards(['a', 'b', 'c', 'd', 'e'])) == [['a', 'b'], ['c', 'd'], ['e']]
+    assert not list(yara_binary_search._split_into_shards([]))
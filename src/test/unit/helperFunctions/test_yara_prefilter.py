@@ -0,0 +1,82 @@
+import pytest
+import yara
+
+from helperFunctions.yara_prefilter import _get_hex_string_atoms, get_ngram_query
+
+
+def _ngrams(*atoms: bytes) -> set[int]:
+    return {int.from_bytes(atom[index : index + 3], 'big') for atom in atoms for index in range(len(atom) - 2)}
+
+
+def _to_sets(query):
+    if query is None:
+        return None
+    operator, operands = query
+    if operator == 'ngrams':
+        return set(operands.tolist())
+    return operator, [_to_sets(operand) for operand in operands]
+
+
+@pytest.mark.parametrize(
+    ('rules', 'expected'),
+    [
+        ('rule r { strings: $a = "foobar" condition: $a }', _ngrams(b'foobar')),
+        ('rule r { strings: $a = "foo" $b = "bar" condition: $a and $b }', _ngrams(b'foo', b'bar')),
+        ('rule r { strings: $a = "foo" $b = "bar" condition: all of them }', _ngrams(b'foo', b'bar')),
+        (
+            'rule r { strings: $a = "foo" $b = "bar" condition: any of them }',
+            ('or', [_ngrams(b'foo'), _ngrams(b'bar')]),
+        ),
+        ('rule r { strings: $a = "foo" $b = "bar" condition: 1 of ($a*) }', _ngrams(b'foo')),
+        ('rule r { strings: $a = "foo" condition: $a at 0 and filesize < 100 }', _ngrams(b'foo')),
+        ('rule r { strings: $a = "a\\x00\\"b" condition: ($a) }', _ngrams(b'a\x00"b')),
+        ('rule r { strings: $a = "foo" wide condition: $a }', _ngrams(b'f\x00o\x00o\x00')),
+        (
+            'rule r { strings: $a = "foo" condition: $a } rule s { strings: $a = "bar" condition: $a }',
+            ('or', [_ngrams(b'foo'), _ngrams(b'bar')]),
+        ),
+        ('private rule p { condition: true } rule r { strings: $a = "foo" condition: $a }', _ngrams(b'foo')),
+        ('rule r { strings: $a = { 00 01 02 ?? 03 04 05 } condition: $a }', _ngrams(b'\x00\x01\x02', b'\x03\x04\x05')),
+        ('import "pe"\nrule r { meta: a = "b" strings: $a = "foo" condition: pe.is_dll() and $a }', _ngrams(b'foo')),
+        (
+            'rule r { strings: $ = "foobar" $ = "bazqux" condition: any of them }',
+            ('or', [_ngrams(b'foobar'), _ngrams(b'bazqux')]),
+        ),
+        ('rule r { strings: $ = "foo" $a = "bar" $ = "baz" condition: all of them }', _ngrams(b'foo', b'bar', b'baz')),
+        # conditions and strings that can not be used
+        ('rule r { strings: $a = "foo" condition: not $a }', None),
+        ('rule r { strings: $a = "foo" condition: #a > 2 }', None),
+        ('rule r { strings: $a = "foo" condition: $a or filesize < 100 }', None),
+        ('rule r { strings: $a = "foo" nocase condition: $a }', None),
+        ('rule r { strings: $a = /foo/ condition: $a }', None),
+        ('rule r { strings: $a = "fo" condition: $a }', None),
+        ('rule r { strings: $a = "foo" condition: $a } rule s { condition: filesize < 10 }', None),
+        ('rule r { strings: $a = "foo" condition: $a } rule s { condition: r }', None),
+        ('rule r { strings: $a = "foo" condition: 0 of them }', None),
+        ('rule r { strings: $a = "foo" condition: for any i in (1..#a): (@a[i] < 10) }', None),
+        ('rule r { strings: $a = "foo" $a = "bar" condition: $a }', None),
+    ],
+)
+def test_get_ngram_query(rules, expected):
+    assert _to_sets(get_ngram_query(rules)) == expected
+
+
+def test_anonymous_strings_match():
+    # anonymous strings all share the identifier "$" -> none of them must be lost
+    rules = 'rule r { strings: $ = "foobar" $ = "bazqux" condition: any of them }'
+    assert yara.compile(source=rules).match(data=b'xxfoobarxx')
+    assert _ngrams(b'foobar') in _to_sets(get_ngram_query(rules))[1]
+
+
+@pytest.mark.parametrize(
+    ('hex_string', 'expected'),
+    [
+        ('{ 4D 5A 90 00 }', [b'MZ\x90\x00']),
+        ('{4D5A9000}', [b'MZ\x90\x00']),
+        ('{ 01 02 03 [2-4] 04 05 ?6 07 }', [b'\x01\x02\x03', b'\x04\x05', b'\x07']),
+        ('{ 01 02 ( 03 04 | 05 ) 06 ~07 08 }', [b'\x01\x02', b'\x06', b'\x08']),
+        ('{ 01 02 // comment\n 03 }', [b'\x01\x02\x03']),
+    ],
+)
+def test_get_hex_string_atoms(hex_string, expected):
+    assert _get_hex_string_atoms(hex_string) == expected
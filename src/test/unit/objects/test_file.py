@@ -1,3 +1,6 @@
+import pickle
+import re
+
 from common_helper_files import get_binary_from_file
 
 from objects.file import FileObject
@@ -85,3 +88,39 @@ class TestObjectsFile:  # pylint: disable=no-self-use
         fo = FileObject(binary=b'foo')
         fo.virtual_file_path = {'root_uid_1': ['vfp1', 'vfp2'], 'root_uid_2': ['vfp3']}
         assert sorted(fo.get_virtual_paths_for_all_uids()) == ['vfp1', 'vfp2', 'vfp3']
+
+    def test_binary_is_loaded_lazily(self):
+        test_object = FileObject(file_path=f'{get_test_data_dir()}/test_data_file.bin')
+        assert test_object.uid == '268d870ffa2b21784e4dc955d8e8b8eb5f3bcddd6720a1e6d31d2cf84bd1bff8_19'
+        assert not test_object.binary_is_loaded(), 'hash and size should be computed without loading the file'
+
+        assert test_object.binary[:4] == b'test'
+        assert re.search(rb'string in \w+', test_object.binary).group() == b'string in file'
+        assert test_object.binary_is_loaded()
+
+    def test_hash_is_computed_at_creation(self, tmp_path):
+        test_file = tmp_path / 'test_file'
+        test_file.write_bytes(b'test string in file')
+        test_object = FileObject(file_path=str(test_file))
+        test_file.unlink()  # e.g. a temporary file
+        assert test_object.uid == '268d870ffa2b21784e4dc955d8e8b8eb5f3bcddd6720a1e6d31d2cf84bd1bff8_19'
+        assert test_object.size == 19
+
+    def test_loaded_binary_is_pickled(self):
+        test_object = FileObject(file_path=f'{get_test_data_dir()}/test_data_file.bin')
+        assert test_object.binary == b'test string in file'
+        test_object.file_path = None
+        assert pickle.loads(pickle.dumps(test_object)).binary == b'test string in file'
+
+    def test_metadata_does_not_change_on_access(self):
+        test_object = FileObject(file_path=f'{get_test_data_dir()}/test_data_file.bin')
+        test_object.uid, test_object.size = 'some_uid', 42  # e.g. set from the database
+        assert test_object.uid == 'some_uid'
+        assert test_object.size == 42
+        assert test_object.sha256 == '268d870ffa2b21784e4dc955d8e8b8eb5f3bcddd6720a1e6d31d2cf84bd1bff8'
+
+    def test_file_object_with_missing_file(self):
+        test_object = FileObject(file_path='/non/existing/file')
+        assert test_object.binary is None
+        assert test_object.uid is None
+        assert test_object.file_name == 'file'
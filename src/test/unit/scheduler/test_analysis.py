@@ -8,8 +8,10 @@ from unittest import TestCase, mock
 import pytest
 
 from config import configparser_cfg
+from objects.file import FileObject
 from objects.firmware import Firmware
 from scheduler.analysis import MANDATORY_PLUGINS, AnalysisScheduler
+from scheduler.yara_scan import YaraScanStage
 from storage.unpacking_locks import UnpackingLockManager
 from test.common_helper import MockFileObject, get_test_data_dir
 from test.mock import mock_patch, mock_spy
@@ -24,6 +26,14 @@ class BackendDbInterface:
     def get_analysis(self, *_):
         pass
 
+    def get_analyses(self, *_):
+        return {}
+
+    def get_analysis_metadata(self, *_):
+        return {}
+
+    round_trips = 0
+
 
 @pytest.mark.cfg_defaults(
     {
@@ -89,10 +99,34 @@ class TestScheduleInitialAnalysis(AnalysisSchedulerTest):
         analysis_results = [self.tmp_queue.get(timeout=10) for _ in range(3)]
         assert len(analysis_results) == 3, 'analysis not done'
         assert analysis_results[0]['plugin'] == 'file_type'
-        assert analysis_results[1]['plugin'] == 'dummy_plugin_for_testing_only'
-        assert analysis_results[2]['plugin'] == 'file_hashes'
-        assert analysis_results[1]['result']['1'] == 'first result', 'result not correct'
-        assert analysis_results[1]['result']['summary'] == ['first result', 'second result']
+        # plugins without dependencies between them run concurrently -> the order is not fixed
+        results_by_plugin = {result['plugin']: result['result'] for result in analysis_results[1:]}
+        assert set(results_by_plugin) == {'dummy_plugin_for_testing_only', 'file_hashes'}
+        assert results_by_plugin['dummy_plugin_for_testing_only']['1'] == 'first result', 'result not correct'
+        assert results_by_plugin['dummy_plugin_for_testing_only']['summary'] == ['first result', 'second result']
+
+    def test_whole_run_binary_from_file_storage(self):
+        test_fw = Firmware(file_path=os.path.join(get_test_data_dir(), 'get_files_test/testfile1'))
+        test_fw.scheduled_analysis = ['file_hashes']
+        self.sched.fs_organizer.store_file(test_fw)
+        self.sched.start_analysis_of_object(test_fw)
+        analysis_results = {}
+        for _ in range(2):
+            result = self.tmp_queue.get(timeout=10)
+            analysis_results[result['plugin']] = result['result']
+        assert set(analysis_results) == {'file_type', 'file_hashes'}
+        assert analysis_results['file_hashes']['sha256'] == test_fw.sha256, 'binary was not loaded by the plugin'
+
+    def test_get_object_without_binary(self):
+        test_fw = Firmware(file_path=os.path.join(get_test_data_dir(), 'get_files_test/testfile1'))
+        assert self.sched._get_object_without_binary(test_fw) is test_fw, 'file not in storage -> keep binary'
+
+        self.sched.fs_organizer.store_file(test_fw)
+        result = self.sched._get_object_without_binary(test_fw)
+        assert not result.binary_is_loaded()
+        assert result.file_path == self.sched.fs_organizer.generate_path(test_fw)
+        assert result.uid == test_fw.uid
+        assert test_fw.binary is not None, 'original object must not be changed'
 
     def test_expected_plugins_are_found(self):
         result = self.sched.get_plugin_dict()
@@ -127,25 +161,61 @@ class TestScheduleInitialAnalysis(AnalysisSchedulerTest):
             self.sched._process_next_analysis_task(test_fw)
             assert not spy.was_called(), 'unknown plugin should simply be skipped'
 
-    @pytest.mark.cfg_defaults(
-        {
-            'dummy_plugin_for_testing_only': {
-                'mime_whitelist': 'foo, bar',
-            },
-        }
-    )
-    def test_skip_analysis_because_whitelist(self):
+    def test_file_object_is_stored_once(self):
         test_fw = Firmware(file_path=os.path.join(get_test_data_dir(), 'get_files_test/testfile1'))
-        test_fw.scheduled_analysis = ['file_hashes']
-        test_fw.processed_analysis['file_type'] = {'mime': 'text/plain'}
-        self.sched._start_or_skip_analysis('dummy_plugin_for_testing_only', test_fw)
-        analysis = self.tmp_queue.get(timeout=10)
-        assert analysis['plugin'] == 'dummy_plugin_for_testing_only'
-        assert 'skipped' in analysis['result']
+        test_fw.scheduled_analysis = ['file_hashes', 'file_type']
+        stored_objects, started_jobs = [], []
+
+        with mock_patch(self.sched, 'pre_analysis', stored_objects.append):
+            with mock.patch('analysis.PluginBase.AnalysisBasePlugin.add_job', lambda *args: started_jobs.append(args)):
+                self.sched._process_next_analysis_task(test_fw)
+                while started_jobs:  # simulate the result collector
+                    plugin, result_fo = started_jobs.pop()
+                    result_fo.temporary_data.update({'finished_analysis': plugin.NAME, 'result_db_round_trips': 2})
+                    self.sched._process_next_analysis_task(result_fo)
+
+        assert stored_objects == [test_fw], 'the file object should only be stored once'
+        assert not started_jobs
+        assert not self.sched.running_tasks
+        assert test_fw.temporary_data['db_round_trips'] == 4
+
+    def test_analyses_wait_for_yara_scan(self):
+        test_fw = Firmware(file_path=os.path.join(get_test_data_dir(), 'get_files_test/testfile1'))
+        test_fw.scheduled_analysis = ['file_hashes', 'file_type']
+        yara_scan_stage, started_jobs = YaraScanStageMock(['file_hashes', 'file_type']), []
 
+        with mock_patch(self.sched, 'yara_scan_stage', yara_scan_stage):
+            with mock.patch('analysis.PluginBase.AnalysisBasePlugin.add_job', lambda *args: started_jobs.append(args)):
+                self.sched._process_next_analysis_task(test_fw)
+                assert not started_jobs, 'the analysis should wait for the YARA scan'
+                assert len(yara_scan_stage.jobs) == 1
 
-class TestAnalysisSchedulerBlacklist:
+                scanned_fo = yara_scan_stage.jobs.pop()
+                scanned_fo.temporary_data['fused_yara_matches'] = {'file_hashes': {'rule': {}}, 'file_type': {}}
+                self.sched._process_next_analysis_task(scanned_fo)
+                plugin, result_fo = started_jobs.pop()
+                assert (plugin.NAME, result_fo.temporary_data['yara_matches']) == ('file_type', {})
+                assert 'fused_yara_matches' not in result_fo.temporary_data, 'plugins should only get their own matches'
+
+                result_fo.temporary_data['finished_analysis'] = plugin.NAME  # file_hashes runs after file_type
+                self.sched._process_next_analysis_task(result_fo)
+                plugin, result_fo = started_jobs.pop()
+                assert (plugin.NAME, result_fo.temporary_data['yara_matches']) == ('file_hashes', {'rule': {}})
+                assert not yara_scan_stage.jobs, 'the file should only be scanned once'
+
+
+class YaraScanStageMock:
+    enabled = True
+
+    def __init__(self, plugins):
+        self.plugins = {plugin: None for plugin in plugins}
+        self.jobs = []
+
+    def add_job(self, file_object):
+        self.jobs.append(file_object)
 
+
+class TestAnalysisSchedulerBlacklist:
     test_plugin = 'test_plugin'
     file_object = MockFileObject()
 
@@ -269,13 +339,6 @@ class TestAnalysisSkipping:
             if system_version:
                 self.SYSTEM_VERSION = system_version
 
-    class BackendMock:
-        def __init__(self, analysis_result):
-            self.analysis_entry = analysis_result
-
-        def get_analysis(self, *_):
-            return self.analysis_entry
-
     @classmethod
     def setup_class(cls):
         cls.init_patch = mock.patch(target='scheduler.analysis.AnalysisScheduler.__init__', new=lambda *_: None)
@@ -308,11 +371,13 @@ class TestAnalysisSkipping:
             'plugin_version': analysis_plugin_version,
             'system_version': analysis_system_version,
         }
-        self.scheduler.db_backend_service = self.BackendMock(analysis_entry)
         self.scheduler.analysis_plugins[plugin] = self.PluginMock(
             version=plugin_version, system_version=plugin_system_version
         )
-        assert self.scheduler._analysis_is_already_in_db_and_up_to_date(plugin, '') == expected_output
+        analysis_metadata = {plugin: analysis_entry}
+        assert (
+            self.scheduler._analysis_is_already_in_db_and_up_to_date(plugin, '', analysis_metadata) == expected_output
+        )
 
     @pytest.mark.parametrize(
         'db_entry',
@@ -327,9 +392,12 @@ class TestAnalysisSkipping:
         ],
     )
     def test_analysis_is_already_in_db_and_up_to_date__incomplete(self, db_entry):
-        self.scheduler.db_backend_service = self.BackendMock(db_entry)
         self.scheduler.analysis_plugins['plugin'] = self.PluginMock(version='1.0', system_version='1.0')
-        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('plugin', '') is False
+        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('plugin', '', {'plugin': db_entry}) is False
+
+    def test_analysis_is_already_in_db_and_up_to_date__missing(self):
+        self.scheduler.analysis_plugins['plugin'] = self.PluginMock(version='1.0', system_version=None)
+        assert self.scheduler._analysis_is_already_in_db_and_up_to_date('plugin', '', {}) is False
 
     def test_is_forced_update(self):
         fo = MockFileObject()
@@ -349,14 +417,6 @@ class TestAnalysisShouldReanalyse:
             self.VERSION = plugin_version
             self.SYSTEM_VERSION = system_version
 
-    class BackendMock:
-        def __init__(self, dependency_analysis_date, system_version=None):
-            self.date = dependency_analysis_date
-            self.system_version = system_version
-
-        def get_analysis(self, *_):
-            return dict(analysis_date=self.date, system_version=None)
-
     @classmethod
     def setup_class(cls):
         cls.init_patch = mock.patch(target='scheduler.analysis.AnalysisScheduler.__init__', new=lambda *_: None)
@@ -390,9 +450,14 @@ class TestAnalysisShouldReanalyse:
         analysis_db_entry = dict(
             plugin_version=db_plugin_version, analysis_date=plugin_date, system_version=db_system_version
         )
-        self.scheduler.db_backend_service = self.BackendMock(dependency_date)
+        analysis_metadata = {'plugin_dep': dict(analysis_date=dependency_date, system_version=None)}
         plugin = self.PluginMock(plugin_version, system_version)
-        assert self.scheduler._analysis_is_up_to_date(analysis_db_entry, plugin, 'uid') == expected_result
+        assert self.scheduler._analysis_is_up_to_date(analysis_db_entry, plugin, analysis_metadata) == expected_result
+
+    def test_dependency_missing(self):
+        analysis_db_entry = dict(plugin_version='1.0', analysis_date=10, system_version=None)
+        plugin = self.PluginMock('1.0', None)
+        assert self.scheduler._analysis_is_up_to_date(analysis_db_entry, plugin, {}) is False
 
 
 class PluginMock:
@@ -408,13 +473,83 @@ def test_combined_analysis_workload(monkeypatch):
     dummy_plugin = scheduler.analysis_plugins['dummy_plugin'] = PluginMock([])
     dummy_plugin.in_queue = Queue()  # pylint: disable=attribute-defined-outside-init
     scheduler.process_queue = Queue()
+    scheduler.yara_scan_stage = YaraScanStage({}, scheduler.process_queue, worker_count=0)
     try:
         assert scheduler.get_combined_analysis_workload() == 0
         scheduler.process_queue.put({})
         for _ in range(2):
             dummy_plugin.in_queue.put({})
-        assert scheduler.get_combined_analysis_workload() == 3
+        scheduler.yara_scan_stage.add_job({})
+        assert scheduler.get_combined_analysis_workload() == 4
     finally:
         sleep(0.1)  # let the queue finish internally to not cause "Broken pipe"
         scheduler.process_queue.close()
         dummy_plugin.in_queue.close()
+        scheduler.yara_scan_stage.in_queue.close()
+
+
+class TestUpToDateAnalyses:
+    class PluginMock:
+        VERSION = '1.0'
+
+        def __init__(self, name, dependencies):
+            self.NAME = name
+            self.DEPENDENCIES = dependencies
+
+    class BackendMock:
+        def __init__(self, analysis_metadata):
+            self.analysis_metadata = analysis_metadata
+            self.requested_results = None
+
+        def get_analysis_metadata(self, uid_list):
+            return {uid: self.analysis_metadata for uid in uid_list}
+
+        def get_analyses(self, uid, plugin_list):
+            self.requested_results = set(plugin_list)
+            return {plugin: {'result': uid} for plugin in plugin_list}
+
+    @pytest.fixture(autouse=True)
+    def _scheduler(self, monkeypatch):
+        monkeypatch.setattr(AnalysisScheduler, '__init__', lambda *_: None)
+        self.scheduler = AnalysisScheduler()  # pylint: disable=attribute-defined-outside-init
+        self.scheduler.analysis_plugins = {
+            name: self.PluginMock(name, dependencies)
+            for name, dependencies in [('file_type', []), ('a', []), ('b', ['a']), ('c', ['b']), ('d', [])]
+        }
+
+    def _get_file_object(self, analysis_dates, plugin_versions=None):
+        metadata = {
+            plugin: {'plugin_version': (plugin_versions or {}).get(plugin, '1.0'), 'analysis_date': date}
+            for plugin, date in analysis_dates.items()
+        }
+        self.scheduler.db_backend_service = self.BackendMock(metadata)
+        fo = FileObject(binary=b'test')
+        fo.scheduled_analysis = ['d', 'c', 'b', 'a', 'file_type']
+        return fo
+
+    def test_all_up_to_date(self):
+        fo = self._get_file_object({'file_type': 1, 'a': 2, 'b': 3, 'c': 4, 'd': 5})
+        assert self.scheduler._get_up_to_date_analyses(fo) == {'file_type', 'a', 'b', 'c', 'd'}
+        assert self.scheduler.db_backend_service.requested_results is None, 'no results needed'
+
+    def test_outdated_dependency(self):
+        fo = self._get_file_object({'file_type': 1, 'a': 2, 'b': 3, 'c': 4, 'd': 5}, plugin_versions={'a': '0.9'})
+        assert self.scheduler._get_up_to_date_analyses(fo) == {'file_type', 'd'}, 'b and c depend on a'
+        assert self.scheduler.db_backend_service.requested_results == {'file_type'}
+        assert 'file_type' in fo.processed_analysis
+
+    def test_missing_and_older_analyses(self):
+        fo = self._get_file_object({'file_type': 1, 'a': 2, 'b': 1, 'c': 4})  # b is older than a, d is missing
+        assert self.scheduler._get_up_to_date_analyses(fo) == {'file_type', 'a'}
+        assert self.scheduler.db_backend_service.requested_results == {'file_type', 'a'}
+
+    def test_forced_update(self):
+        fo = self._get_file_object({'file_type': 1, 'a': 2, 'b': 3, 'c': 4, 'd': 5})
+        fo.force_update = True
+        assert self.scheduler._get_up_to_date_analyses(fo) == set()
+
+    def test_metadata_from_temporary_data(self):
+        fo = self._get_file_object({})
+        fo.temporary_data['analysis_metadata'] = {'d': {'plugin_version': '1.0', 'analysis_date': 1}}
+        assert self.scheduler._get_up_to_date_analyses(fo) == {'d'}
+        assert 'analysis_metadata' not in fo.temporary_data
@@ -0,0 +1,85 @@
+# pylint: disable=protected-access,redefined-outer-name
+from multiprocessing import Queue
+from time import sleep, time
+
+import pytest
+
+from objects.file import FileObject
+from scheduler.analysis_result_writer import AnalysisResultWriter
+
+
+class DbInterfaceMock:
+    round_trips = 0
+
+    def __init__(self):
+        self.batches = Queue()
+
+    def add_analyses(self, analyses):
+        if any(uid == 'error' for uid, *_ in analyses):
+            raise RuntimeError('database error')
+        self.batches.put(analyses)
+
+
+@pytest.fixture
+def result_writer():
+    writer = AnalysisResultWriter(DbInterfaceMock(), batch_size=3, flush_interval=0.2, queue_size=10)
+    yield writer
+    writer.queue.close()
+
+
+def test_get_next_batch__batch_size(result_writer):
+    for index in range(5):
+        result_writer.add_result(f'uid_{index}', 'plugin', {})
+    sleep(0.1)  # the queue is filled by a feeder thread
+
+    batch, finished = result_writer._get_next_batch()
+    assert [uid for uid, *_ in batch] == ['uid_0', 'uid_1', 'uid_2'], 'the batch should be full'
+    assert not finished
+
+    start = time()
+    batch, finished = result_writer._get_next_batch()
+    assert [uid for uid, *_ in batch] == ['uid_3', 'uid_4']
+    assert time() - start >= 0.2, 'the batch should be stored after the flush interval'
+    assert not finished
+
+
+def test_get_next_batch__end_of_queue(result_writer):
+    result_writer.add_result('uid', 'plugin', {})
+    result_writer.queue.put(None)
+
+    batch, finished = result_writer._get_next_batch()
+    assert batch == [('uid', 'plugin', {})]
+    assert finished
+
+
+def test_writer_process(result_writer):
+    result_writer.start()
+    for index in range(4):
+        result_writer.add_result(f'uid_{index}', 'plugin', {'index': index})
+    first_batch = result_writer.db_interface.batches.get(timeout=5)
+    assert len(first_batch) == 3
+
+    result_writer.shutdown()  # remaining results are stored before the process stops
+    assert result_writer.db_interface.batches.get(timeout=5) == [('uid_3', 'plugin', {'index': 3})]
+    assert not result_writer.writer_process.is_alive()
+
+
+def test_writer_process_error(result_writer):
+    result_writer.start()
+    result_writer.add_result('error', 'plugin', {})
+    sleep(0.5)  # wait for the flush interval so that the results are stored in separate batches
+    assert result_writer.writer_process.is_alive(), 'the writer should keep running after an error'
+    result_writer.add_result('uid', 'plugin', {})
+    assert result_writer.db_interface.batches.get(timeout=5) == [('uid', 'plugin', {})]
+    result_writer.shutdown()
+
+
+def test_completion_after_store(result_writer):
+    completed = Queue()
+    result_writer.completion_callback = lambda fo: completed.put((fo.uid, result_writer.db_interface.batches.qsize()))
+    result_writer.start()
+    file_object = FileObject(binary=b'foo')
+    result_writer.add_result(file_object.uid, 'plugin', {})
+    result_writer.add_completed_object(file_object)
+    assert completed.get(timeout=5) == (file_object.uid, 1), 'the results should be stored before the completion'
+    result_writer.shutdown()
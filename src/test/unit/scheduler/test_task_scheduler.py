@@ -85,6 +85,23 @@ class TestAnalysisScheduling:
         self._add_plugins()
         assert set(self.scheduler._get_plugins_with_met_dependencies(remaining, scheduled)) == expected_output
 
+    @pytest.mark.parametrize(
+        'scheduled, running, expected_output',
+        [
+            ([], set(), []),
+            (['no_deps', 'foo', 'bar'], set(), ['no_deps']),
+            (['foo', 'bar'], {'no_deps'}, []),
+            (['foo', 'bar', 'other'], set(), ['foo', 'other']),
+            (['bar', 'other', 'unknown'], {'foo'}, ['other', 'unknown']),
+            (['foo', 'file_type'], set(), ['file_type']),
+            (['foo', 'other'], {'file_type'}, []),
+        ],
+    )
+    def test_get_plugins_ready_for_analysis(self, scheduled, running, expected_output):
+        self._add_plugins()
+        self.scheduler.plugins.update({'other': self.PluginMock([]), 'file_type': self.PluginMock([])})
+        assert self.scheduler.get_plugins_ready_for_analysis(scheduled, running) == expected_output
+
     def test_reschedule_failed_analysis_task(self):
         task = Firmware(binary='foo')
         error_message = 'There was an exception'
@@ -0,0 +1,90 @@
+# pylint: disable=redefined-outer-name
+import os
+from multiprocessing import Queue
+
+import pytest
+import yara
+
+from analysis.YaraPluginBase import YaraBasePlugin
+from objects.file import FileObject
+from scheduler.yara_scan import YaraScanStage
+
+SIGNATURES = {
+    'plugin_a': '''
+rule foo { strings: $a = "foo" condition: $a }
+rule bar {
+    strings:
+        $a = { 62 61 72 }
+    condition:
+        $a
+}
+''',
+    'plugin_b': 'rule foo { meta: description = "b" strings: $b = "oo" condition: $b }',
+    'plugin_c': 'rule baz { strings: $a = "baz" condition: $a }',
+}
+
+
+class YaraPluginMock(YaraBasePlugin):
+    def __init__(self, name, plugin_dir):  # pylint: disable=super-init-not-called
+        self.NAME = name  # pylint: disable=invalid-name
+        self.FILE = str(plugin_dir / 'code' / f'{name}.py')
+        self.signature_path = str(plugin_dir / f'{name}.yc')
+
+
+@pytest.fixture
+def yara_plugins(tmp_path):
+    plugins = {}
+    for name, signatures in SIGNATURES.items():
+        plugin_dir = tmp_path / name
+        (plugin_dir / 'signatures').mkdir(parents=True)
+        (plugin_dir / 'signatures' / 'signatures.yara').write_text(signatures)
+        yara.compile(source=signatures).save(str(plugin_dir / f'{name}.yc'))
+        plugins[name] = YaraPluginMock(name, plugin_dir)
+    yara.compile(sources=SIGNATURES).save(str(tmp_path / 'fused.yc'))
+    return plugins
+
+
+@pytest.fixture
+def result_queue():
+    queue = Queue()
+    yield queue
+    queue.close()
+
+
+def test_scan(yara_plugins, result_queue, tmp_path):
+    stage = YaraScanStage(yara_plugins, result_queue, signature_path=str(tmp_path / 'fused.yc'))
+    assert stage.enabled
+
+    result = stage.scan(FileObject(binary=b'foo bar'))
+    assert set(result) == {'plugin_a', 'plugin_b', 'plugin_c'}
+    assert set(result['plugin_a']) == {'foo', 'bar'}
+    assert result['plugin_a']['bar']['strings'] == [(4, '$a', '62 61 72')], 'hex strings of the plugin'
+    assert result['plugin_b'] == {
+        'foo': {'rule': 'foo', 'matches': True, 'strings': [(1, '$b', 'oo')], 'meta': {'description': 'b'}}
+    }, 'rules with the same name should be separated by plugin'
+    assert result['plugin_c'] == {}
+
+
+def test_outdated_signatures(yara_plugins, result_queue, tmp_path):
+    fused_mtime = (tmp_path / 'fused.yc').stat().st_mtime
+    os.utime(yara_plugins['plugin_c'].signature_path, (fused_mtime + 10, fused_mtime + 10))
+    stage = YaraScanStage(yara_plugins, result_queue, signature_path=str(tmp_path / 'fused.yc'))
+    assert set(stage.plugins) == {'plugin_a', 'plugin_b'}, 'plugin_c should scan with its own signatures'
+
+
+def test_missing_signatures(yara_plugins, result_queue, tmp_path):
+    stage = YaraScanStage(yara_plugins, result_queue, signature_path=str(tmp_path / 'non-existing.yc'))
+    assert stage.plugins == {}
+    assert not stage.enabled
+
+
+def test_worker(yara_plugins, result_queue, tmp_path):
+    stage = YaraScanStage(yara_plugins, result_queue, worker_count=1, signature_path=str(tmp_path / 'fused.yc'))
+    stage.start()
+    try:
+        stage.add_job(FileObject(binary=b'baz'))
+        file_object = result_queue.get(timeout=5)
+    finally:
+        stage.shutdown()
+    assert set(file_object.temporary_data['fused_yara_matches']['plugin_c']) == {'baz'}
+    assert not any(worker.is_alive() for worker in stage.workers)
@@ -3,7 +3,7 @@
 import pytest
 
 from analysis.PluginBase import AnalysisBasePlugin
-from statistic.analysis_stats import get_plugin_stats
+from statistic.analysis_stats import DurationStats, get_plugin_stats
 from test.common_helper import create_test_firmware
 
 
@@ -54,3 +54,20 @@ def test_update_duration_stats(mock_plugin):
     assert mock_plugin.analysis_stats_index.value == 0, 'index should start at 0 when max count is reached'
 
     assert get_plugin_stats(mock_plugin) is not None
+
+
+def test_duration_stats():
+    stats = DurationStats(limit=3)
+    assert stats.get_stats() is None
+    for duration in [5.0, 1.0, 2.0, 3.0]:
+        stats.add(duration)
+    assert stats.count.value == 3
+    assert stats.index.value == 1
+    assert stats.get_stats() == {
+        'count': '3',
+        'max': '3.00',
+        'mean': '2.00',
+        'median': '2.00',
+        'min': '1.00',
+        'std_dev': '0.82',
+    }
@@ -0,0 +1,45 @@
+# pylint: disable=protected-access
+import multiprocessing
+from types import SimpleNamespace
+
+import pytest
+
+from storage import db_connection
+from storage.db_connection import ReadOnlyConnection, ReadWriteConnection
+
+
+def test_engine_is_shared():
+    connection = ReadOnlyConnection()
+    assert ReadOnlyConnection().engine is connection.engine
+    assert ReadWriteConnection().engine is not connection.engine
+    assert ReadOnlyConnection(db_name='other_db').engine is not connection.engine
+    assert ReadOnlyConnection(echo=True).engine is not connection.engine
+
+
+@pytest.mark.cfg_defaults({'data-storage': {'postgres-pool-size': '3', 'postgres-max-overflow': '7'}})
+def test_pool_size():
+    pool = ReadOnlyConnection(db_name='pool_size_test_db').engine.pool
+    assert pool.size() == 3
+    assert pool._max_overflow == 7
+
+
+def test_round_trips_are_counted_per_engine():
+    connection = ReadOnlyConnection()
+    round_trips = connection.round_trips
+    db_connection._count_round_trip(SimpleNamespace(engine=connection.engine))
+    assert connection.round_trips == ReadOnlyConnection().round_trips == round_trips + 1
+
+
+def _get_pool_id(engine, queue):
+    queue.put(id(engine.pool))
+
+
+def test_pools_are_replaced_after_fork():
+    engine = ReadOnlyConnection().engine
+    pool = engine.pool
+    queue = multiprocessing.get_context('fork').Queue()
+    process = multiprocessing.get_context('fork').Process(target=_get_pool_id, args=(engine, queue))
+    process.start()
+    process.join()
+    assert queue.get(timeout=5) != id(pool), 'the child process should not use the connection pool of the parent'
+    assert engine.pool is pool
@@ -1,10 +1,13 @@
+# pylint: disable=redefined-outer-name,protected-access
 import os
+import stat
 
 import pytest
 from common_helper_files import get_binary_from_file
 
 from objects.file import FileObject
-from storage.fsorganizer import FSOrganizer
+from storage.fsorganizer import TMP_DIR_NAME, FSOrganizer
+from storage.ngram_index import NgramIndex
 
 
 @pytest.fixture
@@ -44,3 +47,51 @@ def test_store_and_delete_file(fsorganizer):
 
     fsorganizer.delete_file(file_object.uid)
     assert not os.path.exists(file_object.file_path), 'file not deleted'
+
+
+def test_store_file_with_ngram_index(fsorganizer, tmp_path):
+    fsorganizer.ngram_index = NgramIndex(str(tmp_path))
+    fsorganizer.store_file(FileObject(b'abcde'))
+    assert [path.stem for path in fsorganizer.ngram_index._get_pending_files()] == [
+        '36bbe50ed96841d10443bcb670d6554f0a34b761be67ec9c4a8ad2c0c44ca42c_5'
+    ]
+
+
+@pytest.mark.parametrize('hard_link', [True, False])
+def test_store_file_from_path(fsorganizer, tmp_path, hard_link, monkeypatch):
+    if not hard_link:
+        monkeypatch.setattr('storage.fsorganizer.os.link', _raise_os_error)
+    fsorganizer.ngram_index = NgramIndex(str(tmp_path / 'index'))
+    source_path = tmp_path / 'extracted_file'
+    source_path.write_bytes(b'abcde')
+    source_path.chmod(0o4777)  # world-writable and setuid
+    file_object = FileObject(file_name='extracted_file')
+    file_object.uid = '36bbe50ed96841d10443bcb670d6554f0a34b761be67ec9c4a8ad2c0c44ca42c_5'
+
+    fsorganizer.store_file_from_path(file_object, source_path)
+    _check_file_presence_and_content(file_object.file_path, b'abcde')
+    assert file_object.file_path == fsorganizer.generate_path(file_object)
+    assert not file_object.binary_is_loaded(), 'the binary should not be loaded'
+    assert os.path.samefile(file_object.file_path, source_path) == hard_link
+    assert stat.S_IMODE(os.stat(file_object.file_path).st_mode) & (stat.S_ISUID | stat.S_IWOTH) == 0
+    assert [path.stem for path in fsorganizer.ngram_index._get_pending_files()] == [file_object.uid]
+    assert not any((fsorganizer.data_storage_path / TMP_DIR_NAME).iterdir()), 'temporary file should be renamed'
+
+    fsorganizer.store_file_from_path(file_object, source_path)  # storing an existing file again should not fail
+    _check_file_presence_and_content(file_object.file_path, b'abcde')
+
+
+def test_store_file_from_path_of_other_user(fsorganizer, tmp_path, monkeypatch):
+    monkeypatch.setattr('storage.fsorganizer.os.getuid', lambda: os.stat(tmp_path).st_uid + 1)
+    source_path = tmp_path / 'extracted_file'
+    source_path.write_bytes(b'abcde')
+    file_object = FileObject(file_name='extracted_file')
+    file_object.uid = '36bbe50ed96841d10443bcb670d6554f0a34b761be67ec9c4a8ad2c0c44ca42c_5'
+
+    fsorganizer.store_file_from_path(file_object, source_path)
+    _check_file_presence_and_content(file_object.file_path, b'abcde')
+    assert not os.path.samefile(file_object.file_path, source_path), 'files of other users should be copied'
+
+
+def _raise_os_error(*_):
+    raise OSError('Invalid cross-device link')
@@ -0,0 +1,118 @@
+# pylint: disable=redefined-outer-name,protected-access
+import itertools
+import random
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from helperFunctions.yara_prefilter import get_ngram_query
+from storage import ngram_index
+from storage.ngram_index import NgramIndex, get_ngrams
+
+FILES = {
+    'uid_1': b'foo bar',
+    'uid_2': b'foo baz',
+    'uid_3': b'foobar',
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NgramIndex(str(tmp_path / 'index'))
+    for uid, binary in FILES.items():
+        index.add_file(uid, binary)
+    yield index
+
+
+def test_get_ngrams():
+    assert get_ngrams(b'abcabc').tolist() == [0x616263, 0x626361, 0x636162]
+    assert get_ngrams(b'ab').tolist() == []
+
+
+@patch('storage.ngram_index.CHUNK_SIZE', 4)
+@patch('storage.ngram_index.SMALL_FILE_SIZE', 0)
+def test_get_ngrams_chunks():
+    binary = bytes(range(20))
+    assert get_ngrams(binary).tolist() == [int.from_bytes(binary[i : i + 3], 'big') for i in range(18)]
+
+
+@pytest.mark.parametrize(
+    ('rules', 'expected'),
+    [
+        ('rule r { strings: $a = "foo" condition: $a }', set()),
+        ('rule r { strings: $a = "foo ba" condition: $a }', {'uid_3'}),
+        ('rule r { strings: $a = "bar" condition: $a }', {'uid_2'}),
+        ('rule r { strings: $a = "bar" $b = "baz" condition: any of them }', set()),
+        ('rule r { strings: $a = "bar" $b = "foo " condition: all of them }', {'uid_2', 'uid_3'}),
+        ('rule r { strings: $a = "xyz" condition: $a }', {'uid_1', 'uid_2', 'uid_3'}),
+        ('rule r { strings: $a = "bar" condition: not $a }', set()),
+    ],
+)
+def test_get_excluded_files(index, rules, expected):
+    assert index.get_excluded_files(get_ngram_query(rules)) == expected
+
+
+def test_flush(index):
+    assert len(index._get_pending_files()) == len(FILES)
+    index.flush()
+    assert not index._get_pending_files()
+    segments = index._get_segments()
+    assert len(segments) == 1
+    segment = segments[0]
+    assert segment.uids == ['uid_1', 'uid_2', 'uid_3']
+    assert ngram_index._get_postings(segment, 0x666F6F).tolist() == [0, 1, 2]  # "foo"
+    assert ngram_index._get_postings(segment, 0x626172).tolist() == [0, 2]  # "bar"
+    assert ngram_index._get_postings(segment, 0x78797A) is None  # "xyz"
+
+    posting_lists = ngram_index._get_posting_lists(segment)
+    assert posting_lists.ngrams.tolist() == sorted({ngram for binary in FILES.values() for ngram in get_ngrams(binary)})
+    assert len(posting_lists.postings) == sum(posting_lists.counts) == sum(len(get_ngrams(b)) for b in FILES.values())
+
+
+@patch('storage.ngram_index.BLOCK_SIZE', 16)
+def test_merge_posting_lists():
+    random.seed(0)
+    binaries = [bytes(random.choices(b'abcd', k=20)) for _ in range(30)]
+    parts = []
+    for uid, binary in enumerate(binaries):
+        ngrams = get_ngrams(binary)
+        parts.append(ngram_index.PostingLists([str(uid)], ngrams, np.ones_like(ngrams), np.zeros_like(ngrams)))
+    merged = ngram_index._merge_posting_lists(
+        [ngram_index._merge_posting_lists(parts[:10]), ngram_index._merge_posting_lists(parts[10:20]), *parts[20:]]
+    )
+    segment = ngram_index._create_segment(merged)
+    assert segment.uids == [str(uid) for uid in range(30)]
+    for ngram in (int.from_bytes(bytes(trigram), 'big') for trigram in itertools.product(b'abcde', repeat=3)):
+        expected = [uid for uid, part in enumerate(parts) if ngram in part.ngrams]
+        postings = ngram_index._get_postings(segment, ngram)
+        assert (postings.tolist() if postings is not None else []) == expected
+
+
+@patch('storage.ngram_index.FLUSH_THRESHOLD', 2)
+def test_flush_when_threshold_is_reached(tmp_path):
+    index = NgramIndex(str(tmp_path))
+    index.add_file('uid_1', b'foo')
+    assert len(index._get_pending_files()) == 1
+    index.add_file('uid_2', b'bar')
+    assert not index._get_pending_files()
+    assert [segment.uids for segment in index._get_segments()] == [['uid_1', 'uid_2']]
+
+
+@patch('storage.ngram_index.MERGE_FACTOR', 2)
+def test_merge_small_segments(tmp_path):
+    index = NgramIndex(str(tmp_path))
+    for uid, binary in FILES.items():
+        index.add_file(uid, binary)
+        index.flush()
+    segments = index._get_segments()
+    assert len(segments) == 1, 'the small segments should have been merged'
+    assert sorted(uid for segment in segments for uid in segment.uids) == sorted(FILES)
+    assert index.get_excluded_files(get_ngram_query('rule r { strings: $a = "foo b" condition: $a }')) == {'uid_3'}
+
+
+def test_get_ngram_index(tmp_path, cfg_tuple):
+    cfg, _ = cfg_tuple
+    assert ngram_index.get_ngram_index() is None
+    cfg.data_storage.ngram_index_directory = str(tmp_path)
+    assert isinstance(ngram_index.get_ngram_index(), NgramIndex)
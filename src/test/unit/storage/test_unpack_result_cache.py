@@ -0,0 +1,42 @@
+# pylint: disable=redefined-outer-name,protected-access
+import pytest
+
+from storage import unpack_result_cache
+from storage.unpack_result_cache import CachedUnpackResult, UnpackResultCache
+
+UID = 'deadbeef' * 8 + '_123'
+RESULT = CachedUnpackResult({'plugin_used': 'tar', 'number_of_unpacked_files': 2}, [('uid_1', '/a'), ('uid_2', '/b')])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    yield UnpackResultCache(str(tmp_path / 'cache'))
+
+
+def test_add_and_get(cache):
+    assert cache.get(UID, 'version_1') is None
+    cache.add(UID, 'version_1', RESULT)
+    assert cache.get(UID, 'version_1') == RESULT
+    assert cache.get('other_uid', 'version_1') is None
+
+
+def test_extractor_version_invalidates_result(cache):
+    cache.add(UID, 'version_1', RESULT)
+    assert cache.get(UID, 'version_2') is None, 'results of other extractor versions should not be used'
+    new_result = CachedUnpackResult({'plugin_used': 'zip'}, [])
+    cache.add(UID, 'version_2', new_result)
+    assert cache.get(UID, 'version_2') == new_result
+    assert cache.get(UID, 'version_1') is None
+
+
+def test_get_broken_entry(cache):
+    cache.add(UID, 'version_1', RESULT)
+    cache._get_path(UID).write_text('{"broken')
+    assert cache.get(UID, 'version_1') is None
+
+
+def test_get_unpack_result_cache(tmp_path, cfg_tuple):
+    cfg, _ = cfg_tuple
+    assert unpack_result_cache.get_unpack_result_cache() is None
+    cfg.data_storage.unpack_cache_directory = str(tmp_path)
+    assert isinstance(unpack_result_cache.get_unpack_result_cache(), UnpackResultCache)
@@ -0,0 +1,48 @@
+import pytest
+
+from advise_db_indexes import get_index_recommendations, read_queries
+
+
+def test_read_queries(tmp_path):
+    query_file = tmp_path / 'queries'
+    query_file.write_text(
+        '{"vendor": "foo"}\n'
+        '[2023-01-01 12:00:00][db_interface_frontend][DEBUG]: Search query: {"file_name": {"$like": "bar"}}\n'
+        '[2023-01-01 12:00:01][frontend][INFO]: something else\n'
+    )
+    assert list(read_queries([str(query_file)])) == [{'vendor': 'foo'}, {'file_name': {'$like': 'bar'}}]
+
+
+@pytest.mark.parametrize(
+    ('query', 'expected'),
+    [
+        ({'sha256': 'abc', 'processed_analysis.file_type.mime': 'foo'}, {}),
+        ({'processed_analysis.unpacker.summary': 'packed'}, {}),
+        (
+            {'file_name': {'$like': 'foo'}},
+            {'file_object_file_name_trigram_index': 'file_object USING gin (file_name gin_trgm_ops)'},
+        ),
+        (
+            {'$or': {'size': {'$lt': 10}, 'vendor': {'$in': ['a']}}},
+            {'file_object_size_index': 'file_object (size)', 'firmware_vendor_index': 'firmware (vendor)'},
+        ),
+        (
+            {'processed_analysis.plugin.key': 'value'},
+            {'analysis_plugin_result_index': 'analysis USING gin (result jsonb_path_ops) WHERE plugin = \'plugin\''},
+        ),
+        (
+            {'processed_analysis.file_type.full': {'$like': 'ELF'}},
+            {
+                'analysis_file_type_full_trigram_index': (
+                    'analysis USING gin ((result ->> \'full\') gin_trgm_ops) WHERE plugin = \'file_type\''
+                )
+            },
+        ),
+        (
+            {'processed_analysis.plugin.a.b': {'$in': ['x']}},
+            {'analysis_plugin_a_b_index': 'analysis ((result -> \'a\' ->> \'b\')) WHERE plugin = \'plugin\''},
+        ),
+    ],
+)
+def test_get_index_recommendations(query, expected):
+    assert get_index_recommendations(query) == expected
@@ -0,0 +1,34 @@
+import yara
+
+from compile_yara_signatures import compile_signature_file
+
+RULE = 'rule {name} {{ strings: $a = "foobar" condition: $a and not test_flag }}'
+
+
+def test_compile_signature_file(tmp_path):
+    signature_file = tmp_path / 'signatures.yara'
+    signature_file.write_text(RULE.format(name='single_rule'))
+    target_path = tmp_path / 'signatures.yc'
+    assert compile_signature_file(str(signature_file), str(target_path))
+    rules = yara.load(str(target_path))  # the compiled rules must be readable by yara-python
+    assert [match.rule for match in rules.match(data=b'xx foobar xx')] == ['single_rule']
+
+
+def test_compile_fused_signature_file(tmp_path):
+    sources = {}
+    for plugin in ['plugin_a', 'plugin_b']:
+        (tmp_path / f'{plugin}.yara').write_text(RULE.format(name=f'rule_{plugin}'))
+        sources[plugin] = str(tmp_path / f'{plugin}.yara')
+    target_path = tmp_path / 'fused.yc'
+    assert compile_signature_file(sources, str(target_path))
+    matches = yara.load(str(target_path)).match(data=b'foobar')
+    assert sorted((match.namespace, match.rule) for match in matches) == [
+        ('plugin_a', 'rule_plugin_a'),
+        ('plugin_b', 'rule_plugin_b'),
+    ]
+
+
+def test_compile_invalid_signature_file(tmp_path):
+    signature_file = tmp_path / 'signatures.yara'
+    signature_file.write_text('no valid rule')
+    assert not compile_signature_file(str(signature_file), str(tmp_path / 'signatures.yc'))
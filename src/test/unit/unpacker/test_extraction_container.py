@@ -0,0 +1,122 @@
+# pylint: disable=redefined-outer-name,protected-access
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock
+
+import pytest
+from docker.errors import NotFound
+from requests.exceptions import ReadTimeout
+
+from unpacker.extraction_container import ExtractionContainer
+from unpacker.unpack_base import UnpackBase
+
+
+class ResponseMock:
+    def __init__(self, status_code=200, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+def _get_container(client, name):
+    if name.startswith('fact_extractor_') and not client.stale_container:
+        raise NotFound('no such container')
+    return client.containers.get.return_value
+
+
+@pytest.fixture
+def docker_client(monkeypatch):
+    client = MagicMock()
+    client.containers.run.return_value.id = 'container_id'
+    client.stale_container = False
+    client.containers.get.side_effect = lambda name: _get_container(client, name)
+    monkeypatch.setattr('unpacker.extraction_container.docker.client.from_env', lambda: client)
+    yield client
+
+
+@pytest.fixture
+def container(docker_client, monkeypatch):  # pylint: disable=unused-argument
+    monkeypatch.setattr('unpacker.extraction_container.requests.get', lambda *_, **__: ResponseMock(404))
+    _container = ExtractionContainer(2)
+    _container.start()
+    yield _container
+    _container.stop()
+
+
+@pytest.mark.cfg_defaults({'unpack': {'memory-limit': '1024', 'extractor-base-port': '9000'}})
+def test_start_and_stop(container, docker_client):
+    assert container.port == 9002
+    assert container.container_id == 'container_id'
+    assert Path(container.get_job_dir_base()).is_dir()
+    kwargs = docker_client.containers.run.call_args.kwargs
+    assert kwargs['mem_limit'] == '1024m'
+    assert kwargs['ports'] == {'5000/tcp': ('127.0.0.1', 9002)}
+    assert any(mount['Source'] == container.get_job_dir_base() for mount in kwargs['mounts'])
+    assert kwargs['name'] == 'fact_extractor_9002'
+    assert not docker_client.containers.get.return_value.remove.called, 'there is no stale container'
+
+    work_dir = container.get_job_dir_base()
+    container.stop()
+    assert docker_client.containers.get.return_value.remove.called
+    assert container.container_id is None
+    assert not Path(work_dir).exists()
+
+
+def test_remove_stale_container(docker_client, monkeypatch):
+    monkeypatch.setattr('unpacker.extraction_container.requests.get', lambda *_, **__: ResponseMock(404))
+    docker_client.stale_container = True  # e.g. the worker was killed and the container is still running
+    container = ExtractionContainer(1)
+    container.start()
+    try:
+        assert docker_client.containers.get.call_args_list[0].args == (container.name,)
+        assert docker_client.containers.get.return_value.remove.called
+        assert docker_client.containers.run.called
+    finally:
+        container.stop()
+
+
+def test_start_unpacking(container, monkeypatch):
+    requested = []
+    monkeypatch.setattr(
+        'unpacker.extraction_container.requests.get',
+        lambda url, timeout: requested.append((url, timeout)) or ResponseMock(),
+    )
+    with TemporaryDirectory(dir=container.get_job_dir_base()) as job_dir:
+        assert container.start_unpacking(job_dir, timeout=10).status_code == 200
+    assert requested == [(f'http://127.0.0.1:{container.port}/start/{Path(job_dir).name}', 10)]
+
+    with pytest.raises(ValueError):
+        container.start_unpacking('/some/other/dir', timeout=10)
+
+
+def test_extract_with_extraction_container(container, tmp_path):
+    input_file = tmp_path / 'input.bin'
+    input_file.write_bytes(b'foobar')
+
+    def start_unpacking(job_dir, timeout):  # pylint: disable=unused-argument
+        Path(job_dir, 'files', 'extracted_file').write_bytes(b'foo')
+        return ResponseMock()
+
+    container.start_unpacking = start_unpacking
+    unpacker = UnpackBase(extraction_container=container)
+    with TemporaryDirectory(dir=unpacker.get_tmp_dir_base()) as tmp_dir:
+        extracted_files = unpacker.extract_files_from_file(str(input_file), tmp_dir)
+        assert [path.name for path in extracted_files] == ['extracted_file']
+        assert Path(tmp_dir, 'input', 'input.bin').read_bytes() == b'foobar'
+        assert not Path(tmp_dir, 'input', 'input.bin').samefile(input_file), 'the input file should be copied'
+
+    container.start_unpacking = MagicMock(return_value=ResponseMock(500, 'error'))
+    with TemporaryDirectory(dir=unpacker.get_tmp_dir_base()) as tmp_dir:
+        with pytest.raises(RuntimeError):
+            unpacker.extract_files_from_file(str(input_file), tmp_dir)
+
+
+def test_extraction_container_timeout(container, tmp_path):
+    input_file = tmp_path / 'input.bin'
+    input_file.write_bytes(b'foobar')
+    container.start_unpacking = MagicMock(side_effect=ReadTimeout())
+    container.restart = MagicMock()
+
+    unpacker = UnpackBase(extraction_container=container)
+    with TemporaryDirectory(dir=unpacker.get_tmp_dir_base()) as tmp_dir:
+        assert unpacker.extract_files_from_file(str(input_file), tmp_dir) is None
+    assert container.restart.called, 'the container should be restarted to stop the job'
@@ -3,7 +3,9 @@ from pathlib import Path
 
 import pytest
 
+from helperFunctions.uid import create_uid
 from objects.file import FileObject
+from storage.unpack_result_cache import UnpackResultCache
 from storage.unpacking_locks import UnpackingLockManager
 from test.common_helper import create_test_file_object, get_test_data_dir
 from unpacker.unpack import Unpacker
@@ -42,6 +44,21 @@ class TestUnpackerCore:
         parent_uid = test_fo.uid
         assert f'|{parent_uid}|/get_files_test/testfile1' in file_objects[0].virtual_file_path[test_fo.uid]
 
+    def test_store_file_objects(self, unpacker, test_fo):
+        file_paths = [EXTRACTION_DIR / 'get_files_test' / 'testfile1', EXTRACTION_DIR / 'get_files_test' / 'testfile2']
+        file_paths.append(file_paths[0])  # the same file extracted twice
+        file_objects = unpacker.generate_and_store_file_objects(file_paths, EXTRACTION_DIR, test_fo)
+        assert len(file_objects) == 2
+        for file_path in file_paths[:2]:
+            file_object = file_objects[create_uid(file_path.read_bytes())]
+            assert file_object.file_name == file_path.name
+            assert file_object.size == file_path.stat().st_size
+            assert file_object.uid == f'{file_object.sha256}_{file_object.size}'
+            assert file_object.file_path == unpacker.file_storage_system.generate_path(file_object)
+            assert Path(file_object.file_path).read_bytes() == file_path.read_bytes()
+            assert file_object.temporary_data['parent_fo_type'] == 'text/plain'
+        assert len(file_objects[create_uid(file_paths[0].read_bytes())].virtual_file_path[test_fo.uid]) == 2
+
     def test_remove_duplicates_child_equals_parent(self, unpacker):
         parent = FileObject(binary=b'parent_content')
         result = unpacker.remove_duplicates({parent.uid: parent}, parent)
@@ -53,6 +70,40 @@ class TestUnpackerCore:
         unpacker.generate_and_store_file_objects(file_paths, EXTRACTION_DIR, test_fo)
         assert unpacker.unpacking_locks.unpacking_lock_is_set(test_fo.uid)
 
+    def test_unpack_with_cache(self, unpacker, tmp_path):
+        unpacker.unpack_cache, unpacker._extractor_version = UnpackResultCache(str(tmp_path)), 'version_1'
+        extractor_calls = []
+
+        def extract_files_from_file(_, tmp_dir):
+            extractor_calls.append(tmp_dir)
+            files_dir = Path(tmp_dir, 'files', 'dir')
+            files_dir.mkdir(parents=True)
+            for file_name in ['testfile1', 'testfile2']:
+                (files_dir / file_name).write_bytes((EXTRACTION_DIR / 'get_files_test' / file_name).read_bytes())
+            Path(tmp_dir, 'reports').mkdir()
+            Path(tmp_dir, 'reports', 'meta.json').write_text('{"plugin_used": "foo"}')
+            return [files_dir / 'testfile1', files_dir / 'testfile2']
+
+        unpacker.extract_files_from_file = extract_files_from_file
+        results = []
+        for _ in range(2):
+            test_file = FileObject(file_path=str(TEST_DATA_DIR / 'container/test.zip'))
+            extracted_files = unpacker.unpack(test_file)
+            assert test_file.processed_analysis['unpacker'] == {'plugin_used': 'foo'}
+            assert len(test_file.files_included) == 2
+            results.append(
+                sorted(
+                    (fo.uid, fo.file_name, fo.file_path, fo.size, *fo.virtual_file_path.values())
+                    for fo in extracted_files
+                )
+            )
+        assert len(extractor_calls) == 1, 'the cached result should have been used'
+        assert results[0] == results[1]
+
+        unpacker._extractor_version = 'version_2'
+        unpacker.unpack(FileObject(file_path=str(TEST_DATA_DIR / 'container/test.zip')))
+        assert len(extractor_calls) == 2, 'a new extractor version should invalidate the cache'
+
 
 @pytest.mark.cfg_defaults(
     {
@@ -63,7 +114,6 @@ class TestUnpackerCore:
     }
 )
 class TestUnpackerCoreMain:
-
     test_file_path = str(TEST_DATA_DIR / 'container/test.zip')
 
     def main_unpack_check(self, unpacker, test_object, number_unpacked_files, first_unpacker):
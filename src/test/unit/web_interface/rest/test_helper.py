@@ -1,10 +1,13 @@
 import pytest
 
+from storage.query_conversion import get_cursor
 from web_interface.rest.helper import (
     error_message,
     get_boolean_from_request,
     get_current_gmt,
+    get_next_cursor,
     get_paging,
+    get_paging_cursor,
     get_query,
     get_update,
     success_message,
@@ -111,3 +114,24 @@ def test_get_paging_bad_arguments(offset, limit):
 def test_get_paging_success(request_args):
     offset, limit = get_paging(request_args)
     assert (offset, limit) == (0, 1)
+
+
+@pytest.mark.parametrize(
+    'request_args',
+    [dict(cursor='foo'), dict(cursor=get_cursor(['a', 'b'])), dict(cursor=get_cursor(['a']), offset='2')],
+)
+def test_get_paging_cursor_bad_arguments(request_args):
+    with pytest.raises(ValueError):
+        get_paging_cursor(request_args)
+
+
+def test_get_paging_cursor():
+    assert get_paging_cursor({}) is None
+    assert get_paging_cursor(dict(cursor='', offset='2')) is None
+    assert get_paging_cursor(dict(cursor=get_cursor(['uid_1']), offset='0')) == get_cursor(['uid_1'])
+
+
+def test_get_next_cursor():
+    assert get_next_cursor(['uid_1', 'uid_2'], limit=2) == get_cursor(['uid_2'])
+    assert get_next_cursor(['uid_1'], limit=2) is None
+    assert get_next_cursor(['uid_1', 'uid_2'], limit=0) is None
@@ -24,7 +24,7 @@ TEST_FW_PAYLOAD = {
 class DbMock(CommonDatabaseMock):
     @staticmethod
     def rest_get_firmware_uids(
-        limit: int = 10, offset: int = 0, query=None, recursive=False, inverted=False
+        limit: int = 10, offset: int = 0, query=None, recursive=False, inverted=False, cursor=None
     ):  # pylint: disable=unused-argument
         return [f'uid{i}' for i in range(offset, limit or 10)]
 
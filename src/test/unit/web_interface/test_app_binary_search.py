@@ -80,6 +80,11 @@ class TestAppBinarySearch:
         )
         assert 'test_uid' in response
 
+    def test_app_binary_search_partial_result(self, test_client):
+        response = test_client.get('/database/binary_search_results?request_id=running_binary_search_id').data.decode()
+        assert 'Waiting for results' in response
+        assert '1234 files scanned, 2 matching files found so far' in response
+
 
 def _post_binary_search(test_client, query: dict) -> str:
     response = test_client.post(
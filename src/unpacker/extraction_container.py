@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import logging
+from contextlib import suppress
+from os import getgid, getuid
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep, time
+
+import docker
+import requests
+from docker.errors import DockerException, NotFound
+from docker.types import Mount
+
+from config import cfg
+
+EXTRACTOR_DOCKER_IMAGE = 'fkiecad/fact_extractor'
+CONTAINER_PORT = 5000
+STARTUP_TIMEOUT = 60
+
+
+class ExtractionContainer:
+    '''
+    A long-running extractor container (instead of starting a new container for every file). The container runs the
+    HTTP server of the extractor and has its own working directory (mounted to ``/tmp/extractor``). An extraction
+    job is a subdirectory of the working directory with the same layout as for a single-use container (``input/``,
+    ``files/`` and ``reports/``) and is started with ``GET /start/<job directory name>`` on a local port. The
+    container processes one job at a time, so the memory limit of the container is the memory limit of the job.
+
+    The container is named after its port, so that a container that was left behind by a killed worker (and still
+    occupies the port) can be removed before the container is started again.
+
+    :param id_: The ID of the container (the port of the container is ``cfg.unpack.extractor_base_port + id_``).
+    '''
+
+    def __init__(self, id_: int):
+        self.id_ = id_
+        self.port = cfg.unpack.extractor_base_port + id_
+        self.name = f'fact_extractor_{self.port}'
+        self.work_dir: TemporaryDirectory | None = None
+        self.container_id: str | None = None
+
+    def start(self):
+        if self.container_id is not None:
+            raise RuntimeError(f'extraction container {self.id_} is already running')
+        if self.work_dir is None:
+            self.work_dir = TemporaryDirectory(
+                prefix=f'fact_extractor_{self.id_}_', dir=cfg.data_storage.docker_mount_base_dir
+            )
+        client = docker.client.from_env()
+        self._remove_stale_container(client)
+        container = client.containers.run(
+            EXTRACTOR_DOCKER_IMAGE,
+            name=self.name,
+            ports={f'{CONTAINER_PORT}/tcp': ('127.0.0.1', self.port)},
+            mem_limit=f'{cfg.unpack.memory_limit}m',
+            mounts=[
+                Mount('/dev/', '/dev/', type='bind'),
+                Mount('/tmp/extractor', self.work_dir.name, type='bind'),
+            ],
+            privileged=True,
+            detach=True,
+            remove=True,
+            environment={'CHMOD_OWNER': f'{getuid()}:{getgid()}'},
+            entrypoint=(
+                f'gunicorn --timeout {cfg.unpack.extraction_timeout} -w 1 -b 0.0.0.0:{CONTAINER_PORT} server:app'
+            ),
+        )
+        self.container_id = container.id
+        self._wait_until_ready()
+        logging.info(f'Started extraction container {self.id_} on port {self.port}')
+
+    def stop(self, cleanup: bool = True):
+        if self.container_id is not None:
+            with suppress(DockerException):
+                # removing (instead of stopping) the container frees its name immediately for a restart
+                docker.client.from_env().containers.get(self.container_id).remove(force=True)
+            self.container_id = None
+        if cleanup and self.work_dir is not None:
+            self.work_dir.cleanup()
+            self.work_dir = None
+
+    def _remove_stale_container(self, client: docker.DockerClient):
+        try:
+            container = client.containers.get(self.name)
+        except NotFound:
+            return
+        container.remove(force=True)
+        logging.warning(f'Removed stale extraction container {self.name} (e.g. of a killed worker)')
+
+    def restart(self):
+        self.stop(cleanup=False)
+        self.start()
+
+    def get_job_dir_base(self) -> str:
+        '''
+        Get the directory where the job directories must be created (so that the container can see them).
+        '''
+        if self.work_dir is None:
+            raise RuntimeError(f'extraction container {self.id_} is not running')
+        return self.work_dir.name
+
+    def start_unpacking(self, job_dir: str, timeout: int) -> requests.Response:
+        '''
+        Extract the input file of the job and wait until the extraction is finished.
+
+        :param job_dir: The job directory (must be a subdirectory of ``get_job_dir_base()``).
+        :param timeout: The timeout of the extraction in seconds.
+        :raises requests.exceptions.RequestException: If the extraction was not finished in time or the container
+            crashed (e.g. because the memory limit was exceeded). The container should be restarted afterwards.
+        '''
+        if Path(job_dir).parent != Path(self.get_job_dir_base()):
+            raise ValueError(f'job directory {job_dir} is not in the working directory of the extraction container')
+        return requests.get(f'{self._get_url()}/start/{Path(job_dir).name}', timeout=timeout)
+
+    def _get_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    def _wait_until_ready(self):
+        start = time()
+        while time() - start < STARTUP_TIMEOUT:
+            # any HTTP response (even 404) means that the server is up
+            with suppress(requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                requests.get(f'{self._get_url()}/', timeout=1)
+                return
+            sleep(0.1)
+        raise RuntimeError(f'extraction container {self.id_} did not start in time')
+
+
+def get_extractor_version() -> str | None:
+    '''
+    :return: The ID of the extractor image (it changes with every update of the extractor) or ``None`` if it is not
+        available.
+    '''
+    try:
+        return docker.client.from_env().images.get(EXTRACTOR_DOCKER_IMAGE).id
+    except DockerException as error:
+        logging.warning(f'Could not get the version of the extractor: {error}')
+        return None
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from time import time
@@ -11,17 +12,22 @@ from fact_helper_file import get_file_type_from_path
 from config import cfg
 from helperFunctions.fileSystem import file_is_empty, get_relative_object_path
 from helperFunctions.tag import TagColor
-from helperFunctions.virtual_file_path import get_base_of_virtual_path, join_virtual_path
+from helperFunctions.uid import create_uid_from_file
+from helperFunctions.virtual_file_path import get_base_of_virtual_path, get_top_of_virtual_path, join_virtual_path
 from objects.file import FileObject
 from storage.fsorganizer import FSOrganizer
+from storage.unpack_result_cache import CachedUnpackResult, get_unpack_result_cache
+from unpacker.extraction_container import get_extractor_version
 from unpacker.unpack_base import UnpackBase
 
 
 class Unpacker(UnpackBase):
-    def __init__(self, worker_id=None, fs_organizer=None, unpacking_locks=None):
-        super().__init__(worker_id=worker_id)
+    def __init__(self, worker_id=None, fs_organizer=None, unpacking_locks=None, extraction_container=None):
+        super().__init__(worker_id=worker_id, extraction_container=extraction_container)
         self.file_storage_system = FSOrganizer() if fs_organizer is None else fs_organizer
         self.unpacking_locks = unpacking_locks
+        self.unpack_cache = get_unpack_result_cache()
+        self._extractor_version = None
 
     def unpack(self, current_fo: FileObject):
         '''
@@ -35,23 +41,66 @@ class Unpacker(UnpackBase):
             self._store_unpacking_depth_skip_info(current_fo)
             return []
 
-        with TemporaryDirectory(prefix='fact_unpack_', dir=cfg.data_storage.docker_mount_base_dir) as tmp_dir:
-            file_path = self._generate_local_file_path(current_fo)
-            extracted_files = self.extract_files_from_file(file_path, tmp_dir)
-            if extracted_files is None:
-                self._store_unpacking_error_skip_info(current_fo)
-                return []
+        extracted_file_objects = self._get_file_objects_from_cache(current_fo)
+        if extracted_file_objects is None:
+            with TemporaryDirectory(prefix='fact_unpack_', dir=self.get_tmp_dir_base()) as tmp_dir:
+                file_path = self._generate_local_file_path(current_fo)
+                extracted_files = self.extract_files_from_file(file_path, tmp_dir)
+                if extracted_files is None:
+                    self._store_unpacking_error_skip_info(current_fo)
+                    return []
+
+                extracted_file_objects = self.generate_and_store_file_objects(
+                    extracted_files, Path(tmp_dir) / 'files', current_fo
+                )
+                # set meta data
+                current_fo.processed_analysis['unpacker'] = json.loads(
+                    Path(tmp_dir, 'reports', 'meta.json').read_text()
+                )
+            self._add_to_cache(current_fo, extracted_file_objects)
 
-            extracted_file_objects = self.generate_and_store_file_objects(
-                extracted_files, Path(tmp_dir) / 'files', current_fo
-            )
-            extracted_file_objects = self.remove_duplicates(extracted_file_objects, current_fo)
-            self.add_included_files_to_object(extracted_file_objects, current_fo)
-            # set meta data
-            current_fo.processed_analysis['unpacker'] = json.loads(Path(tmp_dir, 'reports', 'meta.json').read_text())
+        extracted_file_objects = self.remove_duplicates(extracted_file_objects, current_fo)
+        self.add_included_files_to_object(extracted_file_objects, current_fo)
+        return extracted_file_objects
+
+    def _get_extractor_version(self) -> str | None:
+        if self._extractor_version is None:
+            self._extractor_version = get_extractor_version()
+        return self._extractor_version
 
+    def _get_file_objects_from_cache(self, file_object: FileObject) -> dict[str, FileObject] | None:
+        '''
+        If the file was already extracted by the current version of the extractor, the extracted files are still in
+        the file storage and the extractor does not need to run again (see ``storage.unpack_result_cache``).
+        '''
+        if self.unpack_cache is None or self._get_extractor_version() is None:
+            return None
+        cached_result = self.unpack_cache.get(file_object.uid, self._get_extractor_version())
+        if cached_result is None:
+            return None
+        if not all(
+            Path(self.file_storage_system.generate_path_from_uid(uid)).is_file() for uid, _ in cached_result.files
+        ):
+            return None  # files were deleted from the file storage in the meantime
+        logging.debug(f'[worker {self.worker_id}] Using cached unpack result of {file_object.uid}')
+        extracted_file_objects = self._generate_file_objects(cached_result.files, file_object)
+        for extracted_file_object in extracted_file_objects.values():
+            extracted_file_object.file_path = self.file_storage_system.generate_path(extracted_file_object)
+        file_object.processed_analysis['unpacker'] = cached_result.meta
         return extracted_file_objects
 
+    def _add_to_cache(self, file_object: FileObject, extracted_file_objects: dict[str, FileObject]):
+        if self.unpack_cache is None or self._get_extractor_version() is None:
+            return
+        files = [
+            (uid, get_top_of_virtual_path(virtual_path))
+            for uid, extracted_file_object in extracted_file_objects.items()
+            for virtual_path_list in extracted_file_object.virtual_file_path.values()
+            for virtual_path in virtual_path_list
+        ]
+        result = CachedUnpackResult(file_object.processed_analysis['unpacker'], files)
+        self.unpack_cache.add(file_object.uid, self._get_extractor_version(), result)
+
     @staticmethod
     def _store_unpacking_error_skip_info(file_object: FileObject):
         file_object.processed_analysis['unpacker'] = {
@@ -90,27 +139,59 @@ class Unpacker(UnpackBase):
             root_file_object.add_included_file(item)
 
     def generate_and_store_file_objects(self, file_paths: list[Path], extraction_dir: Path, parent: FileObject):
+        '''
+        Create file objects for the extracted files and store the files in the file storage. The files are hashed in
+        chunks and hard-linked into the file storage (if possible), so they are never loaded into memory as a whole.
+        Hashing and storing is done by a thread pool (hashlib and file I/O release the GIL).
+        '''
+        file_paths = [item for item in file_paths if not file_is_empty(item)]
+        if not file_paths:
+            return {}
+        with ThreadPoolExecutor(max_workers=cfg.unpack.storage_threads) as executor:
+            uids = list(executor.map(create_uid_from_file, file_paths))
+            extracted_files = self._generate_file_objects(
+                [(uid, get_relative_object_path(item, extraction_dir)) for uid, item in zip(uids, file_paths)], parent
+            )
+            source_paths = dict(zip(uids, file_paths))
+            for _ in executor.map(
+                lambda fo: self.file_storage_system.store_file_from_path(fo, source_paths[fo.uid]),
+                extracted_files.values(),
+            ):
+                pass  # consume the results to raise possible exceptions
+        return extracted_files
+
+    def _generate_file_objects(self, files: list[tuple[str, str]], parent: FileObject) -> dict[str, FileObject]:
+        '''
+        :param files: The UIDs and paths (relative to the extraction directory) of the extracted files.
+        :param parent: The file object of the extracted file.
+        :return: The file objects of the extracted files by UID.
+        '''
+        root_uid = parent.get_root_uid()
+        base = get_base_of_virtual_path(parent.get_virtual_file_paths()[root_uid][0])
+        parent_fo_type = get_file_type_from_path(parent.file_path)['mime']
+
         extracted_files = {}
-        for item in file_paths:
-            if not file_is_empty(item):
-                current_file = FileObject(file_path=str(item))
-                base = get_base_of_virtual_path(parent.get_virtual_file_paths()[parent.get_root_uid()][0])
-                current_virtual_path = join_virtual_path(
-                    base, parent.uid, get_relative_object_path(item, extraction_dir)
-                )
-                current_file.temporary_data['parent_fo_type'] = get_file_type_from_path(parent.file_path)['mime']
-                if current_file.uid in extracted_files:  # the same file is extracted multiple times from one archive
-                    extracted_files[current_file.uid].virtual_file_path[parent.get_root_uid()].append(
-                        current_virtual_path
-                    )
-                else:
-                    self.unpacking_locks.set_unpacking_lock(current_file.uid)
-                    self.file_storage_system.store_file(current_file)
-                    current_file.virtual_file_path = {parent.get_root_uid(): [current_virtual_path]}
-                    current_file.parent_firmware_uids.add(parent.get_root_uid())
-                    extracted_files[current_file.uid] = current_file
+        for uid, relative_path in files:
+            current_virtual_path = join_virtual_path(base, parent.uid, relative_path)
+            if uid in extracted_files:  # the same file is extracted multiple times from one archive
+                extracted_files[uid].virtual_file_path[root_uid].append(current_virtual_path)
+                continue
+            current_file = self._create_extracted_file_object(Path(relative_path).name, uid)
+            current_file.temporary_data['parent_fo_type'] = parent_fo_type
+            current_file.virtual_file_path = {root_uid: [current_virtual_path]}
+            current_file.parent_firmware_uids.add(root_uid)
+            self.unpacking_locks.set_unpacking_lock(uid)
+            extracted_files[uid] = current_file
         return extracted_files
 
+    @staticmethod
+    def _create_extracted_file_object(file_name: str, uid: str) -> FileObject:
+        file_object = FileObject(file_name=file_name)
+        file_object.uid = uid
+        file_object.sha256, size = uid.split('_')
+        file_object.size = int(size)
+        return file_object
+
     @staticmethod
     def remove_duplicates(extracted_fo_dict, parent_fo):
         if parent_fo.uid in extracted_fo_dict:
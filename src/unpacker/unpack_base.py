@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import logging
 import shutil
 from os import getgid, getuid, makedirs
@@ -10,24 +12,51 @@ from requests import exceptions
 
 from config import cfg
 from helperFunctions.docker import run_docker_container
+from unpacker.extraction_container import EXTRACTOR_DOCKER_IMAGE, ExtractionContainer
 
 
 class UnpackBase:
-    def __init__(self, worker_id=None):
+    '''
+    Base class for extracting files with the extractor. If an ``extraction_container`` is given, the files are
+    extracted by this (long-running) container. Otherwise, a new container is started for each file.
+    '''
+
+    def __init__(self, worker_id=None, extraction_container: ExtractionContainer | None = None):
         self.worker_id = worker_id
+        self.extraction_container = extraction_container
 
     @staticmethod
     def get_extracted_files_dir(base_dir):
         return Path(base_dir, 'files')
 
+    def get_tmp_dir_base(self) -> str:
+        '''
+        Get the directory where the temporary extraction directories should be created.
+        '''
+        if self.extraction_container is not None:
+            return self.extraction_container.get_job_dir_base()
+        return cfg.data_storage.docker_mount_base_dir
+
     def extract_files_from_file(self, file_path, tmp_dir):
         self._initialize_shared_folder(tmp_dir)
+        # the file is copied (not linked): the privileged extractor changes the owner and mode of its working directory
         shutil.copy2(file_path, str(Path(tmp_dir, 'input', Path(file_path).name)))
 
+        if self.extraction_container is not None and Path(tmp_dir).parent == Path(self.get_tmp_dir_base()):
+            success = self._extract_with_extraction_container(tmp_dir)
+        else:
+            success = self._extract_with_new_container(tmp_dir)
+        if not success:
+            return None
+
+        return [item for item in safe_rglob(Path(tmp_dir, 'files')) if not item.is_dir()]
+
+    def _extract_with_new_container(self, tmp_dir) -> bool:
         try:
             result = run_docker_container(
-                'fkiecad/fact_extractor',
+                EXTRACTOR_DOCKER_IMAGE,
                 combine_stderr_stdout=True,
+                timeout=cfg.unpack.extraction_timeout,
                 privileged=True,
                 mem_limit=f'{cfg.unpack.memory_limit}m',
                 mounts=[
@@ -39,7 +68,7 @@ class UnpackBase:
         except exceptions.RequestException as err:
             warning = f'Request exception executing docker extractor:\n{err}'
             logging.warning(warning)
-            return None
+            return False
 
         try:
             result.check_returncode()
@@ -47,8 +76,22 @@ class UnpackBase:
             error = f'Failed to execute docker extractor with code {err.returncode}:\n{err.stdout}'
             logging.error(error)
             raise RuntimeError(error)
+        return True
 
-        return [item for item in safe_rglob(Path(tmp_dir, 'files')) if not item.is_dir()]
+    def _extract_with_extraction_container(self, tmp_dir) -> bool:
+        try:
+            response = self.extraction_container.start_unpacking(tmp_dir, timeout=cfg.unpack.extraction_timeout)
+        except exceptions.RequestException as err:
+            # the job is still running (timeout) or the container crashed (e.g. memory limit): start a fresh one
+            logging.warning(f'[worker {self.worker_id}] Request exception executing extraction container:\n{err}')
+            self.extraction_container.restart()
+            return False
+
+        if response.status_code != 200:
+            error = f'Failed to execute extraction container with code {response.status_code}:\n{response.text}'
+            logging.error(error)
+            raise RuntimeError(error)
+        return True
 
     @staticmethod
     def _initialize_shared_folder(tmp_dir):
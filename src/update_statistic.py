@@ -21,6 +21,8 @@ import sys
 
 from helperFunctions.program_setup import program_setup
 from statistic.update import StatsUpdater
+from storage.db_connection import ReadWriteDeleteConnection
+from storage.db_interface_stats import StatsUpdateDbInterface
 
 PROGRAM_NAME = 'FACT Statistic Updater'
 PROGRAM_DESCRIPTION = 'Initialize or update FACT statistic'
@@ -29,8 +31,10 @@ PROGRAM_DESCRIPTION = 'Initialize or update FACT statistic'
 def main(command_line_options=None):
     if command_line_options is None:
         command_line_options = sys.argv
-    program_setup(PROGRAM_NAME, PROGRAM_DESCRIPTION, command_line_options=command_line_options)
+    args = program_setup(PROGRAM_NAME, PROGRAM_DESCRIPTION, command_line_options=command_line_options)
 
+    if args.reconcile_counters:  # this is expensive, so it is run less often than the statistic update
+        StatsUpdateDbInterface(connection=ReadWriteDeleteConnection()).reconcile_summary_counters()
     updater = StatsUpdater()
     updater.update_all_stats()
 
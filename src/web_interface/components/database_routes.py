@@ -38,14 +38,16 @@ class DatabaseRoutes(ComponentBase):
     @AppRoute('/database/browse', GET)
     def browse_database(self, query: str = '{}', only_firmwares=False, inverted=False):
         page, per_page = extract_pagination_from_request(request)[0:2]
+        cursor = request.args.get('cursor') or None  # keyset pagination: faster than page numbers for deep pages
         search_parameters = self._get_search_parameters(query, only_firmwares, inverted)
 
         with get_shared_session(self.db.frontend) as frontend_db:
             try:
-                firmware_list = self._search_database(
+                firmware_list, next_cursor = self._search_database(
                     search_parameters['query'],
-                    skip=per_page * (page - 1),
+                    skip=0 if cursor else per_page * (page - 1),
                     limit=per_page,
+                    cursor=cursor,
                     only_firmwares=search_parameters['only_firmware'],
                     inverted=search_parameters['inverted'],
                 )
@@ -79,6 +81,8 @@ class DatabaseRoutes(ComponentBase):
             current_class=str(request.args.get('device_class')),
             current_vendor=str(request.args.get('vendor')),
             search_parameters=search_parameters,
+            cursor=cursor,
+            next_cursor=next_cursor,
         )
 
     @roles_accepted(*PRIVILEGES['pattern_search'])
@@ -135,13 +139,13 @@ class DatabaseRoutes(ComponentBase):
     def _query_has_only_one_result(result_list, query):
         return len(result_list) == 1 and query != '{}'
 
-    def _search_database(self, query, skip=0, limit=0, only_firmwares=False, inverted=False):
-        meta_list = self.db.frontend.generic_search(
-            query, skip, limit, only_fo_parent_firmware=only_firmwares, inverted=inverted, as_meta=True
+    def _search_database(self, query, skip=0, limit=0, cursor=None, only_firmwares=False, inverted=False):
+        meta_list, next_cursor = self.db.frontend.generic_search_page(
+            query, limit, cursor, skip, only_fo_parent_firmware=only_firmwares, inverted=inverted, as_meta=True
         )
         if not isinstance(meta_list, list):
             raise Exception(meta_list)
-        return sorted(meta_list, key=lambda x: x[1].lower())
+        return sorted(meta_list, key=lambda x: x[1].lower()), next_cursor
 
     def _build_search_query(self):
         query = {}
@@ -237,11 +241,13 @@ class DatabaseRoutes(ComponentBase):
     @roles_accepted(*PRIVILEGES['pattern_search'])
     @AppRoute('/database/binary_search_results', GET)
     def get_binary_search_results(self):
-        firmware_dict, error, yara_rules = None, None, None
+        firmware_dict, error, yara_rules, partial_result = None, None, None, None
         if request.args.get('request_id'):
             request_id = request.args.get('request_id')
             with ConnectTo(self.intercom) as connection:
                 result, yara_rules = connection.get_binary_search_result(request_id)
+                if result is None:
+                    partial_result = connection.get_binary_search_partial_result(request_id)
             if isinstance(result, str):
                 error = result
             elif result is not None:
@@ -260,6 +266,7 @@ class DatabaseRoutes(ComponentBase):
             error=error,
             request_id=request_id,
             yara_rules=yara_rules,
+            partial_result=partial_result,
         )
 
     def _store_binary_search_query(self, binary_search_results: list, yara_rules: str) -> str:
@@ -12,6 +12,8 @@ from copy import deepcopy
 
 from werkzeug.datastructures import ImmutableMultiDict
 
+from storage.query_conversion import QueryConversionException, decode_cursor, get_cursor
+
 
 def get_current_gmt() -> int:
     '''
@@ -90,6 +92,39 @@ def get_paging(request_parameters: ImmutableMultiDict) -> tuple[int, int]:
     return offset, limit
 
 
+def get_paging_cursor(request_parameters: ImmutableMultiDict) -> str | None:
+    '''
+    Parse the paging parameter cursor from request parameters. The cursor of the next page is part of the response if
+    the page is full (see ``get_next_cursor``). Paging with a cursor is faster than with an offset for large offsets.
+
+    :param request_parameters: dict containing the request parameters.
+    :return: The cursor or ``None`` if there is no cursor.
+    '''
+    cursor = request_parameters.get('cursor')
+    if not cursor:
+        return None
+    try:
+        decode_cursor(cursor, 1)
+    except QueryConversionException:
+        raise ValueError('Malformed cursor parameter')
+    if request_parameters.get('offset') not in (None, '', '0', 0):
+        raise ValueError('Offset and cursor can not be combined')
+    return cursor
+
+
+def get_next_cursor(uids: list[str], limit: int) -> str | None:
+    '''
+    Get the cursor of the next page of a UID listing (the results are sorted by UID).
+
+    :param uids: The UIDs of the current page.
+    :param limit: The page size.
+    :return: The cursor of the next page or ``None`` if this is the last page.
+    '''
+    if not limit or len(uids) < limit:
+        return None
+    return get_cursor([uids[-1]])
+
+
 def get_query(request_parameters: ImmutableMultiDict) -> dict:
     '''
     Parse the query parameter from request parameters. Query is a dictionary representing a MongoDB query.
@@ -3,7 +3,14 @@ from flask_restx import Namespace
 
 from helperFunctions.object_conversion import create_meta_dict
 from storage.db_interface_base import DbInterfaceError
-from web_interface.rest.helper import error_message, get_paging, get_query, success_message
+from web_interface.rest.helper import (
+    error_message,
+    get_next_cursor,
+    get_paging,
+    get_paging_cursor,
+    get_query,
+    success_message,
+)
 from web_interface.rest.rest_resource_base import RestResourceBase
 from web_interface.security.decorator import roles_accepted
 from web_interface.security.privileges import PRIVILEGES
@@ -21,6 +28,11 @@ class RestFileObjectWithoutUid(RestResourceBase):
         params={
             'offset': {'description': 'offset of results (paging)', 'in': 'query', 'type': 'int'},
             'limit': {'description': 'number of results (paging)', 'in': 'query', 'type': 'int'},
+            'cursor': {
+                'description': 'cursor of the next page from the previous response (paging, faster than offset)',
+                'in': 'query',
+                'type': 'string',
+            },
             'query': {'description': 'MongoDB style query', 'in': 'query', 'type': 'dict'},
         },
     )
@@ -31,14 +43,16 @@ class RestFileObjectWithoutUid(RestResourceBase):
         try:
             query = get_query(request.args)
             offset, limit = get_paging(request.args)
+            cursor = get_paging_cursor(request.args)
         except ValueError as value_error:
-            request_data = {k: request.args.get(k) for k in ['query', 'limit', 'offset']}
+            request_data = {k: request.args.get(k) for k in ['query', 'limit', 'offset', 'cursor']}
             return error_message(str(value_error), self.URL, request_data=request_data)
 
-        parameters = dict(offset=offset, limit=limit, query=query)
+        parameters = dict(offset=offset, limit=limit, query=query, cursor=cursor)
         try:
             uids = self.db.frontend.rest_get_file_object_uids(**parameters)
-            return success_message(dict(uids=uids), self.URL, parameters)
+            result = dict(uids=uids, next_cursor=get_next_cursor(uids, limit))
+            return success_message(result, self.URL, parameters)
         except DbInterfaceError:
             return error_message('Unknown exception on request', self.URL, parameters)
 
@@ -14,7 +14,9 @@ from storage.db_interface_base import DbInterfaceError
 from web_interface.rest.helper import (
     error_message,
     get_boolean_from_request,
+    get_next_cursor,
     get_paging,
+    get_paging_cursor,
     get_query,
     get_update,
     success_message,
@@ -55,6 +57,11 @@ class RestFirmwareGetWithoutUid(RestResourceBase):
         params={
             'offset': {'description': 'offset of results (paging)', 'in': 'query', 'type': 'int'},
             'limit': {'description': 'number of results (paging)', 'in': 'query', 'type': 'int'},
+            'cursor': {
+                'description': 'cursor of the next page from the previous response (paging, faster than offset)',
+                'in': 'query',
+                'type': 'string',
+            },
             'query': {'description': 'MongoDB style query', 'in': 'query', 'type': 'dict'},
             'recursive': {
                 'description': 'Query for parent firmware of matching objects (requires query)',
@@ -77,15 +84,20 @@ class RestFirmwareGetWithoutUid(RestResourceBase):
         List all available firmware in the database
         '''
         try:
-            query, recursive, inverted, offset, limit = self._get_parameters_from_request(request.args)
+            query, recursive, inverted, offset, limit, cursor = self._get_parameters_from_request(request.args)
         except ValueError as value_error:
-            request_data = {k: request.args.get(k) for k in ['query', 'limit', 'offset', 'recursive', 'inverted']}
+            request_data = {
+                k: request.args.get(k) for k in ['query', 'limit', 'offset', 'cursor', 'recursive', 'inverted']
+            }
             return error_message(str(value_error), self.URL, request_data=request_data)
 
-        parameters = dict(offset=offset, limit=limit, query=query, recursive=recursive, inverted=inverted)
+        parameters = dict(
+            offset=offset, limit=limit, query=query, recursive=recursive, inverted=inverted, cursor=cursor
+        )
         try:
             uids = self.db.frontend.rest_get_firmware_uids(**parameters)
-            return success_message(dict(uids=uids), self.URL, parameters)
+            result = dict(uids=uids, next_cursor=get_next_cursor(uids, limit))
+            return success_message(result, self.URL, parameters)
         except DbInterfaceError:
             return error_message('Unknown exception on request', self.URL, parameters)
 
@@ -95,11 +107,12 @@ class RestFirmwareGetWithoutUid(RestResourceBase):
         recursive = get_boolean_from_request(request_parameters, 'recursive')
         inverted = get_boolean_from_request(request_parameters, 'inverted')
         offset, limit = get_paging(request.args)
+        cursor = get_paging_cursor(request.args)
         if recursive and not query:
             raise ValueError('Recursive search is only permissible with non-empty query')
         if inverted and not recursive:
             raise ValueError('Inverted flag can only be used with recursive')
-        return query, recursive, inverted, offset, limit
+        return query, recursive, inverted, offset, limit, cursor
 
     @roles_accepted(*PRIVILEGES['submit_analysis'])
     @api.expect(firmware_model)